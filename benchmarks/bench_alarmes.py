@@ -0,0 +1,178 @@
+"""
+Benchmark: latência dos alarmes sobre as leituras ao vivo
+
+1. Custo da avaliação: MotorAlarmes.processar com --regras regras, uma
+   leitura por lote (o caso do Arduino em ASCII), sem porta nem banco.
+2. Ponta a ponta com o simulador (servidor/simulador_arduino.py) a --hz
+   leituras/s, perfil ioio (sobe e desce três vezes) e missão ativa em um
+   banco temporário: latência desde a escrita da leitura na porta até o
+   barramento e até o evento chegar ao assinante do motor (thread de
+   entrega, onde a interface recebe), eventos gerados e gravados.
+3. Silêncio: tempo entre a última leitura enviada e o alarme de sensor
+   silencioso, além do timeout da regra.
+
+As regras do teste não têm atraso (debounce), para medir só o custo do
+caminho; com atraso_ms, o alarme sai atraso_ms depois.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_alarmes [--hz 100] [--regras 50] [--segundos 20]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import servidor.database as db
+from servidor import sensor_arduino
+from servidor.alarmes import MotorAlarmes, criar_regras
+from servidor.simulador_arduino import PSI_POR_METRO, SimuladorArduino, perfil_mergulho
+
+PROFUNDIDADE_MAXIMA = 20.0
+TIMEOUT_SILENCIO_MS = 200
+
+
+def _declarar_regras(total):
+    """
+    total regras variadas sobre o perfil ioio de PROFUNDIDADE_MAXIMA m: limites
+    de profundidade, pressão e temperatura espalhados pela faixa do mergulho,
+    taxas de descida/subida e uma regra de silêncio
+    """
+    regras = [{'tipo': 'silencio', 'nome': 'silencio', 'timeout_ms': TIMEOUT_SILENCIO_MS}]
+    i = 0
+    while len(regras) < total:
+        fracao = (i // 4 + 1) / (total // 4 + 2)
+        tipo = i % 4
+        if tipo == 0:
+            regras.append({'tipo': 'limite', 'nome': f'profundidade_{i}', 'canal': 'profundidade',
+                           'limite': fracao * PROFUNDIDADE_MAXIMA, 'histerese': 0.3})
+        elif tipo == 1:
+            regras.append({'tipo': 'limite', 'nome': f'pressao_{i}', 'canal': 'pressao',
+                           'limite': fracao * PROFUNDIDADE_MAXIMA * PSI_POR_METRO, 'histerese': 0.5})
+        elif tipo == 2:
+            regras.append({'tipo': 'limite', 'nome': f'temperatura_{i}', 'canal': 'temperatura',
+                           'limite': 25.0 - 8.0 * fracao, 'acima': False, 'histerese': 0.2})
+        else:
+            sentido = 1 if (i // 4) % 2 else -1
+            regras.append({'tipo': 'taxa', 'nome': f'taxa_{i}', 'canal': 'profundidade',
+                           'limite': sentido * 400 * fracao, 'acima': sentido > 0,
+                           'janela_ms': 500, 'histerese': 20.0})
+        i += 1
+    return regras
+
+
+def _medir_avaliacao(total_regras, leituras):
+    motor = MotorAlarmes(criar_regras(_declarar_regras(total_regras)))
+    dados = [(int(t * 1000), temperatura, pressao) for t, pressao, temperatura in leituras]
+    inicio = time.perf_counter()
+    for leitura in dados:
+        motor.processar((leitura,))
+    duracao = time.perf_counter() - inicio
+    por_leitura = duracao / len(dados)
+    print(f"Avaliação ({total_regras} regras, {len(dados)} leituras, uma por lote)")
+    print(f"  {por_leitura * 1e6:8.2f} µs/leitura  {por_leitura / total_regras * 1e9:6.0f} ns por regra  "
+          f"{motor.eventos_gerados} eventos  (limite de leituras/s: {1 / por_leitura:,.0f})")
+
+
+def _resumo(latencias):
+    if not len(latencias):
+        return "sem dados"
+    p50, p99 = np.percentile(latencias, [50, 99])
+    return f"p50 {p50:7.2f}  p99 {p99:7.2f}  máx. {latencias.max():7.2f} ms"
+
+
+def _medir_ponta_a_ponta(transporte, hz, segundos, total_regras, id_missao):
+    leituras = perfil_mergulho(segundos, hz, 'ioio', PROFUNDIDADE_MAXIMA)
+    simulador = SimuladorArduino(leituras, transporte, velocidade=1.0, semente=hz)
+    sensor = sensor_arduino.SensorArduino()
+    if not sensor.conectar(simulador.abrir(), espera_reset=0):
+        raise RuntimeError("não foi possível conectar ao simulador")
+    sensor.ultimo_log = float('inf')  # sem mensagens de leitura no console
+    sensor.definir_regras_alarme(criar_regras(_declarar_regras(total_regras)))
+
+    # Horário (relógio único) de cada leitura e instante em que cada lote chegou
+    timestamps = []
+    chegadas = []
+
+    def receber(lote, snapshot):
+        timestamps.extend(leitura[0] for leitura in lote)
+        chegadas.append((len(timestamps), time.perf_counter()))
+
+    sensor.assinar(receber)  # depois do motor: recebe o lote já avaliado
+    eventos = []
+    sensor.alarmes.assinar(lambda evento: eventos.append((evento, time.perf_counter())))
+
+    sensor.iniciar_leitura(id_missao)
+    simulador.iniciar()
+    simulador.aguardar()
+    fim_envio = simulador.envios[-1][1]
+    # Espera o alarme de silêncio (e a entrega dos eventos pendentes)
+    time.sleep(TIMEOUT_SILENCIO_MS / 1000 + 0.3)
+    sensor.parar_leitura()
+    sensor.escritor.parar()
+
+    enviados, t_envio = np.array(simulador.envios).T
+    recebidos, t_chegada = np.array(chegadas).T
+    ts = np.array(timestamps)
+
+    def envio(k):
+        return t_envio[np.searchsorted(enviados, k)]
+
+    k = np.arange(1, int(min(enviados[-1], recebidos[-1])) + 1)
+    latencia_barramento = (t_chegada[np.searchsorted(recebidos, k)] - envio(k)) * 1000
+
+    latencia_alarme = []
+    silencio = None
+    for evento, instante in eventos:
+        if evento.regra == 'silencio':
+            if evento.ativo:
+                silencio = (instante - fim_envio) * 1000 - TIMEOUT_SILENCIO_MS
+            continue
+        # Primeira leitura com o horário do evento (a que disparou, ou antes dela no mesmo lote)
+        leitura = int(np.searchsorted(ts, evento.timestamp_ms, side='left')) + 1
+        latencia_alarme.append((instante - envio(leitura)) * 1000)
+
+    gravados = len(db.listar_alarmes_por_missao(id_missao))
+    print(f"\nPonta a ponta ({hz} Hz, {segundos:.0f} s, {total_regras} regras, {transporte}, missão ativa)")
+    print(f"  enviadas {simulador.leituras_enviadas}  recebidas {sensor.leituras_recebidas}  "
+          f"avaliadas {sensor.alarmes.leituras_avaliadas}  eventos {len(eventos)}  gravados {gravados}")
+    print(f"  porta -> barramento        {_resumo(latencia_barramento)}")
+    print(f"  porta -> alarme entregue   {_resumo(np.array(latencia_alarme))}  ({len(latencia_alarme)} eventos)")
+    if silencio is not None:
+        print(f"  silêncio: alarme {silencio:.1f} ms após o timeout de {TIMEOUT_SILENCIO_MS} ms")
+    else:
+        print("  silêncio: alarme NÃO gerado")
+    sensor.desconectar()
+    simulador.parar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--transporte', choices=('pty', 'socket'), default='pty')
+    parser.add_argument('--hz', type=int, default=100)
+    parser.add_argument('--regras', type=int, default=50)
+    parser.add_argument('--segundos', type=float, default=20.0)
+    parser.add_argument('--leituras-avaliacao', type=int, default=100_000)
+    args = parser.parse_args()
+    if args.transporte == 'pty' and os.name != 'posix':
+        args.transporte = 'socket'
+
+    _medir_avaliacao(args.regras, list(perfil_mergulho(args.leituras_avaliacao / args.hz, args.hz,
+                                                       'ioio', PROFUNDIDADE_MAXIMA)))
+
+    caminho_original = db.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        db.fechar_conexoes()
+        db.DB_PATH = os.path.join(tmp, 'bench_alarmes.db')
+        db.inicializar_banco()
+        id_mergulhador = db.inserir_mergulhador("Benchmark", 30, "M")
+        id_missao = db.inserir_missao(id_mergulhador, "Alarmes", 0, "Missao_alarmes")
+        _medir_ponta_a_ponta(args.transporte, args.hz, args.segundos, args.regras, id_missao)
+        db.fechar_conexoes()
+    db.DB_PATH = caminho_original
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Benchmark: análise do perfil do mergulho (NumPy vetorizado vs. laço em Python)
+
+1. Missão sintética de --amostras leituras (perfil quadrado a 10 Hz, ruído e
+   picos isolados): análise inteira de uma vez com AnaliseMergulho e o mesmo
+   cálculo leitura a leitura em Python puro (em --amostras-python leituras,
+   projetado para o total). Confere que os dois chegam ao mesmo resumo.
+2. Ao vivo: as mesmas leituras em pedaços de 1, 10, 100 e 1000; custo por
+   leitura e diferença máxima para a análise de uma vez.
+3. Banco temporário com a missão gravada: leitura das séries
+   (carregar_series), primeira análise e análise vinda do cache.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_analise_mergulho [--amostras 1000000] [--amostras-banco 1000000]
+"""
+
+import argparse
+import bisect
+import math
+import os
+import tempfile
+import time
+from collections import deque
+
+import numpy as np
+
+import servidor.database as db
+from servidor import analise_mergulho
+from servidor.analise_mergulho import AnaliseMergulho, analisar, analisar_missao, carregar_series
+from servidor.simulador_arduino import perfil_mergulho
+
+INICIO_MS = 1735689600 * 1000
+
+
+def _gerar(amostras, hz=10, semente=1):
+    """Timestamps (ms) e pressões de um mergulho com ruído e 0,1% de picos"""
+    aleatorio = np.random.default_rng(semente)
+    perfil = np.array(list(perfil_mergulho(amostras / hz, hz, 'quadrado', 20.0)))
+    timestamp_ms = INICIO_MS + np.round(perfil[:, 0] * 1000).astype(np.int64)
+    pressao = perfil[:, 1] + aleatorio.normal(0, 0.05, amostras)
+    pressao[aleatorio.integers(0, amostras, amostras // 1000)] += 5.0
+    return timestamp_ms, pressao
+
+
+def _analisar_em_python(timestamp_ms, pressao):
+    """Mesmo cálculo de AnaliseMergulho, uma leitura por vez, com listas e deque"""
+    a = analise_mergulho
+    fator = a.PA_POR_PSI / (a.DENSIDADE_AGUA_SALGADA * a.GRAVIDADE)
+    ultimas = deque([pressao[0]] * (a.JANELA_MEDIANA - 1), maxlen=a.JANELA_MEDIANA)
+    janela_t, janela_p = deque(), deque()
+    ema, t_anterior = None, None
+    maxima, subida, descida, submerso, por_faixa = 0.0, 0.0, 0.0, 0.0, {}
+    anterior = None  # (t, profundidade) aguardando o tempo até a próxima
+    for ts, p in zip(timestamp_ms.tolist(), pressao.tolist()):
+        t = (ts - int(timestamp_ms[0])) / 1000
+        if t_anterior is not None:
+            t = max(t, t_anterior)
+        ultimas.append(p)
+        mediana = sorted(ultimas)[a.JANELA_MEDIANA // 2]
+        if ema is None:
+            ema, t_anterior = mediana, t
+        passo = max(t - t_anterior, a.PASSO_MINIMO)
+        ema += (1 - math.exp(-passo / a.CONSTANTE_EMA)) * (mediana - ema)
+        t_anterior = t
+        profundidade = max(ema * fator, 0.0)
+
+        janela_t.append(t)
+        janela_p.append(profundidade)
+        while janela_t[0] < t - a.JANELA_TAXA:
+            janela_t.popleft()
+            janela_p.popleft()
+        intervalo = t - janela_t[0]
+        velocidade = (profundidade - janela_p[0]) * 60 / intervalo if intervalo > 0 else 0.0
+
+        maxima = max(maxima, profundidade)
+        descida = max(descida, velocidade)
+        subida = max(subida, -velocidade)
+        if anterior is not None:
+            duracao = t - anterior[0]
+            if duracao <= a.LACUNA_MAXIMA:
+                faixa = int(anterior[1] / a.FAIXA_HISTOGRAMA)
+                por_faixa[faixa] = por_faixa.get(faixa, 0.0) + duracao
+                if anterior[1] > a.PROFUNDIDADE_SUPERFICIE:
+                    submerso += duracao
+        anterior = (t, profundidade)
+    return {'profundidade_maxima': maxima, 'velocidade_subida_maxima': subida,
+            'velocidade_descida_maxima': descida, 'tempo_submerso': submerso}
+
+
+def _melhor_de(repeticoes, funcao):
+    melhor, resultado = float('inf'), None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def _medir_lote(timestamp_ms, pressao, amostras_python):
+    n = len(timestamp_ms)
+    print(f"Missão de {n} leituras (10 Hz, {n / 36000:.1f} h)")
+    tempo, analise = _melhor_de(3, lambda: analisar(timestamp_ms, pressao))
+    print(f"  {'NumPy, tudo de uma vez':<34} {tempo * 1000:9.1f} ms  {n / tempo:12,.0f} leituras/s")
+
+    parcial = slice(0, min(amostras_python, n))
+    tempo_python, resumo_python = _melhor_de(1, lambda: _analisar_em_python(timestamp_ms[parcial], pressao[parcial]))
+    por_leitura = tempo_python / len(timestamp_ms[parcial])
+    print(f"  {'Python, leitura a leitura':<34} {por_leitura * n * 1000:9.1f} ms  "
+          f"{1 / por_leitura:12,.0f} leituras/s  (projetado de {len(timestamp_ms[parcial])})")
+    print(f"  ganho: {por_leitura * n / tempo:.0f}x")
+
+    resumo_numpy = analisar(timestamp_ms[parcial], pressao[parcial]).resumo
+    diferenca = max(abs(resumo_numpy[chave] - valor) for chave, valor in resumo_python.items())
+    print(f"  diferença máxima no resumo (NumPy x Python): {diferenca:.2e}")
+
+    r = analise.resumo
+    print(f"  profundidade máx. {r['profundidade_maxima']:.2f} m, tempo de fundo {r['tempo_fundo'] / 60:.1f} min, "
+          f"subida máx. {r['velocidade_subida_maxima']:.2f} m/min")
+    return analise
+
+
+def _medir_incremental(timestamp_ms, pressao, analise):
+    print("\nAo vivo (mesmas leituras em pedaços)")
+    n = len(timestamp_ms)
+    for tamanho in (1, 10, 100, 1000):
+        # Pedaços pequenos: só o começo da missão, para não demorar
+        total = min(n, tamanho * 20_000)
+        incremental = AnaliseMergulho()
+        partes = []
+        inicio = time.perf_counter()
+        for i in range(0, total, tamanho):
+            partes.append(incremental.adicionar(timestamp_ms[i:i + tamanho], pressao[i:i + tamanho]))
+        tempo = time.perf_counter() - inicio
+        profundidade = np.concatenate([parte.profundidade for parte in partes])
+        esperado = analisar(timestamp_ms[:total], pressao[:total]).series.profundidade
+        print(f"  pedaços de {tamanho:>4}  {tempo / total * 1e6:8.2f} µs/leitura  "
+              f"diferença máx. {np.abs(profundidade - esperado).max():.1e} m  ({total} leituras)")
+
+
+def _medir_banco(timestamp_ms, pressao):
+    n = len(timestamp_ms)
+    caminho_original = db.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        db.fechar_conexoes()
+        db.DB_PATH = os.path.join(tmp, 'bench_analise.db')
+        db.inicializar_banco()
+        id_mergulhador = db.inserir_mergulhador("Benchmark", 30, "M")
+        id_missao = db.inserir_missao(id_mergulhador, "Análise", INICIO_MS, "Missao_analise")
+
+        inicio = time.perf_counter()
+        temperatura = 20.0
+        for i in range(0, n, 50_000):
+            db.inserir_medicoes([(id_missao, int(ts), temperatura, float(p))
+                                 for ts, p in zip(timestamp_ms[i:i + 50_000], pressao[i:i + 50_000])])
+        print(f"\nBanco temporário: {n} medições gravadas em {time.perf_counter() - inicio:.1f} s")
+
+        tempo, (ts, _) = _melhor_de(1, lambda: carregar_series(id_missao))
+        print(f"  {'carregar_series':<34} {tempo * 1000:9.1f} ms  ({len(ts)} leituras)")
+        tempo, _ = _melhor_de(1, lambda: analisar_missao(id_missao))
+        print(f"  {'analisar_missao (leitura + análise)':<34} {tempo * 1000:9.1f} ms")
+        tempo, _ = _melhor_de(5, lambda: analisar_missao(id_missao))
+        print(f"  {'analisar_missao (cache)':<34} {tempo * 1e6:9.1f} µs")
+        db.inserir_medicao(id_missao, int(timestamp_ms[-1]) + 100, temperatura, 0.0)
+        tempo, _ = _melhor_de(1, lambda: analisar_missao(id_missao))
+        print(f"  {'após nova medição (refeita)':<34} {tempo * 1000:9.1f} ms")
+        db.fechar_conexoes()
+    db.DB_PATH = caminho_original
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--amostras', type=int, default=1_000_000)
+    parser.add_argument('--amostras-python', type=int, default=100_000)
+    parser.add_argument('--amostras-banco', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    timestamp_ms, pressao = _gerar(args.amostras)
+    analise = _medir_lote(timestamp_ms, pressao, args.amostras_python)
+    _medir_incremental(timestamp_ms, pressao, analise)
+    if args.amostras_banco:
+        _medir_banco(*_gerar(args.amostras_banco, semente=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark: espaço em disco e vazão de leitura, uma linha por medição vs. blocos
+
+Simula uma missão de 2 horas a 10 Hz e a 100 Hz e grava as mesmas amostras
+nos dois backends (tabela medicao e tabela medicao_bloco).
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_blocos [--horas 2] [--taxas 10 100]
+"""
+
+import argparse
+import math
+import os
+import random
+import tempfile
+import time
+
+import servidor.database as db
+from servidor.armazenamento_blocos import ArmazenamentoBlocos
+
+INICIO_MS = 1_735_700_000_000
+
+
+def _gerar_amostras(horas, taxa):
+    """Perfil de mergulho sintético: descida, fundo e subida com ruído"""
+    rng = random.Random(42)
+    total = int(horas * 3600 * taxa)
+    passo_ms = 1000 // taxa
+    for i in range(total):
+        fase = i / total
+        profundidade = math.sin(math.pi * fase) * 40.0
+        pressao = round(profundidade * 1.45 + rng.gauss(0, 0.05), 2)
+        temperatura = round(24.0 - profundidade * 0.2 + rng.gauss(0, 0.05), 1)
+        yield INICIO_MS + i * passo_ms, temperatura, pressao
+
+
+def _tamanho(tabelas):
+    """Bytes ocupados pelas tabelas/índices (dbstat) ou tamanho do arquivo"""
+    conn = db.conectar()
+    try:
+        marcadores = ','.join('?' * len(tabelas))
+        return conn.execute(f'SELECT SUM(pgsize) FROM dbstat WHERE name IN ({marcadores})',
+                            tabelas).fetchone()[0] or 0
+    except Exception:
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        return os.path.getsize(db.DB_PATH)
+
+
+def _novo_banco(caminho):
+    """Cria um banco vazio com uma missão"""
+    db.fechar_conexoes()
+    db.DB_PATH = caminho
+    db.inicializar_banco()
+    id_merg = db.inserir_mergulhador("Benchmark", 30, "O")
+    return db.inserir_missao(id_merg, "Benchmark", INICIO_MS, "Bench")
+
+
+def _cenario(tmp, horas, taxa, repeticoes):
+    amostras = list(_gerar_amostras(horas, taxa))
+    n = len(amostras)
+    print(f"\nMissão de {horas} h a {taxa} Hz ({n} amostras)")
+
+    # Uma linha por medição (timestamp em texto e em ms)
+    id_missao = _novo_banco(os.path.join(tmp, f'linhas_{taxa}.db'))
+    db.inserir_medicoes([(id_missao, ms, t, p) for ms, t, p in amostras])
+    tamanho_linhas = _tamanho(('medicao', 'idx_medicao_missao_timestamp_ms'))
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        lidas = len(db.listar_medicoes_por_missao(id_missao))
+    tempo_linhas = (time.perf_counter() - inicio) / repeticoes
+
+    # Blocos colunares (com e sem zlib)
+    resultados = []
+    for comprimir in (True, False):
+        id_missao = _novo_banco(os.path.join(tmp, f'blocos_{taxa}_{comprimir}.db'))
+        armazenamento = ArmazenamentoBlocos(comprimir=comprimir)
+        armazenamento.anexar_lote([(id_missao, ms, t, p) for ms, t, p in amostras])
+        armazenamento.descarregar()
+        tamanho = _tamanho(('medicao_bloco', 'idx_medicao_bloco_missao_inicio'))
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            timestamps, _, _ = armazenamento.ler_intervalo(id_missao)
+        tempo = (time.perf_counter() - inicio) / repeticoes
+        assert len(timestamps) == n == lidas
+        resultados.append((f"blocos ({'zlib' if comprimir else 'sem compressão'})", tamanho, tempo))
+
+    print(f"  {'layout':<26} {'disco':>12} {'bytes/amostra':>14} {'leitura':>12} {'amostras/s':>14}")
+    for nome, tamanho, tempo in [("uma linha por medição", tamanho_linhas, tempo_linhas)] + resultados:
+        print(f"  {nome:<26} {tamanho / 1024:>9.0f} KB {tamanho / n:>14.2f} "
+              f"{tempo * 1000:>9.1f} ms {n / tempo:>14,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--horas', type=float, default=2)
+    parser.add_argument('--taxas', type=int, nargs='+', default=[10, 100])
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    caminho_original = db.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        for taxa in args.taxas:
+            _cenario(tmp, args.horas, taxa, args.repeticoes)
+        db.fechar_conexoes()
+    db.DB_PATH = caminho_original
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark: tendência das leituras recentes pelo banco vs. pelo buffer em memória
+
+Grava uma missão sintética (por padrão 10 minutos a 100 Hz) em um banco
+temporário e, em paralelo, no BufferLeituras, e mede:
+1. Custo de acrescentar leituras ao buffer (uma a uma e em lotes como os
+   que a thread serial entrega).
+2. Consulta "últimos 10 s" com mínimo/máximo/média/inclinação: pelo banco
+   (iterar_medicoes + cálculo em Python) e pelo buffer (views + NumPy).
+3. Conferência: os agregados das duas fontes coincidem.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_buffer_leituras [--minutos 10] [--hz 100]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+import servidor.database as db
+from servidor import relogio
+from servidor.buffer_leituras import BufferLeituras, Janela, agregar
+
+
+def _gerar_leituras(n, hz, semente=1):
+    """(timestamp_ms, temperatura, pressao) de uma descida lenta com ruído"""
+    aleatorio = random.Random(semente)
+    inicio_ms = relogio.agora_ms() - n * 1000 // hz
+    return [(inicio_ms + i * 1000 // hz,
+             round(25.0 - i / n * 8 + aleatorio.gauss(0, 0.02), 2),
+             round(14.7 + i / n * 40 + aleatorio.gauss(0, 0.01), 3))
+            for i in range(n)]
+
+
+def _tendencia_banco(id_missao, segundos, ate_ms):
+    """Padrão sem buffer: buscar a janela no banco e agregar em Python"""
+    linhas = []
+    for lote in db.iterar_medicoes(id_missao, inicio=ate_ms - segundos * 1000, fim=ate_ms,
+                                   colunas=('timestamp_ms', 'temperatura', 'pressao')):
+        linhas.extend(lote)
+    timestamp_ms, temperatura, pressao = (np.array(coluna) for coluna in zip(*linhas))
+    return agregar(Janela(timestamp_ms, pressao, temperatura))
+
+
+def _medir(nome, funcao, repeticoes):
+    """Tempo médio de funcao() em µs"""
+    funcao()
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        resultado = funcao()
+    media_us = (time.perf_counter() - inicio) / repeticoes * 1e6
+    print(f"  {nome:<44} {media_us:10.1f} µs")
+    return resultado, media_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--minutos', type=int, default=10)
+    parser.add_argument('--hz', type=int, default=100)
+    parser.add_argument('--janela', type=int, default=10, help='segundos da consulta de tendência')
+    parser.add_argument('--repeticoes', type=int, default=200)
+    args = parser.parse_args()
+
+    n = args.minutos * 60 * args.hz
+    leituras = _gerar_leituras(n, args.hz)
+    print(f"{n} leituras ({args.minutos} min a {args.hz} Hz)\n")
+
+    print("Acrescentar ao buffer")
+    buffer = BufferLeituras()
+    inicio = time.perf_counter()
+    for leitura in leituras:
+        buffer.adicionar(*leitura)
+    print(f"  {'uma a uma (adicionar)':<44} {(time.perf_counter() - inicio) / n * 1e6:10.2f} µs/leitura")
+    for tamanho in (10, 100):
+        buffer = BufferLeituras()
+        inicio = time.perf_counter()
+        for posicao in range(0, n, tamanho):
+            buffer.adicionar_lote(leituras[posicao:posicao + tamanho])
+        print(f"  {f'lotes de {tamanho} (adicionar_lote)':<44} "
+              f"{(time.perf_counter() - inicio) / n * 1e6:10.2f} µs/leitura")
+
+    caminho_original = db.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        db.fechar_conexoes()
+        db.DB_PATH = os.path.join(tmp, 'bench_buffer_leituras.db')
+        db.inicializar_banco()
+        id_mergulhador = db.inserir_mergulhador("Benchmark", 30, "M")
+        id_missao = db.inserir_missao(id_mergulhador, "Benchmark buffer", leituras[0][0], "Missao_bench")
+        db.inserir_medicoes([(id_missao, *leitura) for leitura in leituras])
+
+        ate_ms = int(buffer.ultimas(1).timestamp_ms[-1])
+        print(f"\nTendência dos últimos {args.janela} s")
+        banco, antigo = _medir("banco (iterar_medicoes + agregar)",
+                               lambda: _tendencia_banco(id_missao, args.janela, ate_ms), args.repeticoes)
+        memoria, novo = _medir("buffer (janela_tempo + agregar)",
+                               lambda: agregar(buffer.janela_tempo(args.janela)), args.repeticoes)
+        _medir("buffer, só a janela (views)",
+               lambda: buffer.janela_tempo(args.janela), args.repeticoes)
+        _medir(f"buffer, últimas {args.janela * args.hz} leituras (views)",
+               lambda: buffer.ultimas(args.janela * args.hz), args.repeticoes)
+        print(f"\n  ganho: {antigo / novo:.0f}x")
+
+        for serie in ('pressao', 'temperatura'):
+            for chave in ('min', 'max', 'media', 'inclinacao'):
+                if not np.isclose(banco[serie][chave], memoria[serie][chave]):
+                    print(f"  ERRO: {serie} {chave} difere ({banco[serie][chave]} vs {memoria[serie][chave]})")
+        if banco['leituras'] != memoria['leituras']:
+            print(f"  ERRO: {banco['leituras']} leituras no banco vs {memoria['leituras']} no buffer")
+
+        db.fechar_conexoes()
+    db.DB_PATH = caminho_original
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: codificadores de vídeo dos segmentos (cv2 vs. ffmpeg)
+
+Grava --segundos s de imagens sintéticas (gradiente com um quadrado em
+movimento e ruído leve, como a fonte de bench_pipeline_video) em 720p e
+1080p com cada codificador da matriz, o mais rápido possível, e mede:
+tempo de CPU (este processo + ffmpeg) por segundo de vídeo, fps sustentado
+(frames / tempo decorrido) e bytes por minuto de vídeo.
+
+Sem o ffmpeg no PATH, use --ffmpeg com o caminho do executável; sem ele,
+só os codificadores do cv2 são medidos.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_codificadores [--segundos 10] [--fps 30] [--ffmpeg /caminho/ffmpeg]
+"""
+
+import argparse
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_pipeline_video import FonteSintetica, RESOLUCOES
+from captura.gravacao_video import CodificadorCv2, CodificadorFfmpeg
+from servidor import registro
+
+# (rótulo, classe, parâmetros)
+MATRIZ = [
+    ("cv2 XVID", CodificadorCv2, {'fourcc': 'XVID'}),
+    ("cv2 MJPG", CodificadorCv2, {'fourcc': 'MJPG'}),
+    ("ffmpeg mjpeg q5", CodificadorFfmpeg, {'codec': 'mjpeg', 'crf': 5}),
+    ("ffmpeg h264 ultrafast crf23", CodificadorFfmpeg, {'codec': 'h264', 'preset': 'ultrafast'}),
+    ("ffmpeg h264 veryfast crf23", CodificadorFfmpeg, {'codec': 'h264', 'preset': 'veryfast'}),
+    ("ffmpeg h264 medium crf23", CodificadorFfmpeg, {'codec': 'h264', 'preset': 'medium'}),
+    ("ffmpeg h264 veryfast 2M", CodificadorFfmpeg, {'codec': 'h264', 'preset': 'veryfast', 'bitrate': '2M'}),
+]
+
+
+def _quadros(largura, altura, fps):
+    fonte = FonteSintetica(largura, altura, fps)
+    aleatorio = np.random.default_rng(1)
+    for quadro in fonte.quadros:
+        ruido = aleatorio.integers(0, 6, quadro.shape, dtype=np.uint8)
+        quadro += ruido
+    return fonte.quadros
+
+
+def _cpu():
+    proprio = resource.getrusage(resource.RUSAGE_SELF)
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return proprio.ru_utime + proprio.ru_stime + filhos.ru_utime + filhos.ru_stime
+
+
+def _medir(codificador, quadros, fps, segundos, diretorio, tamanho):
+    caminho = os.path.join(diretorio, f"bench{codificador.extensao}")
+    total = int(segundos * fps)
+    cpu, inicio = _cpu(), time.perf_counter()
+    escritor = codificador.abrir(caminho, fps, tamanho)
+    for i in range(total):
+        escritor.write(quadros[i % len(quadros)])
+    escritor.release()
+    decorrido, cpu = time.perf_counter() - inicio, _cpu() - cpu
+    tamanho_arquivo = os.path.getsize(caminho)
+    os.remove(caminho)
+    return cpu / segundos, total / decorrido, tamanho_arquivo / segundos * 60
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--segundos', type=float, default=10.0)
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--ffmpeg', default='ffmpeg')
+    parser.add_argument('--resolucoes', nargs='+', default=list(RESOLUCOES), choices=list(RESOLUCOES))
+    args = parser.parse_args()
+
+    registro.configurar_log(registro.logging.WARNING)
+    ffmpeg = CodificadorFfmpeg.disponivel(args.ffmpeg)
+    if not ffmpeg:
+        print(f"ffmpeg não encontrado ({args.ffmpeg}): só os codificadores do cv2\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for nome in args.resolucoes:
+            largura, altura = RESOLUCOES[nome]
+            quadros = _quadros(largura, altura, args.fps)
+            print(f"{nome} ({largura}x{altura}), {args.segundos:.0f} s a {args.fps} fps")
+            print(f"  {'codificador':<28} {'CPU/s de vídeo':>14} {'fps':>7} {'MB/min':>8}")
+            for rotulo, classe, parametros in MATRIZ:
+                if classe is CodificadorFfmpeg:
+                    if not ffmpeg:
+                        continue
+                    parametros = dict(parametros, executavel=args.ffmpeg)
+                cpu, fps, bytes_minuto = _medir(classe(**parametros), quadros, args.fps, args.segundos,
+                                               tmp, (largura, altura))
+                tempo_real = "" if fps >= args.fps else "  (abaixo do tempo real)"
+                print(f"  {rotulo:<28} {cpu:12.2f} s {fps:7.1f} {bytes_minuto / 1e6:8.1f}{tempo_real}")
+            print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Benchmark: conexão com o Arduino sem bloquear a interface
+
+Com o Arduino simulado (servidor/simulador_arduino.py):
+1. Prontidão: tempo de conectar() esperando a primeira leitura válida, a 1
+   e 10 leituras/s, contra a espera fixa antiga de 3 s.
+   Velocidade: com o sketch a 115200 baud (pty), conectar() sem baudrate
+   testa as velocidades e conecta na do sketch (sai com código 1 se não).
+2. Segundo plano: quanto conectar_async() bloqueia quem chama (a thread da
+   interface) e quando o Future fica pronto.
+3. Arduino plugado depois: a porta só começa a enviar --atraso-plug s após
+   o pedido; tempo entre o início do envio e a conexão (tentativas com
+   espera crescente).
+4. Desconexões durante a missão (--hz leituras/s, queda de 0,5 s a cada
+   1 s): tempo até a leitura ser retomada após a porta voltar, leituras
+   perdidas e medições gravadas na mesma missão.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_conexao [--transporte socket] [--hz 100] [--segundos 6]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import servidor.database as db
+from servidor import sensor_arduino
+from servidor.simulador_arduino import SimuladorArduino, perfil_mergulho
+
+# Espera fixa usada antes da detecção de prontidão
+ESPERA_FIXA_ANTIGA = 3.0
+
+
+def _sensor():
+    sensor = sensor_arduino.SensorArduino()
+    sensor.ultimo_log = float('inf')  # sem mensagens de leitura no console
+    return sensor
+
+
+def _medir_prontidao(transporte):
+    print(f"Prontidão (primeira leitura válida, {transporte}; espera fixa antiga: {ESPERA_FIXA_ANTIGA:.0f} s)")
+    for hz in (1, 10):
+        simulador = SimuladorArduino(perfil_mergulho(60, hz), transporte, velocidade=1.0, semente=hz)
+        simulador.iniciar()
+        sensor = _sensor()
+        inicio = time.perf_counter()
+        ok = sensor.conectar(simulador.porta)
+        duracao = time.perf_counter() - inicio
+        print(f"  {hz:>3} leituras/s  conectado={ok}  {duracao * 1000:7.0f} ms  "
+              f"({ESPERA_FIXA_ANTIGA / duracao:.1f}x mais rápido)")
+        sensor.desconectar()
+        simulador.parar()
+
+
+def _medir_velocidade():
+    print(f"\nVelocidade detectada (pty, sketch a {sensor_arduino.BAUDRATE_BINARIO} baud, 10 leituras/s)")
+    simulador = SimuladorArduino(perfil_mergulho(60, 10), 'pty', velocidade=1.0,
+                                 baudrate=sensor_arduino.BAUDRATE_BINARIO)
+    simulador.iniciar()
+    sensor = _sensor()
+    inicio = time.perf_counter()
+    ok = sensor.conectar(simulador.porta, espera_reset=2)
+    duracao = time.perf_counter() - inicio
+    velocidade = sensor.porta_serial.baudrate if ok else None
+    print(f"  conectado={ok} a {velocidade} baud em {duracao * 1000:7.0f} ms")
+    sensor.desconectar()
+    simulador.parar()
+    return velocidade == sensor_arduino.BAUDRATE_BINARIO
+
+
+def _medir_segundo_plano(transporte):
+    print(f"\nEm segundo plano (10 leituras/s, {transporte})")
+    simulador = SimuladorArduino(perfil_mergulho(60, 10), transporte, velocidade=1.0)
+    simulador.iniciar()
+    sensor = _sensor()
+    inicio = time.perf_counter()
+    future = sensor.conectar_async(simulador.porta)
+    retorno = time.perf_counter() - inicio
+    ok = future.result()
+    pronto = time.perf_counter() - inicio
+    print(f"  conectar_async retornou em {retorno * 1e6:7.0f} µs; Future pronto em {pronto * 1000:7.0f} ms "
+          f"(conectado={ok})")
+    sensor.desconectar()
+    simulador.parar()
+
+
+def _medir_plug_atrasado(transporte, atraso_plug):
+    print(f"\nArduino plugado {atraso_plug:.1f} s depois do pedido ({transporte}, 10 leituras/s)")
+    simulador = SimuladorArduino(perfil_mergulho(60, 10), transporte, velocidade=1.0)
+    porta = simulador.abrir()  # porta existe, mas nada é enviado ainda
+    sensor = _sensor()
+    future = sensor.conectar_async(porta, espera_reset=0.5, prazo=30)
+    time.sleep(atraso_plug)
+    inicio_envio = time.perf_counter()
+    simulador.iniciar()
+    ok = future.result()
+    print(f"  conectado={ok} {(time.perf_counter() - inicio_envio) * 1000:7.0f} ms após o início do envio")
+    sensor.desconectar()
+    simulador.parar()
+
+
+def _medir_reconexao(transporte, hz, segundos, id_missao):
+    print(f"\nDesconexões durante a missão ({transporte}, {hz} Hz, queda de 0,5 s a cada 1 s, {segundos:.0f} s)")
+    simulador = SimuladorArduino(perfil_mergulho(segundos, hz), transporte, velocidade=1.0,
+                                 intervalo_queda=1.0, duracao_queda=0.5, semente=4)
+    sensor = _sensor()
+    if not sensor.conectar(simulador.abrir(), espera_reset=0):
+        raise RuntimeError("não foi possível conectar ao simulador")
+    sensor.iniciar_leitura(id_missao)
+    simulador.iniciar()
+
+    retomadas = []
+    volta = None
+    estava_lendo = True
+    while not simulador.aguardar(0.0005):
+        agora = time.perf_counter()
+        if not simulador.disponivel.is_set():
+            volta = None
+        elif volta is None:
+            volta = agora
+        if sensor.lendo and not estava_lendo and volta is not None:
+            retomadas.append((agora - volta) * 1000)
+        estava_lendo = sensor.lendo
+    time.sleep(0.2)
+    sensor.parar_leitura()
+    sensor.escritor.parar()
+    gravadas = db.get_estatisticas_medicoes(id_missao)[0]
+
+    print(f"  quedas {simulador.quedas}, leitura retomada {len(retomadas)} vezes; "
+          f"após a porta voltar: " + ", ".join(f"{r:.0f} ms" for r in retomadas))
+    print(f"  leituras enviadas {simulador.leituras_enviadas}, recebidas {sensor.leituras_recebidas}, "
+          f"gravadas na missão {gravadas} (perdidas com a porta fechada: {simulador.leituras_perdidas})")
+    sensor.desconectar()
+    simulador.parar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--transporte', choices=('pty', 'socket'), default='socket')
+    parser.add_argument('--hz', type=int, default=100)
+    parser.add_argument('--segundos', type=float, default=6.0)
+    parser.add_argument('--atraso-plug', type=float, default=2.0)
+    args = parser.parse_args()
+    if args.transporte == 'pty' and os.name != 'posix':
+        args.transporte = 'socket'
+
+    _medir_prontidao(args.transporte)
+    velocidade_ok = os.name != 'posix' or _medir_velocidade()
+    _medir_segundo_plano(args.transporte)
+    # socket: o simulador aceita só o primeiro cliente da fila (uma tentativa
+    # que já desistiu); o pty recebe o envio em qualquer abertura
+    _medir_plug_atrasado('pty' if os.name == 'posix' else 'socket', args.atraso_plug)
+
+    caminho_original = db.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        db.fechar_conexoes()
+        db.DB_PATH = os.path.join(tmp, 'bench_conexao.db')
+        db.inicializar_banco()
+        id_mergulhador = db.inserir_mergulhador("Benchmark", 30, "M")
+        id_missao = db.inserir_missao(id_mergulhador, "Conexão", 0, "Missao_conexao")
+        # A reconexão reabre a mesma porta: no pty cada queda cria outra
+        _medir_reconexao('socket', args.hz, args.segundos, id_missao)
+        db.fechar_conexoes()
+    db.DB_PATH = caminho_original
+
+    if not velocidade_ok:
+        print(f"\nERRO: velocidade de {sensor_arduino.BAUDRATE_BINARIO} baud não detectada")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark: latência por chamada abrindo/fechando conexão vs. conexão persistente
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_conexoes [--n 2000]
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import servidor.database as db
+from servidor import relogio
+
+
+def _inserir_abre_fecha(id_missao, timestamp, temperatura, pressao):
+    """Padrão antigo: uma conexão nova (journal padrão) por chamada"""
+    conn = sqlite3.connect(db.DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO medicao (id_missao, timestamp, timestamp_ms, temperatura, pressao)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (id_missao, relogio.ms_para_texto(timestamp), timestamp, temperatura, pressao))
+    conn.commit()
+    conn.close()
+
+
+def _buscar_abre_fecha(id_missao):
+    """Padrão antigo de leitura"""
+    conn = sqlite3.connect(db.DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM missao WHERE id_missao = ?', (id_missao,))
+    missao = cursor.fetchone()
+    conn.close()
+    return missao
+
+
+def _medir(nome, funcao, n):
+    """Executa a função n vezes e imprime a latência média e p99"""
+    tempos = []
+    for i in range(n):
+        inicio = time.perf_counter()
+        funcao(i)
+        tempos.append(time.perf_counter() - inicio)
+    tempos.sort()
+    media = sum(tempos) / n * 1e6
+    p99 = tempos[int(n * 0.99) - 1] * 1e6
+    print(f"  {nome:<32} média: {media:9.1f} µs   p99: {p99:9.1f} µs")
+    return media
+
+
+def _preparar_banco(caminho, wal):
+    """Cria um banco temporário com uma missão"""
+    db.fechar_conexoes()
+    db.DB_PATH = caminho
+    db.inicializar_banco()
+    if not wal:
+        db.conectar().execute('PRAGMA journal_mode = DELETE')
+        db.fechar_conexoes()
+    id_merg = db.inserir_mergulhador("Benchmark", 30, "O")
+    return db.inserir_missao(id_merg, "Benchmark", "2025-01-01 00:00:00", f"Bench_{wal}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--n', type=int, default=2000, help='chamadas por cenário')
+    args = parser.parse_args()
+
+    caminho_original = db.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        agora = relogio.agora_ms()
+
+        print(f"Leitura (buscar_missao) - {args.n} chamadas")
+        id_missao = _preparar_banco(os.path.join(tmp, 'abre_fecha.db'), wal=False)
+        antigo = _medir("abre/fecha por chamada", lambda i: _buscar_abre_fecha(id_missao), args.n)
+        id_missao = _preparar_banco(os.path.join(tmp, 'persistente.db'), wal=True)
+        novo = _medir("conexão persistente (WAL)", lambda i: db.buscar_missao(id_missao), args.n)
+        print(f"  ganho: {antigo / novo:.1f}x\n")
+
+        print(f"Escrita (inserir_medicao) - {args.n} chamadas")
+        id_missao = _preparar_banco(os.path.join(tmp, 'abre_fecha_w.db'), wal=False)
+        antigo = _medir("abre/fecha por chamada",
+                        lambda i: _inserir_abre_fecha(id_missao, agora, 20.0, 1.0), args.n)
+        id_missao = _preparar_banco(os.path.join(tmp, 'persistente_w.db'), wal=True)
+        novo = _medir("conexão persistente (WAL)",
+                      lambda i: db.inserir_medicao(id_missao, agora, 20.0, 1.0), args.n)
+        print(f"  ganho: {antigo / novo:.1f}x")
+
+        db.fechar_conexoes()
+    db.DB_PATH = caminho_original
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark: consulta do singleton a cada frame vs. barramento de eventos do sensor
+
+1. Custo por frame do texto sobreposto ao vídeo: o padrão antigo
+   (get_sensor + get_temperatura_valor + get_pressao_valor, dois locks e
+   duas formatações) e o snapshot versionado (compara a versão, formata só
+   quando muda), com as leituras chegando em paralelo a --hz.
+2. Custo de publicar um lote com 0, 1, 4 e 16 assinantes (callback e fila).
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_eventos_sensor [--frames 200000] [--hz 100]
+"""
+
+import argparse
+import threading
+import time
+
+from captura.gravacao_video import _texto_sensores
+from servidor import relogio
+from servidor import sensor_arduino
+from servidor.sensor_arduino import BarramentoSensor
+
+
+def _publicar_continuamente(sensor, hz, parar):
+    """Simula a thread serial: uma leitura a cada 1/hz s"""
+    while not parar.is_set():
+        sensor._processar_leituras([(15.0 + time.monotonic() % 1, 20.0, None)])
+        time.sleep(1 / hz)
+
+
+def _frames_antigo(n):
+    for _ in range(n):
+        sensor = sensor_arduino.get_sensor()
+        temperatura = sensor.get_temperatura_valor()
+        pressao = sensor.get_pressao_valor()
+        texto = f"Temperatura: {temperatura}  Pressao: {pressao}"
+    return texto
+
+
+def _frames_snapshot(n):
+    eventos = sensor_arduino.get_sensor().eventos
+    versao, texto, refeitos = None, "", 0
+    for _ in range(n):
+        snapshot = eventos.snapshot
+        if snapshot.versao != versao:
+            versao = snapshot.versao
+            texto = _texto_sensores(snapshot)
+            refeitos += 1
+    return refeitos
+
+
+def _medir_frames(n_frames, hz):
+    sensor = sensor_arduino.get_sensor()
+    sensor.ultimo_log = float('inf')  # sem mensagens no console
+    parar = threading.Event()
+    publicador = threading.Thread(target=_publicar_continuamente, args=(sensor, hz, parar), daemon=True)
+    publicador.start()
+
+    print(f"Texto dos sensores por frame ({n_frames} frames, leituras a {hz} Hz em paralelo)")
+    inicio = time.perf_counter()
+    _frames_antigo(n_frames)
+    antigo = (time.perf_counter() - inicio) / n_frames * 1e6
+    print(f"  {'get_sensor + 2 getters (antigo)':<40} {antigo:8.3f} µs/frame")
+
+    inicio = time.perf_counter()
+    refeitos = _frames_snapshot(n_frames)
+    novo = (time.perf_counter() - inicio) / n_frames * 1e6
+    print(f"  {'snapshot versionado':<40} {novo:8.3f} µs/frame  "
+          f"(texto refeito em {refeitos} frames)")
+    print(f"  ganho: {antigo / novo:.1f}x")
+
+    parar.set()
+    publicador.join()
+
+
+def _medir_publicacao(n_lotes):
+    print(f"\nPublicação de {n_lotes} lotes de 10 leituras")
+    lote = [(relogio.agora_ms(), 20.0, 15.0)] * 10
+    for tipo in ('callback', 'fila'):
+        for n_assinantes in (0, 1, 4, 16):
+            barramento = BarramentoSensor()
+            for _ in range(n_assinantes):
+                if tipo == 'callback':
+                    barramento.assinar(lambda leituras, snapshot: None)
+                else:
+                    barramento.assinar(tamanho_fila=100)
+            inicio = time.perf_counter()
+            for _ in range(n_lotes):
+                barramento.publicar(lote)
+            custo = (time.perf_counter() - inicio) / n_lotes * 1e6
+            print(f"  {tipo:<9} {n_assinantes:>2} assinantes   {custo:8.2f} µs/lote")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--frames', type=int, default=200_000)
+    parser.add_argument('--hz', type=int, default=100)
+    parser.add_argument('--lotes', type=int, default=50_000)
+    args = parser.parse_args()
+
+    _medir_frames(args.frames, args.hz)
+    _medir_publicacao(args.lotes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Benchmark: planos de consulta e tempos antes/depois das migrações de índices
+
+Gera um banco sintético (por padrão 2 milhões de medições distribuídas em
+200 missões), mede as consultas por missão no esquema base (versão 0) e
+repete após aplicar_migracoes(). No esquema base mede-se o SQL original; no
+atual, as funções do módulo database (timestamps em ms, tabela de
+estatísticas).
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_indices [--medicoes 2000000] [--missoes 200]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import servidor.database as db
+
+# Consultas medidas: (nome, SQL do EXPLAIN no esquema base, SQL do EXPLAIN no esquema
+# atual, função do módulo database)
+CONSULTAS = [
+    ("listar_medicoes_por_missao",
+     "SELECT * FROM medicao WHERE id_missao = ? ORDER BY timestamp",
+     "SELECT * FROM medicao WHERE id_missao = ? ORDER BY timestamp_ms, id_medicao LIMIT 5000",
+     db.listar_medicoes_por_missao),
+    ("get_estatisticas_medicoes",
+     "SELECT COUNT(*), MIN(temperatura), MAX(temperatura), AVG(temperatura) "
+     "FROM medicao WHERE id_missao = ?",
+     "SELECT * FROM missao_estatisticas WHERE id_missao = ?",
+     db.get_estatisticas_medicoes),
+    ("listar_videos_por_missao",
+     "SELECT * FROM video WHERE id_missao = ?",
+     "SELECT id_video, id_missao, caminho FROM video WHERE id_missao = ? ORDER BY id_video",
+     db.listar_videos_por_missao),
+    ("listar_audios_por_missao",
+     "SELECT * FROM audio WHERE id_missao = ?",
+     "SELECT id_audio, id_missao, caminho FROM audio WHERE id_missao = ? ORDER BY id_audio",
+     db.listar_audios_por_missao),
+    ("verificar_missao_em_andamento",
+     "SELECT id_missao FROM missao WHERE data_hora_fim IS NULL "
+     "ORDER BY data_hora_inicio DESC LIMIT 1",
+     "SELECT id_missao FROM missao WHERE fim_ms IS NULL "
+     "ORDER BY inicio_ms DESC LIMIT 1",
+     lambda _id: db.verificar_missao_em_andamento()),
+]
+
+
+def _gerar_banco(total_medicoes, total_missoes):
+    """Popula o banco (esquema base, sem índices) com dados sintéticos"""
+    with db.transacao() as cursor:
+        db._criar_tabelas(cursor)
+
+    id_merg = db.inserir_mergulhador("Benchmark", 30, "O")
+    inicio = datetime(2025, 1, 1)
+    por_missao = total_medicoes // total_missoes
+
+    with db.transacao() as cursor:
+        for n in range(total_missoes):
+            dt_inicio = inicio + timedelta(days=n)
+            # Só a última missão fica em andamento
+            dt_fim = None if n == total_missoes - 1 else dt_inicio + timedelta(seconds=por_missao)
+            cursor.execute('''
+                INSERT INTO missao (id_mergulhador, nome_missao, data_hora_inicio, identificador, data_hora_fim)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (id_merg, f"Missão {n}", dt_inicio.strftime("%Y-%m-%d %H:%M:%S"), f"Bench_{n}",
+                  dt_fim.strftime("%Y-%m-%d %H:%M:%S") if dt_fim else None))
+            cursor.executemany('INSERT INTO video (id_missao, caminho) VALUES (?, ?)',
+                               [(n + 1, f"v_{n}_{s}.avi") for s in range(20)])
+            cursor.executemany('INSERT INTO audio (id_missao, caminho) VALUES (?, ?)',
+                               [(n + 1, f"a_{n}_{s}.wav") for s in range(20)])
+
+    # Medições intercaladas entre missões (como várias missões gravando em dias diferentes
+    # e depois importadas), para que nenhuma missão fique contígua na tabela
+    base = int(inicio.timestamp())
+    def linhas():
+        for i in range(por_missao):
+            ts = datetime.fromtimestamp(base + i).strftime("%Y-%m-%d %H:%M:%S")
+            for id_missao in range(1, total_missoes + 1):
+                yield (id_missao, ts, 20.0 + (i % 50) * 0.1, 1.0 + (i % 300) * 0.05)
+
+    with db.transacao() as cursor:
+        cursor.executemany('''
+            INSERT INTO medicao (id_missao, timestamp, temperatura, pressao)
+            VALUES (?, ?, ?, ?)
+        ''', linhas())
+
+
+def _medir(repeticoes, id_missao, esquema_base):
+    """Mostra o plano e o tempo médio de cada consulta"""
+    conn = db.conectar()
+    for nome, sql_base, sql_atual, funcao in CONSULTAS:
+        sql = sql_base if esquema_base else sql_atual
+        parametros = (id_missao,) if '?' in sql else ()
+        plano = [linha[3] for linha in conn.execute(f"EXPLAIN QUERY PLAN {sql}", parametros)]
+
+        # No esquema base as funções atuais não rodam (faltam as colunas em ms),
+        # então mede-se a consulta original diretamente
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            if esquema_base:
+                conn.execute(sql, parametros).fetchall()
+            else:
+                funcao(id_missao)
+        media_ms = (time.perf_counter() - inicio) / repeticoes * 1000
+
+        print(f"  {nome:<32} {media_ms:10.3f} ms")
+        for passo in plano:
+            print(f"      plano: {passo}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--medicoes', type=int, default=2_000_000)
+    parser.add_argument('--missoes', type=int, default=200)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    caminho_original = db.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        db.fechar_conexoes()
+        db.DB_PATH = os.path.join(tmp, 'bench_indices.db')
+
+        inicio = time.perf_counter()
+        _gerar_banco(args.medicoes, args.missoes)
+        print(f"Banco sintético: {args.medicoes} medições, {args.missoes} missões "
+              f"({time.perf_counter() - inicio:.1f} s)\n")
+
+        id_missao = args.missoes // 2
+        print(f"ANTES (esquema versão {db.get_versao_esquema()}):")
+        _medir(args.repeticoes, id_missao, esquema_base=True)
+
+        inicio = time.perf_counter()
+        versao = db.aplicar_migracoes()
+        print(f"\nMigrações aplicadas até a versão {versao} "
+              f"({time.perf_counter() - inicio:.1f} s)\n")
+
+        print(f"DEPOIS (esquema versão {versao}):")
+        _medir(args.repeticoes, id_missao, esquema_base=False)
+
+        db.fechar_conexoes()
+    db.DB_PATH = caminho_original
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark: leitura em lotes (iterar_medicoes) de uma missão muito longa
+
+Gera uma missão sintética (por padrão 5 milhões de medições), percorre todas
+as medições com iterar_medicoes e verifica que o pico de memória alocada
+(tracemalloc) fica abaixo do limite, independente do tamanho da missão.
+Também mede um intervalo de tempo e a projeção de colunas, e repete as leituras com metade das linhas sem
+timestamp_ms (banco migrado antes do preenchimento em segundo plano). Sai
+com código 1 se o número de linhas ou o pico de memória não forem os esperados.
+
+Com 5 milhões de medições a passada com tracemalloc leva alguns minutos.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_leitura_streaming [--medicoes 5000000] [--limite-mb 32]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import servidor.database as db
+
+
+def _gerar_missao(total):
+    """Cria uma missão com `total` medições, uma por segundo, direto em SQL"""
+    db.inicializar_banco()
+    id_merg = db.inserir_mergulhador("Benchmark", 30, "O")
+    id_missao = db.inserir_missao(id_merg, "Benchmark", 1735689600 * 1000, "Bench")
+
+    with db.transacao() as cursor:
+        # Os triggers de estatísticas/agregados não importam para a leitura
+        cursor.execute('DROP TRIGGER IF EXISTS trg_medicao_estatisticas')
+        cursor.execute('DROP TRIGGER IF EXISTS trg_medicao_agregada')
+        cursor.execute('''
+            WITH RECURSIVE seq(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM seq WHERE i + 1 < ?)
+            INSERT INTO medicao (id_missao, timestamp, timestamp_ms, temperatura, pressao)
+            SELECT ?, datetime(1735689600 + i, 'unixepoch', 'localtime'), (1735689600 + i) * 1000,
+                   20.0 + (i % 50) * 0.1, 1.0 + (i % 300) * 0.05
+            FROM seq
+        ''', (total, id_missao))
+    return id_missao
+
+
+def _percorrer(descricao, criar_gerador):
+    """Consome o gerador duas vezes: uma medindo o tempo e outra o pico de memória"""
+    inicio = time.perf_counter()
+    linhas = sum(len(lote) for lote in criar_gerador())
+    tempo = time.perf_counter() - inicio
+
+    # tracemalloc deixa a iteração bem mais lenta, por isso fica em uma passada separada
+    tracemalloc.start()
+    for lote in criar_gerador():
+        pass
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"  {descricao:<32} {linhas:>10} linhas  {tempo:7.2f} s  "
+          f"{linhas / max(tempo, 1e-9):>12,.0f} linhas/s  pico {pico / 2 ** 20:6.1f} MB")
+    return linhas, pico
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--medicoes', type=int, default=5_000_000)
+    parser.add_argument('--lote', type=int, default=5000)
+    parser.add_argument('--limite-mb', type=float, default=32)
+    args = parser.parse_args()
+
+    caminho_original = db.DB_PATH
+    falhou = False
+    with tempfile.TemporaryDirectory() as tmp:
+        db.fechar_conexoes()
+        db.DB_PATH = os.path.join(tmp, 'bench_streaming.db')
+
+        inicio = time.perf_counter()
+        id_missao = _gerar_missao(args.medicoes)
+        print(f"Missão sintética com {args.medicoes} medições ({time.perf_counter() - inicio:.1f} s)\n")
+
+        cenarios = [
+            ("missão inteira", {}, args.medicoes),
+            ("projeção (timestamp, pressao)", {'colunas': ('timestamp', 'pressao')}, args.medicoes),
+            ("intervalo de 1 hora", {'inicio': (1735689600 + 36000) * 1000,
+                                     'fim': (1735689600 + 39599) * 1000}, min(3600, max(0, args.medicoes - 36000))),
+        ]
+        for descricao, filtros, esperado in cenarios:
+            linhas, pico = _percorrer(
+                descricao, lambda: db.iterar_medicoes(id_missao, args.lote, **filtros))
+            if linhas != esperado:
+                print(f"    ERRO: esperado {esperado} linhas")
+                falhou = True
+            if pico > args.limite_mb * 2 ** 20:
+                print(f"    ERRO: pico de memória acima de {args.limite_mb} MB")
+                falhou = True
+
+        # Banco migrado com o preenchimento de timestamp_ms ainda pendente:
+        # metade das linhas só tem o texto e a leitura precisa trazer todas
+        with db.transacao() as cursor:
+            cursor.execute('UPDATE medicao SET timestamp_ms = NULL WHERE id_medicao % 2 = 0')
+        for descricao, filtros, esperado in cenarios:
+            linhas = sum(len(lote) for lote in db.iterar_medicoes(id_missao, args.lote, **filtros))
+            print(f"  {descricao:<32} {linhas:>10} linhas  (sem preenchimento)")
+            if linhas != esperado:
+                print(f"    ERRO: esperado {esperado} linhas antes do preenchimento")
+                falhou = True
+
+        db.fechar_conexoes()
+    db.DB_PATH = caminho_original
+
+    if falhou:
+        sys.exit(1)
+    print("\nOK: memória limitada independente do tamanho da missão")
+
+
+if __name__ == "__main__":
+    main()
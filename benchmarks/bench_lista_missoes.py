@@ -0,0 +1,100 @@
+"""
+Benchmark: lista de missões inteira (listar_missoes_ms + formatação em Python)
+vs. uma página de consultar_missoes (filtros, ordenação e datas no SQL)
+
+Gera um banco com muitas missões (por padrão 20 000 em 50 mergulhadores) e
+mede o tempo para obter o que a tela mostra: a primeira página, a página
+seguinte por chave, uma busca por nome (FTS5) e a contagem.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_lista_missoes [--missoes 20000] [--pagina 100]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import servidor.database as db
+from servidor import relogio
+
+NOMES = ("Naufrágio", "Recife", "Inspeção", "Treinamento", "Resgate", "Exploração", "Caverna")
+
+
+def _gerar_banco(n_missoes, n_mergulhadores):
+    """Cria o banco sintético com as missões distribuídas entre os mergulhadores"""
+    db.inicializar_banco()
+    inicio_ms = relogio.para_ms("2020-01-01 08:00:00")
+    with db.transacao() as cursor:
+        cursor.executemany('INSERT INTO mergulhador (nome, idade, sexo) VALUES (?, ?, ?)',
+                           [(f"Mergulhador {i}", 20 + i % 40, "MF"[i % 2])
+                            for i in range(n_mergulhadores)])
+        for i in range(n_missoes):
+            ms = inicio_ms + i * 3_600_000
+            db.inserir_missao(1 + i % n_mergulhadores, f"{NOMES[i % len(NOMES)]} {i}",
+                              ms, f"Missao_{i:06d}",
+                              ms + 1_800_000 if i < n_missoes - 5 else None)
+
+
+def _lista_completa():
+    """Padrão antigo de carregar_missoes: todas as linhas, datas formatadas em Python"""
+    linhas = []
+    for id_missao, identificador, nome_missao, inicio_ms, fim_ms, nome, idade, sexo in db.listar_missoes_ms():
+        linhas.append((id_missao, identificador, f"{nome} ({idade}a, {sexo})", nome_missao,
+                       relogio.formatar_ms(inicio_ms),
+                       relogio.formatar_ms(fim_ms, padrao="Em andamento"),
+                       "Finalizada" if fim_ms is not None else "Em andamento"))
+    return linhas
+
+
+def _medir(nome, funcao, repeticoes):
+    """Tempo médio de funcao() em ms"""
+    funcao()
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        resultado = funcao()
+    media_ms = (time.perf_counter() - inicio) / repeticoes * 1000
+    print(f"  {nome:<40} {media_ms:9.2f} ms")
+    return resultado, media_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--missoes', type=int, default=20_000)
+    parser.add_argument('--mergulhadores', type=int, default=50)
+    parser.add_argument('--pagina', type=int, default=100)
+    parser.add_argument('--repeticoes', type=int, default=10)
+    args = parser.parse_args()
+
+    caminho_original = db.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        db.fechar_conexoes()
+        db.DB_PATH = os.path.join(tmp, 'bench_lista_missoes.db')
+
+        inicio = time.perf_counter()
+        _gerar_banco(args.missoes, args.mergulhadores)
+        print(f"\nBanco sintético: {args.missoes} missões ({time.perf_counter() - inicio:.1f} s)\n")
+
+        _, antigo = _medir("lista completa (listar_missoes_ms)", _lista_completa, args.repeticoes)
+        (_, chave), novo = _medir(
+            "primeira página (consultar_missoes)",
+            lambda: db.consultar_missoes(limite=args.pagina), args.repeticoes)
+        _medir("página seguinte (por chave)",
+               lambda: db.consultar_missoes(limite=args.pagina, apos=chave), args.repeticoes)
+        _medir("ordenado por nome",
+               lambda: db.consultar_missoes(ordenar_por='nome', decrescente=False,
+                                            limite=args.pagina), args.repeticoes)
+        _medir("busca 'naufragio' (FTS5)",
+               lambda: db.consultar_missoes(busca='naufragio', limite=args.pagina), args.repeticoes)
+        _medir("em andamento de um mergulhador",
+               lambda: db.consultar_missoes(id_mergulhador=1, status='em_andamento',
+                                            limite=args.pagina), args.repeticoes)
+        _medir("contar_missoes (sem filtros)", db.contar_missoes, args.repeticoes)
+        print(f"\n  ganho na abertura da tela: {antigo / novo:.0f}x")
+
+        db.fechar_conexoes()
+    db.DB_PATH = caminho_original
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Benchmark: vários Arduinos simulados, uma thread por dispositivo vs. leitor compartilhado
+
+Cada dispositivo é um pseudo-terminal (pty) aberto pelo SensorArduino como
+uma porta serial de verdade; uma thread escreve no outro lado os quadros
+binários que o Arduino enviaria. Mede, com --dispositivos placas:
+1. Vazão: todos enviando o mais rápido possível (leituras/s e CPU).
+2. Taxa real (--hz por placa): CPU do processo durante --segundos.
+Nos dois casos compara uma thread de leitura por dispositivo (padrão antigo:
+read bloqueante por porta) com a thread única do leitor compartilhado
+(servidor/leitor_serial.py), com o mesmo processamento das leituras.
+3. Roteamento: metade das placas gravando em uma missão e metade em outra,
+   em um banco temporário; confere as medições por missão e dispositivo.
+
+Só funciona em sistemas com pty (Linux/macOS).
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_multissensor [--dispositivos 8] [--quadros 20000] [--hz 100]
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import servidor.database as db
+from servidor import sensor_arduino
+from servidor.gerenciador_sensores import GerenciadorSensores
+from servidor.protocolo_serial import gerar_quadros
+
+
+def _criar_dispositivos(gerenciador, n):
+    """Abre n pares de pty e conecta um sensor em cada; retorna [(sensor, fd do lado Arduino)]"""
+    dispositivos = []
+    for i in range(n):
+        mestre, escravo = os.openpty()
+        sensor = gerenciador.adicionar(os.ttyname(escravo), f"sim{i:02d}",
+                                       baudrate=sensor_arduino.BAUDRATE_BINARIO, espera_reset=0)
+        os.close(escravo)  # a porta serial abriu o seu próprio descritor
+        sensor.ultimo_log = float('inf')  # sem mensagens de leitura no console
+        dispositivos.append((sensor, mestre))
+    return dispositivos
+
+
+def _escrever(mestre, fluxo, hz=None):
+    """Escreve o fluxo no lado do Arduino: tudo de uma vez ou a hz quadros por segundo"""
+    if hz is None:
+        for posicao in range(0, len(fluxo), 1024):
+            os.write(mestre, fluxo[posicao:posicao + 1024])
+        return
+    tamanho = 14
+    inicio = time.monotonic()
+    for i, posicao in enumerate(range(0, len(fluxo), tamanho)):
+        atraso = inicio + i / hz - time.monotonic()
+        if atraso > 0:
+            time.sleep(atraso)
+        os.write(mestre, fluxo[posicao:posicao + tamanho])
+
+
+def _ler_com_thread_propria(sensor, parar):
+    """Padrão antigo: cada dispositivo com uma thread bloqueada no read da sua porta"""
+    porta = sensor.porta_serial
+    while not parar.is_set():
+        dados = porta.read(porta.in_waiting or 1)
+        if dados:
+            sensor._receber(dados)
+
+
+def _iniciar(modo, dispositivos, id_missao=None):
+    parar = threading.Event()
+    threads = []
+    for sensor, _ in dispositivos:
+        sensor.leituras_recebidas = 0
+        if modo == 'compartilhado':
+            sensor.iniciar_leitura(id_missao)
+        else:
+            sensor.decodificador.reiniciar()
+            thread = threading.Thread(target=_ler_com_thread_propria, args=(sensor, parar), daemon=True)
+            thread.start()
+            threads.append(thread)
+    return parar, threads
+
+
+def _parar(modo, dispositivos, parar, threads):
+    parar.set()
+    for thread in threads:
+        thread.join()
+    if modo == 'compartilhado':
+        for sensor, _ in dispositivos:
+            sensor.parar_leitura()
+
+
+def _medir_vazao(modo, dispositivos, n_quadros):
+    fluxos = [gerar_quadros(n_quadros, semente=i) for i in range(len(dispositivos))]
+    parar, threads = _iniciar(modo, dispositivos)
+    escritores = [threading.Thread(target=_escrever, args=(mestre, fluxo), daemon=True)
+                  for (_, mestre), fluxo in zip(dispositivos, fluxos)]
+    total = n_quadros * len(dispositivos)
+
+    inicio, cpu = time.perf_counter(), time.process_time()
+    for escritor in escritores:
+        escritor.start()
+    while sum(sensor.leituras_recebidas for sensor, _ in dispositivos) < total:
+        if time.perf_counter() - inicio > 120:
+            print("  ERRO: nem todas as leituras chegaram")
+            break
+        time.sleep(0.005)
+    duracao, cpu = time.perf_counter() - inicio, time.process_time() - cpu
+    for escritor in escritores:
+        escritor.join()
+    _parar(modo, dispositivos, parar, threads)
+
+    recebidas = sum(sensor.leituras_recebidas for sensor, _ in dispositivos)
+    print(f"  {modo:<14} {recebidas:>8} leituras em {duracao:5.2f} s  {recebidas / duracao:10,.0f}/s  "
+          f"CPU {cpu / recebidas * 1e6:6.1f} µs/leitura")
+
+
+def _medir_taxa_real(modo, dispositivos, hz, segundos):
+    """CPU do processo (leitura e simuladores) com cada placa enviando a hz"""
+    n_quadros = int(hz * segundos)
+    fluxos = [gerar_quadros(n_quadros, periodo_ms=1000 // hz, semente=i) for i in range(len(dispositivos))]
+    parar, threads = _iniciar(modo, dispositivos)
+    n_threads = threading.active_count()
+    escritores = [threading.Thread(target=_escrever, args=(mestre, fluxo, hz), daemon=True)
+                  for (_, mestre), fluxo in zip(dispositivos, fluxos)]
+
+    inicio, cpu = time.perf_counter(), time.process_time()
+    for escritor in escritores:
+        escritor.start()
+    for escritor in escritores:
+        escritor.join()
+    time.sleep(0.2)
+    duracao, cpu = time.perf_counter() - inicio, time.process_time() - cpu
+    _parar(modo, dispositivos, parar, threads)
+
+    recebidas = sum(sensor.leituras_recebidas for sensor, _ in dispositivos)
+    print(f"  {modo:<14} {recebidas:>8} leituras em {duracao:5.2f} s  {n_threads:>3} threads  "
+          f"CPU {cpu / duracao * 100:5.1f}% de um núcleo")
+
+
+def _medir_cpu_ocioso(modo, dispositivos, segundos):
+    """CPU do processo com todas as portas abertas e sem dados"""
+    parar, threads = _iniciar(modo, dispositivos)
+    time.sleep(0.1)
+    cpu = time.process_time()
+    time.sleep(segundos)
+    uso = (time.process_time() - cpu) / segundos
+    _parar(modo, dispositivos, parar, threads)
+    print(f"  {modo:<14} {uso * 100:6.2f}% de um núcleo")
+
+
+def _conferir_roteamento(gerenciador, dispositivos, n_quadros):
+    caminho_original = db.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        db.fechar_conexoes()
+        db.DB_PATH = os.path.join(tmp, 'bench_multissensor.db')
+        db.inicializar_banco()
+        id_mergulhador = db.inserir_mergulhador("Benchmark", 30, "M")
+        missoes = [db.inserir_missao(id_mergulhador, f"Multissensor {i}", 0, f"Missao_multi_{i}")
+                   for i in range(2)]
+
+        metade = len(dispositivos) // 2
+        ids = [sensor.id_dispositivo for sensor, _ in dispositivos]
+        gerenciador.iniciar_leitura(missoes[0], ids[:metade])
+        gerenciador.iniciar_leitura(missoes[1], ids[metade:])
+
+        # A 500 Hz por placa: rápido, sem encher a fila de escrita no banco
+        escritores = [threading.Thread(target=_escrever, args=(mestre, gerar_quadros(n_quadros, semente=i), 500),
+                                       daemon=True)
+                      for i, (_, mestre) in enumerate(dispositivos)]
+        for escritor in escritores:
+            escritor.start()
+        for escritor in escritores:
+            escritor.join()
+        inicio = time.perf_counter()
+        while (sum(sensor.leituras_recebidas for sensor, _ in dispositivos) < n_quadros * len(dispositivos)
+               and time.perf_counter() - inicio < 60):
+            time.sleep(0.01)
+        gerenciador.parar_leitura()
+        gerenciador.descarregar_medicoes()
+
+        print(f"\nRoteamento ({len(dispositivos)} placas, 2 missões, {n_quadros} quadros por placa)")
+        erros = 0
+        for i, id_missao in enumerate(missoes):
+            esperados = ids[:metade] if i == 0 else ids[metade:]
+            encontrados = db.listar_dispositivos_missao(id_missao)
+            contagens = {id_dispositivo: sum(len(lote) for lote in db.iterar_medicoes(
+                id_missao, colunas=('id_medicao',), id_dispositivo=id_dispositivo))
+                for id_dispositivo in encontrados}
+            print(f"  missão {id_missao}: " + ", ".join(f"{d}={n}" for d, n in contagens.items()))
+            if encontrados != esperados or any(n != n_quadros for n in contagens.values()):
+                erros += 1
+        if erros:
+            print("  ERRO: medições gravadas na missão ou dispositivo errado")
+
+        db.fechar_conexoes()
+    db.DB_PATH = caminho_original
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dispositivos', type=int, default=8)
+    parser.add_argument('--quadros', type=int, default=20_000, help='quadros por placa na medição de vazão')
+    parser.add_argument('--hz', type=int, default=100, help='quadros por segundo de cada placa')
+    parser.add_argument('--segundos', type=float, default=3.0)
+    args = parser.parse_args()
+
+    gerenciador = GerenciadorSensores()
+    dispositivos = _criar_dispositivos(gerenciador, args.dispositivos)
+    print(f"\n{args.dispositivos} placas simuladas (pty, protocolo binário)\n")
+
+    print(f"Vazão ({args.quadros} quadros por placa, sem pausa)")
+    for modo in ('thread própria', 'compartilhado'):
+        _medir_vazao(modo, dispositivos, args.quadros)
+
+    print(f"\nTaxa real: {args.hz} Hz por placa por {args.segundos:.0f} s (CPU inclui os simuladores)")
+    for modo in ('thread própria', 'compartilhado'):
+        _medir_taxa_real(modo, dispositivos, args.hz, args.segundos)
+
+    print(f"\nCPU com as portas ociosas ({args.segundos:.0f} s)")
+    for modo in ('thread própria', 'compartilhado'):
+        _medir_cpu_ocioso(modo, dispositivos, args.segundos)
+
+    _conferir_roteamento(gerenciador, dispositivos, 1000)
+
+    gerenciador.desconectar()
+    for _, mestre in dispositivos:
+        os.close(mestre)
+
+
+if __name__ == "__main__":
+    main()
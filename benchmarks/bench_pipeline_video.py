@@ -0,0 +1,194 @@
+"""
+Benchmark: gravação de vídeo em uma thread vs. etapas com filas limitadas
+
+Fonte sintética no lugar da câmera: entrega um frame a cada 1/--fps s (como
+o read() bloqueante da câmera), em 720p e 1080p, e o codificador real
+(cv2.VideoWriter, XVID) grava em um diretório temporário.
+1. Laço antigo: read -> putText -> write -> copy -> sleep(1/fps) na mesma
+   thread.
+2. GravadorVideo: captura, sobreposição e codificação em threads ligadas por
+   filas (captura/gravacao_video.py), com missão em um banco temporário.
+3. O mesmo com o codificador travando --atraso-codificador ms a cada 10
+   frames (disco lento): a captura não atrasa; a fila descarta os mais
+   antigos e a lacuna é preenchida repetindo frames.
+
+Para cada caso: fps alcançado (frames distintos gravados por segundo),
+latência da captura até a escrita (p50/p99/máx.) e frames descartados.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_pipeline_video [--fps 30] [--segundos 5] [--atraso-codificador 300]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+import servidor.database as db
+from captura import gravacao_video
+from servidor import registro
+
+RESOLUCOES = {'720p': (1280, 720), '1080p': (1920, 1080)}
+
+
+class FonteSintetica:
+    """Imita cv2.VideoCapture: um frame novo a cada 1/fps s (gradiente com um quadrado em movimento)"""
+
+    def __init__(self, largura, altura, fps, quadros_distintos=30):
+        self.largura = largura
+        self.altura = altura
+        self.fps = fps
+        gradiente = np.linspace(0, 255, largura, dtype=np.uint8)[None, :, None]
+        base = np.broadcast_to(gradiente, (altura, largura, 3))
+        self.quadros = []
+        lado = altura // 6
+        for i in range(quadros_distintos):
+            quadro = base.copy()
+            x = (i * largura // quadros_distintos) % (largura - lado)
+            quadro[altura // 2 - lado // 2:altura // 2 + lado // 2, x:x + lado] = (40, 80, 200)
+            self.quadros.append(quadro)
+        self.proximo = None
+        self.lidos = 0
+        self.leituras = {}  # id do array -> instante da entrega (perf_counter)
+
+    def isOpened(self):
+        return True
+
+    def get(self, propriedade):
+        return {cv2.CAP_PROP_FPS: self.fps, cv2.CAP_PROP_FRAME_WIDTH: self.largura,
+                cv2.CAP_PROP_FRAME_HEIGHT: self.altura}.get(propriedade, 0)
+
+    def read(self):
+        agora = time.perf_counter()
+        if self.proximo is None:
+            self.proximo = agora
+        elif agora < self.proximo:
+            time.sleep(self.proximo - agora)
+        self.proximo += 1 / self.fps
+        frame = self.quadros[self.lidos % len(self.quadros)].copy()
+        self.lidos += 1
+        self.leituras[id(frame)] = time.perf_counter()
+        return True, frame
+
+    def release(self):
+        pass
+
+
+class EscritorMedido:
+    """Envolve o VideoWriter: registra a latência de cada frame distinto e pode travar"""
+
+    def __init__(self, escritor, fonte, latencias, atraso=0.0):
+        self.escritor = escritor
+        self.fonte = fonte
+        self.latencias = latencias
+        self.atraso = atraso
+        self.escritas = 0
+
+    def write(self, frame):
+        self.escritas += 1
+        if self.atraso and self.escritas % 10 == 0:
+            time.sleep(self.atraso)
+        self.escritor.write(frame)
+        lido = self.fonte.leituras.pop(id(frame), None)
+        if lido is not None:
+            self.latencias.append(time.perf_counter() - lido)
+
+    def release(self):
+        self.escritor.release()
+
+
+def _resumo(latencias):
+    if not latencias:
+        return "sem dados"
+    ms = np.array(latencias) * 1000
+    p50, p99 = np.percentile(ms, [50, 99])
+    return f"p50 {p50:6.1f}  p99 {p99:6.1f}  máx. {ms.max():6.1f} ms"
+
+
+def _medir_antigo(largura, altura, fps, segundos, diretorio):
+    """Laço de uma thread só, como era antes das etapas"""
+    fonte = FonteSintetica(largura, altura, fps)
+    escritor = cv2.VideoWriter(os.path.join(diretorio, 'antigo.avi'), cv2.VideoWriter_fourcc(*'XVID'),
+                               fps, (largura, altura))
+    latencias = []
+    cor = (100, 255, 100)
+    gravados = 0
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < segundos:
+        ret, frame = fonte.read()
+        lido = fonte.leituras.pop(id(frame))
+        cv2.putText(frame, "Missao_bench", (10, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.8, cor, 2, cv2.LINE_AA)
+        cv2.putText(frame, "Temperatura: 20.0  Pressao: 14.70", (10, 75),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, cor, 2, cv2.LINE_AA)
+        escritor.write(frame)
+        latencias.append(time.perf_counter() - lido)
+        gravados += 1
+        ultimo = frame.copy()
+        time.sleep(1.0 / fps)
+    duracao = time.perf_counter() - inicio
+    escritor.release()
+    print(f"  uma thread         {gravados / duracao:5.1f} fps  {_resumo(latencias)}  "
+          f"(câmera entregou {fonte.lidos})")
+
+
+def _medir_etapas(largura, altura, fps, segundos, id_missao, atraso, rotulo):
+    gravador = gravacao_video.get_gravador()
+    fonte = FonteSintetica(largura, altura, fps)
+    latencias = []
+    abrir_escritor = gravacao_video.GravadorVideo._abrir_escritor.__get__(gravador)
+    gravador._abrir_fonte = lambda: fonte
+    gravador._abrir_escritor = lambda *args: EscritorMedido(abrir_escritor(*args), fonte, latencias, atraso)
+
+    antes = registro.ler_metricas('video.')
+    gravador.iniciar_gravacao(id_missao, "Missao_bench")
+    time.sleep(segundos)
+    gravador.parar_gravacao()
+    depois = registro.ler_metricas('video.')
+
+    def delta(nome):
+        return depois[nome] - antes.get(nome, 0)
+
+    descartados = delta('video.descartados_sobreposicao') + delta('video.descartados_codificacao')
+    print(f"  {rotulo:<18} {delta('video.frames_gravados') / segundos:5.1f} fps  {_resumo(latencias)}  "
+          f"(capturados {delta('video.frames_capturados')}, descartados {descartados}, "
+          f"repetidos {delta('video.frames_repetidos')})")
+    del gravador._abrir_fonte, gravador._abrir_escritor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--segundos', type=float, default=5.0)
+    parser.add_argument('--atraso-codificador', type=float, default=300.0, help="ms a cada 10 frames")
+    parser.add_argument('--resolucoes', nargs='+', default=list(RESOLUCOES), choices=list(RESOLUCOES))
+    args = parser.parse_args()
+
+    registro.configurar_log(registro.logging.WARNING)  # sem as mensagens de segmento
+    caminho_original = db.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        db.fechar_conexoes()
+        db.DB_PATH = os.path.join(tmp, 'bench_pipeline_video.db')
+        db.inicializar_banco()
+        id_mergulhador = db.inserir_mergulhador("Benchmark", 30, "M")
+        id_missao = db.inserir_missao(id_mergulhador, "Vídeo", 0, "Missao_bench")
+        gravacao_video.get_gravador().diretorio_videos = tmp
+
+        for nome in args.resolucoes:
+            largura, altura = RESOLUCOES[nome]
+            print(f"{nome} ({largura}x{altura}), câmera a {args.fps} fps, {args.segundos:.0f} s")
+            _medir_antigo(largura, altura, args.fps, args.segundos, tmp)
+            _medir_etapas(largura, altura, args.fps, args.segundos, id_missao, 0.0, "etapas")
+            _medir_etapas(largura, altura, args.fps, args.segundos, id_missao,
+                          args.atraso_codificador / 1000, "etapas, disco lento")
+            print()
+
+        print(f"Segmentos gravados no banco: {len(db.listar_videos_por_missao(id_missao))}")
+        db.fechar_conexoes()
+    db.DB_PATH = caminho_original
+
+
+if __name__ == "__main__":
+    main()
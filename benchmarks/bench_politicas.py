@@ -0,0 +1,91 @@
+"""
+Benchmark: taxa de compressão vs. erro de reconstrução das políticas de armazenamento
+
+Passa as leituras de uma missão gravada (--missao, banco em db.DB_PATH) ou
+de um mergulho sintético (descida, fundo, subida, 10 Hz, com ruído) por cada
+política e limite de erro, reconstrói o sinal a partir das leituras que
+seriam gravadas e compara com o original.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_politicas [--missao ID] [--minutos 30]
+"""
+
+import argparse
+import random
+import time
+
+import servidor.database as db
+from servidor.politicas_armazenamento import (
+    PoliticaIntervaloFixo, PoliticaBandaMorta, PoliticaPortaGiratoria, avaliar_politica)
+
+# psi por metro de água salgada
+PSI_POR_METRO = 1.4223
+
+
+def _mergulho_sintetico(minutos, hz=10, profundidade=30.0, semente=1):
+    """Descida a 15 m/min, fundo e subida a 6 m/min; temperatura cai com a profundidade"""
+    aleatorio = random.Random(semente)
+    duracao = minutos * 60
+    descida = profundidade / 15 * 60
+    subida = profundidade / 6 * 60
+    leituras = []
+    for i in range(int(duracao * hz)):
+        s = i / hz
+        if s < descida:
+            metros = profundidade * s / descida
+        elif s > duracao - subida:
+            metros = profundidade * max(0.0, duracao - s) / subida
+        else:
+            metros = profundidade
+        pressao = 14.7 + metros * PSI_POR_METRO + aleatorio.gauss(0, 0.01)
+        temperatura = 25.0 - metros * 0.3 + aleatorio.gauss(0, 0.02)
+        leituras.append((int(s * 1000), round(temperatura, 2), round(pressao, 3)))
+    return leituras
+
+
+def _leituras_missao(id_missao):
+    """Leituras (timestamp_ms, temperatura, pressao) de uma missão do banco"""
+    leituras = []
+    for lote in db.iterar_medicoes(id_missao, colunas=('timestamp_ms', 'temperatura', 'pressao')):
+        leituras.extend(lote)
+    return leituras
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--missao', type=int, help='id de uma missão gravada')
+    parser.add_argument('--minutos', type=int, default=30, help='duração do mergulho sintético')
+    args = parser.parse_args()
+
+    if args.missao is not None:
+        leituras = _leituras_missao(args.missao)
+        origem = f"missão {args.missao}"
+    else:
+        leituras = _mergulho_sintetico(args.minutos)
+        origem = f"mergulho sintético de {args.minutos} min a 10 Hz"
+    if not leituras:
+        print("Nenhuma leitura para avaliar")
+        return
+    print(f"{len(leituras)} leituras ({origem})\n")
+
+    politicas = [
+        PoliticaIntervaloFixo(60000),
+        PoliticaIntervaloFixo(1000),
+    ]
+    for temperatura, pressao in ((0.05, 0.02), (0.1, 0.05), (0.2, 0.1)):
+        limites = {'temperatura': temperatura, 'pressao': pressao}
+        politicas.append(PoliticaBandaMorta(limites))
+        politicas.append(PoliticaPortaGiratoria(limites))
+
+    print(f"  {'política':<46} {'gravadas':>9} {'compressão':>11} "
+          f"{'erro máx T':>11} {'erro máx P':>11} {'µs/leitura':>11}")
+    for politica in politicas:
+        inicio = time.perf_counter()
+        r = avaliar_politica(politica, leituras)
+        custo = (time.perf_counter() - inicio) / len(leituras) * 1e6
+        print(f"  {r['politica']:<46} {r['gravadas']:>9} {r['taxa_compressao']:>10.1f}x "
+              f"{r['erro_max_temperatura']:>9.3f}°C {r['erro_max_pressao']:>7.3f} psi {custo:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark: protocolo binário com CRC vs. linhas ASCII
+
+Usa o gerador de quadros (sem hardware) para medir:
+1. Vazão de decodificação das mesmas leituras nos dois formatos.
+2. Integridade: quadros perdidos, corrompidos e lixo entre quadros são
+   detectados e contados (comparado com o que foi injetado).
+3. Detecção automática do formato com lixo no início do fluxo.
+4. Fluxo completo pela porta loop:// com o SensorArduino (sem banco).
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_protocolo_binario [--quadros 200000]
+"""
+
+import argparse
+import random
+import time
+
+import serial
+
+from servidor import sensor_arduino
+from servidor.protocolo_serial import (
+    DecodificadorAscii, DecodificadorBinario, DecodificadorSerial,
+    TAMANHO_QUADRO, adc_para_psi, gerar_quadros)
+
+# Bits por byte na serial (start + 8 dados + stop)
+BITS_POR_BYTE = 10
+
+
+def _fluxo_ascii_equivalente(fluxo_binario):
+    """As mesmas leituras no formato de linhas do sketch"""
+    leituras = DecodificadorBinario().alimentar(fluxo_binario)
+    return b"".join(b"%.2f,%.1f\r\n" % (pressao, temperatura) for pressao, temperatura, _ in leituras)
+
+
+def _decodificar(decodificador, fluxo, tamanho=256):
+    leituras = []
+    for inicio in range(0, len(fluxo), tamanho):
+        leituras.extend(decodificador.alimentar(fluxo[inicio:inicio + tamanho]))
+    return leituras
+
+
+def _medir_vazao(n_quadros):
+    binario = gerar_quadros(n_quadros, semente=1)
+    ascii_ = _fluxo_ascii_equivalente(binario)
+    print(f"Decodificação de {n_quadros} leituras (pedaços de 256 B)")
+    for nome, decodificador, fluxo, baud in (
+            ("ASCII (linhas CSV)", DecodificadorAscii(), ascii_, sensor_arduino.BAUDRATE_ASCII),
+            ("binário (quadros com CRC)", DecodificadorBinario(), binario, sensor_arduino.BAUDRATE_BINARIO)):
+        inicio = time.perf_counter()
+        leituras = _decodificar(decodificador, fluxo)
+        duracao = time.perf_counter() - inicio
+        bytes_leitura = len(fluxo) / len(leituras)
+        maximo_hz = baud / BITS_POR_BYTE / bytes_leitura
+        print(f"  {nome:<28} {len(leituras) / duracao:12,.0f} leituras/s   "
+              f"{bytes_leitura:5.1f} B/leitura   máx. {maximo_hz:6.0f} Hz a {baud} baud")
+
+
+def _medir_integridade(n_quadros):
+    aleatorio = random.Random(7)
+    perder = set(aleatorio.sample(range(1, n_quadros), n_quadros // 100))
+    corromper = set(aleatorio.sample(sorted(set(range(1, n_quadros)) - perder), n_quadros // 200))
+    fluxo = bytearray(gerar_quadros(n_quadros, perder=perder, corromper=corromper, semente=2))
+
+    # Lixo (inclusive marcas de sincronismo falsas) entre alguns quadros;
+    # inserido de trás para frente para as posições continuarem nas fronteiras
+    lixo = 0
+    fronteiras = aleatorio.sample(range(len(fluxo) // TAMANHO_QUADRO), n_quadros // 500)
+    for quadro in sorted(fronteiras, reverse=True):
+        posicao = quadro * TAMANHO_QUADRO
+        bloco = bytes(aleatorio.randrange(256) for _ in range(aleatorio.randint(1, 20))) + b"\xa5\x5a"
+        fluxo[posicao:posicao] = bloco
+        lixo += len(bloco)
+
+    decodificador = DecodificadorBinario()
+    leituras = _decodificar(decodificador, bytes(fluxo), tamanho=97)
+    metricas = decodificador.get_metricas()
+    esperadas = n_quadros - len(perder) - len(corromper)
+    print(f"\nIntegridade ({n_quadros} quadros, {len(perder)} perdidos, {len(corromper)} corrompidos, "
+          f"{lixo} bytes de lixo)")
+    print(f"  leituras válidas     {len(leituras):>8} (esperado {esperadas})")
+    print(f"  quadros perdidos     {metricas['quadros_perdidos']:>8} "
+          f"(esperado {len(perder) + len(corromper)}: lacunas na sequência)")
+    print(f"  CRC inválido         {metricas['quadros_corrompidos']:>8}")
+    print(f"  bytes descartados    {metricas['bytes_descartados']:>8}")
+    if len(leituras) != esperadas or metricas['quadros_perdidos'] != len(perder) + len(corromper):
+        print("  ERRO: contagem diferente do esperado")
+
+
+def _medir_deteccao():
+    print("\nDetecção automática do formato")
+    binario = gerar_quadros(50, semente=3)
+    for nome, fluxo in (("binário", b"\x00\x13lixo\n" + binario),
+                        ("ASCII", b"7.1,2" + _fluxo_ascii_equivalente(binario))):
+        decodificador = DecodificadorSerial()
+        leituras = _decodificar(decodificador, fluxo, tamanho=5)
+        print(f"  {nome:<8} -> {decodificador.formato:<8} {len(leituras)} leituras")
+
+
+def _medir_loop(n_quadros):
+    print(f"\nFluxo completo pela porta loop:// ({n_quadros} quadros, SensorArduino)")
+    fluxo = gerar_quadros(n_quadros, perder=range(0, n_quadros, 1000), semente=4)
+    sensor = sensor_arduino.get_sensor()
+    sensor.porta_serial = serial.serial_for_url('loop://', timeout=sensor_arduino.TIMEOUT_LEITURA)
+    sensor.conectado = True
+    sensor.leituras_recebidas = 0
+    sensor.iniciar_leitura(None)
+
+    inicio = time.perf_counter()
+    for posicao in range(0, len(fluxo), 1024):
+        sensor.porta_serial.write(fluxo[posicao:posicao + 1024])
+    esperadas = n_quadros - len(range(0, n_quadros, 1000))
+    while sensor.get_metricas_leitura()['leituras_recebidas'] < esperadas:
+        if time.perf_counter() - inicio > 120:
+            print("  ERRO: nem todas as leituras chegaram")
+            break
+        time.sleep(0.01)
+    duracao = time.perf_counter() - inicio
+
+    metricas = sensor.get_metricas_leitura()
+    print(f"  {metricas['leituras_recebidas']} leituras em {duracao:.2f} s "
+          f"({metricas['leituras_recebidas'] / duracao:,.0f}/s), formato {metricas['formato']}, "
+          f"{metricas['quadros_perdidos']} quadros perdidos")
+    sensor.desconectar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--quadros', type=int, default=200_000)
+    parser.add_argument('--quadros-loop', type=int, default=20_000)
+    args = parser.parse_args()
+
+    print(f"Pressão para ADC 512: {adc_para_psi(512):.2f} psi\n")
+    _medir_vazao(args.quadros)
+    _medir_integridade(args.quadros // 4)
+    _medir_deteccao()
+    _medir_loop(args.quadros_loop)
+
+
+if __name__ == "__main__":
+    main()
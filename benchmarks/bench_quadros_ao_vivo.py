@@ -0,0 +1,177 @@
+"""
+Benchmark: frame da gravação para as telas ao vivo, cópia + consulta vs. publicação sem cópia
+
+1. Custo por frame na gravação em 720p e 1080p: o padrão antigo (lock +
+   frame.copy() em todo frame, mesmo sem tela aberta) e
+   PublicadorQuadros.publicar (view somente leitura, sem cópia).
+2. Com --telas telas ao vivo e a gravação publicando a --fps: antigo, cada
+   tela consulta get_ultimo_frame() (outra cópia) a cada 30 ms; novo, cada
+   tela espera aguardar(sequencia) e copia uma vez para o seu buffer.
+   Frames exibidos, repetidos (mesmo frame exibido de novo), perdidos,
+   MB copiados por segundo e atraso entre a publicação e a tela receber.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_quadros_ao_vivo [--fps 30] [--telas 1 4] [--segundos 3]
+"""
+
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from captura.gravacao_video import PublicadorQuadros
+
+RESOLUCOES = {'720p': (1280, 720), '1080p': (1920, 1080)}
+
+
+class UltimoFrameAntigo:
+    """Como a gravação guardava o frame: cópia em todo frame; get copia de novo"""
+
+    def __init__(self):
+        self.ultimo_frame = None
+        self.frame_lock = threading.Lock()
+        self.sequencia = 0
+        self.publicado_em = 0.0
+
+    def publicar(self, frame, timestamp_ns):
+        with self.frame_lock:
+            self.ultimo_frame = frame.copy()
+            self.sequencia += 1
+            self.publicado_em = time.perf_counter()
+
+    def get_ultimo_frame(self):
+        with self.frame_lock:
+            if self.ultimo_frame is not None:
+                return self.ultimo_frame.copy(), self.sequencia, self.publicado_em
+            return None, 0, 0.0
+
+
+def _frames(largura, altura, quantidade=8):
+    aleatorio = np.random.default_rng(1)
+    return [aleatorio.integers(0, 256, (altura, largura, 3), dtype=np.uint8) for _ in range(quantidade)]
+
+
+def _medir_gravacao(frames, n):
+    antigo = UltimoFrameAntigo()
+    novo = PublicadorQuadros()
+    resultados = []
+    for publicador in (antigo, novo):
+        inicio = time.perf_counter()
+        for i in range(n):
+            publicador.publicar(frames[i % len(frames)], i)
+        resultados.append((time.perf_counter() - inicio) / n)
+    return resultados
+
+
+def _resumo(atrasos):
+    if not atrasos:
+        return "sem dados"
+    ms = np.array(atrasos) * 1000
+    p50, p99 = np.percentile(ms, [50, 99])
+    return f"atraso p50 {p50:5.1f}  p99 {p99:5.1f} ms"
+
+
+def _gravar(publicador, frames, fps, segundos, instantes):
+    """Publica um frame a cada 1/fps s (a etapa de sobreposição da gravação)"""
+    inicio = time.perf_counter()
+    proximo = inicio
+    i = 0
+    while time.perf_counter() - inicio < segundos:
+        proximo += 1 / fps
+        instantes[i + 1] = time.perf_counter()
+        publicador.publicar(frames[i % len(frames)], i)
+        i += 1
+        time.sleep(max(0.0, proximo - time.perf_counter()))
+    return i
+
+
+def _tela_antiga(gravador, parar, estatisticas):
+    ultima = 0
+    while not parar.is_set():
+        frame, sequencia, publicado_em = gravador.get_ultimo_frame()
+        if frame is not None:
+            estatisticas['copiado'] += frame.nbytes
+            if sequencia == ultima:
+                estatisticas['repetidos'] += 1
+            else:
+                estatisticas['exibidos'] += 1
+                estatisticas['perdidos'] += sequencia - ultima - 1
+                estatisticas['atrasos'].append(time.perf_counter() - publicado_em)
+            ultima = sequencia
+        time.sleep(0.03)  # cv2.waitKey(30)
+
+
+def _tela_nova(publicador, parar, estatisticas, instantes):
+    ultima = 0
+    buffer = None
+    while not parar.is_set():
+        publicado = publicador.aguardar(ultima, timeout=0.03)
+        if publicado is None:
+            continue
+        recebido = time.perf_counter()
+        if buffer is None:
+            buffer = publicado.imagem.copy()
+        else:
+            np.copyto(buffer, publicado.imagem)
+        estatisticas['copiado'] += buffer.nbytes
+        estatisticas['exibidos'] += 1
+        estatisticas['perdidos'] += publicado.sequencia - ultima - 1
+        estatisticas['atrasos'].append(recebido - instantes[publicado.sequencia])
+        ultima = publicado.sequencia
+
+
+def _medir_telas(frames, fps, telas, segundos, novo):
+    publicador = PublicadorQuadros() if novo else UltimoFrameAntigo()
+    parar = threading.Event()
+    instantes = {}
+    estatisticas = [{'exibidos': 0, 'repetidos': 0, 'perdidos': 0, 'copiado': 0, 'atrasos': []}
+                    for _ in range(telas)]
+    threads = []
+    for e in estatisticas:
+        if novo:
+            threads.append(threading.Thread(target=_tela_nova, args=(publicador, parar, e, instantes)))
+        else:
+            threads.append(threading.Thread(target=_tela_antiga, args=(publicador, parar, e)))
+    for thread in threads:
+        thread.start()
+    publicados = _gravar(publicador, frames, fps, segundos, instantes)
+    parar.set()
+    for thread in threads:
+        thread.join()
+
+    copiado = sum(e['copiado'] for e in estatisticas)
+    if not novo:
+        # Cópia do gravador em todo frame (com ou sem tela)
+        copiado += publicados * frames[0].nbytes
+    exibidos = sum(e['exibidos'] for e in estatisticas) / telas
+    repetidos = sum(e['repetidos'] for e in estatisticas) / telas
+    perdidos = sum(e['perdidos'] for e in estatisticas) / telas
+    atrasos = [a for e in estatisticas for a in e['atrasos']]
+    rotulo = "publicação" if novo else "cópia + 30 ms"
+    print(f"    {rotulo:<14} {telas} tela(s): por tela {exibidos:5.0f} exibidos, {repetidos:4.0f} repetidos, "
+          f"{perdidos:4.0f} perdidos de {publicados}; {copiado / segundos / 1e6:7.1f} MB/s copiados; "
+          f"{_resumo(atrasos)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--telas', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--segundos', type=float, default=3.0)
+    parser.add_argument('--frames', type=int, default=500)
+    args = parser.parse_args()
+
+    for nome, (largura, altura) in RESOLUCOES.items():
+        frames = _frames(largura, altura)
+        antigo, novo = _medir_gravacao(frames, args.frames)
+        print(f"{nome} ({frames[0].nbytes / 1e6:.1f} MB por frame)")
+        print(f"  por frame na gravação: cópia {antigo * 1e6:8.1f} µs  publicação {novo * 1e6:6.1f} µs")
+        print(f"  telas ao vivo a {args.fps} fps, {args.segundos:.0f} s")
+        for telas in args.telas:
+            _medir_telas(frames, args.fps, telas, args.segundos, novo=False)
+            _medir_telas(frames, args.fps, telas, args.segundos, novo=True)
+
+
+if __name__ == "__main__":
+    main()
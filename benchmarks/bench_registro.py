@@ -0,0 +1,130 @@
+"""
+Benchmark: log em níveis e métricas no lugar de print()
+
+1. Custo na thread que registra, com um console lento (cada escrita leva
+   --atraso-console ms, como um terminal remoto ou saída redirecionada):
+   print() direto, log.info pela fila (servidor/registro.py), log.debug
+   desligado, o mesmo erro repetido (suprimido) e as métricas (contador,
+   latência, ler_metricas). Também o tempo para a fila do log esvaziar.
+2. Sensor com o Arduino simulado (servidor/simulador_arduino.py) a --hz
+   leituras/s com 1% de linhas corrompidas: métricas do registro lidas ao
+   final (leituras/s, erros de decodificação).
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_registro [--mensagens 2000] [--atraso-console 0.2] [--hz 500]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import time
+
+from servidor import registro, sensor_arduino
+from servidor.simulador_arduino import SimuladorArduino, perfil_mergulho
+
+
+class ConsoleLento(io.TextIOBase):
+    """Saída de texto em que cada escrita espera `atraso` segundos"""
+
+    def __init__(self, atraso):
+        self.atraso = atraso
+        self.escritas = 0
+
+    def writable(self):
+        return True
+
+    def write(self, texto):
+        time.sleep(self.atraso)
+        self.escritas += 1
+        return len(texto)
+
+
+def _por_chamada(funcao, total):
+    inicio = time.perf_counter()
+    for i in range(total):
+        funcao(i)
+    return (time.perf_counter() - inicio) / total
+
+
+def _medir_custo(mensagens, atraso):
+    console = ConsoleLento(atraso)
+    print(f"Custo na thread que registra ({mensagens} mensagens, console com {atraso * 1000:.1f} ms por escrita)")
+
+    with contextlib.redirect_stdout(console):
+        direto = _por_chamada(lambda i: print(f"[SENSOR] Temp: {20 + i * 1e-3:.1f}°C | Pressão: {i * 1e-2:.2f} psi"),
+                              mensagens)
+    print(f"  print()                    {direto * 1e6:9.2f} µs/mensagem")
+
+    with contextlib.redirect_stdout(console):
+        registro.configurar_log()  # console = o lento
+    log = registro.get_log('bench', 'BENCH')
+    fila = _por_chamada(lambda i: log.info("Temp: %.1f°C | Pressão: %.2f psi", 20 + i * 1e-3, i * 1e-2),
+                        mensagens)
+    inicio = time.perf_counter()
+    registro.descarregar_log()
+    esvaziar = time.perf_counter() - inicio
+    print(f"  log.info (fila)            {fila * 1e6:9.2f} µs/mensagem  "
+          f"({direto / fila:,.0f}x; fila esvaziada {esvaziar * 1000:.0f} ms depois, em outra thread)")
+
+    desligado = _por_chamada(lambda i: log.debug("Quadro %d", i), mensagens * 50)
+    print(f"  log.debug desligado        {desligado * 1e6:9.2f} µs/mensagem")
+
+    escritas = console.escritas
+    repetido = _por_chamada(lambda i: log.error("Falha ao capturar frame"), mensagens * 50)
+    registro.descarregar_log()
+    print(f"  erro repetido              {repetido * 1e6:9.2f} µs/mensagem  "
+          f"({mensagens * 50} registrados, {console.escritas - escritas} escritos)")
+
+    contador = registro.contador('bench.eventos')
+    incremento = _por_chamada(lambda i: contador.incrementar(), mensagens * 500)
+    latencia = registro.latencia('bench.latencia')
+    medida = _por_chamada(lambda i: latencia.registrar(1e-3), mensagens * 500)
+    leitura = _por_chamada(lambda i: registro.ler_metricas(), mensagens * 5)
+    print(f"  contador.incrementar       {incremento * 1e9:9.0f} ns")
+    print(f"  latencia.registrar         {medida * 1e9:9.0f} ns")
+    print(f"  ler_metricas ({len(registro.ler_metricas())} valores)  {leitura * 1e6:9.2f} µs")
+
+    registro.configurar_log()  # volta ao console normal
+
+
+def _medir_sensor(transporte, hz, segundos):
+    simulador = SimuladorArduino(perfil_mergulho(segundos, hz), transporte, velocidade=1.0,
+                                 taxa_corrupcao=0.01, semente=1)
+    sensor = sensor_arduino.SensorArduino()
+    if not sensor.conectar(simulador.abrir(), espera_reset=0):
+        raise RuntimeError("não foi possível conectar ao simulador")
+    antes = registro.ler_metricas('sensor.')
+    sensor.iniciar_leitura()
+    simulador.iniciar()
+    simulador.aguardar()
+    time.sleep(0.2)
+    depois = registro.ler_metricas('sensor.')
+    sensor.parar_leitura()
+    sensor.desconectar()
+    simulador.parar()
+
+    print(f"\nSensor com o simulador ({hz} Hz, {segundos:.0f} s, 1% corrompidas, {transporte})")
+    print(f"  enviadas {simulador.leituras_enviadas}  corrompidas {simulador.linhas_corrompidas}")
+    print(f"  sensor.leituras            +{depois['sensor.leituras'] - antes['sensor.leituras']}  "
+          f"({depois['sensor.leituras_por_s']:.0f}/s)")
+    print(f"  sensor.erros_decodificacao +{depois['sensor.erros_decodificacao'] - antes['sensor.erros_decodificacao']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--mensagens', type=int, default=2000)
+    parser.add_argument('--atraso-console', type=float, default=0.2, help="ms por escrita no console")
+    parser.add_argument('--transporte', choices=('pty', 'socket'), default='pty')
+    parser.add_argument('--hz', type=int, default=500)
+    parser.add_argument('--segundos', type=float, default=3.0)
+    args = parser.parse_args()
+    if args.transporte == 'pty' and os.name != 'posix':
+        args.transporte = 'socket'
+
+    _medir_custo(args.mensagens, args.atraso_console / 1000)
+    _medir_sensor(args.transporte, args.hz, args.segundos)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Benchmark: leitura serial por polling + readline vs. leitura em bloco + decodificador
+
+1. Decodificação (sem E/S): linhas "pressao,temperatura" (1% de lixo)
+   decodificadas linha a linha (decode + split + float) e pelo
+   DecodificadorAscii recebendo pedaços de tamanhos diferentes.
+2. Fluxo completo pela porta virtual loop:// do pyserial: o laço antigo
+   (in_waiting + readline, que no pyserial lê byte a byte) e o SensorArduino
+   atual lendo as mesmas linhas (sem missão ativa, sem banco).
+3. CPU ociosa: tempo de CPU do processo com a porta aberta e sem dados, no
+   laço antigo (in_waiting sem espera) e na leitura bloqueante atual.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_serial [--linhas 200000] [--ocioso 2]
+"""
+
+import argparse
+import io
+import random
+import threading
+import time
+
+import serial
+
+from servidor.protocolo_serial import DecodificadorAscii
+from servidor import sensor_arduino
+
+
+def _gerar_fluxo(n_linhas, semente=1):
+    """Bytes como os do Arduino, com 1% de linhas corrompidas"""
+    aleatorio = random.Random(semente)
+    linhas = []
+    for i in range(n_linhas):
+        if aleatorio.random() < 0.01:
+            linhas.append(b"\x00\xff#lixo\r\n")
+        else:
+            linhas.append(b"%.2f,%.1f\r\n" % (aleatorio.uniform(0, 30), aleatorio.uniform(5, 30)))
+    return b"".join(linhas)
+
+
+def _decodificar_linha(linha, leituras):
+    """Padrão antigo para uma linha: decode, split e float com exceção se inválida"""
+    linha = linha.decode('utf-8', errors='ignore').strip()
+    if linha:
+        dados = linha.split(',')
+        if len(dados) >= 2:
+            try:
+                leituras.append((float(dados[0]), float(dados[1])))
+            except ValueError:
+                pass
+
+
+def _decodificar_linha_a_linha(fluxo):
+    """Decodificação antiga aplicada às linhas já separadas"""
+    leituras = []
+    for linha in io.BytesIO(fluxo):
+        _decodificar_linha(linha, leituras)
+    return leituras
+
+
+def _decodificar_em_pedacos(fluxo, tamanho):
+    """Decodificador atual recebendo o fluxo em pedaços de `tamanho` bytes"""
+    decodificador = DecodificadorAscii()
+    leituras = []
+    for inicio in range(0, len(fluxo), tamanho):
+        leituras.extend(decodificador.alimentar(fluxo[inicio:inicio + tamanho]))
+    return leituras
+
+
+def _medir_decodificacao(fluxo, n_linhas):
+    print(f"Decodificação sem E/S de {n_linhas} linhas ({len(fluxo) / 1024:.0f} KB)")
+    esperado = None
+    cenarios = [("decode + split + float por linha", _decodificar_linha_a_linha)]
+    for tamanho in (16, 64, 4096):
+        cenarios.append((f"decodificador, pedaços de {tamanho} B",
+                         lambda f, t=tamanho: _decodificar_em_pedacos(f, t)))
+    for nome, funcao in cenarios:
+        inicio = time.perf_counter()
+        leituras = funcao(fluxo)
+        duracao = time.perf_counter() - inicio
+        leituras = [leitura[:2] for leitura in leituras]  # (pressao, temperatura)
+        if esperado is None:
+            esperado = leituras
+        elif leituras != esperado:
+            print(f"  ERRO: {nome} decodificou leituras diferentes")
+        print(f"  {nome:<36} {duracao * 1000:8.1f} ms  {n_linhas / duracao:12,.0f} linhas/s")
+
+
+def _escrever(porta, fluxo):
+    """Escreve o fluxo na porta em pedaços de 1 KB"""
+    for posicao in range(0, len(fluxo), 1024):
+        porta.write(fluxo[posicao:posicao + 1024])
+
+
+def _medir_loop_antigo(fluxo, n_validas):
+    """Laço antigo de _ler_dados_continuamente sobre loop://"""
+    porta = serial.serial_for_url('loop://', timeout=1)
+    leituras = []
+    escritor = threading.Thread(target=_escrever, args=(porta, fluxo), daemon=True)
+    inicio = time.perf_counter()
+    escritor.start()
+    while len(leituras) < n_validas and time.perf_counter() - inicio < 120:
+        if porta.in_waiting > 0:
+            _decodificar_linha(porta.readline(), leituras)
+    duracao = time.perf_counter() - inicio
+    escritor.join()
+    porta.close()
+    print(f"  {'in_waiting + readline (antigo)':<36} {len(leituras):>7} leituras em {duracao:6.2f} s "
+          f"({len(leituras) / duracao:10,.0f} linhas/s)")
+
+
+def _medir_loop(fluxo, n_validas):
+    """SensorArduino atual lendo de loop://"""
+    sensor = sensor_arduino.get_sensor()
+    sensor.porta_serial = serial.serial_for_url('loop://', timeout=sensor_arduino.TIMEOUT_LEITURA)
+    sensor.conectado = True
+    sensor.leituras_recebidas = 0
+    sensor.iniciar_leitura(None)
+
+    inicio = time.perf_counter()
+    _escrever(sensor.porta_serial, fluxo)
+    while sensor.get_metricas_leitura()['leituras_recebidas'] < n_validas:
+        if time.perf_counter() - inicio > 120:
+            print("  ERRO: nem todas as leituras chegaram")
+            break
+        time.sleep(0.01)
+    duracao = time.perf_counter() - inicio
+
+    recebidas = sensor.get_metricas_leitura()['leituras_recebidas']
+    print(f"  {'read() em bloco + decodificador':<36} {recebidas:>7} leituras em {duracao:6.2f} s "
+          f"({recebidas / duracao:10,.0f} linhas/s)")
+    return sensor
+
+
+def _cpu_ocioso(nome, laco, segundos):
+    """Fração de um núcleo usada pelo laço com a porta sem dados"""
+    porta = serial.serial_for_url('loop://', timeout=sensor_arduino.TIMEOUT_LEITURA)
+    parar = threading.Event()
+    thread = threading.Thread(target=laco, args=(porta, parar), daemon=True)
+    cpu = time.process_time()
+    thread.start()
+    time.sleep(segundos)
+    uso = (time.process_time() - cpu) / segundos
+    parar.set()
+    thread.join()
+    porta.close()
+    print(f"  {nome:<36} {uso * 100:6.1f}% de um núcleo")
+
+
+def _laco_polling(porta, parar):
+    """Laço antigo: consulta in_waiting sem esperar"""
+    while not parar.is_set():
+        if porta.in_waiting > 0:
+            porta.readline()
+
+
+def _laco_bloqueante(porta, parar):
+    """Laço atual: read() bloqueia até chegar um byte ou o timeout"""
+    while not parar.is_set():
+        porta.read(porta.in_waiting or 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--linhas', type=int, default=200_000)
+    parser.add_argument('--linhas-loop', type=int, default=20_000)
+    parser.add_argument('--ocioso', type=float, default=2.0, help='segundos de medição de CPU ociosa')
+    args = parser.parse_args()
+
+    fluxo = _gerar_fluxo(args.linhas)
+    _medir_decodificacao(fluxo, args.linhas)
+
+    fluxo_loop = _gerar_fluxo(args.linhas_loop, semente=2)
+    n_validas = len(_decodificar_em_pedacos(fluxo_loop, 4096))
+    print(f"\nFluxo completo pela porta loop:// ({args.linhas_loop} linhas)")
+    _medir_loop_antigo(fluxo_loop, n_validas)
+    sensor = _medir_loop(fluxo_loop, n_validas)
+    sensor.desconectar()
+
+    print(f"\nCPU com a porta ociosa ({args.ocioso:.0f} s)")
+    _cpu_ocioso("polling de in_waiting (antigo)", _laco_polling, args.ocioso)
+    _cpu_ocioso("read() bloqueante (atual)", _laco_bloqueante, args.ocioso)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Benchmark: fluxo completo de ponta a ponta com o Arduino simulado
+
+O simulador (servidor/simulador_arduino.py) envia linhas "pressao,temperatura"
+por um pty ou socket:// e o SensorArduino as lê como de um Arduino real.
+1. Vazão: linhas enviadas sem pausa (1% corrompidas), sem missão; leituras/s
+   e linhas rejeitadas pelo decodificador (deve ser igual às corrompidas).
+2. Taxa sustentada (--taxas Hz) com missão ativa em um banco temporário:
+   leituras recebidas e gravadas, descartadas e latência (p50/p99/máx.)
+   da escrita na porta até o barramento de eventos e até o commit no banco.
+3. Quedas de conexão: tempo até o sensor perceber a porta com erro e
+   leituras perdidas (o sensor é reconectado a cada queda).
+4. Reprodução da missão gravada em 2 a --velocidade vezes o tempo real:
+   duração e estatísticas iguais às da original.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_simulador [--transporte pty] [--linhas 200000] [--taxas 100 1000 5000]
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+import servidor.database as db
+from servidor import sensor_arduino
+from servidor.simulador_arduino import SimuladorArduino, leituras_da_missao, perfil_mergulho
+
+
+def _conectar(simulador, escritor=None):
+    """Sensor conectado à porta do simulador (antes de o envio começar)"""
+    sensor = sensor_arduino.SensorArduino(escritor=escritor)
+    if not sensor.conectar(simulador.abrir(), espera_reset=0):
+        raise RuntimeError("não foi possível conectar ao simulador")
+    sensor.ultimo_log = float('inf')  # sem mensagens de leitura no console
+    return sensor
+
+
+def _registrar_chegadas(sensor):
+    """Assina o barramento; retorna a lista de (leituras recebidas até aqui, instante)"""
+    chegadas = []
+    total = 0
+
+    def receber(leituras, snapshot):
+        nonlocal total
+        total += len(leituras)
+        chegadas.append((total, time.perf_counter()))
+
+    sensor.assinar(receber)
+    return chegadas
+
+
+def _latencias(envios, chegadas):
+    """
+    Latência de cada leitura: instante em que a k-ésima chegou (primeira marca
+    com total >= k) menos o instante em que foi escrita na porta
+    """
+    if not envios or not chegadas:
+        return np.zeros(0)
+    enviados, t_envio = np.array(envios).T
+    recebidos, t_chegada = np.array(chegadas).T
+    k = np.arange(1, int(min(enviados[-1], recebidos[-1])) + 1)
+    return (t_chegada[np.searchsorted(recebidos, k)] - t_envio[np.searchsorted(enviados, k)]) * 1000
+
+
+def _resumo(latencias):
+    if not len(latencias):
+        return "sem dados"
+    p50, p99 = np.percentile(latencias, [50, 99])
+    return f"p50 {p50:7.2f}  p99 {p99:7.2f}  máx. {latencias.max():7.2f} ms"
+
+
+def _medir_vazao(transporte, n_linhas):
+    print(f"Vazão ({n_linhas} linhas sem pausa, 1% corrompidas, {transporte})")
+    simulador = SimuladorArduino(perfil_mergulho(n_linhas / 100, 100), transporte, velocidade=None,
+                                 taxa_corrupcao=0.01, semente=1)
+    sensor = _conectar(simulador)
+    sensor.iniciar_leitura(None)
+
+    inicio = time.perf_counter()
+    simulador.iniciar()
+    simulador.aguardar()
+    enviadas = simulador.leituras_enviadas
+    while sensor.leituras_recebidas < enviadas and time.perf_counter() - inicio < 120:
+        time.sleep(0.002)
+    duracao = time.perf_counter() - inicio
+
+    metricas = sensor.get_metricas_leitura()
+    print(f"  {metricas['leituras_recebidas']:>8} leituras em {duracao:5.2f} s  "
+          f"{metricas['leituras_recebidas'] / duracao:10,.0f} linhas/s")
+    print(f"  linhas rejeitadas {metricas['linhas_invalidas']} "
+          f"(corrompidas pelo simulador: {simulador.linhas_corrompidas})")
+    sensor.desconectar()
+    simulador.parar()
+
+
+def _registrar_gravacoes(escritor, parar):
+    """Amostra o total de medições gravadas pelo escritor a cada 2 ms"""
+    gravacoes = []
+    while not parar.is_set():
+        gravacoes.append((escritor.get_metricas()['medicoes_gravadas'], time.perf_counter()))
+        time.sleep(0.002)
+    return gravacoes
+
+
+def _medir_taxa(transporte, hz, segundos, id_missao):
+    simulador = SimuladorArduino(perfil_mergulho(segundos, hz), transporte, velocidade=1.0, semente=hz)
+    sensor = _conectar(simulador)
+    chegadas = _registrar_chegadas(sensor)
+    sensor.iniciar_leitura(id_missao)
+
+    parar = threading.Event()
+    gravacoes = []
+    amostrador = threading.Thread(target=lambda: gravacoes.extend(_registrar_gravacoes(sensor.escritor, parar)),
+                                  daemon=True)
+    amostrador.start()
+    simulador.iniciar()
+    simulador.aguardar()
+    time.sleep(0.1)
+    sensor.parar_leitura()  # descarrega a fila do banco
+    time.sleep(0.01)
+    parar.set()
+    amostrador.join()
+
+    escrita = sensor.get_metricas_escrita()
+    print(f"  {hz:>6} Hz  enviadas {simulador.leituras_enviadas:>6}  recebidas {sensor.leituras_recebidas:>6}  "
+          f"gravadas {escrita['medicoes_gravadas']:>6}  descartadas {escrita['medicoes_descartadas']:>4}  "
+          f"atraso do envio {simulador.atraso_maximo * 1000:5.1f} ms")
+    print(f"  {'':>9} barramento {_resumo(_latencias(simulador.envios, chegadas))}")
+    print(f"  {'':>9} banco      {_resumo(_latencias(simulador.envios, gravacoes))}")
+    sensor.escritor.parar()
+    sensor.desconectar()
+    simulador.parar()
+
+
+def _medir_quedas(transporte, segundos):
+    hz = 100
+    print(f"\nQuedas de conexão ({transporte}, {hz} Hz, queda de 0,5 s a cada 1 s, {segundos:.0f} s)")
+    simulador = SimuladorArduino(perfil_mergulho(segundos, hz), transporte, velocidade=1.0,
+                                 intervalo_queda=1.0, duracao_queda=0.5, semente=3)
+    sensor = _conectar(simulador)
+    sensor.reconectar_automatico = False  # a reconexão é feita e medida aqui
+    sensor.iniciar_leitura(None)
+    simulador.iniciar()
+
+    deteccoes = []
+    while not simulador.aguardar(0.0005):
+        if sensor.conectado and not sensor.lendo:
+            # O leitor compartilhado avisou a falha da porta
+            if len(deteccoes) < len(simulador.instantes_queda):
+                deteccoes.append((time.perf_counter() - simulador.instantes_queda[len(deteccoes)]) * 1000)
+            sensor.desconectar()
+        if not sensor.conectado and simulador.disponivel.is_set():
+            # Arduino de volta: reconectar (leituras_recebidas continua acumulando)
+            if sensor.conectar(simulador.porta, espera_reset=0):
+                sensor.iniciar_leitura(None)
+    time.sleep(0.1)
+    recebidas = sensor.leituras_recebidas
+    sensor.desconectar()
+    simulador.parar()
+
+    print(f"  quedas {simulador.quedas}, percebidas {len(deteccoes)}, tempo até perceber: "
+          + ", ".join(f"{d:.2f} ms" for d in deteccoes))
+    print(f"  leituras enviadas {simulador.leituras_enviadas}, recebidas {recebidas}, "
+          f"perdidas durante as quedas {simulador.leituras_perdidas}")
+
+
+def _medir_reproducao(transporte, id_original, id_mergulhador, velocidade):
+    original = db.get_estatisticas_medicoes(id_original)
+    tempos = [ts for lote in db.iterar_medicoes(id_original, colunas=('timestamp_ms',)) for (ts,) in lote]
+    duracao_original = (tempos[-1] - tempos[0]) / 1000
+    print(f"\nReprodução da missão gravada ({original[0]} medições, {duracao_original:.1f} s, {transporte})")
+
+    for vezes in (2, velocidade):
+        # Lido inteiro antes: a consulta ao banco não entra no tempo de envio
+        leituras = list(leituras_da_missao(id_original))
+        simulador = SimuladorArduino(leituras, transporte, velocidade=vezes, ruido_pressao=0, ruido_temperatura=0)
+        id_copia = db.inserir_missao(id_mergulhador, f"Reprodução {vezes:g}x", 0, f"Missao_reproducao_{vezes:g}")
+        sensor = _conectar(simulador)
+        sensor.iniciar_leitura(id_copia)
+        inicio = time.perf_counter()
+        simulador.iniciar()
+        simulador.aguardar()
+        duracao = time.perf_counter() - inicio
+        time.sleep(0.1)
+        sensor.parar_leitura()
+        sensor.escritor.parar()
+        sensor.desconectar()
+        simulador.parar()
+
+        copia = db.get_estatisticas_medicoes(id_copia)
+        iguais = copia[0] == original[0] and np.allclose(copia[1:], original[1:])
+        print(f"  {vezes:>5g}x  {duracao:6.2f} s (esperado {duracao_original / vezes:6.2f} s)  "
+              f"{copia[0]} medições, estatísticas {'iguais' if iguais else 'DIFERENTES'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--transporte', choices=('pty', 'socket'), default='pty')
+    parser.add_argument('--linhas', type=int, default=200_000)
+    parser.add_argument('--taxas', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--segundos', type=float, default=3.0)
+    parser.add_argument('--velocidade', type=float, default=20.0)
+    args = parser.parse_args()
+    if args.transporte == 'pty' and os.name != 'posix':
+        args.transporte = 'socket'
+
+    _medir_vazao(args.transporte, args.linhas)
+
+    caminho_original = db.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        db.fechar_conexoes()
+        db.DB_PATH = os.path.join(tmp, 'bench_simulador.db')
+        db.inicializar_banco()
+        id_mergulhador = db.inserir_mergulhador("Benchmark", 30, "M")
+        missoes = {hz: db.inserir_missao(id_mergulhador, f"Simulada {hz} Hz", 0, f"Missao_sim_{hz}")
+                   for hz in args.taxas}
+
+        print(f"\nTaxa sustentada ({args.segundos:.0f} s por taxa, missão ativa; latência desde a escrita na porta)")
+        for hz in args.taxas:
+            _medir_taxa(args.transporte, hz, args.segundos, missoes[hz])
+
+        _medir_quedas(args.transporte, args.segundos)
+
+        _medir_reproducao(args.transporte, missoes[args.taxas[0]], id_mergulhador, args.velocidade)
+        db.fechar_conexoes()
+    db.DB_PATH = caminho_original
+
+
+if __name__ == "__main__":
+    main()
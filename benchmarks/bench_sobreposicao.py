@@ -0,0 +1,83 @@
+"""
+Benchmark: texto da gravação com putText a cada frame vs. bloco em cache
+
+Custo por frame de sobrepor o identificador da missão e o texto dos
+sensores (layout padrão da gravação) em 480p, 720p e 1080p:
+1. putText: duas chamadas cv2.putText com LINE_AA e espessura 2, como era
+   feito em cada frame.
+2. CompositorTexto (captura/sobreposicao.py): texto dos sensores trocado a
+   cada --frames-por-leitura frames (1 leitura/s a 30 fps), com a
+   renderização do bloco incluída no custo; e só a mistura (texto igual).
+Também a maior diferença de pixel entre os dois resultados.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_sobreposicao [--frames 3000] [--frames-por-leitura 30]
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from captura.sobreposicao import CompositorTexto, ESTILO_PADRAO, LAYOUT_PADRAO
+
+RESOLUCOES = {'480p': (640, 480), '720p': (1280, 720), '1080p': (1920, 1080)}
+
+MISSAO = "Missao_2026_10_17_Recife"
+
+
+def _texto_sensores(i):
+    return f"Temperatura: {20 + i * 0.01:.1f}  Pressao: {14.7 + i * 0.003:.2f}"
+
+
+def _put_text(frame, textos):
+    for linha, texto in zip(LAYOUT_PADRAO, textos):
+        cv2.putText(frame, texto, linha['posicao'], ESTILO_PADRAO['fonte'], ESTILO_PADRAO['escala'],
+                    ESTILO_PADRAO['cor'], ESTILO_PADRAO['espessura'], cv2.LINE_AA)
+
+
+def _medir(frames, base, por_leitura, aplicar):
+    frame = base.copy()
+    inicio = time.perf_counter()
+    for i in range(frames):
+        aplicar(frame, i // por_leitura)
+    return (time.perf_counter() - inicio) / frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--frames', type=int, default=3000)
+    parser.add_argument('--frames-por-leitura', type=int, default=30)
+    args = parser.parse_args()
+
+    aleatorio = np.random.default_rng(1)
+    print(f"Custo por frame ({args.frames} frames, texto dos sensores novo a cada {args.frames_por_leitura})")
+    for nome, (largura, altura) in RESOLUCOES.items():
+        base = aleatorio.integers(0, 256, (altura, largura, 3), dtype=np.uint8)
+
+        antigo = _medir(args.frames, base, args.frames_por_leitura,
+                        lambda frame, i: _put_text(frame, (MISSAO, _texto_sensores(i))))
+
+        compositor = CompositorTexto()
+        compositor.definir('missao', MISSAO)
+
+        def compor(frame, i):
+            compositor.definir('sensores', _texto_sensores(i))
+            compositor.aplicar(frame)
+        cache = _medir(args.frames, base, args.frames_por_leitura, compor)
+        so_mistura = _medir(args.frames, base, args.frames, compor)
+
+        esperado, obtido = base.copy(), base.copy()
+        _put_text(esperado, (MISSAO, _texto_sensores(0)))
+        compositor.definir('sensores', _texto_sensores(0))
+        compositor.aplicar(obtido)
+        diferenca = int(np.abs(esperado.astype(np.int16) - obtido).max())
+
+        print(f"  {nome:>5}  putText {antigo * 1e6:6.1f} µs  cache {cache * 1e6:6.1f} µs "
+              f"({antigo / cache:.1f}x)  só mistura {so_mistura * 1e6:6.1f} µs  "
+              f"diferença máx. {diferenca}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,8 +7,16 @@ import wave
 import threading
 import time
 import os
-from datetime import datetime
 import servidor.database as db
+from servidor import registro, relogio
+
+log = registro.get_log('audio', 'ÁUDIO')
+
+# Métricas da gravação (ver servidor/registro.py)
+_blocos_gravados = registro.contador('audio.blocos_gravados')
+_falhas_captura = registro.contador('audio.falhas_captura')
+_latencia_finalizacao = registro.latencia('audio.latencia_finalizacao')
+_segmento = registro.medidor('audio.segmento')
 
 
 class GravadorAudio:
@@ -50,7 +58,7 @@ class GravadorAudio:
     def iniciar_gravacao(self, id_missao, identificador_missao):
         """Inicia a gravação automática de áudio para uma missão"""
         if self.gravando:
-            print(f"[ÁUDIO AVISO] Já existe uma gravação de áudio em andamento!")
+            log.warning("Já existe uma gravação de áudio em andamento!")
             return False
 
         self.id_missao = id_missao
@@ -65,16 +73,16 @@ class GravadorAudio:
         )
         self.thread_gravacao.start()
 
-        print(f"[ÁUDIO] Gravação iniciada para missão ID: {id_missao} ({identificador_missao})")
+        log.info("Gravação iniciada para missão ID: %s (%s)", id_missao, identificador_missao)
         return True
 
     def parar_gravacao(self):
         """Para a gravação de áudio em andamento"""
         if not self.gravando:
-            print(f"[ÁUDIO AVISO] Não há gravação de áudio em andamento!")
+            log.warning("Não há gravação de áudio em andamento!")
             return False
 
-        print(f"[ÁUDIO] Parando gravação da missão ID: {self.id_missao}...")
+        log.info("Parando gravação da missão ID: %s...", self.id_missao)
         self.parar_flag = True
         self.gravando = False
 
@@ -84,7 +92,7 @@ class GravadorAudio:
 
         self.id_missao = None
         self.identificador_missao = None
-        print(f"[ÁUDIO] Gravação parada com sucesso!")
+        log.info("Gravação parada com sucesso!")
         return True
 
     def _gravar_em_segmentos(self):
@@ -105,24 +113,25 @@ class GravadorAudio:
                     frames_per_buffer=self.CHUNK
                 )
             except Exception as e:
-                print(f"[ÁUDIO ERRO] Não foi possível abrir o dispositivo de áudio: {e}")
+                log.error("Não foi possível abrir o dispositivo de áudio: %s", e)
                 self.gravando = False
                 audio.terminate()
                 return
 
-            print(f"[ÁUDIO] Dispositivo de áudio configurado: {self.RATE}Hz, {self.CHANNELS} canais")
+            log.info("Dispositivo de áudio configurado: %dHz, %d canais", self.RATE, self.CHANNELS)
 
             segmento_numero = 1
 
             while not self.parar_flag:
                 # Criar nome do arquivo para este segmento
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                timestamp = relogio.ms_para_texto(relogio.agora_ms(), "%Y%m%d_%H%M%S")
                 nome_arquivo = f"{self.identificador_missao}_seg{segmento_numero:03d}_{timestamp}.wav"
                 # Usar caminho absoluto
                 caminho_completo = os.path.abspath(os.path.join(self.diretorio_audios, nome_arquivo))
 
-                print(f"[ÁUDIO] Iniciando segmento {segmento_numero}: {nome_arquivo}")
-                print(f"[ÁUDIO DEBUG] Caminho completo (absoluto): {caminho_completo}")
+                _segmento.definir(segmento_numero)
+                log.info("Iniciando segmento %d: %s", segmento_numero, nome_arquivo)
+                log.debug("Caminho completo (absoluto): %s", caminho_completo)
 
                 # Configurar arquivo WAV
                 wf = wave.open(caminho_completo, 'wb')
@@ -132,6 +141,7 @@ class GravadorAudio:
 
                 tempo_inicio_segmento = time.time()
                 frames_gravados = 0
+                inicio_ms = None  # instante da primeira amostra, no relógio dos sensores
 
                 # Gravar por 5 minutos ou até receber sinal de parada
                 while not self.parar_flag:
@@ -144,16 +154,22 @@ class GravadorAudio:
                     try:
                         # Ler dados do microfone
                         data = stream.read(self.CHUNK, exception_on_overflow=False)
+                        if inicio_ms is None:
+                            # read() retorna quando o bloco termina; descontar sua duração
+                            inicio_ms = relogio.agora_ms() - self.CHUNK * 1000 // self.RATE
                         wf.writeframes(data)
                         frames_gravados += 1
+                        _blocos_gravados.incrementar()
                     except Exception as e:
-                        print(f"[ÁUDIO ERRO] Falha ao capturar áudio: {e}")
+                        _falhas_captura.incrementar()
+                        log.error("Falha ao capturar áudio: %s", e)
                         break
 
                 # Fechar o arquivo de áudio deste segmento
+                inicio_finalizacao = time.perf_counter()
                 wf.close()
 
-                print(f"[ÁUDIO] Segmento {segmento_numero} finalizado: {frames_gravados} frames gravados")
+                log.info("Segmento %d finalizado: %d frames gravados", segmento_numero, frames_gravados)
 
                 # Salvar caminho no banco de dados apenas se houver frames gravados
                 if frames_gravados > 0:
@@ -162,25 +178,22 @@ class GravadorAudio:
                         time.sleep(0.5)
 
                         # Verificar se o arquivo realmente existe
-                        print(f"[ÁUDIO DEBUG] Verificando existência do arquivo: {caminho_completo}")
-                        print(f"[ÁUDIO DEBUG] Arquivo existe? {os.path.exists(caminho_completo)}")
-
                         if os.path.exists(caminho_completo):
-                            print(f"[ÁUDIO DEBUG] Salvando no banco o caminho: {caminho_completo}")
-                            db.inserir_audio(self.id_missao, caminho_completo)
-                            print(f"[ÁUDIO BANCO] Áudio salvo no banco: {caminho_completo}")
+                            db.inserir_audio(self.id_missao, caminho_completo, inicio_ms)
+                            log.info("Áudio salvo no banco: %s", caminho_completo)
                         else:
-                            print(f"[ÁUDIO ERRO] Arquivo de áudio não foi criado: {caminho_completo}")
+                            log.error("Arquivo de áudio não foi criado: %s", caminho_completo)
                     except Exception as e:
-                        print(f"[ÁUDIO ERRO] Falha ao salvar áudio no banco: {e}")
+                        log.error("Falha ao salvar áudio no banco: %s", e)
                 else:
                     # Se não houver frames, deletar o arquivo vazio
                     if os.path.exists(caminho_completo):
                         try:
                             os.remove(caminho_completo)
-                            print(f"[ÁUDIO] Arquivo vazio removido: {caminho_completo}")
+                            log.info("Arquivo vazio removido: %s", caminho_completo)
                         except Exception as e:
-                            print(f"[ÁUDIO ERRO] Falha ao remover arquivo vazio: {e}")
+                            log.error("Falha ao remover arquivo vazio: %s", e)
+                _latencia_finalizacao.registrar(time.perf_counter() - inicio_finalizacao)
 
                 # Se foi sinalizado para parar, sair do loop principal
                 if self.parar_flag:
@@ -194,10 +207,10 @@ class GravadorAudio:
             stream.close()
             audio.terminate()
 
-            print(f"[ÁUDIO] Dispositivo de áudio liberado. Total de segmentos: {segmento_numero - 1}")
+            log.info("Dispositivo de áudio liberado. Total de segmentos: %d", segmento_numero - 1)
 
         except Exception as e:
-            print(f"[ÁUDIO ERRO] Erro durante gravação: {e}")
+            log.exception("Erro durante gravação: %s", e)
             self.gravando = False
 
     def esta_gravando(self):
@@ -3,12 +3,318 @@ Módulo para gravação automática de vídeo em background
 """
 
 import cv2
+import shutil
+import subprocess
+import tempfile
 import threading
 import time
 import os
-from datetime import datetime
+from collections import deque, namedtuple
 import servidor.database as db
+from servidor import registro, relogio
 import servidor.sensor_arduino as sensor_arduino
+from captura.sobreposicao import CompositorTexto, LAYOUT_PADRAO
+
+log = registro.get_log('video', 'GRAVAÇÃO')
+
+# Métricas da gravação (ver servidor/registro.py)
+_frames_capturados = registro.contador('video.frames_capturados')
+_frames_gravados = registro.contador('video.frames_gravados')
+_frames_perdidos = registro.contador('video.frames_perdidos')
+_frames_repetidos = registro.contador('video.frames_repetidos')
+_frames_pulados = registro.contador('video.frames_pulados')
+_latencia_quadro = registro.latencia('video.latencia_quadro')
+_latencia_finalizacao = registro.latencia('video.latencia_finalizacao')
+_segmento = registro.medidor('video.segmento')
+
+# Duração de cada arquivo de vídeo (s)
+DURACAO_SEGMENTO = 5 * 60
+
+# FPS usado se a câmera não informar o seu
+FPS_PADRAO = 20
+
+# Quadros guardados em cada fila entre as etapas; com a fila cheia, o mais
+# antigo é descartado (a gravação fica com uma lacuna, preenchida repetindo
+# o quadro anterior, em vez de atrasar a captura)
+CAPACIDADE_FILA = 8
+
+# Quadro capturado: número sequencial, horário da captura no relógio único (ns) e imagem
+Quadro = namedtuple('Quadro', 'numero timestamp_ns imagem')
+
+# Tempo máximo (s) para o ffmpeg terminar o arquivo depois do fim da entrada
+ESPERA_FFMPEG = 30
+
+
+# ==================== CODIFICADORES ====================
+
+class CodificadorCv2:
+    """cv2.VideoWriter com um fourcc do OpenCV (padrão: XVID em .avi)"""
+
+    def __init__(self, fourcc='XVID', extensao='.avi'):
+        self.fourcc = fourcc
+        self.extensao = extensao
+
+    def abrir(self, caminho, fps, tamanho):
+        """Escritor do segmento: write(frame BGR), release()"""
+        escritor = cv2.VideoWriter(caminho, cv2.VideoWriter_fourcc(*self.fourcc), fps, tamanho)
+        if not escritor.isOpened():
+            log.error("VideoWriter não abriu %s (fourcc %s)", caminho, self.fourcc)
+        return escritor
+
+    def __repr__(self):
+        return f"CodificadorCv2(fourcc={self.fourcc!r}, extensao={self.extensao!r})"
+
+
+class CodificadorFfmpeg:
+    """
+    ffmpeg em um processo separado, recebendo os frames BGR crus pela entrada
+    padrão (sem cópia: o próprio buffer do array vai para o pipe).
+
+    codec: 'h264' (libx264) ou 'mjpeg'. crf: qualidade constante (h264: 0-51,
+    menor = melhor; mjpeg: -q:v 2-31; padrão em QUALIDADE_PADRAO). bitrate ('4M', '800k'): taxa alvo no
+    lugar do crf (h264 com maxrate/bufsize para limitar picos). preset: do
+    x264 (ultrafast ... veryslow; mais lento = arquivo menor com a mesma
+    qualidade). container: extensão do arquivo ('.mkv' continua legível se
+    a gravação for interrompida; '.mp4' precisa do fim do arquivo)
+    """
+
+    CODECS = {
+        'h264': ('libx264', 'yuv420p'),
+        'mjpeg': ('mjpeg', 'yuvj420p'),
+    }
+
+    # crf de cada codec quando não informado (as escalas são diferentes:
+    # -q:v 23 no mjpeg seria uma imagem muito degradada)
+    QUALIDADE_PADRAO = {
+        'h264': 23,
+        'mjpeg': 4,
+    }
+
+    def __init__(self, codec='h264', crf=None, bitrate=None, preset='veryfast', container='.mkv',
+                 executavel='ffmpeg', threads=None):
+        if codec not in self.CODECS:
+            raise ValueError(f"Codec desconhecido: {codec}")
+        self.codec = codec
+        self.crf = self.QUALIDADE_PADRAO[codec] if crf is None else crf
+        self.bitrate = bitrate
+        self.preset = preset
+        self.extensao = container if container.startswith('.') else f".{container}"
+        self.executavel = executavel
+        self.threads = threads
+
+    @staticmethod
+    def disponivel(executavel='ffmpeg'):
+        """True se o executável do ffmpeg existe (no PATH ou caminho completo)"""
+        return shutil.which(executavel) is not None
+
+    def comando(self, caminho, fps, tamanho):
+        """Linha de comando do ffmpeg para um segmento"""
+        biblioteca, formato_pixel = self.CODECS[self.codec]
+        largura, altura = tamanho
+        comando = [self.executavel, '-hide_banner', '-loglevel', 'error', '-y',
+                   '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{largura}x{altura}',
+                   '-framerate', str(fps), '-i', '-',
+                   '-c:v', biblioteca, '-pix_fmt', formato_pixel]
+        if self.codec == 'h264':
+            comando += ['-preset', self.preset]
+            if self.bitrate:
+                comando += ['-b:v', str(self.bitrate), '-maxrate', str(self.bitrate), '-bufsize', str(self.bitrate)]
+            else:
+                comando += ['-crf', str(self.crf)]
+        elif self.bitrate:
+            comando += ['-b:v', str(self.bitrate)]
+        else:
+            comando += ['-q:v', str(self.crf)]
+        if self.threads:
+            comando += ['-threads', str(self.threads)]
+        return comando + [caminho]
+
+    def abrir(self, caminho, fps, tamanho):
+        """Escritor do segmento; se o ffmpeg não puder ser iniciado, usa o cv2 no mesmo arquivo"""
+        try:
+            return EscritorFfmpeg(self.comando(caminho, fps, tamanho), tamanho)
+        except OSError as e:
+            log.warning("ffmpeg não iniciou (%s); segmento gravado com o cv2", e)
+            return CodificadorCv2(extensao=self.extensao).abrir(caminho, fps, tamanho)
+
+    def __repr__(self):
+        qualidade = f"bitrate={self.bitrate!r}" if self.bitrate else f"crf={self.crf}"
+        return (f"CodificadorFfmpeg(codec={self.codec!r}, {qualidade}, preset={self.preset!r}, "
+                f"container={self.extensao!r})")
+
+
+class EscritorFfmpeg:
+    """Um processo ffmpeg por segmento; write() manda o frame, release() espera o arquivo"""
+
+    def __init__(self, comando, tamanho):
+        self.largura, self.altura = tamanho
+        self.erros = tempfile.TemporaryFile()  # stderr: um pipe poderia encher e travar o ffmpeg
+        # bufsize=0: write() vai direto ao pipe, sem cópia para um buffer intermediário
+        self.processo = subprocess.Popen(comando, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                         stderr=self.erros, bufsize=0)
+        self.falhou = False
+
+    def write(self, frame):
+        if self.falhou:
+            return
+        if frame.shape[0] != self.altura or frame.shape[1] != self.largura:
+            frame = cv2.resize(frame, (self.largura, self.altura))
+        if not frame.flags.c_contiguous:
+            frame = frame.copy()
+        dados = memoryview(frame).cast('B')
+        try:
+            while dados:
+                escritos = self.processo.stdin.write(dados)
+                dados = dados[escritos:]
+        except (BrokenPipeError, OSError) as e:
+            self.falhou = True
+            log.error("ffmpeg parou de receber frames: %s", e)
+
+    def release(self):
+        try:
+            self.processo.stdin.close()
+        except OSError:
+            pass
+        try:
+            codigo = self.processo.wait(timeout=ESPERA_FFMPEG)
+        except subprocess.TimeoutExpired:
+            self.processo.kill()
+            codigo = self.processo.wait()
+        if codigo != 0:
+            self.erros.seek(0)
+            log.error("ffmpeg terminou com código %s: %s", codigo,
+                      self.erros.read().decode(errors='replace').strip())
+        self.erros.close()
+
+
+CODIFICADORES = {
+    'cv2': CodificadorCv2,
+    'ffmpeg': CodificadorFfmpeg,
+}
+
+
+def criar_codificador(nome='cv2', **parametros):
+    """
+    Cria o codificador pelo nome (chave de CODIFICADORES) com os parâmetros
+    da classe. Sem o executável do ffmpeg, volta para o cv2 com um aviso
+    """
+    if nome not in CODIFICADORES:
+        raise ValueError(f"Codificador desconhecido: {nome}")
+    if nome == 'ffmpeg' and not CodificadorFfmpeg.disponivel(parametros.get('executavel', 'ffmpeg')):
+        log.warning("ffmpeg não encontrado; gravando com o cv2 (XVID)")
+        return CodificadorCv2()
+    return CODIFICADORES[nome](**parametros)
+
+
+def _texto_sensores(snapshot):
+    """Texto sobreposto ao vídeo para uma LeituraSensor"""
+    temperatura = f"{snapshot.temperatura:.1f}" if snapshot.temperatura is not None else "N/A"
+    pressao = f"{snapshot.pressao:.2f}" if snapshot.pressao is not None else "N/A"
+    return f"Temperatura: {temperatura}  Pressao: {pressao}"
+
+
+class Segmento:
+    """Arquivo de vídeo em gravação: frames já escritos e horário do primeiro"""
+
+    __slots__ = ('numero', 'id_missao', 'caminho', 'escritor', 'inicio_ns', 'frames')
+
+    def __init__(self, numero, id_missao, caminho, escritor, inicio_ns):
+        self.numero = numero
+        self.id_missao = id_missao
+        self.caminho = caminho
+        self.escritor = escritor
+        self.inicio_ns = inicio_ns
+        self.frames = 0
+
+
+class FilaQuadros:
+    """
+    Fila limitada entre duas etapas da gravação. colocar() nunca bloqueia:
+    com a fila cheia, o quadro mais antigo é descartado e contado
+    (descartados e a métrica video.descartados_<nome>)
+    """
+
+    def __init__(self, capacidade, nome):
+        self.quadros = deque()
+        self.capacidade = capacidade
+        self.condicao = threading.Condition()
+        self.fechada = False
+        self.descartados = 0
+        self._descartados = registro.contador(f'video.descartados_{nome}')
+
+    def colocar(self, quadro):
+        with self.condicao:
+            if len(self.quadros) >= self.capacidade:
+                self.quadros.popleft()
+                self.descartados += 1
+                self._descartados.incrementar()
+            self.quadros.append(quadro)
+            self.condicao.notify()
+
+    def retirar(self):
+        """Próximo quadro (espera chegar um); None quando a fila foi fechada e esvaziou"""
+        with self.condicao:
+            while not self.quadros:
+                if self.fechada:
+                    return None
+                self.condicao.wait()
+            return self.quadros.popleft()
+
+    def fechar(self):
+        """Sem mais quadros: retirar() devolve os restantes e depois None"""
+        with self.condicao:
+            self.fechada = True
+            self.condicao.notify_all()
+
+    def __len__(self):
+        return len(self.quadros)
+
+
+# Frame publicado para a visualização ao vivo: sequência (1, 2, ...), horário
+# da captura (ns, relógio único) e imagem somente leitura
+QuadroPublicado = namedtuple('QuadroPublicado', 'sequencia timestamp_ns imagem')
+
+
+class PublicadorQuadros:
+    """
+    Último frame da gravação para as visualizações ao vivo, com número de
+    sequência. Cada frame da câmera é um array novo que, depois da
+    sobreposição, só é lido (codificador e telas), então é publicado como
+    uma view somente leitura do próprio array: nenhuma cópia na gravação e
+    várias telas compartilham o mesmo frame. Quem precisar desenhar sobre
+    ele copia para um buffer seu.
+    """
+
+    def __init__(self):
+        self.condicao = threading.Condition()
+        self.ultimo = None
+        self.sequencia = 0
+
+    def publicar(self, imagem, timestamp_ns):
+        """Publica o frame (que não pode mais ser alterado) e acorda quem espera"""
+        visao = imagem.view()
+        visao.flags.writeable = False
+        with self.condicao:
+            self.sequencia += 1
+            self.ultimo = QuadroPublicado(self.sequencia, timestamp_ns, visao)
+            self.condicao.notify_all()
+
+    def aguardar(self, apos=0, timeout=None):
+        """
+        Espera um frame com sequência maior que `apos` (a do último que o
+        consumidor recebeu) e o retorna; None se o timeout passar antes.
+        Sem frame publicado (antes da gravação ou depois de limpar()) também
+        espera o timeout inteiro, em vez de retornar None na hora
+        """
+        with self.condicao:
+            if not self.condicao.wait_for(lambda: self.ultimo is not None and self.sequencia > apos, timeout):
+                return None
+            return self.ultimo
+
+    def limpar(self):
+        """Descarta o último frame (fim da gravação); a sequência continua crescendo"""
+        with self.condicao:
+            self.ultimo = None
 
 
 class GravadorVideo:
@@ -37,9 +343,20 @@ class GravadorVideo:
         self.parar_flag = False
         self.diretorio_videos = "gravacoes/videos_missoes"
 
-        # Frame compartilhado para visualização ao vivo
-        self.ultimo_frame = None
-        self.frame_lock = threading.Lock()
+        # Linhas de texto gravadas nos frames: 'missao' e 'sensores' (posição,
+        # cor, escala e espessura; ver captura/sobreposicao.py)
+        self.layout_sobreposicao = LAYOUT_PADRAO
+
+        # Como os segmentos são codificados (ver definir_codificador)
+        self.codificador = CodificadorCv2()
+
+        # Último frame gravado, compartilhado sem cópia com as telas ao vivo
+        self.quadros_ao_vivo = PublicadorQuadros()
+
+        # Filas entre as etapas da gravação em andamento
+        self.fila_sobreposicao = None
+        self.fila_codificacao = None
+        self.segmentos_gravados = 0
 
         # Criar diretório de vídeos se não existir
         if not os.path.exists(self.diretorio_videos):
@@ -48,13 +365,14 @@ class GravadorVideo:
     def iniciar_gravacao(self, id_missao, identificador_missao):
         """Inicia a gravação automática para uma missão"""
         if self.gravando:
-            print(f"[AVISO] Já existe uma gravação em andamento!")
+            log.warning("Já existe uma gravação em andamento!")
             return False
 
         self.id_missao = id_missao
         self.identificador_missao = identificador_missao
         self.parar_flag = False
         self.gravando = True
+        self.segmentos_gravados = 0
 
         # Iniciar thread de gravação
         self.thread_gravacao = threading.Thread(
@@ -63,16 +381,16 @@ class GravadorVideo:
         )
         self.thread_gravacao.start()
 
-        print(f"[GRAVAÇÃO] Iniciada para missão ID: {id_missao} ({identificador_missao})")
+        log.info("Iniciada para missão ID: %s (%s)", id_missao, identificador_missao)
         return True
 
     def parar_gravacao(self):
         """Para a gravação em andamento"""
         if not self.gravando:
-            print(f"[AVISO] Não há gravação em andamento!")
+            log.warning("Não há gravação em andamento!")
             return False
 
-        print(f"[GRAVAÇÃO] Parando gravação da missão ID: {self.id_missao}...")
+        log.info("Parando gravação da missão ID: %s...", self.id_missao)
         self.parar_flag = True
         self.gravando = False
 
@@ -82,137 +400,215 @@ class GravadorVideo:
 
         self.id_missao = None
         self.identificador_missao = None
-        print(f"[GRAVAÇÃO] Parada com sucesso!")
+        log.info("Parada com sucesso!")
         return True
 
-    def _gravar_em_segmentos(self):
-        """Função principal que grava em segmentos de 5 minutos"""
-        DURACAO_SEGMENTO = 5 * 60 
+    def _abrir_fonte(self):
+        """Câmera de onde os frames são lidos (read() -> (ok, frame), get(), release())"""
+        return cv2.VideoCapture(0)
+
+    def definir_codificador(self, nome, **parametros):
+        """
+        Troca o codificador dos próximos segmentos: 'cv2' (fourcc, extensao) ou
+        'ffmpeg' (codec, crf, bitrate, preset, container; ver CodificadorFfmpeg)
+        """
+        if self.gravando:
+            log.warning("Pare a gravação antes de trocar o codificador")
+            return False
+        self.codificador = criar_codificador(nome, **parametros)
+        log.info("Codificador de vídeo: %r", self.codificador)
+        return True
+
+    def _abrir_escritor(self, caminho, fps, tamanho):
+        """Arquivo de vídeo de um segmento (write(frame), release())"""
+        return self.codificador.abrir(caminho, fps, tamanho)
 
+    def _gravar_em_segmentos(self):
+        """
+        Abre a câmera e roda as etapas: captura (esta thread) -> sobreposição
+        do texto -> codificação em segmentos de DURACAO_SEGMENTO, ligadas por
+        filas limitadas. Um codificador lento não atrasa a captura: a fila
+        cheia descarta o quadro mais antigo
+        """
         try:
-            # Abrir câmera
-            cap = cv2.VideoCapture(0)
+            cap = self._abrir_fonte()
 
             if not cap.isOpened():
-                print("[ERRO] Não foi possível abrir a câmera!")
+                log.error("Não foi possível abrir a câmera!")
                 self.gravando = False
                 return
 
             # Configurações da câmera
-            fps = int(cap.get(cv2.CAP_PROP_FPS)) or 20  # FPS padrão se não conseguir obter
+            fps = int(cap.get(cv2.CAP_PROP_FPS)) or FPS_PADRAO  # FPS padrão se não conseguir obter
             largura = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
             altura = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
 
-            print(f"[GRAVAÇÃO] Câmera configurada: {largura}x{altura} @ {fps}fps")
-
-            segmento_numero = 1
-
-            while not self.parar_flag:
-                # Criar nome do arquivo para este segmento
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                nome_arquivo = f"{self.identificador_missao}_seg{segmento_numero:03d}_{timestamp}.avi"
-                # Usar caminho absoluto
-                caminho_completo = os.path.abspath(os.path.join(self.diretorio_videos, nome_arquivo))
-
-                # Configurar codec e writer
-                fourcc = cv2.VideoWriter_fourcc(*'XVID')
-                out = cv2.VideoWriter(caminho_completo, fourcc, fps, (largura, altura))
-
-                print(f"[GRAVAÇÃO] Iniciando segmento {segmento_numero}: {nome_arquivo}")
-                print(f"[DEBUG] Caminho completo (absoluto): {caminho_completo}")
-
-                tempo_inicio_segmento = time.time()
-                frames_gravados = 0
+            log.info("Câmera configurada: %dx%d @ %dfps", largura, altura, fps)
+
+            self.fila_sobreposicao = FilaQuadros(CAPACIDADE_FILA, 'sobreposicao')
+            self.fila_codificacao = FilaQuadros(CAPACIDADE_FILA, 'codificacao')
+            etapas = [
+                threading.Thread(target=self._sobrepor_continuamente, daemon=True),
+                threading.Thread(target=self._codificar_continuamente, args=(fps, (largura, altura)),
+                                 daemon=True),
+            ]
+            for etapa in etapas:
+                etapa.start()
+
+            try:
+                self._capturar_continuamente(cap, fps)
+            finally:
+                # Liberar câmera; as etapas seguintes terminam o que já foi capturado
+                cap.release()
+                self.fila_sobreposicao.fechar()
+                for etapa in etapas:
+                    etapa.join()
+                self.quadros_ao_vivo.limpar()
+            log.info("Câmera liberada. Total de segmentos: %d", self.segmentos_gravados)
 
-                # Gravar por 5 minutos ou até receber sinal de parada
-                while not self.parar_flag:
-                    tempo_decorrido = time.time() - tempo_inicio_segmento
-
-                    # Se passou 5 minutos, fechar este segmento
-                    if tempo_decorrido >= DURACAO_SEGMENTO:
-                        break
-
-                    ret, frame = cap.read()
-
-                    if not ret:
-                        print("[ERRO] Falha ao capturar frame")
-                        break
-
-                    # Obter dados dos sensores
-                    sensor = sensor_arduino.get_sensor()
-                    temperatura = sensor.get_temperatura_valor()
-                    pressao = sensor.get_pressao_valor()
-
-                    # Verde claro para todos os textos
-                    cor_verde_claro = (100, 255, 100)
-
-                    # Adicionar informações no frame (mais nítidas e limpas)
-                    texto_missao = f"{self.identificador_missao}"
-                    texto_sensores = f"Temperatura: {temperatura}  Pressao: {pressao}"
-
-                    # Textos maiores e mais espessos para melhor nitidez
-                    cv2.putText(frame, texto_missao, (10, 40),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.8, cor_verde_claro, 2, cv2.LINE_AA)
-                    cv2.putText(frame, texto_sensores, (10, 75),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.8, cor_verde_claro, 2, cv2.LINE_AA)
-
-                    # Gravar frame
-                    out.write(frame)
-                    frames_gravados += 1
-
-                    # Armazenar frame para visualização ao vivo
-                    with self.frame_lock:
-                        self.ultimo_frame = frame.copy()
-
-                    # Pequeno delay para não sobrecarregar o CPU - Realmente necessario ? ( Verificar) - Sim, necessario, pensando em escala.
-                    time.sleep(1.0 / fps)
-
-                # Fechar o arquivo de vídeo deste segmento
-                out.release()
-
-                print(f"[GRAVAÇÃO] Segmento {segmento_numero} finalizado: {frames_gravados} frames gravados")
-
-                # Salvar caminho no banco de dados apenas se houver frames gravados
-                if frames_gravados > 0:
-                    try:
-                        # Aguardar um pouco para garantir que o arquivo foi escrito no disco
-                        time.sleep(0.5)
+        except Exception as e:
+            log.exception("Erro durante gravação: %s", e)
+            self.gravando = False
 
-                        # Verificar se o arquivo realmente existe
-                        print(f"[DEBUG] Verificando existência do arquivo: {caminho_completo}")
-                        print(f"[DEBUG] Arquivo existe? {os.path.exists(caminho_completo)}")
+    def _capturar_continuamente(self, cap, fps):
+        """Etapa de captura: lê a câmera no ritmo dela e marca cada frame no relógio único"""
+        numero = 0
+        while not self.parar_flag:
+            ret, frame = cap.read()
+            if not ret:
+                _frames_perdidos.incrementar()
+                log.error("Falha ao capturar frame")
+                # Câmera sem frame (desconectada): não consumir a CPU tentando
+                time.sleep(1.0 / fps)
+                continue
+
+            _frames_capturados.incrementar()
+            self.fila_sobreposicao.colocar(Quadro(numero, relogio.agora_ns(), frame))
+            numero += 1
+
+    def _sobrepor_continuamente(self):
+        """Etapa de sobreposição: missão e sensores no frame, publicado para as telas ao vivo"""
+        # Leituras dos sensores pelo snapshot versionado do barramento
+        eventos = sensor_arduino.get_sensor().eventos
+        versao_sensores = None
+
+        # Texto renderizado só quando muda; por frame, só a mistura do bloco
+        compositor = CompositorTexto(self.layout_sobreposicao)
+        compositor.definir('missao', f"{self.identificador_missao}")
 
-                        if os.path.exists(caminho_completo):
-                            print(f"[DEBUG] Salvando no banco o caminho: {caminho_completo}")
-                            db.inserir_video(self.id_missao, caminho_completo)
-                            print(f"[BANCO] Vídeo salvo no banco: {caminho_completo}")
-                        else:
-                            print(f"[ERRO] Arquivo de vídeo não foi criado: {caminho_completo}")
-                    except Exception as e:
-                        print(f"[ERRO] Falha ao salvar vídeo no banco: {e}")
-                else:
-                    # Se não houver frames, deletar o arquivo vazio
-                    if os.path.exists(caminho_completo):
-                        try:
-                            os.remove(caminho_completo)
-                            print(f"[GRAVAÇÃO] Arquivo vazio removido: {caminho_completo}")
-                        except Exception as e:
-                            print(f"[ERRO] Falha ao remover arquivo vazio: {e}")
-
-                # Se foi sinalizado para parar, sair do loop principal
-                if self.parar_flag:
+        try:
+            while True:
+                quadro = self.fila_sobreposicao.retirar()
+                if quadro is None:
                     break
-
-                # Próximo segmento
-                segmento_numero += 1
-
-            # Liberar câmera
-            cap.release()
-            print(f"[GRAVAÇÃO] Câmera liberada. Total de segmentos: {segmento_numero - 1}")
-
-        except Exception as e:
-            print(f"[ERRO] Erro durante gravação: {e}")
-            self.gravando = False
+                frame = quadro.imagem
+
+                # Texto dos sensores refeito só quando chega leitura nova
+                snapshot = eventos.snapshot
+                if snapshot.versao != versao_sensores:
+                    versao_sensores = snapshot.versao
+                    compositor.definir('sensores', _texto_sensores(snapshot))
+                compositor.aplicar(frame)
+
+                # Daqui em diante o frame só é lido: as telas recebem o próprio array
+                self.quadros_ao_vivo.publicar(frame, quadro.timestamp_ns)
+
+                self.fila_codificacao.colocar(quadro)
+        finally:
+            self.fila_codificacao.fechar()
+
+    def _codificar_continuamente(self, fps, tamanho):
+        """
+        Etapa de codificação: grava os frames em segmentos. O ritmo do arquivo
+        segue o horário de captura: cada frame vai para a posição
+        (horário - início do segmento) * fps; lacunas (frames descartados ou
+        câmera mais lenta que fps) repetem o frame anterior e frames
+        adiantados (câmera mais rápida) são pulados, então a duração do
+        vídeo acompanha o relógio dos sensores e do áudio
+        """
+        # A missão é lida aqui: parar_gravacao pode limpá-la antes do último segmento
+        id_missao, identificador = self.id_missao, self.identificador_missao
+        segmento = None
+        while True:
+            quadro = self.fila_codificacao.retirar()
+            if quadro is None:
+                break
+
+            if segmento is not None and quadro.timestamp_ns - segmento.inicio_ns >= DURACAO_SEGMENTO * 1e9:
+                self._finalizar_segmento(segmento)
+                segmento = None
+            if segmento is None:
+                segmento = self._novo_segmento(quadro, fps, tamanho, id_missao, identificador)
+
+            # Posição do frame no arquivo pelo horário de captura
+            posicao = round((quadro.timestamp_ns - segmento.inicio_ns) * fps / 1e9)
+            if posicao < segmento.frames:
+                _frames_pulados.incrementar()
+                continue
+            repeticoes = posicao - segmento.frames
+            if repeticoes and len(self.fila_codificacao):
+                # Codificador atrasado: repetir agora só o atrasaria mais; a
+                # lacuna é preenchida quando a fila esvaziar
+                repeticoes = 0
+            # No máximo 1 s de repetições por frame, para não travar a etapa
+            repeticoes = min(repeticoes, fps)
+            for _ in range(repeticoes + 1):
+                segmento.escritor.write(quadro.imagem)
+            if repeticoes:
+                _frames_repetidos.incrementar(repeticoes)
+            segmento.frames += repeticoes + 1
+            _frames_gravados.incrementar()
+            _latencia_quadro.registrar((relogio.agora_ns() - quadro.timestamp_ns) / 1e9)
+
+        if segmento is not None:
+            self._finalizar_segmento(segmento)
+
+    def _novo_segmento(self, quadro, fps, tamanho, id_missao, identificador):
+        """Abre o arquivo do próximo segmento, que começa no horário do quadro"""
+        numero = self.segmentos_gravados + 1
+        # Criar nome do arquivo para este segmento
+        inicio_ms = quadro.timestamp_ns // 1_000_000
+        timestamp = relogio.ms_para_texto(inicio_ms, "%Y%m%d_%H%M%S")
+        nome_arquivo = f"{identificador}_seg{numero:03d}_{timestamp}{self.codificador.extensao}"
+        # Usar caminho absoluto
+        caminho_completo = os.path.abspath(os.path.join(self.diretorio_videos, nome_arquivo))
+
+        _segmento.definir(numero)
+        log.info("Iniciando segmento %d: %s", numero, nome_arquivo)
+        log.debug("Caminho completo (absoluto): %s", caminho_completo)
+        escritor = self._abrir_escritor(caminho_completo, fps, tamanho)
+        return Segmento(numero, id_missao, caminho_completo, escritor, quadro.timestamp_ns)
+
+    def _finalizar_segmento(self, segmento):
+        """Fecha o arquivo do segmento e o registra no banco (ou remove, se vazio)"""
+        inicio_finalizacao = time.perf_counter()
+        self.segmentos_gravados = segmento.numero
+        caminho_completo = segmento.caminho
+
+        # Fechar o arquivo de vídeo deste segmento (release() termina a escrita no disco)
+        segmento.escritor.release()
+
+        log.info("Segmento %d finalizado: %d frames gravados", segmento.numero, segmento.frames)
+
+        # Salvar caminho no banco de dados apenas se houver frames gravados
+        if segmento.frames > 0:
+            try:
+                if os.path.exists(caminho_completo):
+                    db.inserir_video(segmento.id_missao, caminho_completo, segmento.inicio_ns // 1_000_000)
+                    log.info("Vídeo salvo no banco: %s", caminho_completo)
+                else:
+                    log.error("Arquivo de vídeo não foi criado: %s", caminho_completo)
+            except Exception as e:
+                log.error("Falha ao salvar vídeo no banco: %s", e)
+        else:
+            # Se não houver frames, deletar o arquivo vazio
+            if os.path.exists(caminho_completo):
+                try:
+                    os.remove(caminho_completo)
+                    log.info("Arquivo vazio removido: %s", caminho_completo)
+                except Exception as e:
+                    log.error("Falha ao remover arquivo vazio: %s", e)
+        _latencia_finalizacao.registrar(time.perf_counter() - inicio_finalizacao)
 
     def esta_gravando(self):
         """Verifica se há gravação em andamento"""
@@ -229,12 +625,22 @@ class GravadorVideo:
         else:
             return {'gravando': False}
 
+    def get_metricas(self):
+        """Métricas da gravação (frames capturados, gravados, descartados por fila, latências)"""
+        metricas = registro.ler_metricas('video.')
+        for nome, fila in (('fila_sobreposicao', self.fila_sobreposicao),
+                           ('fila_codificacao', self.fila_codificacao)):
+            metricas[nome] = len(fila) if fila is not None else 0
+        return metricas
+
     def get_ultimo_frame(self):
-        """Retorna o último frame capturado (para visualização ao vivo)"""
-        with self.frame_lock:
-            if self.ultimo_frame is not None:
-                return self.ultimo_frame.copy()
-            return None
+        """
+        Cópia do último frame gravado (None se não houver). Para acompanhar a
+        gravação sem copiar nem consultar periodicamente, usar
+        quadros_ao_vivo.aguardar()
+        """
+        ultimo = self.quadros_ao_vivo.ultimo
+        return ultimo.imagem.copy() if ultimo is not None else None
 
 
 # Função  para obter a instância única
@@ -0,0 +1,119 @@
+"""
+Texto sobreposto aos frames gravados (missão e sensores), com cache
+
+cv2.putText com anti-aliasing (LINE_AA) rasteriza o texto a cada chamada,
+mas o identificador da missão não muda e o texto dos sensores muda cerca de
+uma vez por segundo. O CompositorTexto desenha cada linha uma vez, quando o
+texto muda, em um bloco do tamanho do texto: a cobertura do anti-aliasing
+(máscara) e a cor já multiplicada por ela. Em cada frame só mistura o bloco
+na região correspondente: frame * (1 - cobertura) + cor * cobertura, o
+mesmo resultado do putText (diferença de arredondamento de no máximo 1).
+
+O layout é uma sequência de linhas, cada uma com nome, posição (x, y da
+linha de base, como no putText) e, opcionalmente, fonte, escala, cor (BGR)
+e espessura; o que faltar vem de ESTILO_PADRAO.
+"""
+
+import cv2
+import numpy as np
+
+# Estilo de cada linha quando o layout não define
+ESTILO_PADRAO = {
+    'fonte': cv2.FONT_HERSHEY_SIMPLEX,
+    'escala': 0.8,
+    'cor': (100, 255, 100),  # verde claro
+    'espessura': 2,
+}
+
+# Identificador da missão e leituras dos sensores no canto superior esquerdo
+LAYOUT_PADRAO = (
+    {'nome': 'missao', 'posicao': (10, 40)},
+    {'nome': 'sensores', 'posicao': (10, 75)},
+)
+
+
+class LinhaTexto:
+    """Uma linha do layout e o bloco renderizado do seu texto atual"""
+
+    def __init__(self, nome, posicao, fonte, escala, cor, espessura):
+        self.nome = nome
+        self.posicao = posicao
+        self.fonte = fonte
+        self.escala = escala
+        self.cor = tuple(int(c) for c in cor)
+        self.espessura = espessura
+        self.texto = ""
+        self.bloco = None  # (y0, x0, 255 - cobertura, cor * cobertura), ambos h x w x 3
+
+    def definir(self, texto):
+        """Troca o texto; só renderiza de novo se mudou"""
+        if texto == self.texto:
+            return
+        self.texto = texto
+        self.bloco = self._renderizar(texto) if texto else None
+
+    def _renderizar(self, texto):
+        (largura, altura), base = cv2.getTextSize(texto, self.fonte, self.escala, self.espessura)
+        margem = self.espessura + 1  # o traço e o anti-aliasing passam da caixa
+        x, y = self.posicao
+        x0, y0 = x - margem, y - altura - margem
+        cobertura = np.zeros((altura + base + 2 * margem, largura + 2 * margem), np.uint8)
+        cv2.putText(cobertura, texto, (x - x0, y - y0), self.fonte, self.escala, 255,
+                    self.espessura, cv2.LINE_AA)
+
+        # Recorta ao que foi realmente desenhado
+        linhas, colunas = np.nonzero(cobertura)
+        if not len(linhas):
+            return None
+        topo, esquerda = linhas.min(), colunas.min()
+        cobertura = cobertura[topo:linhas.max() + 1, esquerda:colunas.max() + 1]
+
+        cobertura3 = cv2.merge((cobertura, cobertura, cobertura))
+        cor = np.empty_like(cobertura3)
+        cor[:] = self.cor
+        return (int(y0 + topo), int(x0 + esquerda),
+                cv2.subtract(255, cobertura3), cv2.multiply(cor, cobertura3, scale=1 / 255))
+
+    def aplicar(self, frame):
+        """Mistura o bloco no frame (BGR uint8), recortando o que ficar fora dele"""
+        if self.bloco is None:
+            return
+        y0, x0, inversa, cor = self.bloco
+        altura, largura = inversa.shape[:2]
+        y1, x1 = y0 + altura, x0 + largura
+        if y0 < 0 or x0 < 0 or y1 > frame.shape[0] or x1 > frame.shape[1]:
+            cy0, cx0 = max(-y0, 0), max(-x0, 0)
+            cy1 = altura - max(y1 - frame.shape[0], 0)
+            cx1 = largura - max(x1 - frame.shape[1], 0)
+            if cy0 >= cy1 or cx0 >= cx1:
+                return
+            inversa, cor = inversa[cy0:cy1, cx0:cx1], cor[cy0:cy1, cx0:cx1]
+            y0, x0 = y0 + cy0, x0 + cx0
+            y1, x1 = y0 + (cy1 - cy0), x0 + (cx1 - cx0)
+
+        regiao = frame[y0:y1, x0:x1]
+        cv2.add(cv2.multiply(regiao, inversa, scale=1 / 255), cor, dst=regiao)
+
+
+class CompositorTexto:
+    """
+    Linhas de texto de um layout aplicadas a cada frame. definir(nome, texto)
+    quando o conteúdo muda (sem custo se for igual); aplicar(frame) por frame
+    """
+
+    def __init__(self, layout=LAYOUT_PADRAO):
+        self.linhas = {}
+        for declaracao in layout:
+            parametros = dict(ESTILO_PADRAO)
+            parametros.update(declaracao)
+            self.linhas[parametros['nome']] = LinhaTexto(**parametros)
+
+    def definir(self, nome, texto):
+        """Texto da linha `nome` (ignorado se o layout não tiver essa linha)"""
+        linha = self.linhas.get(nome)
+        if linha is not None:
+            linha.definir(texto)
+
+    def aplicar(self, frame):
+        for linha in self.linhas.values():
+            linha.aplicar(frame)
@@ -6,13 +6,20 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
 import servidor.database as db
+from servidor import registro, relogio
 import captura.gravacao_video as gravacao_video
 import captura.gravacao_audio as gravacao_audio
-import servidor.sensor_arduino as sensor_arduino
+from servidor.gerenciador_sensores import get_gerenciador
+
+log = registro.get_log('missao', 'MISSÃO')
+
+# Intervalo (ms) entre as verificações da conexão dos sensores em segundo plano
+INTERVALO_CONEXAO_MS = 200
 
 
 class CriarMissaoWindow:
     def __init__(self, parent):
+        self.parent = parent
         self.window = tk.Toplevel(parent)
         self.window.title("Criar Nova Missão")
         self.window.geometry("700x450")
@@ -98,11 +105,15 @@ class CriarMissaoWindow:
 
         self.entry_data_inicio = tk.Entry(datetime_frame, font=('Arial', 10), width=12)
         self.entry_data_inicio.pack(side=tk.LEFT, padx=(0, 5))
-        self.entry_data_inicio.insert(0, datetime.now().strftime("%d/%m/%Y"))
+        # Texto sugerido no relógio único; se não for alterado, a missão começa
+        # em relogio.agora_ms() no momento da criação (mesmo relógio das medições)
+        agora_ms = relogio.agora_ms()
+        self.inicio_sugerido = (relogio.formatar_ms(agora_ms, "%d/%m/%Y"), relogio.formatar_ms(agora_ms, "%H:%M"))
+        self.entry_data_inicio.insert(0, self.inicio_sugerido[0])
 
         self.entry_hora_inicio = tk.Entry(datetime_frame, font=('Arial', 10), width=8)
         self.entry_hora_inicio.pack(side=tk.LEFT)
-        self.entry_hora_inicio.insert(0, datetime.now().strftime("%H:%M"))
+        self.entry_hora_inicio.insert(0, self.inicio_sugerido[1])
 
         tk.Label(datetime_frame, text="(DD/MM/AAAA HH:MM)",
                 bg='#f0f0f0', fg='#666666',
@@ -258,21 +269,22 @@ class CriarMissaoWindow:
             messagebox.showerror("Erro", "Data/Hora de início inválida!\nUse o formato: DD/MM/AAAA HH:MM")
             return
 
+        if (data_inicio, hora_inicio) == self.inicio_sugerido:
+            inicio_ms = relogio.agora_ms()
+        else:
+            inicio_ms = relogio.para_ms(data_hora_inicio)  # Início informado pelo usuário
+
         # Gerar identificador no formato Missão_DD-MM-AA_HH-MM (sem dois pontos)
         identificador = f"Missao_{data_hora_inicio.strftime('%d-%m-%y_%H-%M')}"
 
         # Inserir missão
         id_mergulhador = self.mergulhador_selecionado[0]
-        id_missao = db.inserir_missao(id_mergulhador, nome_missao, data_hora_inicio.strftime("%Y-%m-%d %H:%M:%S"), identificador)
-
-        # Conectar e iniciar leitura do Arduino
-        sensor = sensor_arduino.get_sensor()
-        if not sensor.conectado:
-            sensor.conectar()  # Tenta conectar automaticamente
+        id_missao = db.inserir_missao(id_mergulhador, nome_missao, inicio_ms, identificador)
 
-        sensor_ok = False
-        if sensor.conectado:
-            sensor_ok = sensor.iniciar_leitura(id_missao)
+        # Conectar os Arduinos e iniciar a leitura dos que estão livres em
+        # segundo plano (espera do reset e novas tentativas não travam a tela);
+        # os já em uso continuam gravando nas suas missões
+        conexao = get_gerenciador().iniciar_missao_async(id_missao)
 
         # Iniciar gravação automática de vídeo
         gravador_video = gravacao_video.get_gravador()
@@ -288,13 +300,12 @@ class CriarMissaoWindow:
             status.append("Vídeo")
         if audio_ok:
             status.append("Áudio")
-        if sensor_ok:
-            status.append("Sensores")
 
         if status:
             msg_gravacao = f"\n\n{', '.join(status)} iniciado(s)!"
         else:
-            msg_gravacao = "\n\nAVISO: Não foi possível iniciar gravações/sensores."
+            msg_gravacao = "\n\nAVISO: Não foi possível iniciar as gravações."
+        msg_gravacao += "\nSensores: conectando em segundo plano..."
 
         messagebox.showinfo("Sucesso",
                            f"Missão criada com sucesso!\n\n"
@@ -305,3 +316,21 @@ class CriarMissaoWindow:
                            f"{msg_gravacao}")
 
         self.window.destroy()
+        self.parent.after(INTERVALO_CONEXAO_MS, self.verificar_conexao, conexao, identificador)
+
+    def verificar_conexao(self, conexao, identificador):
+        """Acompanha a conexão dos sensores (na thread da interface) e avisa se nenhum iniciou"""
+        if not conexao.done():
+            self.parent.after(INTERVALO_CONEXAO_MS, self.verificar_conexao, conexao, identificador)
+            return
+        try:
+            iniciados = conexao.result()
+        except Exception as e:
+            log.error("Falha ao conectar sensores: %s", e)
+            iniciados = []
+        if iniciados:
+            log.info("Sensores gravando em %s: %s", identificador, ', '.join(map(str, iniciados)))
+        else:
+            messagebox.showwarning("Sensores",
+                                   f"Nenhum sensor foi conectado à missão {identificador}.\n\n"
+                                   "Vídeo e áudio continuam gravando.", parent=self.parent)
@@ -4,18 +4,51 @@ Módulo para visualizar missões antigas
 
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
-from datetime import datetime
+from datetime import datetime, timedelta
+import numpy as np
 import servidor.database as db
+from servidor import relogio
 import captura.gravacao_video as gravacao_video
 import captura.gravacao_audio as gravacao_audio
 import servidor.sensor_arduino as sensor_arduino
+from servidor import analise_mergulho
+from servidor.gerenciador_sensores import get_gerenciador
+
+
+# Máximo de medições listadas na janela de detalhes
+LIMITE_MEDICOES_DETALHES = 5000
+
+# Missões buscadas por vez na lista (mais páginas ao rolar)
+TAMANHO_PAGINA_MISSOES = 100
+
+# Coluna da tabela -> chave de ordenação em db.ORDENACOES_MISSOES
+ORDENACAO_COLUNAS = {
+    'Identificador': 'identificador',
+    'Mergulhador': 'mergulhador',
+    'Nome da Missão': 'nome',
+    'Início': 'inicio',
+}
+
+# Opções do filtro de status -> valor de db.STATUS_MISSOES
+STATUS_FILTRO = {
+    'Todos': None,
+    'Em andamento': 'em_andamento',
+    'Finalizada': 'finalizada',
+}
 
 
 class VisualizarMissoesWindow:
     def __init__(self, parent):
         self.window = tk.Toplevel(parent)
         self.window.title("Visualizar Missões Antigas")
-        self.window.geometry("900x600")
+        self.window.geometry("1000x650")
+
+        # Estado da lista (filtros, ordenação e paginação)
+        self.filtros = {}
+        self.ordenar_por = 'inicio'
+        self.decrescente = True
+        self.proxima_chave = None
+        self.carregando = False
 
         # Criar interface
         self.criar_interface()
@@ -33,31 +66,83 @@ class VisualizarMissoesWindow:
                          bg='#f0f0f0', fg='#1a5490')
         titulo.pack(pady=(0, 15))
 
+        # Frame de filtros
+        filtro_frame = tk.Frame(main_frame, bg='#f0f0f0')
+        filtro_frame.pack(fill=tk.X, pady=(0, 10))
+
+        tk.Label(filtro_frame, text="Buscar:", bg='#f0f0f0',
+                font=('Arial', 10)).pack(side=tk.LEFT)
+        self.entry_busca = tk.Entry(filtro_frame, font=('Arial', 10), width=18)
+        self.entry_busca.pack(side=tk.LEFT, padx=(5, 10))
+        self.entry_busca.bind('<Return>', lambda e: self.aplicar_filtros())
+
+        tk.Label(filtro_frame, text="Mergulhador:", bg='#f0f0f0',
+                font=('Arial', 10)).pack(side=tk.LEFT)
+        self.mergulhadores = db.listar_mergulhadores()
+        self.combo_mergulhador = ttk.Combobox(filtro_frame, state='readonly', width=16,
+                                              values=['Todos'] + [m[1] for m in self.mergulhadores])
+        self.combo_mergulhador.current(0)
+        self.combo_mergulhador.pack(side=tk.LEFT, padx=(5, 10))
+
+        tk.Label(filtro_frame, text="Status:", bg='#f0f0f0',
+                font=('Arial', 10)).pack(side=tk.LEFT)
+        self.combo_status = ttk.Combobox(filtro_frame, state='readonly', width=12,
+                                         values=list(STATUS_FILTRO))
+        self.combo_status.current(0)
+        self.combo_status.pack(side=tk.LEFT, padx=(5, 10))
+
+        tk.Label(filtro_frame, text="De:", bg='#f0f0f0',
+                font=('Arial', 10)).pack(side=tk.LEFT)
+        self.entry_data_de = tk.Entry(filtro_frame, font=('Arial', 10), width=10)
+        self.entry_data_de.pack(side=tk.LEFT, padx=(5, 5))
+
+        tk.Label(filtro_frame, text="Até:", bg='#f0f0f0',
+                font=('Arial', 10)).pack(side=tk.LEFT)
+        self.entry_data_ate = tk.Entry(filtro_frame, font=('Arial', 10), width=10)
+        self.entry_data_ate.pack(side=tk.LEFT, padx=(5, 10))
+
+        tk.Button(filtro_frame, text="Filtrar",
+                 command=self.aplicar_filtros,
+                 bg='#1a5490', fg='white',
+                 font=('Arial', 9, 'bold'), cursor='hand2').pack(side=tk.LEFT, padx=2)
+
+        tk.Button(filtro_frame, text="Limpar",
+                 command=self.limpar_filtros,
+                 bg='#999999', fg='white',
+                 font=('Arial', 9, 'bold'), cursor='hand2').pack(side=tk.LEFT, padx=2)
+
+        # Total de missões encontradas
+        self.label_total = tk.Label(main_frame, text="", bg='#f0f0f0',
+                                   fg='#666666', font=('Arial', 9))
+        self.label_total.pack(anchor=tk.W)
+
         # Frame para a tabela
         tree_frame = tk.Frame(main_frame)
         tree_frame.pack(fill=tk.BOTH, expand=True)
 
         # Scrollbars
-        scroll_y = tk.Scrollbar(tree_frame, orient=tk.VERTICAL)
+        self.scroll_y = tk.Scrollbar(tree_frame, orient=tk.VERTICAL)
         scroll_x = tk.Scrollbar(tree_frame, orient=tk.HORIZONTAL)
 
-        # Treeview (tabela)
+        # Treeview (tabela); ao rolar perto do fim busca a próxima página
         self.tree = ttk.Treeview(tree_frame,
                                 columns=('Identificador', 'Mergulhador', 'Nome da Missão', 'Início', 'Fim', 'Status'),
                                 show='headings',
-                                yscrollcommand=scroll_y.set,
+                                yscrollcommand=self._ao_rolar,
                                 xscrollcommand=scroll_x.set)
 
-        scroll_y.config(command=self.tree.yview)
+        self.scroll_y.config(command=self.tree.yview)
         scroll_x.config(command=self.tree.xview)
 
-        # Configurar colunas
+        # Configurar colunas (clique no cabeçalho ordena, exceto Fim e Status)
         self.tree.heading('Identificador', text='Identificador')
         self.tree.heading('Mergulhador', text='Mergulhador')
         self.tree.heading('Nome da Missão', text='Nome da Missão')
         self.tree.heading('Início', text='Data/Hora Início')
         self.tree.heading('Fim', text='Data/Hora Fim')
         self.tree.heading('Status', text='Status')
+        for coluna in ORDENACAO_COLUNAS:
+            self.tree.heading(coluna, command=lambda c=coluna: self.ordenar(c))
 
         self.tree.column('Identificador', width=180)
         self.tree.column('Mergulhador', width=150)
@@ -67,7 +152,7 @@ class VisualizarMissoesWindow:
         self.tree.column('Status', width=100, anchor=tk.CENTER)
 
         # Layout
-        scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
+        self.scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
         scroll_x.pack(side=tk.BOTTOM, fill=tk.X)
         self.tree.pack(fill=tk.BOTH, expand=True)
 
@@ -100,49 +185,100 @@ class VisualizarMissoesWindow:
                  width=12, cursor='hand2').pack(side=tk.LEFT, padx=5)
 
     def carregar_missoes(self):
-        """Carrega as missões do banco de dados"""
+        """Recarrega a lista a partir da primeira página (filtros e ordenação atuais)"""
         # Limpar tabela
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        self.tree.delete(*self.tree.get_children())
+        self.proxima_chave = None
 
-        # Buscar missões
-        missoes = db.listar_missoes()
+        total = db.contar_missoes(**self.filtros)
+        self.label_total.config(text=f"{total} missão(ões) encontrada(s)")
 
-        if not missoes:
+        if total == 0 and not self.filtros:
             messagebox.showinfo("Info", "Nenhuma missão cadastrada.")
             return
 
-        for missao in missoes:
-            id_missao, identificador, nome_missao, data_inicio, data_fim, nome_merg, idade, sexo = missao
+        self._carregar_pagina()
+        self.tree.yview_moveto(0)
 
-            # Formatar datas
-            try:
-                dt_inicio = datetime.strptime(data_inicio, "%Y-%m-%d %H:%M:%S")
-                inicio_fmt = dt_inicio.strftime("%d/%m/%Y %H:%M")
-            except:
-                inicio_fmt = data_inicio
-
-            if data_fim:
-                try:
-                    dt_fim = datetime.strptime(data_fim, "%Y-%m-%d %H:%M:%S")
-                    fim_fmt = dt_fim.strftime("%d/%m/%Y %H:%M")
-                    status = "Finalizada"
-                except:
-                    fim_fmt = data_fim
-                    status = "Finalizada"
-            else:
-                fim_fmt = "Em andamento"
-                status = "Em andamento"
-
-            # Armazenar o id_missao como dado oculto (iid) e mostrar o identificador  - Pq isso?
-            self.tree.insert('', tk.END, iid=str(id_missao), values=(
-                identificador,
-                f"{nome_merg} ({idade}a, {sexo})",
-                nome_missao,
-                inicio_fmt,
-                fim_fmt,
-                status
-            ))
+    def _carregar_pagina(self):
+        """Busca a próxima página no banco (já formatada) e acrescenta à tabela"""
+        self.carregando = True
+        try:
+            missoes, self.proxima_chave = db.consultar_missoes(
+                ordenar_por=self.ordenar_por,
+                decrescente=self.decrescente,
+                limite=TAMANHO_PAGINA_MISSOES,
+                apos=self.proxima_chave,
+                **self.filtros)
+
+            # Armazenar o id_missao como dado oculto (iid) e mostrar o identificador
+            for id_missao, *valores in missoes:
+                self.tree.insert('', tk.END, iid=str(id_missao), values=valores)
+        finally:
+            self.carregando = False
+
+    def _ao_rolar(self, primeiro, ultimo):
+        """Atualiza a barra de rolagem e busca mais missões perto do fim da lista"""
+        self.scroll_y.set(primeiro, ultimo)
+        if float(ultimo) >= 0.9 and self.proxima_chave is not None and not self.carregando:
+            # Fora do callback de rolagem, que o Treeview chama durante o insert
+            self.window.after_idle(self._carregar_pagina_pendente)
+
+    def _carregar_pagina_pendente(self):
+        """Carrega a próxima página se ainda houver uma pendente"""
+        if self.proxima_chave is not None and not self.carregando:
+            self._carregar_pagina()
+
+    def ordenar(self, coluna):
+        """Ordena pela coluna clicada (segundo clique inverte a direção)"""
+        chave = ORDENACAO_COLUNAS[coluna]
+        if chave == self.ordenar_por:
+            self.decrescente = not self.decrescente
+        else:
+            self.ordenar_por = chave
+            self.decrescente = chave == 'inicio'
+        self.carregar_missoes()
+
+    def aplicar_filtros(self):
+        """Lê os campos de filtro e recarrega a lista"""
+        filtros = {}
+
+        busca = self.entry_busca.get().strip()
+        if busca:
+            filtros['busca'] = busca
+
+        indice = self.combo_mergulhador.current()
+        if indice > 0:
+            filtros['id_mergulhador'] = self.mergulhadores[indice - 1][0]
+
+        status = STATUS_FILTRO[self.combo_status.get()]
+        if status:
+            filtros['status'] = status
+
+        try:
+            data_de = self.entry_data_de.get().strip()
+            if data_de:
+                filtros['inicio'] = datetime.strptime(data_de, "%d/%m/%Y")
+            data_ate = self.entry_data_ate.get().strip()
+            if data_ate:
+                # Inclui o dia inteiro
+                filtros['fim'] = datetime.strptime(data_ate, "%d/%m/%Y") + timedelta(days=1, milliseconds=-1)
+        except ValueError:
+            messagebox.showerror("Erro", "Data inválida!\nUse o formato: DD/MM/AAAA")
+            return
+
+        self.filtros = filtros
+        self.carregar_missoes()
+
+    def limpar_filtros(self):
+        """Remove todos os filtros e recarrega a lista"""
+        self.entry_busca.delete(0, tk.END)
+        self.combo_mergulhador.current(0)
+        self.combo_status.current(0)
+        self.entry_data_de.delete(0, tk.END)
+        self.entry_data_ate.delete(0, tk.END)
+        self.filtros = {}
+        self.carregar_missoes()
 
     def ver_detalhes(self):
         """Mostra detalhes da missão selecionada"""
@@ -154,11 +290,12 @@ class VisualizarMissoesWindow:
         # O iid contém o id_missao
         id_missao = int(selection[0])
 
-        # Buscar dados completos
-        missao = db.buscar_missao(id_missao)
-        medicoes = db.listar_medicoes_por_missao(id_missao)
-        videos = db.listar_videos_por_missao(id_missao)
-        audios = db.listar_audios_por_missao(id_missao)
+        # Buscar dados completos (uma transação de leitura, ou do cache)
+        pacote = db.carregar_pacote_missao(id_missao)
+        if pacote is None:
+            messagebox.showerror("Erro", "Missão não encontrada!")
+            return
+        missao, stats, videos, audios = pacote.missao, pacote.estatisticas, pacote.videos, pacote.audios
 
         # Criar janela de detalhes
         det_window = tk.Toplevel(self.window)
@@ -205,33 +342,83 @@ class VisualizarMissoesWindow:
             info += "  Nenhum áudio cadastrado.\n"
         info += "\n"
 
-        # Medições
-        info += f"MEDIÇÕES DE SENSORES ({len(medicoes)}):\n"
+        # Medições (total vem da tabela de estatísticas)
+        total_medicoes = stats['total'] if stats else 0
+        info += f"MEDIÇÕES DE SENSORES ({total_medicoes}):\n"
         info += f"{'-' * 70}\n"
-        if medicoes:
+        if total_medicoes:
             info += f"{'ID':<8} {'Data/Hora':<20} {'Temp (°C)':<12} {'Pressão (psi)':<15}\n"
             info += f"{'-' * 70}\n"
-            for med in medicoes:
-                id_med, _, timestamp, temp, press = med
-                info += f"{id_med:<8} {timestamp:<20} {temp:<12.2f} {press:<15.2f}\n"
-
-            # Estatísticas
-            stats = db.get_estatisticas_medicoes(id_missao)
-            if stats and stats[0] > 0:
-                total, temp_min, temp_max, temp_avg, press_min, press_max, press_avg = stats
-                info += f"\n{'-' * 70}\n"
-                info += f"ESTATÍSTICAS:\n"
-                info += f"  Total de medições: {total}\n"
-                info += f"  Temperatura - Mín: {temp_min:.2f}°C | Máx: {temp_max:.2f}°C | Média: {temp_avg:.2f}°C\n"
-                info += f"  Pressão - Mín: {press_min:.2f} psi | Máx: {press_max:.2f} psi | Média: {press_avg:.2f} psi\n"
+            text_area.insert(tk.END, info)
+            info = ""
+
+            # Primeiras medições, já carregadas no pacote
+            medicoes = pacote.medicoes[:LIMITE_MEDICOES_DETALHES]
+            text_area.insert(tk.END, ''.join(
+                f"{id_med:<8} {timestamp:<20} {temp:<12.2f} {press:<15.2f}\n"
+                for id_med, _, timestamp, temp, press in medicoes))
+            exibidas = len(medicoes)
+
+            if total_medicoes > exibidas:
+                info += f"... mais {total_medicoes - exibidas} medições não exibidas\n"
+
+            # Estatísticas (tabela de resumo, custo constante)
+            info += f"\n{'-' * 70}\n"
+            info += f"ESTATÍSTICAS:\n"
+            info += f"  Total de medições: {stats['total']}\n"
+            info += f"  Período: {stats['primeiro_timestamp']} a {stats['ultimo_timestamp']}\n"
+            info += (f"  Temperatura - Mín: {stats['temp_min']:.2f}°C | Máx: {stats['temp_max']:.2f}°C"
+                     f" | Média: {stats['temp_media']:.2f}°C | Desvio: {stats['temp_desvio']:.2f}°C\n")
+            info += (f"  Pressão - Mín: {stats['press_min']:.2f} psi | Máx: {stats['press_max']:.2f} psi"
+                     f" | Média: {stats['press_media']:.2f} psi | Desvio: {stats['press_desvio']:.2f} psi\n")
+            info += self._texto_perfil(id_missao)
         else:
             info += "  Nenhuma medição registrada.\n"
 
+        # Alarmes (ativações e normalizações)
+        info += f"\nALARMES ({sum(1 for alarme in pacote.alarmes if alarme[5])}):\n"
+        for _, timestamp_ms, dispositivo, _, severidade, ativo, valor, mensagem in pacote.alarmes:
+            estado = severidade.upper() if ativo else "normalizado"
+            origem = f" [{dispositivo}]" if dispositivo else ""
+            medido = f" ({valor:.2f})" if valor is not None else ""
+            info += f"  {relogio.formatar_ms(timestamp_ms)}{origem} {estado}: {mensagem}{medido}\n"
+        if not pacote.alarmes:
+            info += "  Nenhum alarme registrado.\n"
+
         info += f"\n{'=' * 70}\n"
 
         text_area.insert(tk.END, info)
         text_area.config(state=tk.DISABLED)
 
+    def _texto_perfil(self, id_missao):
+        """Perfil do mergulho (profundidade em água salgada) de cada dispositivo da missão"""
+        dispositivos = db.listar_dispositivos_missao(id_missao)
+        if len(dispositivos) <= 1:
+            return self._texto_perfil_dispositivo(id_missao, None)
+        return "".join(self._texto_perfil_dispositivo(id_missao, dispositivo) for dispositivo in dispositivos)
+
+    def _texto_perfil_dispositivo(self, id_missao, id_dispositivo):
+        """Perfil do mergulho de um dispositivo, da análise em cache da missão"""
+        analise = analise_mergulho.analisar_missao(id_missao, id_dispositivo)
+        if analise is None:
+            return ""
+        resumo = analise.resumo
+        origem = f" [{id_dispositivo}]" if id_dispositivo else ""
+        texto = f"\nPERFIL DO MERGULHO{origem} (água salgada):\n"
+        texto += (f"  Profundidade - Máx: {resumo['profundidade_maxima']:.1f} m"
+                  f" | Média submerso: {resumo['profundidade_media']:.1f} m\n")
+        texto += (f"  Tempo submerso: {timedelta(seconds=round(resumo['tempo_submerso']))}"
+                  f" | Tempo de fundo: {timedelta(seconds=round(resumo['tempo_fundo']))}\n")
+        texto += (f"  Velocidade máx. - Descida: {resumo['velocidade_descida_maxima']:.1f} m/min"
+                  f" | Subida: {resumo['velocidade_subida_maxima']:.1f} m/min"
+                  f" | Subida rápida (> {analise_mergulho.LIMITE_SUBIDA:.0f} m/min):"
+                  f" {resumo['tempo_subida_rapida']:.0f} s\n")
+        faixa = resumo['faixa_histograma']
+        for i, segundos in enumerate(resumo['segundos_por_faixa']):
+            if segundos >= 1:
+                texto += f"  {i * faixa:4.0f}-{(i + 1) * faixa:<4.0f} m: {timedelta(seconds=round(segundos))}\n"
+        return texto
+
     def visualizar_missao(self):
         """Visualiza vídeo (missão finalizada) ou abre câmera (missão em andamento)"""
         selection = self.tree.selection()
@@ -264,9 +451,10 @@ class VisualizarMissoesWindow:
 
         import os
 
-        # Buscar vídeos e áudios da missão
-        videos = db.listar_videos_por_missao(id_missao)
-        audios = db.listar_audios_por_missao(id_missao)
+        # Buscar vídeos, áudios e dados da missão (do cache, se já aberta)
+        pacote = db.carregar_pacote_missao(id_missao)
+        videos = pacote.videos if pacote else ()
+        audios = pacote.audios if pacote else ()
 
         if not videos:
             messagebox.showwarning("Aviso", "Nenhum vídeo cadastrado para esta missão!")
@@ -276,9 +464,7 @@ class VisualizarMissoesWindow:
         videos_ordenados = sorted(videos, key=lambda x: x[0])
         audios_ordenados = sorted(audios, key=lambda x: x[0])
 
-        # Buscar informações da missão
-        missao = db.buscar_missao(id_missao)
-        identificador = missao[1] if missao else f"Missão #{id_missao}"
+        identificador = pacote.missao[1]
 
         print(f"[REPRODUÇÃO] Iniciando reprodução de {len(videos_ordenados)} vídeo(s) e {len(audios_ordenados)} áudio(s)")
 
@@ -409,25 +595,68 @@ class VisualizarMissoesWindow:
 
     def visualizar_gravacao_ao_vivo(self, cv2, gravador):
         """Exibe os frames que estão sendo gravados em tempo real"""
+        # Leituras novas chegam pela fila; a tendência só é recalculada quando há alguma
+        sensor = sensor_arduino.get_sensor()
+        assinatura = sensor.assinar(tamanho_fila=10)
+        texto_tendencia = None
+        texto_profundidade = None
         try:
             info = gravador.get_info_gravacao()
             titulo = f"Gravação ao Vivo - {info['identificador']} - Pressione 'Q' para sair"
             cv2.namedWindow(titulo)
 
-            while True:
-                # Obter o último frame capturado pela gravação
-                frame = gravador.get_ultimo_frame()
+            # Frames da gravação sem cópia (somente leitura); o texto desta tela
+            # é desenhado em um buffer próprio, reaproveitado entre os frames
+            sequencia = 0
+            frame = None
 
-                if frame is not None:
+            while True:
+                # Esperar um frame mais novo que o último exibido (até 30 ms, para atender o teclado)
+                publicado = gravador.quadros_ao_vivo.aguardar(sequencia, timeout=0.03)
+                if publicado is not None:
+                    sequencia = publicado.sequencia
+                    if frame is None or frame.shape != publicado.imagem.shape:
+                        frame = publicado.imagem.copy()
+                    else:
+                        np.copyto(frame, publicado.imagem)
+
+                # Tendência dos últimos 10 s, do buffer em memória do sensor (sem banco)
+                if assinatura.receber_pendentes():
+                    tendencia = sensor.get_tendencia(10)
+                    if tendencia and tendencia['pressao']['inclinacao'] is not None:
+                        pressao = tendencia['pressao']
+                        texto_tendencia = (f"10 s: {pressao['min']:.2f}-{pressao['max']:.2f} psi  "
+                                           f"{pressao['inclinacao'] * 60:+.2f} psi/min")
+                    analise = sensor.get_analise()
+                    if analise:
+                        # Sem acentos: o putText do OpenCV só desenha ASCII
+                        velocidade = analise['velocidade_vertical_atual']
+                        sentido = "descendo" if velocidade > 0 else "subindo"
+                        texto_profundidade = (f"{analise['profundidade_atual']:.1f} m  {sentido} "
+                                              f"{abs(velocidade):.1f} m/min  max {analise['profundidade_maxima']:.1f} m")
+
+                if publicado is not None:
                     # Adicionar texto indicando que é visualização da gravação
                     cor_verde_claro = (100, 255, 100)
                     cv2.putText(frame, "AO VIVO", (10, frame.shape[0] - 25),
                                cv2.FONT_HERSHEY_SIMPLEX, 0.8, cor_verde_claro, 2, cv2.LINE_AA)
 
+                    if texto_tendencia:
+                        cv2.putText(frame, texto_tendencia, (10, frame.shape[0] - 60),
+                                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, cor_verde_claro, 1, cv2.LINE_AA)
+                    if texto_profundidade:
+                        cv2.putText(frame, texto_profundidade, (10, frame.shape[0] - 85),
+                                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, cor_verde_claro, 1, cv2.LINE_AA)
+
+                    # Alarmes ativos em vermelho, abaixo do texto da gravação (nomes das regras: só ASCII)
+                    for i, (nome, _, _) in enumerate(sensor.get_alarmes_ativos()):
+                        cv2.putText(frame, f"ALARME: {nome}", (10, 110 + 25 * i),
+                                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2, cv2.LINE_AA)
+
                     cv2.imshow(titulo, frame)
 
                 # Pressionar 'q' para sair
-                if cv2.waitKey(30) & 0xFF == ord('q'):
+                if cv2.waitKey(1) & 0xFF == ord('q'):
                     break
 
                 # Verificar se a gravação ainda está ativa
@@ -439,6 +668,8 @@ class VisualizarMissoesWindow:
 
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao visualizar gravação:\n{e}")
+        finally:
+            assinatura.cancelar()
 
     def visualizar_camera_direta(self, cv2):
         """Abre a câmera diretamente (quando não há gravação)"""
@@ -497,12 +728,11 @@ class VisualizarMissoesWindow:
                                        "Isso marcará a data/hora atual como término da missão.")
 
         if resposta:
-            # Parar leitura de sensores
-            sensor = sensor_arduino.get_sensor()
-            sensor_parado = False
-            if sensor.lendo:
-                sensor.parar_leitura()
-                sensor_parado = True
+            # Parar leitura dos sensores que gravam nesta missão
+            gerenciador = get_gerenciador()
+            sensor_parado = bool(gerenciador.parar_leitura(id_missao=id_missao))
+            # Garantir que nenhuma medição ficou na fila de gravação
+            gerenciador.descarregar_medicoes()
 
             # Parar gravação automática de vídeo
             gravador_video = gravacao_video.get_gravador()
@@ -533,8 +763,7 @@ class VisualizarMissoesWindow:
                 msg_gravacao = ""
 
             # Atualizar banco de dados
-            data_hora_fim = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            db.atualizar_fim_missao(id_missao, data_hora_fim)
+            db.atualizar_fim_missao(id_missao, relogio.agora_ms())
 
             messagebox.showinfo("Sucesso",
                                f"Missão #{id_missao} finalizada com sucesso!"
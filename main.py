@@ -9,6 +9,12 @@ from datetime import datetime
 import servidor.database as db
 from interface.criar_missao import CriarMissaoWindow
 from interface.visualizar_missoes import VisualizarMissoesWindow
+from servidor.gerenciador_sensores import get_gerenciador
+from captura import gravacao_audio, gravacao_video
+
+
+# Intervalo (ms) entre as consultas aos alarmes ativos dos sensores
+INTERVALO_ALARMES_MS = 250
 
 
 class SistemaMergulhoApp:
@@ -30,6 +36,9 @@ class SistemaMergulhoApp:
         # Criar interface
         self.criar_interface()
 
+        # Alarmes dos sensores, consultados periodicamente na thread da interface
+        self.atualizar_alarmes()
+
     def centralizar_janela(self):
         """Centraliza a janela na tela"""
         self.root.update_idletasks()
@@ -125,6 +134,11 @@ class SistemaMergulhoApp:
                                   bd=3)
         btn_visualizar.pack(pady=15)
 
+        # Alarmes ativos (atualizado por atualizar_alarmes)
+        self.alarmes_label = tk.Label(main_frame, text="", font=('Arial', 11, 'bold'),
+                                      bg='#f0f0f0', fg='#c0392b', wraplength=540)
+        self.alarmes_label.pack(pady=(0, 10))
+
         # Rodapé
         rodape_frame = tk.Frame(main_frame, bg='#f0f0f0')
         rodape_frame.pack(side=tk.BOTTOM, pady=10)
@@ -141,6 +155,19 @@ class SistemaMergulhoApp:
                            font=('Arial', 8))
         info_db.pack()
 
+    def atualizar_alarmes(self):
+        """Mostra os alarmes ativos de todos os sensores e agenda a próxima consulta"""
+        ativos = get_gerenciador().get_alarmes_ativos()
+        linhas = [f"ALARME {dispositivo}: {mensagem}" if len(ativos) > 1 else f"ALARME: {mensagem}"
+                  for dispositivo, alarmes in ativos.items()
+                  for _, _, mensagem in alarmes]
+        texto = "\n".join(linhas)
+        if texto != self.alarmes_label.cget('text'):
+            self.alarmes_label.config(text=texto)
+            if texto:
+                self.root.bell()
+        self.root.after(INTERVALO_ALARMES_MS, self.atualizar_alarmes)
+
     def criar_nova_missao(self):
         """Abre a janela para criar uma nova missão"""
         CriarMissaoWindow(self.root)
@@ -155,6 +182,25 @@ def main():
     root = tk.Tk()
     app = SistemaMergulhoApp(root)
     root.mainloop()
+    encerrar()
+
+
+def encerrar():
+    """Para quem grava no banco, grava o que está na fila e só então fecha as conexões"""
+    get_gerenciador().encerrar()
+
+    gravador_video = gravacao_video.get_gravador()
+    if gravador_video.esta_gravando():
+        gravador_video.parar_gravacao()
+    gravador_audio = gravacao_audio.get_gravador()
+    if gravador_audio.esta_gravando():
+        gravador_audio.parar_gravacao()
+
+    # Preenchimento de bancos antigos continua na próxima inicialização
+    db.parar_preenchimento()
+
+    # Fechar conexões persistentes com o banco (faz checkpoint do WAL)
+    db.fechar_conexoes()
 
 
 if __name__ == "__main__":
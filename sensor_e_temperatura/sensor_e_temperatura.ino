@@ -2,48 +2,134 @@
 #include <OneWire.h>
 #include <DallasTemperature.h>
 
+// Protocolo de saida:
+//   0 = ASCII "psi,temp" uma vez por segundo a 9600 baud (padrao)
+//   1 = quadros binarios com CRC a 115200 baud, pressao amostrada a 100 Hz
+// O programa em Python detecta o formato automaticamente (servidor/protocolo_serial.py)
+#define PROTOCOLO_BINARIO 0
+
 const int PINO_ONEWIRE = 12;         // Define pino do sensor
 const int PINO_SENSOR = A0;          // Pino sensor pressao
 OneWire oneWire(PINO_ONEWIRE);       // Cria um objeto OneWire
 DallasTemperature sensor(&oneWire);  // Informa a referencia da biblioteca dallas temperature para Biblioteca onewire
 DeviceAddress endereco_temp;         // Cria um endereco temporario da leitura do sensor
 
+#if PROTOCOLO_BINARIO
+const long BAUDRATE = 115200;
+const unsigned long PERIODO_AMOSTRA_MS = 10;    // 100 Hz
+#else
+const long BAUDRATE = 9600;
+const unsigned long PERIODO_AMOSTRA_MS = 1000;  // 1 Hz
+#endif
+
+// Conversao de temperatura sem bloquear (12 bits leva ate 750 ms)
+const unsigned long TEMPO_CONVERSAO_MS = 750;
+unsigned long inicio_conversao = 0;
+float ultima_temperatura = DEVICE_DISCONNECTED_C;
+
+unsigned long proxima_amostra = 0;
+
+#if PROTOCOLO_BINARIO
+// Quadro (little-endian): A5 5A | sequencia u16 | tempo_ms u32 | adc u16 | temp_centesimos i16 | crc u16
+const uint8_t SINC_1 = 0xA5;
+const uint8_t SINC_2 = 0x5A;
+uint16_t sequencia = 0;
+
+// CRC-16/CCITT-FALSE (polinomio 0x1021, inicial 0xFFFF)
+uint16_t crc16(const uint8_t *dados, uint8_t tamanho) {
+  uint16_t crc = 0xFFFF;
+  for (uint8_t i = 0; i < tamanho; i++) {
+    crc ^= (uint16_t)dados[i] << 8;
+    for (uint8_t b = 0; b < 8; b++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+void enviarQuadro(unsigned long tempo_ms, int leitura) {
+  uint8_t quadro[14];
+  int16_t temp_centesimos = (int16_t)(ultima_temperatura * 100.0);
+
+  quadro[0] = SINC_1;
+  quadro[1] = SINC_2;
+  quadro[2] = sequencia & 0xFF;
+  quadro[3] = sequencia >> 8;
+  quadro[4] = tempo_ms & 0xFF;
+  quadro[5] = (tempo_ms >> 8) & 0xFF;
+  quadro[6] = (tempo_ms >> 16) & 0xFF;
+  quadro[7] = (tempo_ms >> 24) & 0xFF;
+  quadro[8] = leitura & 0xFF;
+  quadro[9] = (leitura >> 8) & 0xFF;
+  quadro[10] = temp_centesimos & 0xFF;
+  quadro[11] = (temp_centesimos >> 8) & 0xFF;
+
+  uint16_t crc = crc16(quadro + 2, 10);  // Tudo entre o sincronismo e o CRC
+  quadro[12] = crc & 0xFF;
+  quadro[13] = crc >> 8;
+
+  Serial.write(quadro, sizeof(quadro));
+  sequencia++;
+}
+#endif
+
 void setup() {
-  Serial.begin(9600);                     // Inicia a porta serial
+  Serial.begin(BAUDRATE);                 // Inicia a porta serial
   //Serial.println("Medindo Temperatura");  // Imprime a mensagem inicial
-  sensor.begin();
-  ;  // Inicia o sensor
+  sensor.begin();                         // Inicia o sensor
+  // Primeira conversao esperando (ate 750 ms) antes de enviar qualquer leitura:
+  // sem ela os primeiros quadros sairiam com DEVICE_DISCONNECTED_C (-127)
+  sensor.requestTemperatures();
+  ultima_temperatura = sensor.getTempCByIndex(0);
+  sensor.setWaitForConversion(false);     // Daqui em diante requestTemperatures() retorna sem esperar
+  sensor.requestTemperatures();
+  inicio_conversao = millis();
+  proxima_amostra = millis();
+}
+
+void atualizarTemperatura() {
+  // Le a conversao pronta e ja pede a proxima, sem travar a amostragem de pressao
+  if (millis() - inicio_conversao >= TEMPO_CONVERSAO_MS) {
+    ultima_temperatura = sensor.getTempCByIndex(0);
+    sensor.requestTemperatures();
+    inicio_conversao = millis();
+  }
 }
 
 void loop() {
+  atualizarTemperatura();
+
+  unsigned long agora = millis();
+  if ((long)(agora - proxima_amostra) < 0) {
+    return;
+  }
+  proxima_amostra += PERIODO_AMOSTRA_MS;
+  if ((long)(agora - proxima_amostra) > (long)PERIODO_AMOSTRA_MS) {
+    proxima_amostra = agora + PERIODO_AMOSTRA_MS;  // Atrasou demais: nao tentar recuperar
+  }
+
   int leitura = analogRead(PINO_SENSOR);
-  sensor.requestTemperatures();                // Envia comando para realizar a conversão de temperatura
-  //if (!sensor.getAddress(endereco_temp, 0)) {  // Encontra o endereco do sensor no barramento
-   // Serial.println("SENSOR NAO CONECTADO");    // Sensor conectado, imprime mensagem de erro
- // } else {
-    
-                                                        // Converte leitura (0-1023) para tensao (0-5V)
-    float tensao = leitura * (5.0 / 1023.0);
-
-    // Converte tensao para pressão em psi
-    // 0.5V = 0 psi ; 4.5V = 30 psi
-    float psi = (tensao - 0.5) * (30.0 / 4.0);  // ou *7.5
-
-    // Evita valores negativos se houver pequeno erro de offset
-    if (psi < 0) psi = 0;
-
-    //Serial.print(" | Tensão: ");
-    //Serial.print(tensao, 3);
-    //Serial.print(" V");
-
-    //Serial.print(" | Pressao: ");
-    Serial.print(psi, 2);
-    //Serial.print(" psi");
-    Serial.print(",");
-
-    //Serial.print(" | Temperatura = ");                  // Imprime a temperatura no monitor serial
-    Serial.println(sensor.getTempC(endereco_temp), 1);  // Busca temperatura para dispositivo
- // }
-
-  delay(1000);
-}
\ No newline at end of file
+
+#if PROTOCOLO_BINARIO
+  // Conversao para psi feita no Python (adc_para_psi)
+  enviarQuadro(agora, leitura);
+#else
+                                                      // Converte leitura (0-1023) para tensao (0-5V)
+  float tensao = leitura * (5.0 / 1023.0);
+
+  // Converte tensao para pressão em psi
+  // 0.5V = 0 psi ; 4.5V = 30 psi
+  float psi = (tensao - 0.5) * (30.0 / 4.0);  // ou *7.5
+
+  // Evita valores negativos se houver pequeno erro de offset
+  if (psi < 0) psi = 0;
+
+  //Serial.print(" | Pressao: ");
+  Serial.print(psi, 2);
+  //Serial.print(" psi");
+  Serial.print(",");
+
+  //Serial.print(" | Temperatura = ");                  // Imprime a temperatura no monitor serial
+  Serial.println(ultima_temperatura, 1);  // Ultima temperatura convertida
+#endif
+}
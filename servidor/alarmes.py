@@ -0,0 +1,420 @@
+"""
+Módulo de alarmes sobre as leituras ao vivo dos sensores
+
+O MotorAlarmes assina o barramento de eventos do SensorArduino e avalia as
+regras a cada leitura, na própria thread de leitura serial: cada regra
+guarda só o estado necessário, então o custo é O(1) por leitura e por regra.
+
+    - RegraLimite:   valor de um canal acima ou abaixo de um limite
+    - RegraTaxa:     variação do canal por minuto em uma janela de tempo
+                     (ex.: subida rápida = profundidade caindo mais que 10 m/min)
+    - RegraSilencio: nenhuma leitura há mais de timeout_ms (sensor mudo ou
+                     desconectado), verificada pela thread do motor
+
+Canais: 'temperatura' (°C), 'pressao' (psi) e 'profundidade' (m, da pressão
+manométrica, ver analise_mergulho.profundidade_da_pressao).
+
+Cada regra só ativa depois de a condição valer por atraso_ms (debounce) e
+só normaliza quando o valor volta além do limite com folga de histerese,
+então ruído em torno do limite não gera uma sequência de alarmes.
+
+As regras são declaradas como dicionários (REGRAS_PADRAO, criar_regra). Os
+eventos de ativação e normalização vão para uma fila: a thread do motor os
+grava na tabela alarme da missão e os entrega aos assinantes, sem bloquear
+a leitura serial. A interface consulta get_ativos() periodicamente.
+"""
+
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+
+import servidor.database as db
+from servidor import registro, relogio
+from servidor.analise_mergulho import DENSIDADE_AGUA_SALGADA, GRAVIDADE, PA_POR_PSI
+
+log = registro.get_log('alarme', 'ALARME')
+_eventos_alarme = registro.contador('alarme.eventos')
+
+CANAIS = ('temperatura', 'pressao', 'profundidade')
+
+SEVERIDADES = ('aviso', 'critico')
+
+# Intervalo (s) entre as verificações de silêncio; limita o atraso desses alarmes
+INTERVALO_VERIFICACAO = 0.05
+
+# Eventos guardados na fila de cada assinante antes de descartar os mais antigos
+TAMANHO_FILA_ASSINANTE = 100
+
+# Ativação (ativo=True) ou normalização (ativo=False) de uma regra; mesma
+# ordem das colunas de db.inserir_alarmes
+EventoAlarme = namedtuple('EventoAlarme', 'timestamp_ms id_dispositivo regra severidade ativo valor mensagem')
+
+
+class Regra:
+    """
+    Base das regras: máquina de estados normal/ativo com debounce.
+    As subclasses decidem, a cada valor, se a condição de alarme vale
+    """
+
+    # Canal avaliado (None: a regra recebe todas as leituras, sem valor)
+    canal = None
+
+    def __init__(self, nome, severidade='aviso', atraso_ms=0, atraso_normalizar_ms=0, mensagem=None):
+        if severidade not in SEVERIDADES:
+            raise ValueError(f"Severidade desconhecida: {severidade}")
+        self.nome = nome
+        self.severidade = severidade
+        self.atraso_ms = atraso_ms
+        self.atraso_normalizar_ms = atraso_normalizar_ms
+        self.mensagem = mensagem or nome
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Volta ao estado normal e esquece as leituras (início da missão)"""
+        self.ativo = False
+        self.desde_ms = None  # quando a condição começou a divergir do estado atual
+
+    def avaliar(self, timestamp_ms, valor):
+        """Recebe uma leitura; retorna (ativo, valor) se o estado mudou, senão None"""
+        raise NotImplementedError
+
+    def _transicao(self, violada, timestamp_ms, valor):
+        """Troca de estado quando a condição diverge dele por tempo suficiente"""
+        if violada == self.ativo:
+            self.desde_ms = None
+            return None
+        if self.desde_ms is None:
+            self.desde_ms = timestamp_ms
+        if timestamp_ms - self.desde_ms < (self.atraso_ms if violada else self.atraso_normalizar_ms):
+            return None
+        self.ativo = violada
+        self.desde_ms = None
+        return violada, valor
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.nome})"
+
+
+class RegraLimite(Regra):
+    """
+    Canal acima (acima=True) ou abaixo do limite. Ativa, só normaliza quando o
+    valor volta histerese além do limite
+    """
+
+    def __init__(self, nome, canal, limite, acima=True, histerese=0.0, **opcoes):
+        if canal not in CANAIS:
+            raise ValueError(f"Canal desconhecido: {canal}")
+        self.canal = canal
+        self.limite = limite
+        self.acima = acima
+        self.histerese = histerese
+        super().__init__(nome, **opcoes)
+
+    def _violada(self, valor):
+        if self.acima:
+            return valor > (self.limite - self.histerese if self.ativo else self.limite)
+        return valor < (self.limite + self.histerese if self.ativo else self.limite)
+
+    def avaliar(self, timestamp_ms, valor):
+        return self._transicao(self._violada(valor), timestamp_ms, valor)
+
+
+class RegraTaxa(RegraLimite):
+    """
+    Variação do canal por minuto entre a leitura atual e a mais antiga dos
+    últimos janela_ms, comparada ao limite como em RegraLimite. As leituras
+    da janela ficam em um deque (cada uma entra e sai uma vez: O(1) amortizado)
+    """
+
+    def __init__(self, nome, canal, limite, janela_ms=5000, **opcoes):
+        self.janela_ms = janela_ms
+        super().__init__(nome, canal, limite, **opcoes)
+
+    def reiniciar(self):
+        super().reiniciar()
+        self.janela = deque()
+
+    def avaliar(self, timestamp_ms, valor):
+        janela = self.janela
+        janela.append((timestamp_ms, valor))
+        while timestamp_ms - janela[0][0] > self.janela_ms:
+            janela.popleft()
+        intervalo = timestamp_ms - janela[0][0]
+        # Com menos de meia janela a taxa é dominada pelo ruído
+        if intervalo * 2 < self.janela_ms:
+            return None
+        taxa = (valor - janela[0][1]) * 60000 / intervalo
+        return self._transicao(self._violada(taxa), timestamp_ms, taxa)
+
+
+class RegraSilencio(Regra):
+    """Nenhuma leitura há mais de timeout_ms; normaliza na próxima leitura"""
+
+    def __init__(self, nome, timeout_ms=3000, **opcoes):
+        self.timeout_ms = timeout_ms
+        super().__init__(nome, **opcoes)
+
+    def reiniciar(self):
+        super().reiniciar()
+        self.ultima = None  # time.monotonic() da última leitura (ou do início, MotorAlarmes.iniciar)
+
+    def avaliar(self, timestamp_ms, valor):
+        self.ultima = time.monotonic()
+        if self.ativo:
+            return self._transicao(False, timestamp_ms, 0.0)
+        return None
+
+    def verificar(self, agora, timestamp_ms):
+        """Chamado periodicamente pela thread do motor (agora em time.monotonic())"""
+        if self.ultima is None or self.ativo:
+            return None
+        silencio = agora - self.ultima
+        if silencio * 1000 > self.timeout_ms:
+            return self._transicao(True, timestamp_ms, silencio)
+        return None
+
+    def __repr__(self):
+        return f"RegraSilencio({self.nome}, {self.timeout_ms} ms)"
+
+
+# Tipo -> classe, para declarar as regras por dicionário
+TIPOS_REGRA = {
+    'limite': RegraLimite,
+    'taxa': RegraTaxa,
+    'silencio': RegraSilencio,
+}
+
+# Regras usadas quando nenhuma é configurada
+REGRAS_PADRAO = [
+    {'tipo': 'taxa', 'nome': 'subida_rapida', 'canal': 'profundidade', 'limite': -10.0, 'acima': False,
+     'janela_ms': 5000, 'histerese': 2.0, 'atraso_ms': 1000, 'severidade': 'critico',
+     'mensagem': 'Subida rápida (> 10 m/min)'},
+    {'tipo': 'limite', 'nome': 'profundidade_maxima', 'canal': 'profundidade', 'limite': 40.0,
+     'histerese': 1.0, 'atraso_ms': 2000, 'severidade': 'critico',
+     'mensagem': 'Profundidade máxima (40 m) ultrapassada'},
+    {'tipo': 'limite', 'nome': 'temperatura_baixa', 'canal': 'temperatura', 'limite': 10.0, 'acima': False,
+     'histerese': 0.5, 'atraso_ms': 5000, 'mensagem': 'Temperatura abaixo de 10 °C'},
+    {'tipo': 'limite', 'nome': 'temperatura_alta', 'canal': 'temperatura', 'limite': 35.0,
+     'histerese': 0.5, 'atraso_ms': 5000, 'mensagem': 'Temperatura acima de 35 °C'},
+    {'tipo': 'silencio', 'nome': 'sensor_silencioso', 'timeout_ms': 3000, 'severidade': 'critico',
+     'mensagem': 'Sensor sem leituras há mais de 3 s'},
+]
+
+
+def criar_regra(tipo, **parametros):
+    """Cria a regra pelo tipo (chave de TIPOS_REGRA) com os parâmetros da classe"""
+    if tipo not in TIPOS_REGRA:
+        raise ValueError(f"Tipo de regra desconhecido: {tipo}")
+    return TIPOS_REGRA[tipo](**parametros)
+
+
+def criar_regras(declaracoes):
+    """Regras a partir de uma lista de dicionários {'tipo': ..., parâmetros}"""
+    return [criar_regra(**declaracao) for declaracao in declaracoes]
+
+
+class MotorAlarmes:
+    """
+    Avalia as regras a cada lote publicado no barramento do sensor e entrega
+    os eventos por uma thread própria (gravação no banco e assinantes)
+    """
+
+    def __init__(self, regras=None, id_dispositivo=None, densidade=DENSIDADE_AGUA_SALGADA):
+        self.id_dispositivo = id_dispositivo
+        self.fator_profundidade = PA_POR_PSI / (densidade * GRAVIDADE)
+        self.id_missao = None
+
+        # Protege o estado das regras (leitura serial x verificação de silêncio)
+        self.lock = threading.Lock()
+        self.definir_regras(criar_regras(REGRAS_PADRAO) if regras is None else regras)
+
+        self.eventos = queue.Queue()  # sem limite: alarmes são raros
+        self._assinaturas = ()
+        self.thread = None
+        self.parar_flag = threading.Event()
+
+        # Métricas
+        self.leituras_avaliadas = 0
+        self.eventos_gerados = 0
+        self.falhas_gravacao = 0
+
+    def definir_regras(self, regras):
+        """Troca o conjunto de regras (o estado de todas recomeça)"""
+        with self.lock:
+            self.regras = list(regras)
+            for regra in self.regras:
+                regra.reiniciar()
+            # Agrupadas por canal: cada canal é calculado uma vez por leitura
+            self._por_canal = [(canal, [r for r in self.regras if r.canal == canal])
+                               for canal in (None,) + CANAIS
+                               if any(r.canal == canal for r in self.regras)]
+            self._silencio = [r for r in self.regras if isinstance(r, RegraSilencio)]
+
+    # ==================== CICLO DE VIDA ====================
+
+    def iniciar(self, id_missao=None, reiniciar_regras=True):
+        """Recomeça as regras (exceto na retomada após reconexão) e inicia a thread de entrega"""
+        with self.lock:
+            self.id_missao = id_missao
+            if reiniciar_regras:
+                for regra in self.regras:
+                    regra.reiniciar()
+            # O silêncio conta a partir do início da leitura: um sensor que
+            # nunca envia nada também dispara
+            agora = time.monotonic()
+            for regra in self._silencio:
+                if regra.ultima is None:
+                    regra.ultima = agora
+        if self.thread and self.thread.is_alive():
+            return
+        self.parar_flag.clear()
+        self.thread = threading.Thread(target=self._entregar_continuamente, daemon=True)
+        self.thread.start()
+
+    def parar(self, timeout=5):
+        """Entrega os eventos pendentes e encerra a thread (fim da leitura)"""
+        self.parar_flag.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout)
+
+    # ==================== AVALIAÇÃO ====================
+
+    def processar(self, leituras, snapshot=None):
+        """
+        Assinante do barramento (thread de leitura serial): avalia as regras em
+        cada leitura (timestamp_ms, temperatura, pressao) e enfileira os eventos
+        """
+        fator = self.fator_profundidade
+        with self.lock:
+            por_canal = self._por_canal
+            for timestamp_ms, temperatura, pressao in leituras:
+                for canal, regras in por_canal:
+                    if canal == 'pressao':
+                        valor = pressao
+                    elif canal == 'profundidade':
+                        valor = max(pressao * fator, 0.0)
+                    elif canal == 'temperatura':
+                        valor = temperatura
+                    else:
+                        valor = None
+                    for regra in regras:
+                        mudanca = regra.avaliar(timestamp_ms, valor)
+                        if mudanca is not None:
+                            self._emitir(regra, timestamp_ms, *mudanca)
+            self.leituras_avaliadas += len(leituras)
+
+    def _verificar_silencio(self):
+        """Regras de silêncio (thread do motor)"""
+        if not self._silencio:
+            return
+        agora, agora_ms = time.monotonic(), relogio.agora_ms()
+        with self.lock:
+            for regra in self._silencio:
+                mudanca = regra.verificar(agora, agora_ms)
+                if mudanca is not None:
+                    self._emitir(regra, agora_ms, *mudanca)
+
+    def _emitir(self, regra, timestamp_ms, ativo, valor):
+        """Enfileira o evento (chamar com lock); não bloqueia"""
+        mensagem = regra.mensagem if ativo else f"{regra.mensagem} (normalizado)"
+        self.eventos_gerados += 1
+        self.eventos.put_nowait(EventoAlarme(timestamp_ms, self.id_dispositivo, regra.nome,
+                                             regra.severidade, ativo, valor, mensagem))
+
+    # ==================== ENTREGA ====================
+
+    def assinar(self, callback=None, tamanho_fila=TAMANHO_FILA_ASSINANTE):
+        """
+        Recebe os eventos de alarme: callback(evento) na thread do motor ou,
+        sem callback, uma queue.Queue limitada (descarta os mais antigos)
+        """
+        destino = callback if callback is not None else queue.Queue(maxsize=tamanho_fila)
+        with self.lock:
+            self._assinaturas += (destino,)
+        return destino
+
+    def cancelar(self, assinatura):
+        """Remove o callback ou fila retornado por assinar()"""
+        with self.lock:
+            self._assinaturas = tuple(a for a in self._assinaturas if a is not assinatura)
+
+    def _entregar_continuamente(self):
+        """Thread do motor: verifica silêncio, grava os eventos e avisa os assinantes"""
+        while not self.parar_flag.is_set():
+            try:
+                pendentes = [self.eventos.get(timeout=INTERVALO_VERIFICACAO)]
+            except queue.Empty:
+                pendentes = []
+            self._verificar_silencio()
+            while True:
+                try:
+                    pendentes.append(self.eventos.get_nowait())
+                except queue.Empty:
+                    break
+            if pendentes:
+                self._entregar(pendentes)
+
+        # Eventos gerados até a parada
+        pendentes = []
+        while not self.eventos.empty():
+            pendentes.append(self.eventos.get_nowait())
+        if pendentes:
+            self._entregar(pendentes)
+
+    def _entregar(self, eventos):
+        for assinatura in self._assinaturas:
+            for evento in eventos:
+                try:
+                    if callable(assinatura):
+                        assinatura(evento)
+                    else:
+                        self._enfileirar(assinatura, evento)
+                except Exception as e:
+                    log.error("Falha em assinante de alarmes: %s", e)
+
+        _eventos_alarme.incrementar(len(eventos))
+        for evento in eventos:
+            estado = "ATIVO" if evento.ativo else "normalizado"
+            origem = log.getChild(str(evento.id_dispositivo)) if evento.id_dispositivo else log
+            if evento.valor is None:
+                origem.info("%s: %s", estado, evento.mensagem)
+            else:
+                origem.info("%s: %s (%.2f)", estado, evento.mensagem, evento.valor)
+
+        if self.id_missao:
+            try:
+                db.inserir_alarmes(self.id_missao, eventos)
+            except Exception as e:
+                self.falhas_gravacao += 1
+                log.error("Falha ao gravar alarmes: %s", e)
+
+    @staticmethod
+    def _enfileirar(fila, evento):
+        """Fila cheia: o consumidor está atrasado, descartar o evento mais antigo"""
+        while True:
+            try:
+                fila.put_nowait(evento)
+                return
+            except queue.Full:
+                try:
+                    fila.get_nowait()
+                except queue.Empty:
+                    pass
+
+    # ==================== CONSULTA ====================
+
+    def get_ativos(self):
+        """Regras em alarme agora: lista de (nome, severidade, mensagem)"""
+        with self.lock:
+            return [(regra.nome, regra.severidade, regra.mensagem) for regra in self.regras if regra.ativo]
+
+    def get_metricas(self):
+        """Leituras avaliadas, eventos gerados, fila de entrega e falhas de gravação"""
+        return {
+            'regras': len(self.regras),
+            'leituras_avaliadas': self.leituras_avaliadas,
+            'eventos_gerados': self.eventos_gerados,
+            'eventos_pendentes': self.eventos.qsize(),
+            'falhas_gravacao': self.falhas_gravacao,
+        }
@@ -0,0 +1,359 @@
+"""
+Módulo de análise do perfil do mergulho (NumPy, vetorizado)
+
+A partir das séries (timestamp_ms, pressao) de uma missão:
+- pressão filtrada: mediana móvel (remove picos isolados) seguida de média
+  móvel exponencial no tempo (suaviza o ruído);
+- profundidade pela pressão manométrica e a densidade da água;
+- velocidade vertical (m/min, positiva na descida) em uma janela de tempo;
+- profundidade máxima e média, tempo submerso, tempo de fundo, tempo em
+  subida rápida e histograma de tempo por faixa de profundidade.
+
+AnaliseMergulho processa as leituras em pedaços e mantém o estado entre
+eles, então o mesmo código analisa uma missão inteira de uma vez
+(analisar, analisar_missao) e as leituras ao vivo conforme chegam
+(SensorArduino.get_analise). Os filtros são causais (só usam leituras
+passadas) para que os dois modos deem o mesmo resultado.
+
+analisar_missao guarda o resultado por missão em um cache LRU, descartado
+quando a missão muda (mesmas invalidações do pacote da missão no banco).
+"""
+
+import threading
+from array import array
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+import servidor.database as db
+
+# Densidade da água (kg/m³) e gravidade padrão (m/s²)
+DENSIDADE_AGUA_SALGADA = 1025.0
+DENSIDADE_AGUA_DOCE = 1000.0
+GRAVIDADE = 9.80665
+PA_POR_PSI = 6894.757
+
+# Leituras na mediana móvel e constante de tempo (s) da média exponencial
+JANELA_MEDIANA = 5
+CONSTANTE_EMA = 2.0
+
+# Janela (s) da velocidade vertical e velocidade de subida considerada rápida (m/min)
+JANELA_TAXA = 5.0
+LIMITE_SUBIDA = 10.0
+
+# Abaixo desta profundidade (m) o mergulhador está submerso
+PROFUNDIDADE_SUPERFICIE = 1.0
+
+# O fundo termina na última leitura abaixo desta fração da profundidade máxima
+FRACAO_FUNDO = 0.8
+
+# Largura (m) das faixas do histograma de tempo por profundidade
+FAIXA_HISTOGRAMA = 1.0
+
+# Intervalos maiores que este (s) são falta de dados e não contam tempo
+LACUNA_MAXIMA = 10.0
+
+# Leituras com o mesmo ms contam como 1 ms na média exponencial
+PASSO_MINIMO = 0.001
+
+# Expoente máximo por bloco na média exponencial (exp(600) ~ 1e260, sem estouro)
+_LIMITE_EXPOENTE = 600.0
+
+# Análises de missões mantidas no cache (cada uma guarda as séries inteiras)
+TAMANHO_CACHE_ANALISES = 4
+
+# Séries derivadas, alinhadas com as leituras de entrada (arrays somente leitura)
+SeriesMergulho = namedtuple('SeriesMergulho', 'timestamp_ms pressao_filtrada profundidade velocidade_vertical')
+
+# Séries da missão inteira e o resumo (dicionário de AnaliseMergulho.resultado)
+AnaliseMissao = namedtuple('AnaliseMissao', 'series resumo')
+
+
+def profundidade_da_pressao(pressao, densidade=DENSIDADE_AGUA_SALGADA):
+    """Profundidade (m) a partir da pressão manométrica (psi); aceita número ou array"""
+    return np.maximum(np.asarray(pressao) * (PA_POR_PSI / (densidade * GRAVIDADE)), 0.0)
+
+
+def _mediana_movel(valores, anteriores, janela):
+    """Mediana das últimas `janela` leituras (incluindo as `anteriores`, do pedaço passado)"""
+    if janela <= 1:
+        return valores.copy()
+    estendido = np.concatenate((anteriores, valores))
+    vistas = np.lib.stride_tricks.sliding_window_view(estendido, janela)
+    # Ordenar janelas pequenas é mais rápido que np.median (que copia e particiona)
+    return np.sort(vistas, axis=1)[:, janela // 2]
+
+
+def _media_exponencial(valores, tempo_s, constante, anterior, tempo_anterior):
+    """
+    Média exponencial com peso pelo tempo: y_i = y_(i-1) + a_i (x_i - y_(i-1)),
+    a_i = 1 - exp(-dt_i / constante). Como o produto dos (1 - a_i) é
+    exp(-(u_i - u_0)), com u o tempo acumulado / constante, a recorrência
+    vira uma soma acumulada: y_i = (y_0 + soma(a_k x_k e^u_k)) / e^u_i.
+    Feito em blocos para o expoente não estourar.
+    """
+    passos = np.maximum(np.diff(tempo_s, prepend=tempo_anterior), PASSO_MINIMO) / constante
+    u = np.cumsum(passos)
+    pesos = -np.expm1(-passos) * valores
+    resultado = np.empty_like(valores)
+
+    inicio, base, y = 0, 0.0, anterior
+    while inicio < len(valores):
+        fim = max(int(np.searchsorted(u, base + _LIMITE_EXPOENTE, side='right')), inicio + 1)
+        escala = np.exp(u[inicio:fim] - base)
+        resultado[inicio:fim] = (y + np.cumsum(pesos[inicio:fim] * escala)) / escala
+        inicio, base, y = fim, u[fim - 1], resultado[fim - 1]
+    return resultado
+
+
+def _somente_leitura(*arrays):
+    for array in arrays:
+        array.flags.writeable = False
+    return arrays
+
+
+class AnaliseMergulho:
+    """
+    Estado da análise de um mergulho; adicionar() recebe as leituras em
+    pedaços de qualquer tamanho (uma missão inteira ou cada lote ao vivo)
+    """
+
+    def __init__(self, densidade=DENSIDADE_AGUA_SALGADA, janela_mediana=JANELA_MEDIANA,
+                 constante_ema=CONSTANTE_EMA, janela_taxa=JANELA_TAXA, limite_subida=LIMITE_SUBIDA,
+                 profundidade_superficie=PROFUNDIDADE_SUPERFICIE, fracao_fundo=FRACAO_FUNDO,
+                 faixa_histograma=FAIXA_HISTOGRAMA, lacuna_maxima=LACUNA_MAXIMA):
+        self.densidade = densidade
+        self.janela_mediana = janela_mediana
+        self.constante_ema = constante_ema
+        self.janela_taxa = janela_taxa
+        self.limite_subida = limite_subida
+        self.profundidade_superficie = profundidade_superficie
+        self.fracao_fundo = fracao_fundo
+        self.faixa_histograma = faixa_histograma
+        self.lacuna_maxima = lacuna_maxima
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Esquece todas as leituras (nova missão)"""
+        self.amostras = 0
+        self.inicio_ms = None
+        self.fim_ms = None
+
+        # Continuidade entre pedaços: pressões brutas para a mediana, último
+        # valor da média exponencial, leituras dentro da janela da taxa e a
+        # última leitura, cujo tempo só é conhecido quando chega a próxima
+        self._pressoes_anteriores = np.zeros(0)
+        self._ema = None
+        self._tempo_anterior_s = None
+        self._cauda_tempo_s = np.zeros(0)
+        self._cauda_profundidade = np.zeros(0)
+        self._pendente = None  # (tempo_s, profundidade, velocidade_vertical)
+
+        # Acumuladores do resumo
+        self.profundidade_maxima = 0.0
+        self.velocidade_subida_maxima = 0.0
+        self.velocidade_descida_maxima = 0.0
+        self.tempo_submerso = 0.0
+        self.soma_profundidade_tempo = 0.0
+        self.tempo_subida_rapida = 0.0
+        self.inicio_descida_ms = None
+        self.fim_fundo_ms = None
+        self.segundos_por_faixa = np.zeros(0)
+
+    def adicionar(self, timestamp_ms, pressao):
+        """
+        Processa mais leituras (arrays ou listas de mesmo tamanho, em ordem de
+        tempo) e retorna as SeriesMergulho correspondentes
+        """
+        timestamp_ms = np.asarray(timestamp_ms, dtype=np.int64)
+        pressao = np.asarray(pressao, dtype=np.float64)
+        n = len(timestamp_ms)
+        if n == 0:
+            vazio = np.zeros(0)
+            return SeriesMergulho(timestamp_ms, *_somente_leitura(vazio, vazio.copy(), vazio.copy()))
+
+        if self.amostras == 0:
+            self.inicio_ms = int(timestamp_ms[0])
+            # Antes da primeira leitura, a mediana e a média partem dela
+            self._pressoes_anteriores = np.full(self.janela_mediana - 1, pressao[0])
+        # Tempo em segundos desde o início (precisão sem os ms da época)
+        tempo_s = (timestamp_ms - self.inicio_ms) / 1000.0
+        # Timestamps nunca voltam (reancoragem do relógio do Arduino)
+        if self._tempo_anterior_s is not None:
+            tempo_s[0] = max(tempo_s[0], self._tempo_anterior_s)
+        np.maximum.accumulate(tempo_s, out=tempo_s)
+
+        # Filtro: mediana móvel e média exponencial no tempo
+        mediana = _mediana_movel(pressao, self._pressoes_anteriores, self.janela_mediana)
+        if self._ema is None:
+            self._ema, self._tempo_anterior_s = mediana[0], tempo_s[0]
+        filtrada = _media_exponencial(mediana, tempo_s, self.constante_ema, self._ema, self._tempo_anterior_s)
+        profundidade = profundidade_da_pressao(filtrada, self.densidade)
+
+        # Velocidade vertical: diferença para a primeira leitura da janela
+        tempos = np.concatenate((self._cauda_tempo_s, tempo_s))
+        profundidades = np.concatenate((self._cauda_profundidade, profundidade))
+        inicio_janela = np.searchsorted(tempos, tempo_s - self.janela_taxa, side='left')
+        intervalo = tempo_s - tempos[inicio_janela]
+        velocidade = np.divide((profundidade - profundidades[inicio_janela]) * 60.0, intervalo,
+                               out=np.zeros(n), where=intervalo > 0)
+
+        self._acumular(tempo_s, profundidade, velocidade)
+
+        # Estado para o próximo pedaço
+        if self.janela_mediana > 1:
+            self._pressoes_anteriores = np.concatenate((self._pressoes_anteriores, pressao))[-(self.janela_mediana - 1):]
+        self._ema, self._tempo_anterior_s = filtrada[-1], tempo_s[-1]
+        manter = np.searchsorted(tempos, tempo_s[-1] - self.janela_taxa, side='left')
+        self._cauda_tempo_s, self._cauda_profundidade = tempos[manter:], profundidades[manter:]
+        self.amostras += n
+        self.fim_ms = int(timestamp_ms[-1])
+
+        return SeriesMergulho(timestamp_ms, *_somente_leitura(filtrada, profundidade, velocidade))
+
+    def _acumular(self, tempo_s, profundidade, velocidade):
+        """Atualiza os totais; cada leitura vale o tempo até a seguinte"""
+        if self._pendente is not None:
+            tempo_s = np.concatenate(([self._pendente[0]], tempo_s))
+            profundidade = np.concatenate(([self._pendente[1]], profundidade))
+            velocidade = np.concatenate(([self._pendente[2]], velocidade))
+        self._pendente = (tempo_s[-1], profundidade[-1], velocidade[-1])
+
+        duracao = np.diff(tempo_s)
+        duracao[duracao > self.lacuna_maxima] = 0.0
+        p, v = profundidade[:-1], velocidade[:-1]
+
+        submersa = p > self.profundidade_superficie
+        self.tempo_submerso += float(duracao[submersa].sum())
+        self.soma_profundidade_tempo += float(np.dot(p[submersa], duracao[submersa]))
+        self.tempo_subida_rapida += float(duracao[v < -self.limite_subida].sum())
+        if len(duracao):
+            faixas = (p / self.faixa_histograma).astype(np.int64)
+            por_faixa = np.bincount(faixas, weights=duracao, minlength=len(self.segundos_por_faixa))
+            por_faixa[:len(self.segundos_por_faixa)] += self.segundos_por_faixa
+            self.segundos_por_faixa = por_faixa
+
+        # Extremos e marcos de tempo usam todas as leituras (inclusive a pendente)
+        self.velocidade_descida_maxima = max(self.velocidade_descida_maxima, float(velocidade.max()))
+        self.velocidade_subida_maxima = max(self.velocidade_subida_maxima, float(-velocidade.min()))
+        if self.inicio_descida_ms is None:
+            abaixo = np.flatnonzero(profundidade > self.profundidade_superficie)
+            if len(abaixo):
+                self.inicio_descida_ms = self.inicio_ms + round(tempo_s[abaixo[0]] * 1000)
+        self.profundidade_maxima = max(self.profundidade_maxima, float(profundidade.max()))
+        # Se a máxima aumentou, a leitura que a aumentou está neste pedaço
+        no_fundo = np.flatnonzero(profundidade >= self.fracao_fundo * self.profundidade_maxima)
+        if len(no_fundo):
+            self.fim_fundo_ms = self.inicio_ms + round(tempo_s[no_fundo[-1]] * 1000)
+
+    def resultado(self):
+        """Resumo do mergulho até aqui (dicionário) ou None sem leituras"""
+        if self.amostras == 0:
+            return None
+        mergulhou = self.inicio_descida_ms is not None
+        return {
+            'amostras': self.amostras,
+            'inicio_ms': self.inicio_ms,
+            'fim_ms': self.fim_ms,
+            'profundidade_atual': float(self._pendente[1]),
+            'velocidade_vertical_atual': float(self._pendente[2]),
+            'profundidade_maxima': self.profundidade_maxima,
+            'profundidade_media': (self.soma_profundidade_tempo / self.tempo_submerso
+                                   if self.tempo_submerso else 0.0),
+            'velocidade_subida_maxima': self.velocidade_subida_maxima,
+            'velocidade_descida_maxima': self.velocidade_descida_maxima,
+            'tempo_submerso': self.tempo_submerso,
+            'tempo_subida_rapida': self.tempo_subida_rapida,
+            # Do início da descida à última leitura perto da profundidade máxima
+            'inicio_descida_ms': self.inicio_descida_ms,
+            'fim_fundo_ms': self.fim_fundo_ms if mergulhou else None,
+            'tempo_fundo': max(self.fim_fundo_ms - self.inicio_descida_ms, 0) / 1000 if mergulhou else 0.0,
+            # Segundos em cada faixa [i * faixa_histograma, (i + 1) * faixa_histograma) m
+            'faixa_histograma': self.faixa_histograma,
+            'segundos_por_faixa': self.segundos_por_faixa.copy(),
+        }
+
+
+def analisar(timestamp_ms, pressao, **parametros):
+    """Analisa séries completas de uma vez; retorna AnaliseMissao(series, resumo)"""
+    analise = AnaliseMergulho(**parametros)
+    series = analise.adicionar(timestamp_ms, pressao)
+    return AnaliseMissao(series, analise.resultado())
+
+
+def carregar_series(id_missao, id_dispositivo=None):
+    """
+    Timestamps (int64, ms) e pressões (float64) de uma missão em ordem de
+    tempo, lidos em lotes grandes e convertidos direto para arrays. Sem
+    id_dispositivo, em uma missão com vários dispositivos, retorna só o
+    primeiro (mergulhadores diferentes não formam uma série de profundidade)
+    """
+    if id_dispositivo is None:
+        dispositivos = db.listar_dispositivos_missao(id_missao)
+        if len(dispositivos) > 1:
+            if dispositivos[0] is None:
+                # Medições sem dispositivo não têm filtro: separa todas de uma vez
+                return carregar_series_por_dispositivo(id_missao)[None]
+            id_dispositivo = dispositivos[0]
+
+    lotes = [np.array(lote, dtype=np.float64)
+             for lote in db.iterar_medicoes(id_missao, tamanho_lote=50_000, colunas=('timestamp_ms', 'pressao'),
+                                            id_dispositivo=id_dispositivo)]
+    if not lotes:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    tabela = np.concatenate(lotes)
+    return tabela[:, 0].astype(np.int64), tabela[:, 1].copy()
+
+
+def carregar_series_por_dispositivo(id_missao):
+    """
+    Séries de carregar_series separadas por dispositivo, em uma passada:
+    {id_dispositivo: (timestamps, pressoes)}, na ordem de listar_dispositivos_missao
+    """
+    dispositivos = db.listar_dispositivos_missao(id_missao)
+    if len(dispositivos) <= 1:
+        return {dispositivos[0] if dispositivos else None: carregar_series(id_missao)}
+
+    grupos = {dispositivo: (array('q'), array('d')) for dispositivo in dispositivos}
+    for lote in db.iterar_medicoes(id_missao, tamanho_lote=50_000,
+                                   colunas=('id_dispositivo', 'timestamp_ms', 'pressao')):
+        for dispositivo, ms, pressao in lote:
+            grupo = grupos.get(dispositivo)
+            if grupo is None:
+                # Dispositivo que começou a gravar depois da listagem
+                grupo = grupos[dispositivo] = (array('q'), array('d'))
+            grupo[0].append(ms)
+            grupo[1].append(pressao)
+
+    return {dispositivo: (np.frombuffer(timestamps, dtype=np.int64), np.frombuffer(pressoes, dtype=np.float64))
+            for dispositivo, (timestamps, pressoes) in grupos.items()}
+
+
+_cache_analises = OrderedDict()  # (DB_PATH, id_missao, id_dispositivo, parâmetros) -> (geração, AnaliseMissao)
+_cache_analises_lock = threading.Lock()
+
+
+def analisar_missao(id_missao, id_dispositivo=None, **parametros):
+    """
+    Análise da missão inteira (AnaliseMissao ou None sem medições). Vem do
+    cache até a missão ser alterada
+    """
+    chave = (db.DB_PATH, id_missao, id_dispositivo, tuple(sorted(parametros.items())))
+    geracao = db.geracao_missao(id_missao)
+    with _cache_analises_lock:
+        guardada = _cache_analises.get(chave)
+        if guardada is not None and guardada[0] == geracao:
+            _cache_analises.move_to_end(chave)
+            return guardada[1]
+
+    timestamp_ms, pressao = carregar_series(id_missao, id_dispositivo)
+    analise = analisar(timestamp_ms, pressao, **parametros) if len(timestamp_ms) else None
+
+    with _cache_analises_lock:
+        # Só guarda se a missão não mudou durante a leitura
+        if analise is not None and db.geracao_missao(id_missao) == geracao:
+            _cache_analises[chave] = (geracao, analise)
+            _cache_analises.move_to_end(chave)
+            while len(_cache_analises) > TAMANHO_CACHE_ANALISES:
+                _cache_analises.popitem(last=False)
+    return analise
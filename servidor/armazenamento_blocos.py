@@ -0,0 +1,446 @@
+"""
+Módulo de armazenamento colunar das medições em blocos de duração fixa
+
+Cada linha da tabela medicao_bloco guarda todas as amostras de um
+dispositivo em uma missão dentro de um intervalo de DURACAO_BLOCO_MS: os timestamps como deltas inteiros
+(ms) e temperatura/pressão como colunas float32, opcionalmente comprimidas com
+zlib. Cada bloco também guarda min/máx/soma, para agregações sem decodificar.
+"""
+
+import sys
+import threading
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+import servidor.database as db
+from servidor.registro import get_log
+from servidor.relogio import para_ms, ms_para_texto
+
+log = get_log('blocos', 'BLOCOS')
+
+# Duração de cada bloco (um bloco aberto por missão e dispositivo fica em memória até fechar)
+DURACAO_BLOCO_MS = 60 * 1000
+
+# Blocos lidos por consulta ao percorrer uma missão (paginação por chave)
+BLOCOS_POR_CONSULTA = 16
+
+# Comprimir os BLOBs com zlib (deltas constantes comprimem muito bem)
+COMPRIMIR = True
+NIVEL_COMPRESSAO = 6
+
+
+# ==================== CODIFICAÇÃO ====================
+
+def _para_bytes(valores, comprimir):
+    """Serializa um array em little-endian (e comprime, se pedido)"""
+    if sys.byteorder == 'big':
+        valores = array(valores.typecode, valores)
+        valores.byteswap()
+    dados = valores.tobytes()
+    return zlib.compress(dados, NIVEL_COMPRESSAO) if comprimir else dados
+
+
+def _de_bytes(typecode, dados, comprimido):
+    """Operação inversa de _para_bytes"""
+    valores = array(typecode)
+    valores.frombytes(zlib.decompress(dados) if comprimido else dados)
+    if sys.byteorder == 'big':
+        valores.byteswap()
+    return valores
+
+
+def codificar_bloco(timestamps_ms, temperaturas, pressoes, comprimir=COMPRIMIR):
+    """
+    Codifica as amostras de um bloco (já ordenadas por timestamp)
+    Retorna (inicio_ms, fim_ms, blob_timestamps, blob_temperaturas, blob_pressoes)
+    """
+    inicio_ms = timestamps_ms[0]
+    anterior = inicio_ms
+    deltas = array('I')
+    for ms in timestamps_ms:
+        deltas.append(ms - anterior)
+        anterior = ms
+
+    return (inicio_ms, timestamps_ms[-1],
+            _para_bytes(deltas, comprimir),
+            _para_bytes(array('f', temperaturas), comprimir),
+            _para_bytes(array('f', pressoes), comprimir))
+
+
+def decodificar_bloco(inicio_ms, comprimido, blob_timestamps, blob_temperaturas, blob_pressoes):
+    """Retorna (timestamps_ms, temperaturas, pressoes) como arrays"""
+    deltas = _de_bytes('I', blob_timestamps, comprimido)
+    timestamps = array('q', accumulate(deltas, initial=inicio_ms))
+    del timestamps[0]
+    return (timestamps,
+            _de_bytes('f', blob_temperaturas, comprimido),
+            _de_bytes('f', blob_pressoes, comprimido))
+
+
+# ==================== ARMAZENAMENTO ====================
+
+class ArmazenamentoBlocos:
+    """Armazena medições em blocos colunares de duração fixa por missão e dispositivo"""
+
+    def __init__(self, duracao_bloco_ms=DURACAO_BLOCO_MS, comprimir=COMPRIMIR):
+        self.duracao_bloco_ms = duracao_bloco_ms
+        self.comprimir = comprimir
+
+        # Bloco aberto de cada missão e dispositivo:
+        # (id_missao, id_dispositivo) -> [janela, timestamps, temperaturas, pressoes]
+        self.abertos = {}
+        self.lock = threading.Lock()
+
+    def anexar(self, id_missao, timestamp, temperatura, pressao, id_dispositivo=None):
+        """Anexa uma medição ao bloco aberto da missão"""
+        self.anexar_lote([(id_missao, timestamp, temperatura, pressao, id_dispositivo)])
+
+    def anexar_lote(self, medicoes):
+        """
+        Anexa várias medições (id_missao, timestamp, temperatura, pressao[, id_dispositivo]).
+        Blocos cujo intervalo terminou são gravados no banco em uma transação.
+        """
+        with self.lock:
+            prontos = []
+            sem_horario = 0
+            for id_missao, timestamp, temperatura, pressao, *dispositivo in medicoes:
+                ms = para_ms(timestamp)
+                if ms is None:
+                    # Sem horário não há janela (nem posição no bloco) para a amostra
+                    sem_horario += 1
+                    continue
+                janela = ms // self.duracao_bloco_ms
+                chave = (id_missao, dispositivo[0] if dispositivo else None)
+
+                bloco = self.abertos.get(chave)
+                if bloco is not None and bloco[0] != janela:
+                    prontos.append((chave, bloco))
+                    bloco = None
+                if bloco is None:
+                    bloco = [janela, array('q'), array('f'), array('f')]
+                    self.abertos[chave] = bloco
+
+                bloco[1].append(ms)
+                bloco[2].append(temperatura)
+                bloco[3].append(pressao)
+
+            if prontos:
+                self._gravar_blocos(prontos)
+        if sem_horario:
+            log.warning("%d medições sem timestamp ignoradas", sem_horario)
+
+    def descarregar(self, id_missao=None):
+        """Grava no banco os blocos abertos (de uma missão ou de todas)"""
+        with self.lock:
+            if id_missao is None:
+                prontos = list(self.abertos.items())
+                self.abertos.clear()
+            else:
+                prontos = [(chave, self.abertos.pop(chave))
+                           for chave in list(self.abertos) if chave[0] == id_missao]
+
+            if prontos:
+                self._gravar_blocos(prontos)
+
+    def _gravar_blocos(self, blocos, atualizar_estatisticas=True):
+        """Codifica e insere os blocos ((id_missao, id_dispositivo), [janela, ts, temps, press])"""
+        with db.transacao() as cursor:
+            for (id_missao, id_dispositivo), (_, timestamps, temperaturas, pressoes) in blocos:
+                if not timestamps:
+                    continue
+
+                # Amostras fora de ordem: ordenar antes de codificar os deltas
+                if any(b < a for a, b in zip(timestamps, timestamps[1:])):
+                    ordem = sorted(range(len(timestamps)), key=timestamps.__getitem__)
+                    timestamps = array('q', (timestamps[i] for i in ordem))
+                    temperaturas = array('f', (temperaturas[i] for i in ordem))
+                    pressoes = array('f', (pressoes[i] for i in ordem))
+
+                inicio_ms, fim_ms, blob_ts, blob_temp, blob_press = codificar_bloco(
+                    timestamps, temperaturas, pressoes, self.comprimir)
+                soma_t = sum(temperaturas)
+                soma_p = sum(pressoes)
+
+                cursor.execute('''
+                    INSERT INTO medicao_bloco (
+                        id_missao, inicio_ms, fim_ms, total, comprimido,
+                        timestamps, temperaturas, pressoes,
+                        temp_min, temp_max, soma_temperatura,
+                        press_min, press_max, soma_pressao, id_dispositivo
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (id_missao, inicio_ms, fim_ms, len(timestamps), int(self.comprimir),
+                      blob_ts, blob_temp, blob_press,
+                      min(temperaturas), max(temperaturas), soma_t,
+                      min(pressoes), max(pressoes), soma_p, id_dispositivo))
+
+                if atualizar_estatisticas:
+                    # Mesmo UPSERT do trigger de medicao, com o resumo do bloco inteiro
+                    cursor.execute('''
+                        INSERT INTO missao_estatisticas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT (id_missao) DO UPDATE SET
+                            total = total + excluded.total,
+                            soma_temperatura = soma_temperatura + excluded.soma_temperatura,
+                            soma_quadrados_temperatura = soma_quadrados_temperatura + excluded.soma_quadrados_temperatura,
+                            temp_min = MIN(temp_min, excluded.temp_min),
+                            temp_max = MAX(temp_max, excluded.temp_max),
+                            soma_pressao = soma_pressao + excluded.soma_pressao,
+                            soma_quadrados_pressao = soma_quadrados_pressao + excluded.soma_quadrados_pressao,
+                            press_min = MIN(press_min, excluded.press_min),
+                            press_max = MAX(press_max, excluded.press_max),
+                            primeiro_timestamp = MIN(primeiro_timestamp, excluded.primeiro_timestamp),
+                            ultimo_timestamp = MAX(ultimo_timestamp, excluded.ultimo_timestamp)
+                    ''', (id_missao, len(timestamps),
+                          soma_t, sum(t * t for t in temperaturas),
+                          min(temperaturas), max(temperaturas),
+                          soma_p, sum(p * p for p in pressoes),
+                          min(pressoes), max(pressoes),
+                          ms_para_texto(inicio_ms), ms_para_texto(fim_ms)))
+                    # Séries agregadas (o trigger só cobre a tabela medicao)
+                    db.gravar_agregados(cursor, id_missao, db.acumular_agregados(
+                        {}, timestamps, temperaturas, pressoes))
+
+    def _blocos_no_intervalo(self, id_missao, inicio_ms, fim_ms, colunas, id_dispositivo=None):
+        """Cursor com os blocos gravados que se sobrepõem ao intervalo (de um dispositivo ou de todos)"""
+        filtro, parametros = '', (id_missao, fim_ms, inicio_ms)
+        if id_dispositivo is not None:
+            filtro, parametros = 'AND id_dispositivo = ?', parametros + (id_dispositivo,)
+        cursor = db.conectar().cursor()
+        cursor.execute(f'''
+            SELECT {colunas}
+            FROM medicao_bloco
+            WHERE id_missao = ? AND inicio_ms <= ? AND fim_ms >= ? {filtro}
+            ORDER BY inicio_ms, id_bloco
+        ''', parametros)
+        return cursor
+
+    def _abertos_da_missao(self, id_missao, id_dispositivo=None):
+        """Blocos abertos da missão (chamar com self.lock), ordenados por dispositivo"""
+        chaves = [chave for chave in self.abertos if chave[0] == id_missao
+                  and (id_dispositivo is None or chave[1] == id_dispositivo)]
+        chaves.sort(key=lambda chave: (chave[1] is not None, chave[1] or ''))
+        return [(chave[1], self.abertos[chave]) for chave in chaves]
+
+    def _iterar_blocos(self, id_missao, inicio=None, fim=None, id_dispositivo=None):
+        """Gera (id_dispositivo, timestamps_ms, temperaturas, pressoes) de cada bloco no intervalo"""
+        inicio_ms = para_ms(inicio) if inicio is not None else -2 ** 63
+        fim_ms = para_ms(fim) if fim is not None else 2 ** 63 - 1
+
+        def recortar(ts, temps, press):
+            a = bisect_left(ts, inicio_ms)
+            b = bisect_right(ts, fim_ms)
+            return ts[a:b], temps[a:b], press[a:b]
+
+        # Páginas de BLOCOS_POR_CONSULTA blocos por (inicio_ms, id_bloco): cada
+        # página é uma consulta própria, então nenhuma leitura fica aberta
+        # enquanto quem consome processa os blocos (um decodificado por vez)
+        filtro, parametros = '', (id_missao, fim_ms, inicio_ms)
+        if id_dispositivo is not None:
+            filtro, parametros = 'AND id_dispositivo = ?', parametros + (id_dispositivo,)
+        chave = (-2 ** 63, -1)
+        while True:
+            pagina = db.conectar().execute(f'''
+                SELECT id_dispositivo, inicio_ms, comprimido, timestamps, temperaturas, pressoes, id_bloco
+                FROM medicao_bloco
+                WHERE id_missao = ? AND inicio_ms <= ? AND fim_ms >= ? {filtro}
+                  AND (inicio_ms, id_bloco) > (?, ?)
+                ORDER BY inicio_ms, id_bloco
+                LIMIT ?
+            ''', (*parametros, *chave, BLOCOS_POR_CONSULTA)).fetchall()
+            for linha in pagina:
+                yield (linha[0], *recortar(*decodificar_bloco(*linha[1:6])))
+            if len(pagina) < BLOCOS_POR_CONSULTA:
+                break
+            chave = (pagina[-1][1], pagina[-1][6])
+
+        # Amostras dos blocos abertos, ainda não gravadas
+        with self.lock:
+            pendentes = []
+            for dispositivo, bloco in self._abertos_da_missao(id_missao, id_dispositivo):
+                ordem = sorted(range(len(bloco[1])), key=bloco[1].__getitem__)
+                pendentes.append((dispositivo,
+                                  array('q', (bloco[1][i] for i in ordem)),
+                                  array('f', (bloco[2][i] for i in ordem)),
+                                  array('f', (bloco[3][i] for i in ordem))))
+        for dispositivo, *pendente in pendentes:
+            yield (dispositivo, *recortar(*pendente))
+
+    def iterar_intervalo(self, id_missao, inicio=None, fim=None, id_dispositivo=None):
+        """
+        Gera, bloco a bloco, as amostras da missão em [inicio, fim] (texto,
+        datetime ou ms) como (timestamps_ms, temperaturas, pressoes). Com
+        vários dispositivos, os blocos vêm em ordem de início (as amostras de
+        dispositivos diferentes no mesmo intervalo não são intercaladas).
+        """
+        for _, ts, temps, press in self._iterar_blocos(id_missao, inicio, fim, id_dispositivo):
+            yield ts, temps, press
+
+    def ler_intervalo(self, id_missao, inicio=None, fim=None, id_dispositivo=None):
+        """
+        Lê as amostras da missão em [inicio, fim] (texto, datetime ou ms)
+        Retorna (timestamps_ms, temperaturas, pressoes) como arrays colunares
+        """
+        timestamps, temperaturas, pressoes = array('q'), array('f'), array('f')
+        for ts, temps, press in self.iterar_intervalo(id_missao, inicio, fim, id_dispositivo):
+            timestamps.extend(ts)
+            temperaturas.extend(temps)
+            pressoes.extend(press)
+        return timestamps, temperaturas, pressoes
+
+    def iterar_medicoes(self, id_missao, tamanho_lote=5000, inicio=None, fim=None, colunas=None,
+                        id_dispositivo=None):
+        """
+        Gera lotes de linhas no formato de db.iterar_medicoes. id_medicao é a
+        posição da amostra na missão (blocos não guardam id por amostra).
+        """
+        colunas = colunas or db.COLUNAS_MEDICAO
+        lote = []
+        n = 0
+        for dispositivo, ts, temps, press in self._iterar_blocos(id_missao, inicio, fim, id_dispositivo):
+            for ms, temp, pres in zip(ts, temps, press):
+                n += 1
+                valores = {'id_medicao': n, 'id_missao': id_missao,
+                           'timestamp': ms_para_texto(ms), 'timestamp_ms': ms,
+                           'temperatura': temp, 'pressao': pres, 'id_dispositivo': dispositivo}
+                lote.append(tuple(valores[c] for c in colunas))
+                if len(lote) >= tamanho_lote:
+                    yield lote
+                    lote = []
+        if lote:
+            yield lote
+
+    def listar_medicoes(self, id_missao, inicio=None, fim=None):
+        """Mesmo formato de linhas da tabela medicao: (n, id_missao, timestamp, temp, press)"""
+        medicoes = []
+        for lote in self.iterar_medicoes(id_missao, inicio=inicio, fim=fim):
+            medicoes.extend(lote)
+        return medicoes
+
+    def agregar(self, id_missao, inicio=None, fim=None):
+        """
+        Total, mín, máx e média de temperatura e pressão em [inicio, fim].
+        Blocos inteiramente dentro do intervalo usam o resumo gravado; apenas
+        os blocos das bordas são decodificados.
+        """
+        inicio_ms = para_ms(inicio) if inicio is not None else -2 ** 63
+        fim_ms = para_ms(fim) if fim is not None else 2 ** 63 - 1
+
+        total = 0
+        soma_t = soma_p = 0.0
+        temp_min = temp_max = press_min = press_max = None
+
+        def combinar(n, t_min, t_max, s_t, p_min, p_max, s_p):
+            nonlocal total, soma_t, soma_p, temp_min, temp_max, press_min, press_max
+            if n == 0:
+                return
+            total += n
+            soma_t += s_t
+            soma_p += s_p
+            temp_min = t_min if temp_min is None else min(temp_min, t_min)
+            temp_max = t_max if temp_max is None else max(temp_max, t_max)
+            press_min = p_min if press_min is None else min(press_min, p_min)
+            press_max = p_max if press_max is None else max(press_max, p_max)
+
+        def combinar_amostras(temps, press):
+            if temps:
+                combinar(len(temps), min(temps), max(temps), sum(temps),
+                         min(press), max(press), sum(press))
+
+        for linha in self._blocos_no_intervalo(
+                id_missao, inicio_ms, fim_ms,
+                'inicio_ms, fim_ms, total, temp_min, temp_max, soma_temperatura, '
+                'press_min, press_max, soma_pressao, comprimido, timestamps, temperaturas, pressoes'):
+            bloco_inicio, bloco_fim, n = linha[0], linha[1], linha[2]
+            if inicio_ms <= bloco_inicio and bloco_fim <= fim_ms:
+                combinar(n, *linha[3:9])
+            else:
+                ts, temps, press = decodificar_bloco(bloco_inicio, *linha[9:])
+                a = bisect_left(ts, inicio_ms)
+                b = bisect_right(ts, fim_ms)
+                combinar_amostras(temps[a:b], press[a:b])
+
+        with self.lock:
+            for _, bloco in self._abertos_da_missao(id_missao):
+                dentro = [i for i, ms in enumerate(bloco[1]) if inicio_ms <= ms <= fim_ms]
+                combinar_amostras([bloco[2][i] for i in dentro], [bloco[3][i] for i in dentro])
+
+        if total == 0:
+            return {'total': 0}
+        return {
+            'total': total,
+            'temp_min': temp_min,
+            'temp_max': temp_max,
+            'temp_media': soma_t / total,
+            'press_min': press_min,
+            'press_max': press_max,
+            'press_media': soma_p / total
+        }
+
+    def migrar_medicoes(self, id_missao=None, remover_linhas=False):
+        """
+        Converte as linhas da tabela medicao em blocos. Missões que já possuem
+        blocos são ignoradas. As estatísticas não são alteradas (as linhas já
+        foram contabilizadas pelo trigger). Retorna o número de medições convertidas.
+        """
+        cursor = db.conectar().cursor()
+        if id_missao is None:
+            cursor.execute('SELECT DISTINCT id_missao FROM medicao')
+            missoes = [linha[0] for linha in cursor.fetchall()]
+        else:
+            missoes = [id_missao]
+
+        convertidas = 0
+        for missao in missoes:
+            cursor.execute('SELECT 1 FROM medicao_bloco WHERE id_missao = ? LIMIT 1', (missao,))
+            if cursor.fetchone():
+                continue
+
+            # Percorre as linhas em ordem de tempo (leitura paginada, que também
+            # cobre linhas ainda sem timestamp_ms) e grava cada bloco assim que
+            # a janela do dispositivo avança: só os blocos abertos ficam em memória
+            abertos = {}
+            blocos = 0
+            with db.transacao() as escrita:
+                for lote in db.iterar_medicoes(missao, colunas=(
+                        'id_dispositivo', 'temperatura', 'pressao', 'timestamp_ms', 'id_medicao')):
+                    prontos = []
+                    for dispositivo, temperatura, pressao, ms, _ in lote:
+                        janela = ms // self.duracao_bloco_ms
+                        bloco = abertos.get(dispositivo)
+                        if bloco is not None and bloco[0] != janela:
+                            prontos.append(((missao, dispositivo), bloco))
+                            bloco = None
+                        if bloco is None:
+                            bloco = [janela, array('q'), array('f'), array('f')]
+                            abertos[dispositivo] = bloco
+                        bloco[1].append(ms)
+                        bloco[2].append(temperatura)
+                        bloco[3].append(pressao)
+                        convertidas += 1
+                    self._gravar_blocos(prontos, atualizar_estatisticas=False)
+                    blocos += len(prontos)
+
+                self._gravar_blocos([((missao, dispositivo), bloco)
+                                     for dispositivo, bloco in abertos.items()],
+                                    atualizar_estatisticas=False)
+                blocos += len(abertos)
+                if remover_linhas:
+                    escrita.execute('DELETE FROM medicao WHERE id_missao = ?', (missao,))
+            db.invalidar_pacote_missao(missao)
+            log.info("Missão %s: %d blocos gravados", missao, blocos)
+
+        return convertidas
+
+
+_armazenamento = None
+_armazenamento_lock = threading.Lock()
+
+
+def get_armazenamento():
+    """Retorna a instância única do armazenamento em blocos"""
+    global _armazenamento
+    if _armazenamento is None:
+        with _armazenamento_lock:
+            if _armazenamento is None:
+                _armazenamento = ArmazenamentoBlocos()
+    return _armazenamento
@@ -0,0 +1,149 @@
+"""
+Módulo do buffer circular das leituras recentes (em memória, NumPy)
+
+Guarda as últimas `capacidade` leituras (timestamp_ms, pressao, temperatura)
+em arrays pré-alocados, para gráficos ao vivo, taxa de variação e alarmes
+sem consultar o banco.
+
+Cada leitura é escrita em duas posições (i e i + capacidade) de arrays com
+o dobro do tamanho; assim as últimas N leituras estão sempre contíguas e as
+janelas são views dos arrays, sem cópia. Uma view de N leituras continua
+válida até chegarem mais capacidade - N leituras; para guardar por mais
+tempo, copiar (np.array(view)).
+
+O buffer não tem lock próprio: quem escreve e quem lê usam o lock do dono
+(SensorArduino.dados_lock).
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+# 10 minutos a 100 Hz (protocolo binário) ou ~16 horas a 1 Hz (ASCII)
+CAPACIDADE_PADRAO = 60_000
+
+# Views somente leitura das três séries, alinhadas por índice
+Janela = namedtuple('Janela', ['timestamp_ms', 'pressao', 'temperatura'])
+
+
+class BufferLeituras:
+    """Buffer circular de capacidade fixa com janelas por quantidade ou por tempo"""
+
+    def __init__(self, capacidade=CAPACIDADE_PADRAO):
+        if capacidade < 1:
+            raise ValueError("capacidade deve ser positiva")
+        self.capacidade = capacidade
+        self._timestamp_ms = np.zeros(2 * capacidade, dtype=np.int64)
+        self._pressao = np.zeros(2 * capacidade, dtype=np.float64)
+        self._temperatura = np.zeros(2 * capacidade, dtype=np.float64)
+        self.total = 0  # leituras recebidas desde a criação/limpeza
+
+    def __len__(self):
+        return min(self.total, self.capacidade)
+
+    def adicionar(self, timestamp_ms, temperatura, pressao):
+        """Acrescenta uma leitura (mesma ordem de campos do escritor de medições)"""
+        i = self.total % self.capacidade
+        # Timestamps nunca voltam (reancoragem do relógio do Arduino), para a
+        # busca binária de janela_tempo continuar válida
+        if self.total and timestamp_ms < self._timestamp_ms[i + self.capacidade - 1]:
+            timestamp_ms = self._timestamp_ms[i + self.capacidade - 1]
+        for serie, valor in ((self._timestamp_ms, timestamp_ms), (self._pressao, pressao),
+                             (self._temperatura, temperatura)):
+            serie[i] = valor
+            serie[i + self.capacidade] = valor
+        self.total += 1
+
+    def adicionar_lote(self, leituras):
+        """Acrescenta uma lista de (timestamp_ms, temperatura, pressao)"""
+        if not leituras:
+            return
+        # Só as últimas `capacidade` leituras do lote sobrevivem
+        leituras = leituras[-self.capacidade:]
+        timestamp_ms, temperatura, pressao = (np.asarray(coluna) for coluna in zip(*leituras))
+        timestamp_ms = timestamp_ms.astype(np.int64)
+        if self.total:
+            timestamp_ms[0] = max(timestamp_ms[0], self._ultimo_timestamp())
+        np.maximum.accumulate(timestamp_ms, out=timestamp_ms)
+
+        n = len(timestamp_ms)
+        inicio = self.total % self.capacidade
+        # Até duas fatias: antes e depois da volta do índice
+        primeira = min(n, self.capacidade - inicio)
+        for serie, valores in ((self._timestamp_ms, timestamp_ms), (self._pressao, pressao),
+                               (self._temperatura, temperatura)):
+            for destino in (inicio, inicio + self.capacidade):
+                serie[destino:destino + primeira] = valores[:primeira]
+            if primeira < n:
+                resto = n - primeira
+                serie[:resto] = valores[primeira:]
+                serie[self.capacidade:self.capacidade + resto] = valores[primeira:]
+        self.total += n
+
+    def limpar(self):
+        """Esquece todas as leituras (nova missão ou nova conexão)"""
+        self.total = 0
+
+    def _ultimo_timestamp(self):
+        return self._timestamp_ms[self.total % self.capacidade + self.capacidade - 1]
+
+    def _fatia(self, inicio, fim):
+        """Janela de views [inicio, fim) nos arrays dobrados"""
+        janela = Janela(self._timestamp_ms[inicio:fim], self._pressao[inicio:fim],
+                        self._temperatura[inicio:fim])
+        for view in janela:
+            view.flags.writeable = False
+        return janela
+
+    def ultimas(self, n=None):
+        """Views das últimas n leituras (todas as disponíveis se n for None), da mais antiga à mais nova"""
+        disponiveis = len(self)
+        n = disponiveis if n is None else max(0, min(n, disponiveis))
+        fim = self.total % self.capacidade + self.capacidade
+        return self._fatia(fim - n, fim)
+
+    def janela_tempo(self, segundos, ate_ms=None):
+        """
+        Views das leituras dos últimos `segundos` até ate_ms (padrão: a leitura
+        mais recente), por busca binária nos timestamps
+        """
+        todas = self.ultimas()
+        if not len(todas.timestamp_ms):
+            return todas
+        if ate_ms is None:
+            ate_ms = int(todas.timestamp_ms[-1])
+        inicio = np.searchsorted(todas.timestamp_ms, ate_ms - int(segundos * 1000), side='left')
+        fim = np.searchsorted(todas.timestamp_ms, ate_ms, side='right')
+        deslocamento = self.total % self.capacidade + self.capacidade - len(todas.timestamp_ms)
+        return self._fatia(deslocamento + inicio, deslocamento + fim)
+
+
+def agregar(janela):
+    """
+    Mínimo, máximo, média e inclinação (por segundo, mínimos quadrados) de
+    pressão e temperatura de uma janela. None se a janela estiver vazia.
+    """
+    n = len(janela.timestamp_ms)
+    if n == 0:
+        return None
+
+    resultado = {
+        'leituras': n,
+        'inicio_ms': int(janela.timestamp_ms[0]),
+        'fim_ms': int(janela.timestamp_ms[-1]),
+    }
+    # Tempo relativo em segundos (evita perder precisão com epoch em ms)
+    t = (janela.timestamp_ms - janela.timestamp_ms[0]) / 1000.0
+    t -= t.mean()
+    variancia_t = np.dot(t, t)
+    for nome in ('pressao', 'temperatura'):
+        serie = getattr(janela, nome)
+        media = float(serie.mean())
+        resultado[nome] = {
+            'min': float(serie.min()),
+            'max': float(serie.max()),
+            'media': media,
+            # Sem intervalo de tempo (uma leitura ou todas no mesmo ms) não há inclinação
+            'inclinacao': float(np.dot(t, serie - media) / variancia_t) if variancia_t > 0 else None,
+        }
+    return resultado
@@ -4,21 +4,170 @@ Módulo de gerenciamento do banco de dados SQLite
 
 import sqlite3
 import os
+import re
+import threading
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
 from datetime import datetime
+from types import MappingProxyType
+from servidor.registro import get_log
+from servidor.relogio import para_ms, ms_para_texto
+
+log = get_log('banco', 'BANCO')
 
 DB_PATH = 'servidor/mergulho.db'
 
+# Pragmas aplicados em toda conexão nova
+# WAL permite leituras concorrentes com a escrita (sensor, vídeo, áudio e interface)
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),        # Seguro em WAL e bem mais rápido que FULL
+    ('cache_size', -16000),           # ~16 MB de cache de páginas (negativo = KiB)
+    ('mmap_size', 64 * 1024 * 1024),  # 64 MB mapeados em memória
+    ('temp_store', 'MEMORY'),
+    ('foreign_keys', 'ON'),           # Necessário para o ON DELETE CASCADE
+)
+
+# Tempo máximo (segundos) esperando outro escritor liberar o banco
+TIMEOUT_BLOQUEIO = 10
+
+# Uma conexão persistente por thread
+_local = threading.local()
+_conexoes = []  # (thread, conexão) de todas as conexões abertas
+_conexoes_lock = threading.Lock()
+
+# Incrementada por fechar_conexoes(): conexões de gerações anteriores foram
+# fechadas e conectar() abre outra na próxima chamada da thread
+_geracao = 0
+
+
+def _abrir_conexao():
+    """Abre uma nova conexão já configurada com os pragmas"""
+    # isolation_level=None: sem transações implícitas; transacao() controla BEGIN/COMMIT
+    conn = sqlite3.connect(DB_PATH, timeout=TIMEOUT_BLOQUEIO,
+                           isolation_level=None, check_same_thread=False)
+    for nome, valor in PRAGMAS:
+        conn.execute(f'PRAGMA {nome} = {valor}')
+    return conn
+
+
+def _descartar_conexoes_orfas():
+    """Fecha conexões de threads que já terminaram (chamar com _conexoes_lock)"""
+    vivas = []
+    for thread, conn in _conexoes:
+        if thread.is_alive():
+            vivas.append((thread, conn))
+        else:
+            conn.close()
+    _conexoes[:] = vivas
+
 
 def conectar():
-    """Cria conexão com o banco de dados"""
-    return sqlite3.connect(DB_PATH)
+    """Retorna a conexão persistente da thread atual (abre na primeira chamada)"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.caminho == DB_PATH and _local.geracao == _geracao:
+        return conn
 
+    # Primeira chamada nesta thread, DB_PATH foi alterado ou fechar_conexoes()
+    # já fechou a conexão antiga (fechar de novo não tem efeito)
+    if conn is not None:
+        fechar_conexao()
 
-def inicializar_banco():
-    """Cria as tabelas do banco de dados se não existirem"""
+    conn = _abrir_conexao()
+    _local.conn = conn
+    _local.caminho = DB_PATH
+    _local.geracao = _geracao
+    with _conexoes_lock:
+        _descartar_conexoes_orfas()
+        _conexoes.append((threading.current_thread(), conn))
+    return conn
+
+
+def fechar_conexao():
+    """Fecha a conexão da thread atual (se existir)"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        return
+    _local.conn = None
+    with _conexoes_lock:
+        _conexoes[:] = [(t, c) for t, c in _conexoes if c is not conn]
+    conn.close()
+
+
+def fechar_conexoes():
+    """
+    Fecha as conexões de todas as threads (usar ao encerrar o sistema, depois
+    de parar quem grava). Uma thread que continuar usando o banco abre uma
+    conexão nova na próxima chamada de conectar()
+    """
+    global _geracao
+    with _conexoes_lock:
+        _geracao += 1
+        for _, conn in _conexoes:
+            conn.close()
+        _conexoes.clear()
+    _local.conn = None
+
+
+@contextmanager
+def transacao():
+    """
+    Executa um bloco dentro de uma transação na conexão da thread atual.
+    Faz commit ao final ou rollback em caso de exceção. Chamadas aninhadas
+    participam da transação mais externa.
+
+    Uso:
+        with transacao() as cursor:
+            cursor.execute(...)
+    """
     conn = conectar()
-    cursor = conn.cursor()
+    if conn.in_transaction:
+        yield conn.cursor()
+        return
+
+    # IMMEDIATE reserva a escrita já no início e evita deadlock de upgrade
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn.cursor()
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
 
+@contextmanager
+def leitura():
+    """
+    Executa várias consultas sobre um mesmo instantâneo do banco (transação
+    de leitura, BEGIN DEFERRED). Em WAL não bloqueia o escritor. Dentro de
+    uma transação já aberta apenas participa dela.
+    """
+    conn = conectar()
+    if conn.in_transaction:
+        yield conn.cursor()
+        return
+
+    conn.execute('BEGIN')
+    try:
+        yield conn.cursor()
+    finally:
+        conn.rollback()
+
+
+def inicializar_banco():
+    """
+    Cria as tabelas do banco de dados se não existirem e aplica as migrações.
+    Preenchimentos pendentes de bancos antigos continuam em segundo plano
+    """
+    with transacao() as cursor:
+        _criar_tabelas(cursor)
+
+    aplicar_migracoes()
+    iniciar_preenchimento()
+
+
+def _criar_tabelas(cursor):
+    """Executa os CREATE TABLE do esquema base"""
     # Tabela MERGULHADOR
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS mergulhador (
@@ -74,100 +223,570 @@ def inicializar_banco():
         )
     ''')
 
-    conn.commit()
-    conn.close()
+
+# ==================== MIGRAÇÕES ====================
+# A versão do esquema fica em PRAGMA user_version. O esquema base criado por
+# _criar_tabelas() é a versão 0; cada migração é aplicada uma única vez, em
+# ordem, dentro de uma transação junto com a atualização da versão.
+
+def _migracao_001_indices(cursor):
+    """Índices para as consultas por missão e para a busca de missão em andamento"""
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_medicao_missao_timestamp
+        ON medicao (id_missao, timestamp)
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_video_missao ON video (id_missao)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_audio_missao ON audio (id_missao)')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_missao_inicio
+        ON missao (data_hora_inicio)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_missao_mergulhador
+        ON missao (id_mergulhador)
+    ''')
+    # Índice parcial: só contém as (poucas) missões sem data de fim
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_missao_em_andamento
+        ON missao (data_hora_inicio)
+        WHERE data_hora_fim IS NULL
+    ''')
+
+
+def _migracao_002_estatisticas(cursor):
+    """Tabela de estatísticas por missão mantida por trigger a cada medição inserida"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS missao_estatisticas (
+            id_missao INTEGER PRIMARY KEY,
+            total INTEGER NOT NULL,
+            soma_temperatura FLOAT NOT NULL,
+            soma_quadrados_temperatura FLOAT NOT NULL,
+            temp_min FLOAT,
+            temp_max FLOAT,
+            soma_pressao FLOAT NOT NULL,
+            soma_quadrados_pressao FLOAT NOT NULL,
+            press_min FLOAT,
+            press_max FLOAT,
+            primeiro_timestamp DATETIME,
+            ultimo_timestamp DATETIME,
+            FOREIGN KEY (id_missao) REFERENCES missao(id_missao) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_medicao_estatisticas
+        AFTER INSERT ON medicao
+        BEGIN
+            INSERT INTO missao_estatisticas VALUES (
+                NEW.id_missao, 1,
+                NEW.temperatura, NEW.temperatura * NEW.temperatura,
+                NEW.temperatura, NEW.temperatura,
+                NEW.pressao, NEW.pressao * NEW.pressao,
+                NEW.pressao, NEW.pressao,
+                NEW.timestamp, NEW.timestamp
+            )
+            ON CONFLICT (id_missao) DO UPDATE SET
+                total = total + 1,
+                soma_temperatura = soma_temperatura + excluded.soma_temperatura,
+                soma_quadrados_temperatura = soma_quadrados_temperatura + excluded.soma_quadrados_temperatura,
+                temp_min = MIN(temp_min, excluded.temp_min),
+                temp_max = MAX(temp_max, excluded.temp_max),
+                soma_pressao = soma_pressao + excluded.soma_pressao,
+                soma_quadrados_pressao = soma_quadrados_pressao + excluded.soma_quadrados_pressao,
+                press_min = MIN(press_min, excluded.press_min),
+                press_max = MAX(press_max, excluded.press_max),
+                primeiro_timestamp = MIN(primeiro_timestamp, excluded.primeiro_timestamp),
+                ultimo_timestamp = MAX(ultimo_timestamp, excluded.ultimo_timestamp);
+        END
+    ''')
+    # Bancos criados antes desta versão já têm medições
+    _reconstruir_estatisticas(cursor)
+
+
+# Resoluções (em segundos) das séries agregadas de medições
+RESOLUCOES_AGREGADAS = (1, 60, 600)
+
+# Expressões SQL dos segundos desde a época de uma medição ({p} = prefixo NEW.)
+# Até a versão 4 os buckets vinham do texto; a partir da 5, de timestamp_ms
+_SEGUNDOS_TEXTO = "CAST(strftime('%s', {p}timestamp) AS INTEGER)"
+_SEGUNDOS_MS = "{p}timestamp_ms / 1000"
+# ms de uma medição gravada só com o texto (hora local), como a migração 6 preenche
+_MS_DO_TEXTO = "CAST(strftime('%s', {p}timestamp, 'utc') AS INTEGER) * 1000"
+# A partir da 10: linhas gravadas sem timestamp_ms (só o texto, em hora local)
+# caem no mesmo segundo que a migração 6 calcularia
+_SEGUNDOS_MS_OU_TEXTO = ("COALESCE({p}timestamp_ms / 1000, "
+                         "CAST(strftime('%s', {p}timestamp, 'utc') AS INTEGER))")
+
+
+def _upserts_agregados(segundos):
+    """Corpo do trigger: um UPSERT por resolução; bucket = início do intervalo em segundos"""
+    return ''.join(f'''
+            INSERT INTO medicao_agregada VALUES (
+                NEW.id_missao, {resolucao},
+                {segundos.format(p='NEW.')} / {resolucao} * {resolucao},
+                1, NEW.temperatura, NEW.temperatura, NEW.temperatura,
+                NEW.pressao, NEW.pressao, NEW.pressao
+            )
+            ON CONFLICT (id_missao, resolucao, bucket) DO UPDATE SET
+                total = total + 1,
+                temp_min = MIN(temp_min, excluded.temp_min),
+                temp_max = MAX(temp_max, excluded.temp_max),
+                soma_temperatura = soma_temperatura + excluded.soma_temperatura,
+                press_min = MIN(press_min, excluded.press_min),
+                press_max = MAX(press_max, excluded.press_max),
+                soma_pressao = soma_pressao + excluded.soma_pressao;'''
+        for resolucao in RESOLUCOES_AGREGADAS)
+
+
+def _migracao_003_agregados(cursor):
+    """Séries agregadas (1 s / 1 min / 10 min) mantidas por trigger a cada medição"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS medicao_agregada (
+            id_missao INTEGER NOT NULL,
+            resolucao INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            total INTEGER NOT NULL,
+            temp_min FLOAT,
+            temp_max FLOAT,
+            soma_temperatura FLOAT NOT NULL,
+            press_min FLOAT,
+            press_max FLOAT,
+            soma_pressao FLOAT NOT NULL,
+            PRIMARY KEY (id_missao, resolucao, bucket),
+            FOREIGN KEY (id_missao) REFERENCES missao(id_missao) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    ''')
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_medicao_agregada
+        AFTER INSERT ON medicao
+        BEGIN{_upserts_agregados(_SEGUNDOS_TEXTO)}
+        END
+    ''')
+    _reconstruir_agregados(cursor, segundos=_SEGUNDOS_TEXTO)
+
+
+def _migracao_004_blocos(cursor):
+    """Tabela do armazenamento colunar em blocos (ver armazenamento_blocos.py)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS medicao_bloco (
+            id_bloco INTEGER PRIMARY KEY,
+            id_missao INTEGER NOT NULL,
+            inicio_ms INTEGER NOT NULL,
+            fim_ms INTEGER NOT NULL,
+            total INTEGER NOT NULL,
+            comprimido INTEGER NOT NULL,
+            timestamps BLOB NOT NULL,
+            temperaturas BLOB NOT NULL,
+            pressoes BLOB NOT NULL,
+            temp_min FLOAT,
+            temp_max FLOAT,
+            soma_temperatura FLOAT,
+            press_min FLOAT,
+            press_max FLOAT,
+            soma_pressao FLOAT,
+            FOREIGN KEY (id_missao) REFERENCES missao(id_missao) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_medicao_bloco_missao_inicio
+        ON medicao_bloco (id_missao, inicio_ms)
+    ''')
+
+
+# Data/hora no nome dos arquivos de vídeo/áudio: ..._segNNN_AAAAMMDD_HHMMSS.ext
+_PADRAO_DATA_ARQUIVO = re.compile(r'_(\d{8}_\d{6})\.\w+$')
+
+
+def _migracao_005_timestamps_ms(cursor):
+    """Colunas de época em ms (INTEGER) para ordenação e intervalos"""
+    cursor.execute('ALTER TABLE medicao ADD COLUMN timestamp_ms INTEGER')
+    cursor.execute('ALTER TABLE missao ADD COLUMN inicio_ms INTEGER')
+    cursor.execute('ALTER TABLE missao ADD COLUMN fim_ms INTEGER')
+    cursor.execute('ALTER TABLE video ADD COLUMN inicio_ms INTEGER')
+    cursor.execute('ALTER TABLE audio ADD COLUMN inicio_ms INTEGER')
+
+    # Poucas linhas: preenchidas aqui mesmo. O modificador 'utc' converte o
+    # texto (horário local) para UTC antes de %s
+    cursor.execute('''
+        UPDATE missao SET
+            inicio_ms = CAST(strftime('%s', data_hora_inicio, 'utc') AS INTEGER) * 1000,
+            fim_ms = CAST(strftime('%s', data_hora_fim, 'utc') AS INTEGER) * 1000
+    ''')
+    for tabela, chave in (('video', 'id_video'), ('audio', 'id_audio')):
+        cursor.execute(f'SELECT {chave}, caminho FROM {tabela}')
+        for id_arquivo, caminho in cursor.fetchall():
+            encontrado = _PADRAO_DATA_ARQUIVO.search(caminho)
+            if encontrado:
+                inicio = datetime.strptime(encontrado.group(1), "%Y%m%d_%H%M%S")
+                cursor.execute(f'UPDATE {tabela} SET inicio_ms = ? WHERE {chave} = ?',
+                               (para_ms(inicio), id_arquivo))
+
+    # Índices passam a usar as colunas em ms
+    cursor.execute('DROP INDEX IF EXISTS idx_medicao_missao_timestamp')
+    cursor.execute('DROP INDEX IF EXISTS idx_missao_inicio')
+    cursor.execute('DROP INDEX IF EXISTS idx_missao_em_andamento')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_medicao_missao_timestamp_ms
+        ON medicao (id_missao, timestamp_ms)
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_missao_inicio_ms ON missao (inicio_ms)')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_missao_em_andamento_ms
+        ON missao (inicio_ms)
+        WHERE fim_ms IS NULL
+    ''')
+
+    # Séries agregadas passam a usar timestamp_ms; reconstruídas na migração 6
+    cursor.execute('DROP TRIGGER IF EXISTS trg_medicao_agregada')
+    cursor.execute(f'''
+        CREATE TRIGGER trg_medicao_agregada
+        AFTER INSERT ON medicao
+        BEGIN{_upserts_agregados(_SEGUNDOS_MS)}
+        END
+    ''')
+    cursor.execute('DELETE FROM medicao_agregada')
+
+
+def _migracao_006_preencher_timestamps_ms(cursor):
+    """
+    Agenda o preenchimento de medicao.timestamp_ms das linhas antigas. O
+    preenchimento roda em segundo plano (preencher_timestamps_ms), para não
+    travar a inicialização em bancos grandes
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS preenchimento_pendente (
+            tarefa TEXT PRIMARY KEY,
+            proximo_id INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        INSERT OR IGNORE INTO preenchimento_pendente (tarefa, proximo_id)
+        SELECT 'timestamp_ms', 0 WHERE EXISTS (SELECT 1 FROM medicao)
+    ''')
+
+
+def _migracao_007_busca_missoes(cursor):
+    """Índice FTS5 do nome/identificador das missões e índice para ordenar por nome"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_missao_nome ON missao (nome_missao)')
+
+    # FTS5 com conteúdo externo: o texto fica só na tabela missao
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE missao_busca USING fts5(
+                nome_missao, identificador,
+                content='missao', content_rowid='id_missao',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        # SQLite compilado sem FTS5: a busca por nome usa LIKE
+        log.warning("FTS5 indisponível, busca de missões sem índice: %s", e)
+        return
+
+    cursor.execute('''
+        CREATE TRIGGER trg_missao_busca_insert AFTER INSERT ON missao
+        BEGIN
+            INSERT INTO missao_busca (rowid, nome_missao, identificador)
+            VALUES (new.id_missao, new.nome_missao, new.identificador);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER trg_missao_busca_delete AFTER DELETE ON missao
+        BEGIN
+            INSERT INTO missao_busca (missao_busca, rowid, nome_missao, identificador)
+            VALUES ('delete', old.id_missao, old.nome_missao, old.identificador);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER trg_missao_busca_update AFTER UPDATE OF nome_missao, identificador ON missao
+        BEGIN
+            INSERT INTO missao_busca (missao_busca, rowid, nome_missao, identificador)
+            VALUES ('delete', old.id_missao, old.nome_missao, old.identificador);
+            INSERT INTO missao_busca (rowid, nome_missao, identificador)
+            VALUES (new.id_missao, new.nome_missao, new.identificador);
+        END
+    ''')
+    cursor.execute("INSERT INTO missao_busca (missao_busca) VALUES ('rebuild')")
+
+
+def _migracao_008_dispositivo(cursor):
+    """Identificador do dispositivo (placa/porta) em cada medição, para vários sensores por missão"""
+    # NULL: medições anteriores, de um único sensor
+    cursor.execute('ALTER TABLE medicao ADD COLUMN id_dispositivo TEXT')
+    cursor.execute('ALTER TABLE medicao_bloco ADD COLUMN id_dispositivo TEXT')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_medicao_missao_dispositivo_ms
+        ON medicao (id_missao, id_dispositivo, timestamp_ms)
+    ''')
+
+
+def _migracao_009_alarmes(cursor):
+    """Eventos de alarme (ativação e normalização) gerados durante a missão"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS alarme (
+            id_alarme INTEGER PRIMARY KEY AUTOINCREMENT,
+            id_missao INTEGER NOT NULL,
+            id_dispositivo TEXT,
+            timestamp_ms INTEGER NOT NULL,
+            regra TEXT NOT NULL,
+            severidade TEXT NOT NULL,
+            ativo INTEGER NOT NULL,
+            valor FLOAT,
+            mensagem TEXT NOT NULL,
+            FOREIGN KEY (id_missao) REFERENCES missao(id_missao) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_alarme_missao_ms
+        ON alarme (id_missao, timestamp_ms)
+    ''')
+
+
+def _migracao_010_agregados_sem_ms(cursor):
+    """Trigger das séries agregadas aceita medições inseridas sem timestamp_ms"""
+    cursor.execute('DROP TRIGGER IF EXISTS trg_medicao_agregada')
+    cursor.execute(f'''
+        CREATE TRIGGER trg_medicao_agregada
+        AFTER INSERT ON medicao
+        BEGIN{_upserts_agregados(_SEGUNDOS_MS_OU_TEXTO)}
+        END
+    ''')
+
+
+def _migracao_011_ordenacao_missoes(cursor):
+    """Índices nas expressões de ordenação da lista de missões (ver ORDENACOES_MISSOES)"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_missao_ordem_inicio ON missao (COALESCE(inicio_ms, 0))')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_missao_ordem_nome ON missao (COALESCE(nome_missao, ''))")
+
+
+# (versão, descrição, função, em_lotes) em ordem crescente de versão
+# Migrações em_lotes controlam as próprias transações (não recebem cursor)
+# e precisam poder ser reexecutadas se forem interrompidas
+MIGRACOES = [
+    (1, "Índices de medição, vídeo, áudio e missões", _migracao_001_indices, False),
+    (2, "Estatísticas incrementais por missão", _migracao_002_estatisticas, False),
+    (3, "Séries agregadas de medições (1 s / 1 min / 10 min)", _migracao_003_agregados, False),
+    (4, "Armazenamento colunar de medições em blocos", _migracao_004_blocos, False),
+    (5, "Colunas de timestamp em ms (INTEGER)", _migracao_005_timestamps_ms, False),
+    (6, "Preenchimento de medicao.timestamp_ms em segundo plano", _migracao_006_preencher_timestamps_ms, False),
+    (7, "Busca textual e ordenação da lista de missões", _migracao_007_busca_missoes, False),
+    (8, "Dispositivo de origem das medições", _migracao_008_dispositivo, False),
+    (9, "Eventos de alarme por missão", _migracao_009_alarmes, False),
+    (10, "Séries agregadas de medições sem timestamp_ms", _migracao_010_agregados_sem_ms, False),
+    (11, "Ordenação da lista de missões com início ou nome nulos", _migracao_011_ordenacao_missoes, False),
+]
+
+
+def get_versao_esquema():
+    """Retorna a versão atual do esquema (PRAGMA user_version)"""
+    return conectar().execute('PRAGMA user_version').fetchone()[0]
+
+
+def aplicar_migracoes(versao_alvo=None):
+    """Aplica em ordem as migrações pendentes e retorna a versão final do esquema"""
+    versao = get_versao_esquema()
+
+    for numero, descricao, migracao, em_lotes in MIGRACOES:
+        if numero <= versao:
+            continue
+        if versao_alvo is not None and numero > versao_alvo:
+            break
+
+        if em_lotes:
+            migracao()
+            with transacao() as cursor:
+                cursor.execute(f'PRAGMA user_version = {numero:d}')
+        else:
+            with transacao() as cursor:
+                migracao(cursor)
+                cursor.execute(f'PRAGMA user_version = {numero:d}')
+        versao = numero
+        log.info("Migração %d aplicada: %s", numero, descricao)
+
+    return versao
+
+
+# ==================== PREENCHIMENTO EM SEGUNDO PLANO ====================
+
+# Medições atualizadas por transação do preenchimento de timestamp_ms
+TAMANHO_LOTE_PREENCHIMENTO = 20000
+
+_preenchimento = None  # (thread, Event de parada)
+_preenchimento_lock = threading.Lock()
+
+
+def preenchimento_pendente():
+    """True enquanto há medições antigas sem timestamp_ms (ver migração 6)"""
+    try:
+        return conectar().execute(
+            "SELECT 1 FROM preenchimento_pendente WHERE tarefa = 'timestamp_ms'").fetchone() is not None
+    except sqlite3.OperationalError:
+        return False  # Esquema anterior à migração 6
+
+
+def iniciar_preenchimento():
+    """Inicia a thread de preenchimento se houver trabalho pendente (retorna a thread ou None)"""
+    global _preenchimento
+    with _preenchimento_lock:
+        if _preenchimento is not None and _preenchimento[0].is_alive():
+            return _preenchimento[0]
+        if not preenchimento_pendente():
+            return None
+        parar = threading.Event()
+        thread = threading.Thread(target=preencher_timestamps_ms, kwargs={'parar': parar},
+                                  name='preenchimento-timestamp-ms', daemon=True)
+        _preenchimento = (thread, parar)
+        thread.start()
+        return thread
+
+
+def parar_preenchimento(timeout=10):
+    """Interrompe o preenchimento no fim do lote atual (retomado na próxima inicialização)"""
+    with _preenchimento_lock:
+        if _preenchimento is None:
+            return
+        thread, parar = _preenchimento
+    parar.set()
+    thread.join(timeout)
+
+
+def preencher_timestamps_ms(tamanho_lote=TAMANHO_LOTE_PREENCHIMENTO, parar=None):
+    """
+    Preenche medicao.timestamp_ms das linhas antigas em faixas de id_medicao,
+    uma transação curta por faixa, guardando a próxima faixa em
+    preenchimento_pendente: pode ser interrompido e continua de onde parou.
+    Depois reconstrói as séries agregadas das missões que ficaram sem elas
+    (a migração 5 as apagou). Até terminar, consultas por intervalo de tempo
+    não enxergam as medições antigas ainda sem timestamp_ms
+    """
+    caminho = DB_PATH
+    linha = conectar().execute(
+        "SELECT proximo_id FROM preenchimento_pendente WHERE tarefa = 'timestamp_ms'").fetchone()
+    if linha is None:
+        return True
+    proximo_id = linha[0]
+    maior_id = conectar().execute('SELECT MAX(id_medicao) FROM medicao').fetchone()[0] or 0
+    log.info("Preenchendo timestamp_ms das medições antigas a partir do id %d", proximo_id)
+
+    while proximo_id <= maior_id:
+        if (parar is not None and parar.is_set()) or DB_PATH != caminho:
+            log.info("Preenchimento de timestamp_ms interrompido no id %d", proximo_id)
+            return False
+        with transacao() as cursor:
+            cursor.execute(f'''
+                UPDATE medicao
+                SET timestamp_ms = {_MS_DO_TEXTO.format(p='')}
+                WHERE id_medicao BETWEEN ? AND ? AND timestamp_ms IS NULL
+            ''', (proximo_id, proximo_id + tamanho_lote - 1))
+            proximo_id += tamanho_lote
+            cursor.execute("UPDATE preenchimento_pendente SET proximo_id = ? WHERE tarefa = 'timestamp_ms'",
+                           (proximo_id,))
+
+    missoes = conectar().execute('''
+        SELECT DISTINCT id_missao FROM medicao
+        WHERE id_missao NOT IN (SELECT id_missao FROM medicao_agregada)
+    ''').fetchall()
+    for (id_missao,) in missoes:
+        if (parar is not None and parar.is_set()) or DB_PATH != caminho:
+            return False
+        with transacao() as cursor:
+            _reconstruir_agregados(cursor, id_missao)
+
+    with transacao() as cursor:
+        cursor.execute("DELETE FROM preenchimento_pendente WHERE tarefa = 'timestamp_ms'")
+    invalidar_pacote_missao()
+    log.info("Preenchimento de timestamp_ms concluído")
+    return True
 
 
 # ==================== MERGULHADOR ====================
 
 def inserir_mergulhador(nome, idade, sexo):
     """Insere um novo mergulhador no banco"""
-    conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO mergulhador (nome, idade, sexo)
-        VALUES (?, ?, ?)
-    ''', (nome, idade, sexo))
-    conn.commit()
-    id_mergulhador = cursor.lastrowid
-    conn.close()
+    with transacao() as cursor:
+        cursor.execute('''
+            INSERT INTO mergulhador (nome, idade, sexo)
+            VALUES (?, ?, ?)
+        ''', (nome, idade, sexo))
+        id_mergulhador = cursor.lastrowid
     return id_mergulhador
 
 
 def listar_mergulhadores():
     """Retorna todos os mergulhadores"""
-    conn = conectar()
-    cursor = conn.cursor()
+    cursor = conectar().cursor()
     cursor.execute('SELECT * FROM mergulhador ORDER BY nome')
     mergulhadores = cursor.fetchall()
-    conn.close()
     return mergulhadores
 
 
 def buscar_mergulhador(id_mergulhador):
     """Busca um mergulhador pelo ID"""
-    conn = conectar()
-    cursor = conn.cursor()
+    cursor = conectar().cursor()
     cursor.execute('SELECT * FROM mergulhador WHERE id_mergulhador = ?', (id_mergulhador,))
     mergulhador = cursor.fetchone()
-    conn.close()
     return mergulhador
 
 
 # ==================== MISSAO ====================
 
 def inserir_missao(id_mergulhador, nome_missao, data_hora_inicio, identificador, data_hora_fim=None):
-    """Insere uma nova missão no banco"""
-    conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO missao (id_mergulhador, nome_missao, data_hora_inicio, identificador, data_hora_fim)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (id_mergulhador, nome_missao, data_hora_inicio, identificador, data_hora_fim))
-    conn.commit()
-    id_missao = cursor.lastrowid
-    conn.close()
+    """Insere uma nova missão no banco (datas em texto "%Y-%m-%d %H:%M:%S", datetime ou ms)"""
+    inicio_ms, fim_ms = para_ms(data_hora_inicio), para_ms(data_hora_fim)
+    with transacao() as cursor:
+        cursor.execute('''
+            INSERT INTO missao (id_mergulhador, nome_missao, data_hora_inicio, identificador,
+                                data_hora_fim, inicio_ms, fim_ms)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (id_mergulhador, nome_missao, ms_para_texto(inicio_ms), identificador,
+              ms_para_texto(fim_ms) if fim_ms is not None else None, inicio_ms, fim_ms))
+        id_missao = cursor.lastrowid
     return id_missao
 
 
 def atualizar_fim_missao(id_missao, data_hora_fim):
-    """Atualiza a data/hora de fim de uma missão"""
-    conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE missao SET data_hora_fim = ? WHERE id_missao = ?
-    ''', (data_hora_fim, id_missao))
-    conn.commit()
-    conn.close()
+    """Atualiza a data/hora de fim de uma missão (texto, datetime ou ms)"""
+    fim_ms = para_ms(data_hora_fim)
+    with transacao() as cursor:
+        cursor.execute('''
+            UPDATE missao SET data_hora_fim = ?, fim_ms = ? WHERE id_missao = ?
+        ''', (ms_para_texto(fim_ms), fim_ms, id_missao))
+    invalidar_pacote_missao(id_missao)
 
 
 def listar_missoes():
     """Retorna todas as missões com informações do mergulhador"""
-    conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute('''
+    return _listar_missoes('m.data_hora_inicio', 'm.data_hora_fim')
+
+
+def listar_missoes_ms():
+    """Como listar_missoes, com início e fim em ms (inteiros) em vez de texto"""
+    return _listar_missoes('m.inicio_ms', 'm.fim_ms')
+
+
+def _listar_missoes(coluna_inicio, coluna_fim):
+    cursor = conectar().cursor()
+    cursor.execute(f'''
         SELECT
             m.id_missao,
             m.identificador,
             m.nome_missao,
-            m.data_hora_inicio,
-            m.data_hora_fim,
+            {coluna_inicio},
+            {coluna_fim},
             mg.nome,
             mg.idade,
             mg.sexo
         FROM missao m
         JOIN mergulhador mg ON m.id_mergulhador = mg.id_mergulhador
-        ORDER BY m.data_hora_inicio DESC
+        ORDER BY m.inicio_ms DESC
     ''')
     missoes = cursor.fetchall()
-    conn.close()
     return missoes
 
 
 def buscar_missao(id_missao):
     """Busca uma missão específica pelo ID"""
-    conn = conectar()
-    cursor = conn.cursor()
+    cursor = conectar().cursor()
     cursor.execute('''
         SELECT
             m.id_missao,
@@ -184,14 +803,118 @@ def buscar_missao(id_missao):
         WHERE m.id_missao = ?
     ''', (id_missao,))
     missao = cursor.fetchone()
-    conn.close()
     return missao
 
 
+# Expressões pelas quais consultar_missoes pode ordenar. NULL vira um valor
+# definido (início desconhecido = o mais antigo; texto vazio): a comparação
+# da paginação por chave com NULL nunca é verdadeira e pularia essas missões
+ORDENACOES_MISSOES = {
+    'inicio': 'COALESCE(m.inicio_ms, 0)',
+    'nome': "COALESCE(m.nome_missao, '')",
+    'identificador': "COALESCE(m.identificador, '')",
+    'mergulhador': "COALESCE(mg.nome, '')",
+}
+
+# Filtro de status de consultar_missoes
+STATUS_MISSOES = {
+    'em_andamento': 'm.fim_ms IS NULL',
+    'finalizada': 'm.fim_ms IS NOT NULL',
+}
+
+
+def _termos_busca(texto):
+    """Converte o texto digitado em uma consulta FTS5 (prefixo de cada palavra)"""
+    palavras = re.findall(r'\w+', texto)
+    return ' '.join(f'"{palavra}"*' for palavra in palavras)
+
+
+def _filtros_missoes(cursor, id_mergulhador=None, inicio=None, fim=None, status=None, busca=None):
+    """Monta o WHERE (lista de condições) e os parâmetros dos filtros da lista de missões"""
+    filtros = []
+    parametros = []
+    if id_mergulhador is not None:
+        filtros.append('m.id_mergulhador = ?')
+        parametros.append(id_mergulhador)
+    if inicio is not None:
+        filtros.append('m.inicio_ms >= ?')
+        parametros.append(para_ms(inicio))
+    if fim is not None:
+        filtros.append('m.inicio_ms <= ?')
+        parametros.append(para_ms(fim))
+    if status is not None:
+        if status not in STATUS_MISSOES:
+            raise ValueError(f"Status inválido: {status}")
+        filtros.append(STATUS_MISSOES[status])
+    if busca and busca.strip():
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'missao_busca'")
+        termos = _termos_busca(busca)
+        if cursor.fetchone() and termos:
+            filtros.append('m.id_missao IN (SELECT rowid FROM missao_busca WHERE missao_busca MATCH ?)')
+            parametros.append(termos)
+        else:
+            filtros.append("(m.nome_missao LIKE ? ESCAPE '\\' OR m.identificador LIKE ? ESCAPE '\\')")
+            padrao = '%' + re.sub(r'([%_\\])', r'\\\1', busca.strip()) + '%'
+            parametros.extend((padrao, padrao))
+    return filtros, parametros
+
+
+def consultar_missoes(id_mergulhador=None, inicio=None, fim=None, status=None, busca=None,
+                      ordenar_por='inicio', decrescente=True, limite=100, apos=None):
+    """
+    Lista uma página de missões já formatada para exibição.
+
+    Filtros: id_mergulhador, inicio/fim (data de início da missão; ms, datetime
+    ou texto), status ('em_andamento' ou 'finalizada') e busca (palavras do nome
+    ou identificador, por prefixo).
+    ordenar_por: chave de ORDENACOES_MISSOES. apos: chave devolvida pela página
+    anterior (paginação por chave, custo constante em qualquer página).
+
+    Retorna (linhas, proxima_chave); cada linha é
+    (id_missao, identificador, mergulhador, nome_missao, inicio, fim, status)
+    com datas como "%d/%m/%Y %H:%M". proxima_chave é None na última página.
+    """
+    if ordenar_por not in ORDENACOES_MISSOES:
+        raise ValueError(f"Ordenação inválida: {ordenar_por}")
+    coluna = ORDENACOES_MISSOES[ordenar_por]
+    direcao, comparacao = ('DESC', '<') if decrescente else ('ASC', '>')
+
+    cursor = conectar().cursor()
+    filtros, parametros = _filtros_missoes(cursor, id_mergulhador, inicio, fim, status, busca)
+    if apos is not None:
+        filtros.append(f'({coluna}, m.id_missao) {comparacao} (?, ?)')
+        parametros.extend(apos)
+    onde = ('WHERE ' + ' AND '.join(filtros)) if filtros else ''
+
+    # A chave de ordenação vai no fim de cada linha e é removida antes de retornar
+    cursor.execute(f'''
+        SELECT
+            m.id_missao,
+            m.identificador,
+            mg.nome || ' (' || mg.idade || 'a, ' || mg.sexo || ')',
+            m.nome_missao,
+            strftime('%d/%m/%Y %H:%M', m.inicio_ms / 1000, 'unixepoch', 'localtime'),
+            COALESCE(strftime('%d/%m/%Y %H:%M', m.fim_ms / 1000, 'unixepoch', 'localtime'),
+                     'Em andamento'),
+            CASE WHEN m.fim_ms IS NULL THEN 'Em andamento' ELSE 'Finalizada' END,
+            {coluna}
+        FROM missao m
+        JOIN mergulhador mg ON m.id_mergulhador = mg.id_mergulhador
+        {onde}
+        ORDER BY {coluna} {direcao}, m.id_missao {direcao}
+        LIMIT ?
+    ''', (*parametros, limite))
+    linhas = cursor.fetchall()
+
+    proxima_chave = None
+    if len(linhas) == limite:
+        proxima_chave = (linhas[-1][-1], linhas[-1][0])
+    return [linha[:-1] for linha in linhas], proxima_chave
+
+
 def verificar_missao_em_andamento():
     """Verifica se existe alguma missão em andamento (sem data_hora_fim)"""
-    conn = conectar()
-    cursor = conn.cursor()
+    cursor = conectar().cursor()
     cursor.execute('''
         SELECT
             m.id_missao,
@@ -201,144 +924,660 @@ def verificar_missao_em_andamento():
             mg.nome
         FROM missao m
         JOIN mergulhador mg ON m.id_mergulhador = mg.id_mergulhador
-        WHERE m.data_hora_fim IS NULL
-        ORDER BY m.data_hora_inicio DESC
+        WHERE m.fim_ms IS NULL
+        ORDER BY m.inicio_ms DESC
         LIMIT 1
     ''')
     missao = cursor.fetchone()
-    conn.close()
     return missao
 
 
 # ==================== MEDICAO ====================
+# Backend de armazenamento das medições:
+#   'linhas' - uma linha por medição na tabela medicao (padrão)
+#   'blocos' - blocos colunares compactados por intervalo de tempo
+#              (ver servidor/armazenamento_blocos.py)
+BACKEND_MEDICOES = 'linhas'
+
+
+def _blocos():
+    """Retorna o armazenamento em blocos (import tardio evita import circular)"""
+    from servidor.armazenamento_blocos import get_armazenamento
+    return get_armazenamento()
+
 
-def inserir_medicao(id_missao, timestamp, temperatura, pressao):
-    """Insere uma medição de sensor"""
+def _em_blocos(id_missao):
+    """
+    True se as medições da missão são lidas dos blocos. Uma missão só com
+    blocos (migrada com remover_linhas=True ou gravada no backend de blocos)
+    ou só com linhas usa a que tem; com as duas, ou ainda sem nenhuma
+    gravada (blocos abertos em memória), vale BACKEND_MEDICOES
+    """
     conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO medicao (id_missao, timestamp, temperatura, pressao)
-        VALUES (?, ?, ?, ?)
-    ''', (id_missao, timestamp, temperatura, pressao))
-    conn.commit()
-    id_medicao = cursor.lastrowid
-    conn.close()
+    tem_blocos = conn.execute('SELECT 1 FROM medicao_bloco WHERE id_missao = ? LIMIT 1',
+                              (id_missao,)).fetchone() is not None
+    tem_linhas = conn.execute('SELECT 1 FROM medicao WHERE id_missao = ? LIMIT 1',
+                              (id_missao,)).fetchone() is not None
+    if tem_blocos != tem_linhas:
+        return tem_blocos
+    return BACKEND_MEDICOES == 'blocos'
+
+
+def _linhas_medicao(medicoes):
+    """Converte (id_missao, timestamp, temp, press[, id_dispositivo]) em linhas com texto e ms"""
+    for id_missao, timestamp, temperatura, pressao, *dispositivo in medicoes:
+        ms = para_ms(timestamp)
+        yield id_missao, ms_para_texto(ms), ms, temperatura, pressao, dispositivo[0] if dispositivo else None
+
+
+def inserir_medicao(id_missao, timestamp, temperatura, pressao, id_dispositivo=None):
+    """Insere uma medição de sensor (timestamp em ms, datetime ou texto)"""
+    medicao = (id_missao, timestamp, temperatura, pressao, id_dispositivo)
+    if BACKEND_MEDICOES == 'blocos':
+        _blocos().anexar_lote([medicao])
+        invalidar_pacote_missao(id_missao)
+        return None
+
+    with transacao() as cursor:
+        cursor.execute('''
+            INSERT INTO medicao (id_missao, timestamp, timestamp_ms, temperatura, pressao, id_dispositivo)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', next(_linhas_medicao([medicao])))
+        id_medicao = cursor.lastrowid
+    invalidar_pacote_missao(id_missao)
     return id_medicao
 
 
-def listar_medicoes_por_missao(id_missao):
-    """Retorna todas as medições de uma missão"""
-    conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM medicao
+def inserir_medicoes(medicoes):
+    """
+    Insere várias medições em uma única transação (commit em grupo)
+    medicoes: lista de tuplas (id_missao, timestamp, temperatura, pressao) ou
+    (id_missao, timestamp, temperatura, pressao, id_dispositivo), timestamp
+    em ms, datetime ou texto
+    """
+    if BACKEND_MEDICOES == 'blocos':
+        _blocos().anexar_lote(medicoes)
+    else:
+        with transacao() as cursor:
+            cursor.executemany('''
+                INSERT INTO medicao (id_missao, timestamp, timestamp_ms, temperatura, pressao, id_dispositivo)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', _linhas_medicao(medicoes))
+
+    for id_missao in {medicao[0] for medicao in medicoes}:
+        invalidar_pacote_missao(id_missao)
+
+
+def descarregar_medicoes():
+    """Grava medições que o backend ainda mantém em memória (blocos abertos)"""
+    if BACKEND_MEDICOES == 'blocos':
+        _blocos().descarregar()
+        invalidar_pacote_missao()
+
+
+# Colunas retornadas por padrão (formato original das linhas de medicao)
+COLUNAS_MEDICAO = ('id_medicao', 'id_missao', 'timestamp', 'temperatura', 'pressao')
+
+# Colunas que podem ser pedidas em iterar_medicoes
+COLUNAS_MEDICAO_VALIDAS = COLUNAS_MEDICAO + ('timestamp_ms', 'id_dispositivo')
+
+
+def iterar_medicoes(id_missao, tamanho_lote=5000, inicio=None, fim=None, colunas=None,
+                    id_dispositivo=None):
+    """
+    Gera as medições de uma missão em lotes (listas de tuplas) de até tamanho_lote,
+    em ordem de (timestamp_ms, id_medicao). Cada lote é uma consulta própria com
+    paginação por chave, então a memória não cresce com o tamanho da missão e
+    nenhuma leitura fica aberta entre lotes.
+
+    inicio/fim: limites inclusivos (ms, datetime ou texto "%Y-%m-%d %H:%M:%S")
+    colunas: subconjunto de COLUNAS_MEDICAO_VALIDAS (padrão: COLUNAS_MEDICAO)
+    id_dispositivo: só as medições deste dispositivo (padrão: todos)
+    """
+    colunas = tuple(colunas or COLUNAS_MEDICAO)
+    invalidas = set(colunas) - set(COLUNAS_MEDICAO_VALIDAS)
+    if invalidas:
+        raise ValueError(f"Colunas inválidas: {', '.join(sorted(invalidas))}")
+
+    if _em_blocos(id_missao):
+        yield from _blocos().iterar_medicoes(id_missao, tamanho_lote, inicio, fim, colunas, id_dispositivo)
+        return
+
+    cursor = conectar().cursor()
+
+    # Enquanto o preenchimento em segundo plano (migração 6) não passou por esta
+    # missão, linhas antigas têm timestamp_ms NULL: a chave usa o ms derivado
+    # do texto (a comparação da paginação com NULL nunca é verdadeira)
+    cursor.execute('SELECT 1 FROM medicao WHERE id_missao = ? AND timestamp_ms IS NULL LIMIT 1',
+                   (id_missao,))
+    ms = 'timestamp_ms'
+    if cursor.fetchone() is not None:
+        ms = f"COALESCE(timestamp_ms, {_MS_DO_TEXTO.format(p='')})"
+
+    # A chave (timestamp_ms, id_medicao) vai no fim de cada linha e é removida se não pedida
+    n = len(colunas)
+    chave_extra = colunas[-2:] != ('timestamp_ms', 'id_medicao')
+    selecao = ', '.join([ms if coluna == 'timestamp_ms' else coluna for coluna in colunas]
+                        + ([ms, 'id_medicao'] if chave_extra else []))
+
+    filtros = ['id_missao = ?']
+    parametros = [id_missao]
+    if id_dispositivo is not None:
+        filtros.append('id_dispositivo = ?')
+        parametros.append(id_dispositivo)
+    if inicio is not None:
+        filtros.append(f'{ms} >= ?')
+        parametros.append(para_ms(inicio))
+    if fim is not None:
+        filtros.append(f'{ms} <= ?')
+        parametros.append(para_ms(fim))
+    onde = ' AND '.join(filtros)
+
+    ultima_chave = None
+    while True:
+        if ultima_chave is None:
+            cursor.execute(f'''
+                SELECT {selecao} FROM medicao
+                WHERE {onde}
+                ORDER BY {ms}, id_medicao
+                LIMIT ?
+            ''', (*parametros, tamanho_lote))
+        else:
+            cursor.execute(f'''
+                SELECT {selecao} FROM medicao
+                WHERE {onde} AND ({ms}, id_medicao) > (?, ?)
+                ORDER BY {ms}, id_medicao
+                LIMIT ?
+            ''', (*parametros, *ultima_chave, tamanho_lote))
+
+        lote = cursor.fetchall()
+        if not lote:
+            return
+
+        ultima_chave = lote[-1][-2:]
+        if chave_extra:
+            lote = [linha[:n] for linha in lote]
+        yield lote
+
+        if len(lote) < tamanho_lote:
+            return
+
+
+def listar_medicoes_por_missao(id_missao, inicio=None, fim=None):
+    """Retorna todas as medições de uma missão (em lista; ver iterar_medicoes)"""
+    medicoes = []
+    for lote in iterar_medicoes(id_missao, inicio=inicio, fim=fim):
+        medicoes.extend(lote)
+    return medicoes
+
+
+def listar_dispositivos_missao(id_missao):
+    """Dispositivos que enviaram medições na missão (None = medições sem dispositivo)"""
+    tabela = 'medicao_bloco' if _em_blocos(id_missao) else 'medicao'
+    cursor = conectar().execute(f'''
+        SELECT DISTINCT id_dispositivo FROM {tabela}
         WHERE id_missao = ?
-        ORDER BY timestamp
+        ORDER BY id_dispositivo
     ''', (id_missao,))
-    medicoes = cursor.fetchall()
-    conn.close()
-    return medicoes
+    return [linha[0] for linha in cursor.fetchall()]
 
 
 def get_estatisticas_medicoes(id_missao):
-    """Retorna estatísticas das medições de uma missão"""
-    conn = conectar()
-    cursor = conn.cursor()
+    """
+    Retorna estatísticas das medições de uma missão
+    (total, temp_min, temp_max, temp_media, press_min, press_max, press_media)
+    Lidas da tabela missao_estatisticas, sem percorrer as medições.
+    """
+    cursor = conectar().cursor()
     cursor.execute('''
         SELECT
-            COUNT(*) as total,
-            MIN(temperatura) as temp_min,
-            MAX(temperatura) as temp_max,
-            AVG(temperatura) as temp_media,
-            MIN(pressao) as press_min,
-            MAX(pressao) as press_max,
-            AVG(pressao) as press_media
-        FROM medicao
+            total,
+            temp_min,
+            temp_max,
+            soma_temperatura / total as temp_media,
+            press_min,
+            press_max,
+            soma_pressao / total as press_media
+        FROM missao_estatisticas
         WHERE id_missao = ?
     ''', (id_missao,))
     stats = cursor.fetchone()
-    conn.close()
-    return stats
+    return stats or (0, None, None, None, None, None, None)
 
 
-# ==================== VIDEO ====================
+def _desvio_padrao(total, soma, soma_quadrados):
+    """Desvio padrão populacional a partir das somas acumuladas"""
+    variancia = (soma_quadrados - soma * soma / total) / total
+    return max(variancia, 0.0) ** 0.5
+
+
+def get_estatisticas_completas(id_missao):
+    """Retorna um dicionário com as estatísticas da missão, incluindo desvio padrão e período"""
+    cursor = conectar().cursor()
+    cursor.execute('SELECT * FROM missao_estatisticas WHERE id_missao = ?', (id_missao,))
+    linha = cursor.fetchone()
+    if linha is None:
+        return None
+
+    (_, total, soma_t, soma_q_t, temp_min, temp_max,
+     soma_p, soma_q_p, press_min, press_max, primeiro, ultimo) = linha
+    return {
+        'total': total,
+        'temp_min': temp_min,
+        'temp_max': temp_max,
+        'temp_media': soma_t / total,
+        'temp_desvio': _desvio_padrao(total, soma_t, soma_q_t),
+        'press_min': press_min,
+        'press_max': press_max,
+        'press_media': soma_p / total,
+        'press_desvio': _desvio_padrao(total, soma_p, soma_q_p),
+        'primeiro_timestamp': primeiro,
+        'ultimo_timestamp': ultimo
+    }
+
+
+def _missoes_em_blocos(cursor, id_missao=None):
+    """Missões (todas ou só id_missao) cujas medições são lidas dos blocos (ver _em_blocos)"""
+    if id_missao is not None:
+        return [id_missao] if _em_blocos(id_missao) else []
+    cursor.execute('SELECT DISTINCT id_missao FROM medicao_bloco')
+    return [missao for (missao,) in cursor.fetchall() if _em_blocos(missao)]
+
+
+def _filtro_reconstrucao(id_missao, em_blocos):
+    """WHERE das reconstruções por SQL: a missão pedida (ou todas) menos as que estão em blocos"""
+    filtros, parametros = [], []
+    if id_missao is not None:
+        filtros.append('id_missao = ?')
+        parametros.append(id_missao)
+    if em_blocos:
+        filtros.append(f"id_missao NOT IN ({', '.join('?' * len(em_blocos))})")
+        parametros.extend(em_blocos)
+    return ('WHERE ' + ' AND '.join(filtros)) if filtros else '', tuple(parametros)
+
+
+def acumular_agregados(acumulado, timestamps_ms, temperaturas, pressoes):
+    """
+    Soma amostras (sequências alinhadas) aos intervalos de todas as resoluções:
+    acumulado[(resolucao, bucket)] = [total, temp_min, temp_max, soma_t, press_min, press_max, soma_p]
+    """
+    for ms, temperatura, pressao in zip(timestamps_ms, temperaturas, pressoes):
+        segundo = ms // 1000
+        for resolucao in RESOLUCOES_AGREGADAS:
+            chave = (resolucao, segundo // resolucao * resolucao)
+            valores = acumulado.get(chave)
+            if valores is None:
+                acumulado[chave] = [1, temperatura, temperatura, temperatura, pressao, pressao, pressao]
+            else:
+                valores[0] += 1
+                valores[1] = min(valores[1], temperatura)
+                valores[2] = max(valores[2], temperatura)
+                valores[3] += temperatura
+                valores[4] = min(valores[4], pressao)
+                valores[5] = max(valores[5], pressao)
+                valores[6] += pressao
+    return acumulado
+
+
+def gravar_agregados(cursor, id_missao, acumulado):
+    """Soma os intervalos acumulados em medicao_agregada (mesmo UPSERT do trigger)"""
+    cursor.executemany('''
+        INSERT INTO medicao_agregada VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (id_missao, resolucao, bucket) DO UPDATE SET
+            total = total + excluded.total,
+            temp_min = MIN(temp_min, excluded.temp_min),
+            temp_max = MAX(temp_max, excluded.temp_max),
+            soma_temperatura = soma_temperatura + excluded.soma_temperatura,
+            press_min = MIN(press_min, excluded.press_min),
+            press_max = MAX(press_max, excluded.press_max),
+            soma_pressao = soma_pressao + excluded.soma_pressao
+    ''', ((id_missao, resolucao, bucket, *valores) for (resolucao, bucket), valores in acumulado.items()))
+
+
+def _reconstruir_de_blocos(cursor, id_missao):
+    """Recalcula estatísticas e séries agregadas de uma missão a partir dos blocos, um por vez"""
+    total = 0
+    soma_t = soma_q_t = soma_p = soma_q_p = 0.0
+    temp_min = temp_max = press_min = press_max = primeiro = ultimo = None
+    agregados = {}
+    for timestamps, temperaturas, pressoes in _blocos().iterar_intervalo(id_missao):
+        if not timestamps:
+            continue
+        total += len(timestamps)
+        soma_t += sum(temperaturas)
+        soma_q_t += sum(t * t for t in temperaturas)
+        soma_p += sum(pressoes)
+        soma_q_p += sum(p * p for p in pressoes)
+        temp_min = min(temperaturas) if temp_min is None else min(temp_min, min(temperaturas))
+        temp_max = max(temperaturas) if temp_max is None else max(temp_max, max(temperaturas))
+        press_min = min(pressoes) if press_min is None else min(press_min, min(pressoes))
+        press_max = max(pressoes) if press_max is None else max(press_max, max(pressoes))
+        primeiro = timestamps[0] if primeiro is None else min(primeiro, timestamps[0])
+        ultimo = timestamps[-1] if ultimo is None else max(ultimo, timestamps[-1])
+        acumular_agregados(agregados, timestamps, temperaturas, pressoes)
+
+    cursor.execute('DELETE FROM missao_estatisticas WHERE id_missao = ?', (id_missao,))
+    cursor.execute('DELETE FROM medicao_agregada WHERE id_missao = ?', (id_missao,))
+    if total:
+        cursor.execute('INSERT INTO missao_estatisticas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                       (id_missao, total, soma_t, soma_q_t, temp_min, temp_max,
+                        soma_p, soma_q_p, press_min, press_max,
+                        ms_para_texto(primeiro), ms_para_texto(ultimo)))
+        gravar_agregados(cursor, id_missao, agregados)
+
+
+def _reconstruir_estatisticas(cursor, id_missao=None, em_blocos=()):
+    """Recalcula missao_estatisticas a partir da tabela medicao (exceto as missões em_blocos)"""
+    filtro, parametros = _filtro_reconstrucao(id_missao, em_blocos)
+
+    cursor.execute(f'DELETE FROM missao_estatisticas {filtro}', parametros)
+    cursor.execute(f'''
+        INSERT INTO missao_estatisticas
+        SELECT
+            id_missao,
+            COUNT(*),
+            SUM(temperatura), SUM(temperatura * temperatura),
+            MIN(temperatura), MAX(temperatura),
+            SUM(pressao), SUM(pressao * pressao),
+            MIN(pressao), MAX(pressao),
+            MIN(timestamp), MAX(timestamp)
+        FROM medicao
+        {filtro}
+        GROUP BY id_missao
+    ''', parametros)
+
+
+def _reconstruir_agregados(cursor, id_missao=None, segundos=_SEGUNDOS_MS_OU_TEXTO, em_blocos=()):
+    """Recalcula medicao_agregada (todas as resoluções) a partir da tabela medicao (exceto as missões em_blocos)"""
+    filtro, parametros = _filtro_reconstrucao(id_missao, em_blocos)
+
+    cursor.execute(f'DELETE FROM medicao_agregada {filtro}', parametros)
+    for resolucao in RESOLUCOES_AGREGADAS:
+        cursor.execute(f'''
+            INSERT INTO medicao_agregada
+            SELECT
+                id_missao,
+                {resolucao},
+                {segundos.format(p='')} / {resolucao} * {resolucao} as bucket,
+                COUNT(*),
+                MIN(temperatura), MAX(temperatura), SUM(temperatura),
+                MIN(pressao), MAX(pressao), SUM(pressao)
+            FROM medicao
+            {filtro}
+            GROUP BY id_missao, bucket
+        ''', parametros)
+
+
+def reconstruir_estatisticas(id_missao=None):
+    """
+    Recalcula as estatísticas e as séries agregadas de uma missão (ou de todas)
+    a partir das medições, das linhas ou dos blocos conforme onde cada missão
+    está (ver _em_blocos). Necessário apenas se medições forem
+    removidas/alteradas diretamente no banco.
+    """
+    descarregar_medicoes()
+    with transacao() as cursor:
+        em_blocos = _missoes_em_blocos(cursor, id_missao)
+        _reconstruir_estatisticas(cursor, id_missao, em_blocos)
+        _reconstruir_agregados(cursor, id_missao, em_blocos=em_blocos)
+        for missao in em_blocos:
+            _reconstruir_de_blocos(cursor, missao)
+    invalidar_pacote_missao(id_missao)
+
+
+def consultar_serie(id_missao, pontos_minimos=500, inicio=None, fim=None):
+    """
+    Retorna a série agregada de uma missão na resolução mais grossa que ainda
+    tenha pelo menos pontos_minimos intervalos na janela [inicio, fim].
+    inicio/fim em ms, datetime ou texto (padrão: período inteiro da missão).
+
+    Retorna (resolucao_segundos, linhas) com linhas no formato
+    (inicio_bucket_ms, total, temp_min, temp_max, temp_media, press_min, press_max, press_media)
+    """
+    cursor = conectar().cursor()
+
+    if inicio is None or fim is None:
+        cursor.execute('''
+            SELECT primeiro_timestamp, ultimo_timestamp
+            FROM missao_estatisticas WHERE id_missao = ?
+        ''', (id_missao,))
+        periodo = cursor.fetchone()
+        if periodo is None:
+            return RESOLUCOES_AGREGADAS[0], []
+        # 0 ms é um limite válido: só o que não foi informado vem do período
+        if inicio is None:
+            inicio = periodo[0]
+        if fim is None:
+            fim = periodo[1]
+
+    inicio_s = para_ms(inicio) // 1000
+    fim_s = para_ms(fim) // 1000
+    duracao = fim_s - inicio_s + 1
+
+    # Da mais grossa para a mais fina; a mais fina é o limite
+    resolucao = RESOLUCOES_AGREGADAS[0]
+    for candidata in sorted(RESOLUCOES_AGREGADAS, reverse=True):
+        if duracao / candidata >= pontos_minimos:
+            resolucao = candidata
+            break
 
-def inserir_video(id_missao, caminho):
-    """Insere um caminho de vídeo"""
-    conn = conectar()
-    cursor = conn.cursor()
     cursor.execute('''
-        INSERT INTO video (id_missao, caminho)
-        VALUES (?, ?)
-    ''', (id_missao, caminho))
-    conn.commit()
-    id_video = cursor.lastrowid
-    conn.close()
+        SELECT
+            bucket * 1000,
+            total,
+            temp_min,
+            temp_max,
+            soma_temperatura / total,
+            press_min,
+            press_max,
+            soma_pressao / total
+        FROM medicao_agregada
+        WHERE id_missao = ? AND resolucao = ? AND bucket BETWEEN ? AND ?
+        ORDER BY bucket
+    ''', (id_missao, resolucao, inicio_s // resolucao * resolucao, fim_s))
+    return resolucao, cursor.fetchall()
+
+
+# ==================== VIDEO ====================
+
+def inserir_video(id_missao, caminho, inicio_ms=None):
+    """Insere um caminho de vídeo (inicio_ms: horário do primeiro frame, relógio único)"""
+    with transacao() as cursor:
+        cursor.execute('''
+            INSERT INTO video (id_missao, caminho, inicio_ms)
+            VALUES (?, ?, ?)
+        ''', (id_missao, caminho, inicio_ms))
+        id_video = cursor.lastrowid
+    invalidar_pacote_missao(id_missao)
     return id_video
 
 
 def listar_videos_por_missao(id_missao):
     """Retorna todos os vídeos de uma missão"""
-    conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM video WHERE id_missao = ?', (id_missao,))
+    cursor = conectar().cursor()
+    cursor.execute('''
+        SELECT id_video, id_missao, caminho FROM video
+        WHERE id_missao = ?
+        ORDER BY id_video
+    ''', (id_missao,))
     videos = cursor.fetchall()
-    conn.close()
     return videos
 
 
 # ==================== AUDIO ====================
 
-def inserir_audio(id_missao, caminho):
-    """Insere um caminho de áudio"""
-    conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO audio (id_missao, caminho)
-        VALUES (?, ?)
-    ''', (id_missao, caminho))
-    conn.commit()
-    id_audio = cursor.lastrowid
-    conn.close()
+def inserir_audio(id_missao, caminho, inicio_ms=None):
+    """Insere um caminho de áudio (inicio_ms: horário da primeira amostra, relógio único)"""
+    with transacao() as cursor:
+        cursor.execute('''
+            INSERT INTO audio (id_missao, caminho, inicio_ms)
+            VALUES (?, ?, ?)
+        ''', (id_missao, caminho, inicio_ms))
+        id_audio = cursor.lastrowid
+    invalidar_pacote_missao(id_missao)
     return id_audio
 
 
 def listar_audios_por_missao(id_missao):
     """Retorna todos os áudios de uma missão"""
-    conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM audio WHERE id_missao = ?', (id_missao,))
+    cursor = conectar().cursor()
+    cursor.execute('''
+        SELECT id_audio, id_missao, caminho FROM audio
+        WHERE id_missao = ?
+        ORDER BY id_audio
+    ''', (id_missao,))
     audios = cursor.fetchall()
-    conn.close()
     return audios
 
 
+# ==================== ALARMES ====================
+
+def inserir_alarmes(id_missao, eventos):
+    """
+    Grava em uma transação os eventos de alarme (servidor.alarmes.EventoAlarme
+    ou tuplas timestamp_ms, id_dispositivo, regra, severidade, ativo, valor,
+    mensagem) da missão
+    """
+    with transacao() as cursor:
+        cursor.executemany('''
+            INSERT INTO alarme (id_missao, timestamp_ms, id_dispositivo, regra, severidade, ativo, valor, mensagem)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(id_missao, *evento) for evento in eventos])
+    invalidar_pacote_missao(id_missao)
+
+
+def listar_alarmes_por_missao(id_missao):
+    """
+    Eventos de alarme da missão em ordem de tempo:
+    (id_alarme, timestamp_ms, id_dispositivo, regra, severidade, ativo, valor, mensagem)
+    """
+    cursor = conectar().cursor()
+    cursor.execute('''
+        SELECT id_alarme, timestamp_ms, id_dispositivo, regra, severidade, ativo, valor, mensagem
+        FROM alarme
+        WHERE id_missao = ?
+        ORDER BY timestamp_ms, id_alarme
+    ''', (id_missao,))
+    return cursor.fetchall()
+
+
+# ==================== PACOTE DA MISSÃO ====================
+# Tudo o que a tela de detalhes e a reprodução precisam de uma missão, lido
+# em um único instantâneo e mantido em um cache LRU. As funções que alteram
+# a missão (vídeo, áudio, medições, alarmes, fim, exclusão) invalidam a entrada.
+
+# Número de missões mantidas no cache
+TAMANHO_CACHE_PACOTES = 16
+
+# Medições incluídas no pacote (as primeiras, em ordem de tempo)
+LIMITE_MEDICOES_PACOTE = 5000
+
+PacoteMissao = namedtuple('PacoteMissao', 'missao estatisticas videos audios medicoes alarmes')
+PacoteMissao.__doc__ = """
+Dados imutáveis de uma missão:
+  missao       - tupla de buscar_missao
+  estatisticas - get_estatisticas_completas (somente leitura) ou None
+  videos       - tuplas de listar_videos_por_missao
+  audios       - tuplas de listar_audios_por_missao
+  medicoes     - até LIMITE_MEDICOES_PACOTE tuplas de iterar_medicoes
+  alarmes      - tuplas de listar_alarmes_por_missao
+"""
+
+_cache_pacotes = OrderedDict()  # (DB_PATH, id_missao) -> PacoteMissao
+_geracoes_pacotes = {}          # (DB_PATH, id_missao) ou None (todas) -> nº de invalidações
+_cache_pacotes_lock = threading.Lock()
+
+
+def carregar_pacote_missao(id_missao):
+    """
+    Retorna o PacoteMissao da missão (None se não existir). Consultas feitas
+    em uma única transação de leitura; chamadas seguintes vêm do cache até
+    a missão ser alterada.
+    """
+    chave = (DB_PATH, id_missao)
+    with _cache_pacotes_lock:
+        pacote = _cache_pacotes.get(chave)
+        if pacote is not None:
+            _cache_pacotes.move_to_end(chave)
+            return pacote
+        geracao = _geracao_pacote(chave)
+
+    # Dentro de uma transação de escrita os dados podem não estar confirmados
+    guardar = not conectar().in_transaction
+
+    with leitura():
+        missao = buscar_missao(id_missao)
+        if missao is None:
+            return None
+        estatisticas = get_estatisticas_completas(id_missao)
+        pacote = PacoteMissao(
+            missao=missao,
+            estatisticas=MappingProxyType(estatisticas) if estatisticas else None,
+            videos=tuple(listar_videos_por_missao(id_missao)),
+            audios=tuple(listar_audios_por_missao(id_missao)),
+            medicoes=tuple(next(iterar_medicoes(id_missao, LIMITE_MEDICOES_PACOTE), ())),
+            alarmes=tuple(listar_alarmes_por_missao(id_missao)),
+        )
+
+    with _cache_pacotes_lock:
+        # Só guarda se a missão não foi alterada enquanto era lida
+        if guardar and _geracao_pacote(chave) == geracao:
+            _cache_pacotes[chave] = pacote
+            if len(_cache_pacotes) > TAMANHO_CACHE_PACOTES:
+                _cache_pacotes.popitem(last=False)
+    return pacote
+
+
+def _geracao_pacote(chave):
+    """Contadores de invalidação que afetam a chave (chamar com _cache_pacotes_lock)"""
+    return _geracoes_pacotes.get(None, 0), _geracoes_pacotes.get(chave, 0)
+
+
+def geracao_missao(id_missao):
+    """
+    Valor que muda a cada alteração da missão (as mesmas que invalidam o
+    pacote); permite a outros caches saber se o que guardaram ainda vale
+    """
+    with _cache_pacotes_lock:
+        return _geracao_pacote((DB_PATH, id_missao))
+
+
+def invalidar_pacote_missao(id_missao=None):
+    """Descarta o pacote em cache da missão (ou de todas, se id_missao for None)"""
+    chave = None if id_missao is None else (DB_PATH, id_missao)
+    with _cache_pacotes_lock:
+        if chave is None:
+            _cache_pacotes.clear()
+        else:
+            _cache_pacotes.pop(chave, None)
+        _geracoes_pacotes[chave] = _geracoes_pacotes.get(chave, 0) + 1
+
+
 # ==================== EXTRAS ====================
 
 def deletar_missao(id_missao):
     """Deleta uma missão e todos os dados relacionados"""
-    conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM missao WHERE id_missao = ?', (id_missao,))
-    conn.commit()
-    conn.close()
+    with transacao() as cursor:
+        cursor.execute('DELETE FROM missao WHERE id_missao = ?', (id_missao,))
+    invalidar_pacote_missao(id_missao)
 
 
-def contar_missoes():
-    """Conta o total de missões no banco"""
-    conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute('SELECT COUNT(*) FROM missao')
+def contar_missoes(**filtros):
+    """Conta as missões no banco (aceita os mesmos filtros de consultar_missoes)"""
+    cursor = conectar().cursor()
+    condicoes, parametros = _filtros_missoes(cursor, **filtros)
+    onde = ('WHERE ' + ' AND '.join(condicoes)) if condicoes else ''
+    cursor.execute(f'''
+        SELECT COUNT(*) FROM missao m
+        {onde}
+    ''', parametros)
     total = cursor.fetchone()[0]
-    conn.close()
     return total
 
 
 def contar_mergulhadores():
     """Conta o total de mergulhadores no banco"""
-    conn = conectar()
-    cursor = conn.cursor()
+    cursor = conectar().cursor()
     cursor.execute('SELECT COUNT(*) FROM mergulhador')
     total = cursor.fetchone()[0]
-    conn.close()
     return total
@@ -0,0 +1,188 @@
+"""
+Módulo de escrita em segundo plano das medições dos sensores (write-behind)
+
+A thread de leitura serial apenas enfileira as medições; uma thread separada
+grava os lotes no banco com executemany em uma única transação por lote.
+"""
+
+import queue
+import threading
+import time
+import servidor.database as db
+from servidor import registro
+
+log = registro.get_log('escritor', 'ESCRITOR')
+
+# Métricas de todos os escritores (ver servidor/registro.py)
+_medicoes_gravadas = registro.contador('banco.medicoes_gravadas')
+_falhas_gravacao = registro.contador('banco.falhas_gravacao')
+_latencia_gravacao = registro.latencia('banco.latencia_gravacao')
+_fila = registro.medidor('banco.fila')
+
+
+class EscritorMedicoes:
+    """Fila limitada de medições gravadas em lote por uma thread dedicada"""
+
+    def __init__(self, tamanho_lote=200, idade_maxima=1.0, capacidade=10000):
+        # Lote é gravado ao atingir tamanho_lote medições ou quando a mais
+        # antiga esperar idade_maxima segundos
+        self.tamanho_lote = tamanho_lote
+        self.idade_maxima = idade_maxima
+        self.fila = queue.Queue(maxsize=capacidade)
+
+        self.thread_escrita = None
+        self.parar_flag = False
+        # Protege parar_flag contra enfileirar: depois que parar() marca a
+        # flag, nada novo entra na fila e a thread grava tudo o que ficou
+        self.entrada_lock = threading.Lock()
+
+        # Métricas
+        self.metricas_lock = threading.Lock()
+        self.medicoes_gravadas = 0
+        self.lotes_gravados = 0
+        self.medicoes_descartadas = 0
+        self.falhas_gravacao = 0
+        self.latencia_ultimo_lote = 0.0
+        self.latencia_maxima = 0.0
+        self.latencia_total = 0.0
+
+    def iniciar(self):
+        """Inicia a thread de escrita (se ainda não estiver rodando)"""
+        if self.thread_escrita and self.thread_escrita.is_alive():
+            return
+
+        with self.entrada_lock:
+            self.parar_flag = False
+        self.thread_escrita = threading.Thread(
+            target=self._gravar_continuamente,
+            daemon=True
+        )
+        self.thread_escrita.start()
+
+    def enfileirar(self, id_missao, timestamp, temperatura, pressao, id_dispositivo=None):
+        """Enfileira uma medição sem bloquear. Retorna False se a fila estiver cheia ou o escritor parado"""
+        try:
+            with self.entrada_lock:
+                if self.parar_flag:
+                    raise queue.Full
+                self.fila.put_nowait((id_missao, timestamp, temperatura, pressao, id_dispositivo))
+            return True
+        except queue.Full:
+            with self.metricas_lock:
+                self.medicoes_descartadas += 1
+            return False
+
+    def descarregar(self, timeout=10):
+        """Bloqueia até que tudo o que foi enfileirado até agora esteja gravado"""
+        if not self.thread_escrita or not self.thread_escrita.is_alive():
+            return False
+
+        concluido = threading.Event()
+        try:
+            self.fila.put(concluido, timeout=timeout)
+        except queue.Full:
+            return False
+        return concluido.wait(timeout)
+
+    def parar(self, timeout=10):
+        """Para de aceitar medições, grava o que estiver na fila e encerra a thread de escrita"""
+        with self.entrada_lock:
+            self.parar_flag = True
+
+        if self.thread_escrita and self.thread_escrita.is_alive():
+            self.thread_escrita.join(timeout=timeout)
+
+    def _gravar_continuamente(self):
+        """Thread que junta medições da fila e grava em lotes"""
+        lote = []
+        prazo = None  # Momento em que o lote atual precisa ser gravado
+
+        while not self.parar_flag:
+            espera = 0.1 if prazo is None else max(0.0, prazo - time.monotonic())
+            try:
+                item = self.fila.get(timeout=espera)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, threading.Event):
+                # Pedido de descarga: grava o lote atual e avisa quem pediu
+                self._gravar_lote(lote)
+                lote, prazo = [], None
+                try:
+                    db.descarregar_medicoes()
+                except Exception as e:
+                    log.error("Falha ao descarregar medições: %s", e)
+                item.set()
+                continue
+
+            if item is not None:
+                lote.append(item)
+                if prazo is None:
+                    prazo = time.monotonic() + self.idade_maxima
+
+            if lote and (len(lote) >= self.tamanho_lote or time.monotonic() >= prazo):
+                self._gravar_lote(lote)
+                lote, prazo = [], None
+
+        # parar(): enfileirar já recusa novas medições; grava o que restou na fila
+        descargas = []
+        while True:
+            try:
+                item = self.fila.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, threading.Event):
+                descargas.append(item)
+                continue
+            lote.append(item)
+            if len(lote) >= self.tamanho_lote:
+                self._gravar_lote(lote)
+                lote = []
+        self._gravar_lote(lote)
+        try:
+            db.descarregar_medicoes()
+        except Exception as e:
+            log.error("Falha ao descarregar medições: %s", e)
+        for concluido in descargas:
+            concluido.set()
+
+    def _gravar_lote(self, lote):
+        """Grava um lote no banco e atualiza as métricas"""
+        if not lote:
+            return
+
+        inicio = time.perf_counter()
+        try:
+            db.inserir_medicoes(lote)
+        except Exception as e:
+            _falhas_gravacao.incrementar()
+            log.error("Falha ao gravar %d medições: %s", len(lote), e)
+            with self.metricas_lock:
+                self.falhas_gravacao += 1
+            return
+        latencia = time.perf_counter() - inicio
+        _latencia_gravacao.registrar(latencia)
+        _medicoes_gravadas.incrementar(len(lote))
+        _fila.definir(self.fila.qsize())
+
+        with self.metricas_lock:
+            self.medicoes_gravadas += len(lote)
+            self.lotes_gravados += 1
+            self.latencia_ultimo_lote = latencia
+            self.latencia_maxima = max(self.latencia_maxima, latencia)
+            self.latencia_total += latencia
+
+    def get_metricas(self):
+        """Retorna profundidade da fila e latências de gravação (thread-safe)"""
+        with self.metricas_lock:
+            lotes = self.lotes_gravados
+            return {
+                'fila': self.fila.qsize(),
+                'medicoes_gravadas': self.medicoes_gravadas,
+                'lotes_gravados': lotes,
+                'medicoes_descartadas': self.medicoes_descartadas,
+                'falhas_gravacao': self.falhas_gravacao,
+                'latencia_ultimo_lote': self.latencia_ultimo_lote,
+                'latencia_media': self.latencia_total / lotes if lotes else 0.0,
+                'latencia_maxima': self.latencia_maxima
+            }
@@ -0,0 +1,269 @@
+"""
+Módulo de gerenciamento de vários sensores Arduino ao mesmo tempo
+
+Cada placa encontrada (ver sensor_arduino.encontrar_arduinos) vira um
+SensorArduino com seu id de dispositivo (número de série USB ou nome da
+porta). Todos são lidos pela mesma thread (servidor/leitor_serial.py) e
+gravam pela mesma fila de escrita no banco; cada medição leva o id do
+dispositivo e vai para a missão em que aquele dispositivo foi iniciado.
+
+O primeiro dispositivo usa o sensor principal (sensor_arduino.get_sensor()),
+que continua sendo o usado pelo vídeo e pelas telas ao vivo.
+
+A interface usa iniciar_missao_async: a conexão (espera pelo reset do
+Arduino e novas tentativas se nenhum estiver plugado) roda em segundo plano
+e o resultado vem em um Future.
+"""
+
+import threading
+
+from servidor import registro, sensor_arduino
+from servidor.alarmes import criar_regras
+from servidor.leitor_serial import get_leitor
+from servidor.politicas_armazenamento import criar_politica
+
+log = registro.get_log('sensores', 'SENSORES')
+
+
+class GerenciadorSensores:
+    """Conecta, inicia e para vários sensores; cada um pode gravar em uma missão diferente"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sensores = {}  # id_dispositivo -> SensorArduino, em ordem de conexão
+        self.conexoes_pendentes = {}  # id_missao -> Event que cancela iniciar_missao_async
+
+    def descobrir(self):
+        """Portas de todos os Arduinos conectados ao computador"""
+        return sensor_arduino.encontrar_arduinos()
+
+    def adicionar(self, porta, id_dispositivo=None, baudrate=None,
+                  espera_reset=sensor_arduino.ESPERA_RESET):
+        """
+        Conecta o Arduino da porta e retorna o SensorArduino (None se falhar).
+        Sem baudrate, a velocidade é detectada (SensorArduino.conectar)
+        """
+        id_dispositivo = id_dispositivo or sensor_arduino.identificar_dispositivo(porta)
+        principal = sensor_arduino.get_sensor()
+        with self.lock:
+            if id_dispositivo in self.sensores:
+                log.info("Dispositivo %s já conectado", id_dispositivo)
+                return self.sensores[id_dispositivo]
+            id_anterior = None
+            if not principal.conectado and principal not in self.sensores.values():
+                sensor = principal
+                id_anterior = sensor.id_dispositivo
+                sensor.id_dispositivo = id_dispositivo
+            else:
+                sensor = sensor_arduino.SensorArduino(id_dispositivo, escritor=principal.escritor)
+            # Reservado antes de conectar (a conexão espera o reset do Arduino)
+            self.sensores[id_dispositivo] = sensor
+
+        if not sensor.conectar(porta, baudrate, espera_reset):
+            with self.lock:
+                del self.sensores[id_dispositivo]
+                if sensor is principal:
+                    # O principal volta a ser o de antes (get_sensor, conexão direta)
+                    sensor.id_dispositivo = id_anterior
+            return None
+        return sensor
+
+    def conectar_todos(self, baudrate=None,
+                       espera_reset=sensor_arduino.ESPERA_RESET):
+        """
+        Conecta todos os Arduinos encontrados que ainda não estão conectados.
+        As conexões são abertas em paralelo (as esperas de reset se sobrepõem).
+        Retorna os ids de dispositivo conectados
+        """
+        self._incluir_principal()
+        with self.lock:
+            em_uso = {sensor.porta_serial.port for sensor in self.sensores.values()
+                      if sensor.porta_serial is not None}
+        portas = [porta for porta in self.descobrir() if porta not in em_uso]
+        if portas:
+            log.info("%d Arduino(s) encontrado(s): %s", len(portas), ', '.join(portas))
+
+        threads = [threading.Thread(target=self.adicionar, args=(porta, None, baudrate, espera_reset),
+                                    daemon=True)
+                   for porta in portas]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return [id_dispositivo for id_dispositivo, sensor in self._selecionar(None) if sensor.conectado]
+
+    def _incluir_principal(self):
+        """Inclui o sensor principal se ele foi conectado diretamente (sem o gerenciador)"""
+        principal = sensor_arduino.get_sensor()
+        with self.lock:
+            if principal.conectado and principal not in self.sensores.values():
+                self.sensores[principal.id_dispositivo] = principal
+
+    def _selecionar(self, dispositivos):
+        """(id, sensor) dos dispositivos pedidos (todos se None)"""
+        with self.lock:
+            if dispositivos is None:
+                return list(self.sensores.items())
+            return [(id_dispositivo, self.sensores[id_dispositivo])
+                    for id_dispositivo in dispositivos if id_dispositivo in self.sensores]
+
+    def iniciar_leitura(self, id_missao=None, dispositivos=None):
+        """
+        Inicia a leitura dos dispositivos pedidos (padrão: todos os conectados
+        que ainda não estão lendo), gravando na missão id_missao. Chamado de
+        novo com outros dispositivos e outra missão, registra outro mergulhador.
+        Retorna os ids iniciados
+        """
+        self._incluir_principal()
+        iniciados = []
+        for id_dispositivo, sensor in self._selecionar(dispositivos):
+            if sensor.conectado and not sensor.lendo and sensor.iniciar_leitura(id_missao):
+                iniciados.append(id_dispositivo)
+        return iniciados
+
+    def iniciar_missao_async(self, id_missao, baudrate=None,
+                             espera_reset=sensor_arduino.ESPERA_RESET, prazo=sensor_arduino.PRAZO_CONEXAO,
+                             callback=None):
+        """
+        Em segundo plano: conecta os Arduinos encontrados e inicia a leitura na
+        missão, tentando de novo com espera crescente até algum dispositivo
+        começar a gravar ou o prazo acabar (Arduino plugado depois do início da
+        missão). Retorna um Future com os ids iniciados (lista vazia se nenhum);
+        parar_leitura(id_missao=...) cancela as tentativas
+        """
+        cancelado = threading.Event()
+        with self.lock:
+            self.conexoes_pendentes[id_missao] = cancelado
+
+        def tentar():
+            if cancelado.is_set():
+                return []
+            self.conectar_todos(baudrate, espera_reset)
+            return self.iniciar_leitura(id_missao)
+
+        def iniciar():
+            try:
+                iniciados = sensor_arduino.tentar_com_espera(tentar, prazo, cancelado)
+                if cancelado.is_set() and iniciados:
+                    # Missão finalizada enquanto a conexão terminava
+                    self.parar_leitura(iniciados)
+                    return []
+                return iniciados
+            finally:
+                with self.lock:
+                    if self.conexoes_pendentes.get(id_missao) is cancelado:
+                        del self.conexoes_pendentes[id_missao]
+
+        return sensor_arduino.em_segundo_plano(iniciar, callback=callback)
+
+    def parar_leitura(self, dispositivos=None, id_missao=None):
+        """
+        Para a leitura (e a reconexão em andamento) dos dispositivos pedidos, ou
+        dos que gravam em id_missao, ou de todos; cancela as conexões pendentes da missão
+        """
+        with self.lock:
+            for missao, cancelado in self.conexoes_pendentes.items():
+                if dispositivos is None and id_missao in (None, missao):
+                    cancelado.set()
+        parados = []
+        for id_dispositivo, sensor in self._selecionar(dispositivos):
+            if (sensor.lendo or sensor.reconectando) and (id_missao is None or sensor.id_missao == id_missao):
+                sensor.parar_leitura()
+                parados.append(id_dispositivo)
+        return parados
+
+    def desconectar(self, dispositivos=None):
+        """Para e desconecta os dispositivos pedidos (todos se None)"""
+        for id_dispositivo, sensor in self._selecionar(dispositivos):
+            sensor.desconectar()
+            with self.lock:
+                self.sensores.pop(id_dispositivo, None)
+
+    def encerrar(self, timeout=10):
+        """
+        Ao fechar o sistema: para a leitura, os alarmes e as conexões pendentes
+        de todos os dispositivos, desconecta e grava o que ainda está na fila
+        de escrita antes de encerrar a thread do escritor
+        """
+        sensores = [sensor for _, sensor in self._selecionar(None)]
+        principal = sensor_arduino.get_sensor()
+        if principal not in sensores:
+            sensores.append(principal)
+        self.parar_leitura()
+        self.desconectar()
+        for sensor in sensores:
+            sensor.alarmes.parar(timeout)
+        for escritor in {id(sensor.escritor): sensor.escritor for sensor in sensores}.values():
+            escritor.parar(timeout)
+
+    def get_sensor(self, id_dispositivo):
+        """SensorArduino do dispositivo (None se não conectado)"""
+        with self.lock:
+            return self.sensores.get(id_dispositivo)
+
+    def listar(self):
+        """Estado de cada dispositivo: porta, conexão, leitura e missão"""
+        return [{
+            'id_dispositivo': id_dispositivo,
+            'porta': sensor.porta_serial.port if sensor.porta_serial is not None else None,
+            'conectado': sensor.conectado,
+            'lendo': sensor.lendo,
+            'reconectando': sensor.reconectando,
+            'id_missao': sensor.id_missao,
+        } for id_dispositivo, sensor in self._selecionar(None)]
+
+    def get_ultimas_leituras(self):
+        """Snapshot (LeituraSensor) mais recente de cada dispositivo"""
+        return {id_dispositivo: sensor.get_snapshot() for id_dispositivo, sensor in self._selecionar(None)}
+
+    def definir_politica(self, nome, **parametros):
+        """Mesma política de armazenamento em todos os dispositivos (uma instância por dispositivo)"""
+        return all(sensor.definir_politica(criar_politica(nome, **parametros))
+                   for _, sensor in self._selecionar(None))
+
+    def definir_regras_alarme(self, declaracoes):
+        """Mesmas regras de alarme (dicionários, ver alarmes.REGRAS_PADRAO) em todos os dispositivos"""
+        for _, sensor in self._selecionar(None):
+            sensor.definir_regras_alarme(criar_regras(declaracoes))
+
+    def get_alarmes_ativos(self):
+        """Alarmes ativos de cada dispositivo que tem algum: {id_dispositivo: [(nome, severidade, mensagem)]}"""
+        ativos = {}
+        for id_dispositivo, sensor in self._selecionar(None):
+            alarmes = sensor.get_alarmes_ativos()
+            if alarmes:
+                ativos[id_dispositivo] = alarmes
+        return ativos
+
+    def descarregar_medicoes(self):
+        """Bloqueia até que as medições enfileiradas de todos os dispositivos estejam gravadas"""
+        return sensor_arduino.get_sensor().descarregar_medicoes()
+
+    def get_metricas(self):
+        """
+        Métricas de leitura por dispositivo, da thread de leitura, da escrita
+        no banco e dos alarmes, mais o registro compartilhado (servidor/registro.py)
+        """
+        return {
+            'dispositivos': {id_dispositivo: sensor.get_metricas_leitura()
+                             for id_dispositivo, sensor in self._selecionar(None)},
+            'leitor': get_leitor().get_metricas(),
+            'escrita': sensor_arduino.get_sensor().get_metricas_escrita(),
+            'alarmes': {id_dispositivo: sensor.alarmes.get_metricas()
+                        for id_dispositivo, sensor in self._selecionar(None)},
+            'registro': registro.ler_metricas(),
+        }
+
+
+_gerenciador = None
+_gerenciador_lock = threading.Lock()
+
+
+def get_gerenciador():
+    """Retorna a instância única do gerenciador de sensores"""
+    global _gerenciador
+    if _gerenciador is None:
+        with _gerenciador_lock:
+            if _gerenciador is None:
+                _gerenciador = GerenciadorSensores()
+    return _gerenciador
@@ -0,0 +1,210 @@
+"""
+Módulo de leitura compartilhada das portas seriais
+
+Uma única thread lê todas as portas em uso, em vez de uma thread por
+dispositivo. Portas com descritor de arquivo (POSIX) ficam em um selector e
+a thread dorme até chegar algum byte em qualquer uma delas. Portas sem
+descritor (Windows, loop:// do pyserial) são consultadas com in_waiting a
+cada INTERVALO_VARREDURA enquanto existirem.
+
+Cada porta é registrada com uma função receber(dados), chamada na thread de
+leitura com os bytes que chegaram, e uma função falha(erro), chamada uma vez
+se a porta der erro (ela é removida automaticamente).
+"""
+
+import selectors
+import socket
+import threading
+from servidor.registro import get_log
+
+log = get_log('serial', 'SERIAL')
+
+# Intervalo (s) entre consultas às portas sem descritor de arquivo
+INTERVALO_VARREDURA = 0.01
+
+# Bytes pedidos por leitura nas portas do selector (a porta com timeout 0
+# devolve só o que já chegou). in_waiting não serve de tamanho em todas: na
+# URL socket:// do pyserial ele só diz se há algo (0 ou 1)
+TAMANHO_LEITURA = 4096
+
+
+class _Fonte:
+    """Uma porta registrada e suas funções de entrega"""
+
+    def __init__(self, porta, receber, falha):
+        self.porta = porta
+        self.receber = receber
+        self.falha = falha
+        self.timeout_original = porta.timeout
+        self.descritor = None
+        self.varrida = False  # sem descritor: consultada com in_waiting
+        self.bytes_recebidos = 0
+
+
+def _descritor(porta):
+    """Descritor de arquivo da porta ou None se ela não tiver (Windows, loop://)"""
+    try:
+        return porta.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+class LeitorSerial:
+    """Thread única que lê todas as portas registradas"""
+
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.fontes = {}      # porta -> _Fonte
+        self.varridas = []    # fontes sem descritor
+        self.thread = None
+
+        # Alterações pedidas por outras threads, aplicadas pela thread de leitura
+        self.lock = threading.Lock()
+        self.pendentes = []
+
+        # Par de sockets para acordar o select() quando há alterações
+        self._despertar_leitura, self._despertar_escrita = socket.socketpair()
+        self._despertar_leitura.setblocking(False)
+        self.selector.register(self._despertar_leitura, selectors.EVENT_READ)
+
+    def adicionar(self, porta, receber, falha=None):
+        """Passa a ler a porta; receber(dados) é chamado na thread de leitura"""
+        self._pedir(('adicionar', _Fonte(porta, receber, falha)))
+
+    def remover(self, porta, timeout=5):
+        """
+        Deixa de ler a porta. Ao retornar, receber() não será mais chamado
+        para ela (exceto se chamado de dentro de receber, na própria thread)
+        """
+        if threading.current_thread() is self.thread:
+            self._remover(porta)
+            return True
+        concluido = threading.Event()
+        self._pedir(('remover', porta, concluido))
+        return concluido.wait(timeout)
+
+    def get_metricas(self):
+        """Portas no selector, portas varridas e bytes recebidos por porta"""
+        with self.lock:
+            fontes = list(self.fontes.values())
+        return {
+            'portas': len(fontes),
+            'portas_varridas': sum(1 for fonte in fontes if fonte.varrida),
+            'bytes_recebidos': {getattr(fonte.porta, 'port', None) or repr(fonte.porta): fonte.bytes_recebidos
+                                for fonte in fontes},
+        }
+
+    def _pedir(self, pedido):
+        """Enfileira a alteração, inicia a thread se preciso e acorda o select()"""
+        with self.lock:
+            self.pendentes.append(pedido)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._ler_continuamente, daemon=True)
+                self.thread.start()
+        try:
+            self._despertar_escrita.send(b'\0')
+        except OSError:
+            pass  # Buffer cheio: a thread já vai acordar
+
+    def _aplicar_pendentes(self):
+        with self.lock:
+            pendentes, self.pendentes = self.pendentes, []
+        for pedido in pendentes:
+            if pedido[0] == 'adicionar':
+                self._adicionar(pedido[1])
+            else:
+                self._remover(pedido[1])
+                pedido[2].set()
+
+    def _adicionar(self, fonte):
+        self._remover(fonte.porta)
+        descritor = fonte.descritor = _descritor(fonte.porta)
+        with self.lock:
+            self.fontes[fonte.porta] = fonte
+        if descritor is None:
+            fonte.varrida = True
+            self.varridas.append(fonte)
+        else:
+            # O selector já avisa quando há bytes: leitura sem espera
+            fonte.porta.timeout = 0
+            self.selector.register(descritor, selectors.EVENT_READ, fonte)
+
+    def _remover(self, porta):
+        with self.lock:
+            fonte = self.fontes.pop(porta, None)
+        if fonte is None:
+            return None
+        if fonte.varrida:
+            self.varridas.remove(fonte)
+        else:
+            try:
+                self.selector.unregister(fonte.descritor)
+            except (KeyError, ValueError, OSError):
+                pass  # Porta já fechada
+            try:
+                porta.timeout = fonte.timeout_original
+            except Exception:
+                pass
+        return fonte
+
+    def _ler(self, fonte):
+        """
+        Lê o que estiver disponível na porta e entrega; remove a porta se ela
+        falhar. Retorna True se chegaram bytes
+        """
+        try:
+            if fonte.varrida:
+                disponiveis = fonte.porta.in_waiting
+                dados = fonte.porta.read(disponiveis) if disponiveis else b''
+            else:
+                # Pronta no selector: ao menos um byte ou a falha (porta desconectada)
+                dados = fonte.porta.read(max(fonte.porta.in_waiting, TAMANHO_LEITURA))
+        except Exception as e:
+            self._remover(fonte.porta)
+            if fonte.falha is not None:
+                fonte.falha(e)
+            else:
+                log.error("Porta removida após falha: %s", e)
+            return False
+        if not dados:
+            return False
+        fonte.bytes_recebidos += len(dados)
+        try:
+            fonte.receber(dados)
+        except Exception as e:
+            log.error("Erro ao processar dados: %s", e)
+        return True
+
+    def _ler_continuamente(self):
+        chegaram = False  # nas portas varridas, na última volta
+        while True:
+            self._aplicar_pendentes()
+            # Portas varridas com dados chegando são consultadas de novo sem esperar
+            espera = None if not self.varridas else 0 if chegaram else INTERVALO_VARREDURA
+            for chave, _ in self.selector.select(espera):
+                if chave.fileobj is self._despertar_leitura:
+                    try:
+                        while self._despertar_leitura.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                if chave.data.porta in self.fontes:
+                    self._ler(chave.data)
+            chegaram = False
+            for fonte in list(self.varridas):
+                chegaram |= self._ler(fonte)
+
+
+_leitor = None
+_leitor_lock = threading.Lock()
+
+
+def get_leitor():
+    """Retorna a instância única do leitor compartilhado"""
+    global _leitor
+    if _leitor is None:
+        with _leitor_lock:
+            if _leitor is None:
+                _leitor = LeitorSerial()
+    return _leitor
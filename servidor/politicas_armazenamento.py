@@ -0,0 +1,283 @@
+"""
+Módulo de políticas de armazenamento das medições dos sensores
+
+Fica entre o parser da serial e o escritor do banco e decide quais leituras
+são gravadas. Cada leitura é (timestamp_ms, temperatura, pressao); os limites
+de erro são configurados por canal ('temperatura' em °C, 'pressao' em psi).
+
+    - PoliticaTodas:           grava todas as leituras (padrão)
+    - PoliticaIntervaloFixo:   uma leitura a cada intervalo_ms
+    - PoliticaBandaMorta:      grava quando algum canal se afasta do último
+                               valor gravado mais que o seu limite
+    - PoliticaPortaGiratoria:  swinging door trending; a reconstrução linear
+                               entre os pontos gravados fica dentro do limite
+
+avaliar_politica() reconstrói as leituras originais a partir das gravadas e
+informa a taxa de compressão e o erro máximo de cada canal.
+"""
+
+from bisect import bisect_right
+
+CANAIS = ('temperatura', 'pressao')
+
+# Limites de erro padrão por canal
+LIMITES_PADRAO = {'temperatura': 0.1, 'pressao': 0.05}
+
+
+class PoliticaArmazenamento:
+    """Base das políticas: recebe leituras e devolve as que devem ser gravadas"""
+
+    # Como avaliar_politica reconstrói o sinal entre dois pontos gravados:
+    # 'degrau' (mantém o último valor) ou 'linear' (interpolação)
+    RECONSTRUCAO = 'degrau'
+
+    def __init__(self):
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Descarta o estado (chamar no início de cada missão)"""
+
+    def filtrar(self, timestamp_ms, temperatura, pressao):
+        """Recebe uma leitura e retorna a lista de leituras a gravar (pode ser vazia)"""
+        raise NotImplementedError
+
+    def finalizar(self):
+        """Retorna as leituras pendentes a gravar no fim da missão"""
+        return []
+
+    def __repr__(self):
+        return self.__class__.__name__
+
+
+class PoliticaTodas(PoliticaArmazenamento):
+    """Grava todas as leituras"""
+
+    def filtrar(self, timestamp_ms, temperatura, pressao):
+        return [(timestamp_ms, temperatura, pressao)]
+
+
+class PoliticaIntervaloFixo(PoliticaArmazenamento):
+    """Grava no máximo uma leitura a cada intervalo_ms"""
+
+    def __init__(self, intervalo_ms=60000):
+        self.intervalo_ms = intervalo_ms
+        super().__init__()
+
+    def reiniciar(self):
+        self.ultimo_gravado_ms = None
+
+    def filtrar(self, timestamp_ms, temperatura, pressao):
+        if self.ultimo_gravado_ms is not None and timestamp_ms - self.ultimo_gravado_ms < self.intervalo_ms:
+            return []
+        self.ultimo_gravado_ms = timestamp_ms
+        return [(timestamp_ms, temperatura, pressao)]
+
+    def __repr__(self):
+        return f"IntervaloFixo({self.intervalo_ms} ms)"
+
+
+class _PoliticaComLimites(PoliticaArmazenamento):
+    """Base das políticas com limite de erro por canal e intervalo máximo sem gravar"""
+
+    def __init__(self, limites=None, intervalo_maximo_ms=None):
+        # intervalo_maximo_ms: grava mesmo sem variação depois desse tempo,
+        # para que a série não fique sem pontos por longos períodos
+        self.limites = dict(LIMITES_PADRAO, **(limites or {}))
+        desconhecidos = set(self.limites) - set(CANAIS)
+        if desconhecidos:
+            raise ValueError(f"Canais desconhecidos: {', '.join(sorted(desconhecidos))}")
+        self.intervalo_maximo_ms = intervalo_maximo_ms
+        super().__init__()
+
+    def _limites_texto(self):
+        texto = ', '.join(f"{canal}={self.limites[canal]:g}" for canal in CANAIS)
+        if self.intervalo_maximo_ms:
+            texto += f", máx {self.intervalo_maximo_ms} ms"
+        return texto
+
+
+class PoliticaBandaMorta(_PoliticaComLimites):
+    """
+    Grava quando algum canal se afasta do último valor gravado mais que o seu
+    limite. Reconstruída em degrau, o erro fica dentro do limite.
+    """
+
+    def reiniciar(self):
+        self.ultimo_gravado = None
+
+    def filtrar(self, timestamp_ms, temperatura, pressao):
+        leitura = (timestamp_ms, temperatura, pressao)
+        anterior = self.ultimo_gravado
+        if anterior is not None:
+            dentro = all(abs(valor - valor_gravado) <= self.limites[canal]
+                         for canal, valor, valor_gravado in zip(CANAIS, leitura[1:], anterior[1:]))
+            expirado = (self.intervalo_maximo_ms is not None
+                        and timestamp_ms - anterior[0] >= self.intervalo_maximo_ms)
+            if dentro and not expirado:
+                return []
+        self.ultimo_gravado = leitura
+        return [leitura]
+
+    def __repr__(self):
+        return f"BandaMorta({self._limites_texto()})"
+
+
+class PoliticaPortaGiratoria(_PoliticaComLimites):
+    """
+    Swinging door trending (SDT) aplicado aos dois canais ao mesmo tempo.
+
+    A partir do último ponto gravado, cada canal mantém a faixa de inclinações
+    que passam a até ±limite de todas as leituras vistas depois dele. Quando a
+    reta até a nova leitura sai da faixa de algum canal ("a porta fecha"), a
+    leitura anterior é gravada e passa a ser o novo ponto de partida. Como toda
+    leitura aceita é um fim de reta válido, a reconstrução por interpolação
+    linear fica dentro do limite em cada canal.
+
+    A decisão sobre uma leitura só sai na leitura seguinte, então filtrar()
+    devolve pontos com uma leitura de atraso e finalizar() grava a última.
+    """
+
+    RECONSTRUCAO = 'linear'
+
+    def reiniciar(self):
+        self.origem = None    # último ponto gravado
+        self.anterior = None  # última leitura recebida (candidata a gravar)
+        self.inclinacoes = None
+
+    def _abrir_portas(self):
+        """Faixas de inclinação [mínima, máxima] por canal, ainda sem restrição"""
+        return [[float('-inf'), float('inf')] for _ in CANAIS]
+
+    def _recomecar(self, origem):
+        """Passa a medir as portas a partir do ponto gravado"""
+        self.origem = origem
+        self.inclinacoes = self._abrir_portas()
+
+    def _estreitar(self, leitura):
+        """Restringe as faixas com a leitura; retorna False se alguma porta fechou"""
+        dt = leitura[0] - self.origem[0]
+        if dt <= 0:
+            # Mesmo instante do ponto gravado: só cabe se estiver dentro do limite
+            return all(abs(valor - origem) <= self.limites[canal]
+                       for canal, valor, origem in zip(CANAIS, leitura[1:], self.origem[1:]))
+
+        novas = []
+        for (minima, maxima), canal, valor, origem in zip(
+                self.inclinacoes, CANAIS, leitura[1:], self.origem[1:]):
+            # A reta origem -> leitura precisa passar perto das leituras anteriores
+            if not minima <= (valor - origem) / dt <= maxima:
+                return False
+            limite = self.limites[canal]
+            novas.append([max(minima, (valor - limite - origem) / dt),
+                          min(maxima, (valor + limite - origem) / dt)])
+        self.inclinacoes = novas
+        return True
+
+    def filtrar(self, timestamp_ms, temperatura, pressao):
+        leitura = (timestamp_ms, temperatura, pressao)
+        if self.origem is None:
+            self._recomecar(leitura)
+            return [leitura]
+
+        gravar = []
+        expirado = (self.intervalo_maximo_ms is not None
+                    and timestamp_ms - self.origem[0] > self.intervalo_maximo_ms)
+        if expirado or not self._estreitar(leitura):
+            # Grava a leitura anterior e recomeça a partir dela
+            if self.anterior is not None:
+                gravar.append(self.anterior)
+                self._recomecar(self.anterior)
+            # Sem anterior, ou no mesmo instante dela e fora do limite: grava a atual
+            if self.anterior is None or not self._estreitar(leitura):
+                gravar.append(leitura)
+                self._recomecar(leitura)
+                self.anterior = None
+                return gravar
+
+        self.anterior = leitura
+        return gravar
+
+    def finalizar(self):
+        pendente = [self.anterior] if self.anterior is not None else []
+        self.reiniciar()
+        return pendente
+
+    def __repr__(self):
+        return f"PortaGiratoria({self._limites_texto()})"
+
+
+# Nome -> classe, para configurar a política por texto
+POLITICAS = {
+    'todas': PoliticaTodas,
+    'intervalo_fixo': PoliticaIntervaloFixo,
+    'banda_morta': PoliticaBandaMorta,
+    'porta_giratoria': PoliticaPortaGiratoria,
+}
+
+
+def criar_politica(nome, **parametros):
+    """Cria a política pelo nome (chave de POLITICAS) com os parâmetros da classe"""
+    if nome not in POLITICAS:
+        raise ValueError(f"Política desconhecida: {nome}")
+    return POLITICAS[nome](**parametros)
+
+
+# ==================== AVALIAÇÃO ====================
+
+def aplicar_politica(politica, leituras):
+    """Passa as leituras (timestamp_ms, temperatura, pressao) pela política e retorna as gravadas"""
+    politica.reiniciar()
+    gravadas = []
+    for leitura in leituras:
+        gravadas.extend(politica.filtrar(*leitura))
+    gravadas.extend(politica.finalizar())
+    return gravadas
+
+
+def reconstruir(gravadas, timestamps, modo='linear'):
+    """
+    Estima os valores de cada canal nos instantes pedidos a partir das leituras
+    gravadas (ordenadas por tempo). modo: 'linear' ou 'degrau'.
+    Retorna uma lista de (timestamp_ms, temperatura, pressao).
+    """
+    if not gravadas:
+        raise ValueError("Nenhuma leitura gravada para reconstruir")
+    tempos = [leitura[0] for leitura in gravadas]
+    reconstruidas = []
+    for t in timestamps:
+        i = bisect_right(tempos, t)
+        if i == 0:
+            valores = gravadas[0][1:]
+        elif i == len(gravadas) or modo == 'degrau':
+            valores = gravadas[i - 1][1:]
+        else:
+            (t0, *v0), (t1, *v1) = gravadas[i - 1], gravadas[i]
+            fracao = (t - t0) / (t1 - t0)
+            valores = tuple(a + (b - a) * fracao for a, b in zip(v0, v1))
+        reconstruidas.append((t, *valores))
+    return reconstruidas
+
+
+def avaliar_politica(politica, leituras):
+    """
+    Aplica a política às leituras, reconstrói o sinal (modo RECONSTRUCAO da
+    política) e compara com o original. Retorna um dicionário com o número de
+    leituras e de gravadas, a taxa de compressão e o erro máximo e médio de
+    cada canal.
+    """
+    leituras = list(leituras)
+    gravadas = aplicar_politica(politica, leituras)
+    reconstruidas = reconstruir(gravadas, [leitura[0] for leitura in leituras],
+                                politica.RECONSTRUCAO)
+
+    resultado = {
+        'politica': repr(politica),
+        'leituras': len(leituras),
+        'gravadas': len(gravadas),
+        'taxa_compressao': len(leituras) / len(gravadas),
+    }
+    for i, canal in enumerate(CANAIS, 1):
+        erros = [abs(original[i] - estimada[i]) for original, estimada in zip(leituras, reconstruidas)]
+        resultado[f'erro_max_{canal}'] = max(erros)
+        resultado[f'erro_medio_{canal}'] = sum(erros) / len(erros)
+    return resultado
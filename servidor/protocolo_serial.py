@@ -0,0 +1,316 @@
+"""
+Módulo de decodificação do fluxo serial do Arduino
+
+Dois formatos, detectados automaticamente por DecodificadorSerial:
+
+ASCII (padrão do sketch): uma linha "pressao,temperatura" por leitura. Os
+bytes chegam em pedaços de tamanho qualquer; o decodificador acumula tudo
+em um bytearray reutilizado, separa as linhas completas e extrai os números
+direto dos bytes com uma única expressão regular por pedaço (sem decode e
+sem exceção por linha). Linhas incompletas ficam no buffer até o resto
+chegar; linhas inválidas são apenas contadas.
+
+Binário (PROTOCOLO_BINARIO no sketch, 115200 baud, até 100 Hz): quadros de
+tamanho fixo, little-endian:
+
+    sincronismo  2 B  0xA5 0x5A
+    sequencia    2 B  uint16, +1 a cada quadro (detecta quadros perdidos)
+    tempo_ms     4 B  uint32, millis() do Arduino
+    adc          2 B  uint16, leitura bruta do sensor de pressão (0-1023)
+    temperatura  2 B  int16, centésimos de °C
+    crc          2 B  CRC-16/CCITT-FALSE dos 10 bytes entre sincronismo e crc
+
+Os dois decodificadores retornam leituras (pressao, temperatura, tempo_ms),
+com tempo_ms do Arduino no binário e None no ASCII.
+"""
+
+import random
+import re
+import struct
+from binascii import crc_hqx
+from itertools import chain, repeat
+from servidor.registro import get_log
+
+log = get_log('sensor', 'SENSOR')
+
+# Linha válida: dois números separados por vírgula (\r opcional no fim)
+_PADRAO_LINHA = re.compile(rb'^[ \t]*([-+]?\d+(?:\.\d*)?)[ \t]*,[ \t]*([-+]?\d+(?:\.\d*)?)[ \t]*\r?$', re.M)
+
+# Linha em branco (não conta como inválida)
+_PADRAO_VAZIA = re.compile(rb'^[ \t\r]*$', re.M)
+
+# Sem quebra de linha depois de tantos bytes o conteúdo é lixo e é descartado
+TAMANHO_MAXIMO_LINHA = 256
+
+
+class DecodificadorAscii:
+    """Converte as linhas CSV recebidas em leituras (pressao, temperatura, None)"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.linhas_validas = 0
+        self.linhas_invalidas = 0
+        self.bytes_descartados = 0
+
+    def alimentar(self, dados):
+        """Acrescenta bytes ao buffer e retorna a lista de leituras completas"""
+        buffer = self.buffer
+        buffer += dados
+
+        fim = buffer.rfind(b'\n')
+        if fim < 0:
+            if len(buffer) > TAMANHO_MAXIMO_LINHA:
+                self.bytes_descartados += len(buffer)
+                buffer.clear()
+            return []
+
+        # Apenas as linhas completas; o resto continua no buffer
+        completas = bytes(buffer[:fim])
+        del buffer[:fim + 1]
+
+        # Converte todos os números de uma vez e agrupa em pares
+        valores = iter(list(map(float, chain.from_iterable(_PADRAO_LINHA.findall(completas)))))
+        leituras = list(zip(valores, valores, repeat(None)))
+
+        total = completas.count(b'\n') + 1
+        # Linhas em branco são raras; só procura quando pode haver alguma
+        if (not completas.strip() or completas.startswith((b'\r', b'\n'))
+                or b'\n\n' in completas or b'\n\r\n' in completas):
+            total -= len(_PADRAO_VAZIA.findall(completas))
+        self.linhas_validas += len(leituras)
+        self.linhas_invalidas += total - len(leituras)
+        return leituras
+
+    @property
+    def erros(self):
+        """Linhas recebidas que não puderam ser decodificadas"""
+        return self.linhas_invalidas
+
+    def reiniciar(self):
+        """Descarta bytes pendentes (ao reconectar ou trocar de porta)"""
+        self.buffer.clear()
+
+    def get_metricas(self):
+        """Contadores de linhas válidas/inválidas e bytes descartados"""
+        return {
+            'linhas_validas': self.linhas_validas,
+            'linhas_invalidas': self.linhas_invalidas,
+            'bytes_descartados': self.bytes_descartados,
+        }
+
+
+# ==================== PROTOCOLO BINÁRIO ====================
+
+SINCRONISMO = b'\xa5\x5a'
+
+# sincronismo, sequencia, tempo_ms, adc, temperatura (centésimos), crc
+_QUADRO = struct.Struct('<2sHIHhH')
+TAMANHO_QUADRO = _QUADRO.size  # 14 bytes
+
+# Início do CRC: CRC-16/CCITT-FALSE (polinômio 0x1021, valor inicial 0xFFFF)
+_CRC_INICIAL = 0xFFFF
+
+# Saltos de sequência (módulo 2^16) abaixo disso são quadros perdidos; acima,
+# o Arduino reiniciou ou a sequência voltou, e a contagem recomeça
+JANELA_SEQUENCIA = 0x8000
+
+# Conversão do ADC igual à do sketch: 0,5 V = 0 psi; 4,5 V = 30 psi
+_VOLTS_POR_PASSO = 5.0 / 1023.0
+
+
+def adc_para_psi(adc):
+    """Converte a leitura bruta do ADC (0-1023) em psi, como o sketch faz no modo ASCII"""
+    return max((adc * _VOLTS_POR_PASSO - 0.5) * 7.5, 0.0)
+
+
+def codificar_quadro(sequencia, tempo_ms, adc, temperatura):
+    """Monta um quadro binário (temperatura em °C); usado pelo gerador e pelos testes"""
+    corpo = struct.pack('<HIHh', sequencia & 0xFFFF, tempo_ms & 0xFFFFFFFF,
+                        adc, round(temperatura * 100))
+    return SINCRONISMO + corpo + struct.pack('<H', crc_hqx(corpo, _CRC_INICIAL))
+
+
+class DecodificadorBinario:
+    """Converte os quadros binários recebidos em leituras (pressao, temperatura, tempo_ms)"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.ultima_sequencia = None
+        self.quadros_validos = 0
+        self.quadros_perdidos = 0      # lacunas na sequência (inclui os corrompidos)
+        self.quadros_corrompidos = 0   # CRC inválido
+        self.quadros_repetidos = 0     # mesma sequência do anterior (descartados)
+        self.ressincronizacoes = 0     # saltos fora de JANELA_SEQUENCIA
+        self.bytes_descartados = 0
+
+    def alimentar(self, dados):
+        """Acrescenta bytes ao buffer e retorna a lista de leituras dos quadros completos"""
+        buffer = self.buffer
+        buffer += dados
+        leituras = []
+        posicao = 0
+        limite = len(buffer) - TAMANHO_QUADRO
+
+        while posicao <= limite:
+            if buffer[posicao:posicao + 2] != SINCRONISMO:
+                # Fora de sincronismo: pular até a próxima marca
+                proxima = buffer.find(SINCRONISMO, posicao + 1)
+                if proxima < 0:
+                    # Manter o último byte, que pode ser o início da marca
+                    proxima = len(buffer) - 1
+                self.bytes_descartados += proxima - posicao
+                posicao = proxima
+                continue
+
+            _, sequencia, tempo_ms, adc, centesimos, crc = _QUADRO.unpack_from(buffer, posicao)
+            if crc_hqx(buffer[posicao + 2:posicao + TAMANHO_QUADRO - 2], _CRC_INICIAL) != crc:
+                # Marca falsa ou quadro corrompido: procurar a próxima marca
+                self.quadros_corrompidos += 1
+                self.bytes_descartados += 1
+                posicao += 1
+                continue
+
+            if self.ultima_sequencia is not None:
+                distancia = (sequencia - self.ultima_sequencia) & 0xFFFF
+                if distancia == 0:
+                    # Quadro repetido (retransmitido): não é leitura nova
+                    self.quadros_repetidos += 1
+                    posicao += TAMANHO_QUADRO
+                    continue
+                if distancia < JANELA_SEQUENCIA:
+                    self.quadros_perdidos += distancia - 1
+                else:
+                    # Salto para trás ou grande demais (Arduino reiniciou): ressincroniza
+                    self.ressincronizacoes += 1
+            self.ultima_sequencia = sequencia
+            self.quadros_validos += 1
+            leituras.append((adc_para_psi(adc), centesimos / 100, tempo_ms))
+            posicao += TAMANHO_QUADRO
+
+        del buffer[:posicao]
+        return leituras
+
+    @property
+    def erros(self):
+        """Quadros descartados por CRC inválido"""
+        return self.quadros_corrompidos
+
+    def reiniciar(self):
+        """Descarta bytes pendentes e a sequência (ao reconectar ou trocar de porta)"""
+        self.buffer.clear()
+        self.ultima_sequencia = None
+
+    def get_metricas(self):
+        """Contadores de quadros válidos, perdidos e corrompidos e bytes descartados"""
+        return {
+            'quadros_validos': self.quadros_validos,
+            'quadros_perdidos': self.quadros_perdidos,
+            'quadros_corrompidos': self.quadros_corrompidos,
+            'quadros_repetidos': self.quadros_repetidos,
+            'ressincronizacoes': self.ressincronizacoes,
+            'bytes_descartados': self.bytes_descartados,
+        }
+
+
+def gerar_quadros(quantidade, periodo_ms=10, inicio_sequencia=0, inicio_ms=0,
+                  perder=(), corromper=(), semente=None):
+    """
+    Gera o fluxo binário que o Arduino enviaria (para testes e benchmarks sem
+    hardware): um mergulho simples com pressão e temperatura variando.
+    perder: índices de quadros omitidos (a sequência continua avançando)
+    corromper: índices de quadros com um byte trocado (falham no CRC)
+    """
+    aleatorio = random.Random(semente)
+    perder, corromper = set(perder), set(corromper)
+    fluxo = bytearray()
+    for i in range(quantidade):
+        if i in perder:
+            continue
+        fase = (i % 6000) / 6000
+        adc = 102 + int(700 * min(fase * 4, 1.0, (1 - fase) * 4)) + aleatorio.randint(-2, 2)
+        temperatura = 25.0 - 8.0 * min(fase * 4, 1.0) + aleatorio.uniform(-0.05, 0.05)
+        quadro = bytearray(codificar_quadro(inicio_sequencia + i, inicio_ms + i * periodo_ms,
+                                            adc, temperatura))
+        if i in corromper:
+            quadro[aleatorio.randrange(2, TAMANHO_QUADRO)] ^= 0xFF
+        fluxo += quadro
+    return bytes(fluxo)
+
+
+# ==================== DETECÇÃO DO FORMATO ====================
+
+# Bytes observados antes de desistir de decidir e descartar o início
+LIMITE_DETECCAO = 512
+
+
+class DecodificadorSerial:
+    """
+    Detecta o formato do fluxo (quadro binário com CRC válido ou linha CSV
+    válida, o que aparecer primeiro) e passa a usar o decodificador
+    correspondente. reiniciar() volta à detecção.
+    """
+
+    def __init__(self):
+        self.ascii = DecodificadorAscii()
+        self.binario = DecodificadorBinario()
+        self.reiniciar()
+
+    @property
+    def formato(self):
+        """'ascii', 'binario' ou None enquanto não detectado"""
+        if self.decodificador is self.ascii:
+            return 'ascii'
+        if self.decodificador is self.binario:
+            return 'binario'
+        return None
+
+    def alimentar(self, dados):
+        """Acrescenta bytes e retorna as leituras completas (lista vazia enquanto detecta)"""
+        if self.decodificador is not None:
+            return self.decodificador.alimentar(dados)
+
+        self.inicio += dados
+        self.decodificador = self._detectar(bytes(self.inicio))
+        if self.decodificador is None:
+            if len(self.inicio) > LIMITE_DETECCAO:
+                del self.inicio[:-TAMANHO_QUADRO]
+            return []
+
+        pendentes = bytes(self.inicio)
+        self.inicio.clear()
+        log.info("Protocolo detectado: %s", self.formato)
+        return self.decodificador.alimentar(pendentes)
+
+    def _detectar(self, dados):
+        """Retorna o decodificador do primeiro formato válido encontrado nos dados"""
+        posicao = dados.find(SINCRONISMO)
+        while 0 <= posicao <= len(dados) - TAMANHO_QUADRO:
+            crc = _QUADRO.unpack_from(dados, posicao)[-1]
+            if crc_hqx(dados[posicao + 2:posicao + TAMANHO_QUADRO - 2], _CRC_INICIAL) == crc:
+                return self.binario
+            posicao = dados.find(SINCRONISMO, posicao + 1)
+
+        # Exige uma linha completa depois da primeira quebra (a primeira pode estar cortada)
+        primeira = dados.find(b'\n')
+        if primeira >= 0 and _PADRAO_LINHA.search(dados, primeira + 1, dados.rfind(b'\n')):
+            return self.ascii
+        return None
+
+    @property
+    def erros(self):
+        """Linhas/quadros inválidos nos dois decodificadores (erros de decodificação)"""
+        return self.ascii.linhas_invalidas + self.binario.quadros_corrompidos
+
+    def reiniciar(self):
+        """Descarta bytes pendentes e volta a detectar o formato"""
+        self.ascii.reiniciar()
+        self.binario.reiniciar()
+        self.decodificador = None
+        self.inicio = bytearray()
+
+    def get_metricas(self):
+        """Formato detectado e contadores do decodificador em uso"""
+        metricas = {'formato': self.formato}
+        if self.decodificador is not None:
+            metricas.update(self.decodificador.get_metricas())
+        return metricas
@@ -0,0 +1,383 @@
+"""
+Log em níveis e métricas compartilhados pelo sensor e pela captura
+
+Log: cada componente pede get_log('sensor', 'SENSOR') e escreve com
+log.debug/info/warning/error, passando os valores como argumentos
+(log.info("Conectado em %s", porta)) para que a mensagem só seja montada se
+o nível estiver ativo. O registro vai para uma fila e uma thread
+(QueueListener) formata e escreve no console e, se configurado, em um
+arquivo JSON Lines; a thread que registra só paga o enfileiramento. Avisos
+e erros repetidos (mesma mensagem do mesmo componente) saem no máximo uma
+vez a cada INTERVALO_REPETICAO s, com a contagem dos suprimidos.
+
+Métricas: registro único de contadores, medidores e latências por nome
+('sensor.leituras', 'video.frames_gravados', ...). Atualizar custa uma
+soma sob um lock; ler é só acessar atributos (ler_metricas() monta o
+dicionário de todas, com a taxa por segundo dos contadores).
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+# Nível padrão do console e do arquivo
+NIVEL_PADRAO = logging.INFO
+
+# Intervalo mínimo (s) entre avisos/erros iguais do mesmo componente
+INTERVALO_REPETICAO = 5.0
+
+# Janela mínima (s) para calcular a taxa por segundo dos contadores
+JANELA_TAXA = 1.0
+
+# Logger raiz do projeto; os componentes são filhos dele
+RAIZ = 'mergulho'
+
+# Sufixo do prefixo no console por nível ([SENSOR ERRO], [SENSOR AVISO], ...)
+_SUFIXOS_NIVEL = {
+    logging.DEBUG: ' DEBUG',
+    logging.INFO: '',
+    logging.WARNING: ' AVISO',
+    logging.ERROR: ' ERRO',
+    logging.CRITICAL: ' ERRO',
+}
+
+# Prefixo mostrado no console para cada componente (nome -> 'SENSOR')
+_prefixos = {}
+
+_configuracao_lock = threading.Lock()
+_ouvinte = None
+_ouvindo = False  # thread do _ouvinte em execução (parada no encerramento)
+
+
+# ==================== LOG ====================
+
+class FormatadorConsole(logging.Formatter):
+    """Formata como as mensagens antigas: [SENSOR 1 ERRO] mensagem"""
+
+    def format(self, record):
+        componente, _, dispositivo = record.name[len(RAIZ) + 1:].partition('.')
+        prefixo = _prefixos.get(componente, componente.upper())
+        if dispositivo:
+            prefixo = f"{prefixo} {dispositivo}"
+        texto = f"[{prefixo}{_SUFIXOS_NIVEL.get(record.levelno, '')}] {record.getMessage()}"
+        if record.exc_info:
+            texto = f"{texto}\n{self.formatException(record.exc_info)}"
+        return texto
+
+
+class FormatadorJson(logging.Formatter):
+    """Uma linha JSON por registro (horário, nível, componente, mensagem)"""
+
+    def format(self, record):
+        componente, _, dispositivo = record.name[len(RAIZ) + 1:].partition('.')
+        dados = {
+            'timestamp_ms': int(record.created * 1000),
+            'nivel': record.levelname,
+            'componente': componente,
+            'mensagem': record.getMessage(),
+            'thread': record.threadName,
+        }
+        if dispositivo:
+            dados['dispositivo'] = dispositivo
+        if record.exc_info:
+            dados['excecao'] = self.formatException(record.exc_info)
+        return json.dumps(dados, ensure_ascii=False)
+
+
+class FiltroRepeticao(logging.Filter):
+    """
+    Deixa passar um aviso/erro igual (componente, nível e mensagem sem os
+    argumentos) a cada intervalo s; o próximo que passa informa quantos
+    foram suprimidos. Mensagens abaixo de WARNING passam direto.
+    """
+
+    def __init__(self, intervalo=INTERVALO_REPETICAO):
+        super().__init__()
+        self.intervalo = intervalo
+        self.ultimos = {}  # chave -> [instante da última emitida, suprimidas]
+        self.lock = threading.Lock()
+        self.suprimidas = 0
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING:
+            return True
+
+        chave = (record.name, record.levelno, record.msg)
+        agora = time.monotonic()
+        with self.lock:
+            estado = self.ultimos.get(chave)
+            if estado is None:
+                self.ultimos[chave] = [agora, 0]
+                return True
+            if agora - estado[0] < self.intervalo:
+                estado[1] += 1
+                self.suprimidas += 1
+                return False
+            suprimidas = estado[1]
+            estado[0], estado[1] = agora, 0
+
+        if suprimidas:
+            if isinstance(record.args, tuple) and record.args:
+                record.msg = f"{record.msg} (+%d iguais suprimidas)"
+                record.args = record.args + (suprimidas,)
+            else:
+                record.msg = f"{record.getMessage()} (+{suprimidas} iguais suprimidas)"
+                record.args = None
+        return True
+
+
+class _ManipuladorFila(logging.handlers.QueueHandler):
+    """QueueHandler que deixa a formatação para a thread do ouvinte"""
+
+    def prepare(self, record):
+        # A fila é do mesmo processo: não precisa montar a mensagem nem
+        # serializar a exceção aqui, na thread que registrou
+        return record
+
+
+def configurar_log(nivel=NIVEL_PADRAO, arquivo=None, nivel_arquivo=None,
+                   intervalo_repeticao=INTERVALO_REPETICAO, console=True):
+    """
+    Configura (ou reconfigura) o log do projeto: nível do console, arquivo
+    JSON Lines opcional e intervalo entre avisos/erros repetidos.
+    Retorna o logger raiz do projeto.
+    """
+    global _ouvinte, _ouvindo
+
+    with _configuracao_lock:
+        raiz = logging.getLogger(RAIZ)
+        if _ouvindo:
+            _ouvinte.stop()
+            _ouvindo = False
+        for manipulador in list(raiz.handlers):
+            raiz.removeHandler(manipulador)
+            manipulador.close()
+
+        saidas = []
+        if console:
+            saida = logging.StreamHandler(sys.stdout)
+            saida.setLevel(nivel)
+            saida.setFormatter(FormatadorConsole())
+            saidas.append(saida)
+        if arquivo:
+            saida = logging.FileHandler(arquivo, encoding='utf-8')
+            saida.setLevel(nivel if nivel_arquivo is None else nivel_arquivo)
+            saida.setFormatter(FormatadorJson())
+            saidas.append(saida)
+
+        fila = queue.SimpleQueue()
+        manipulador = _ManipuladorFila(fila)
+        manipulador.addFilter(FiltroRepeticao(intervalo_repeticao))
+        raiz.addHandler(manipulador)
+        raiz.setLevel(min([s.level for s in saidas], default=logging.CRITICAL + 1))
+        raiz.propagate = False
+
+        _ouvinte = logging.handlers.QueueListener(fila, *saidas, respect_handler_level=True)
+        _ouvinte.start()
+        _ouvindo = True
+        return raiz
+
+
+def descarregar_log():
+    """Espera a thread do log escrever tudo o que já foi registrado"""
+    with _configuracao_lock:
+        if _ouvindo:
+            # stop() escreve o que está na fila; depois volta a ouvir
+            _ouvinte.stop()
+            _ouvinte.start()
+
+
+def _encerrar_log():
+    global _ouvindo
+    with _configuracao_lock:
+        if _ouvindo:
+            _ouvinte.stop()
+            _ouvindo = False
+
+
+atexit.register(_encerrar_log)
+
+
+def get_log(componente, prefixo=None):
+    """
+    Logger de um componente ('sensor', 'video', ...), com o prefixo usado no
+    console; configura o log com os padrões se ninguém configurou antes.
+    Para separar dispositivos, use get_log('sensor').getChild(str(id)).
+    """
+    if prefixo is not None:
+        _prefixos[componente] = prefixo
+    if _ouvinte is None:
+        configurar_log()
+    return logging.getLogger(f"{RAIZ}.{componente}")
+
+
+# ==================== MÉTRICAS ====================
+
+class Contador:
+    """Total acumulado (leituras, frames, erros) e sua taxa por segundo"""
+
+    __slots__ = ('nome', 'valor', '_lock', '_marco', '_taxa')
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.valor = 0
+        self._lock = threading.Lock()
+        self._marco = (time.monotonic(), 0)
+        self._taxa = 0.0
+
+    def incrementar(self, quantidade=1):
+        with self._lock:
+            self.valor += quantidade
+
+    def taxa(self):
+        """Média por segundo desde a leitura anterior (com pelo menos JANELA_TAXA s)"""
+        agora = time.monotonic()
+        instante, valor = self._marco
+        if agora - instante >= JANELA_TAXA:
+            atual = self.valor
+            self._taxa = (atual - valor) / (agora - instante)
+            self._marco = (agora, atual)
+        return self._taxa
+
+    def ler(self):
+        return self.valor
+
+
+class Medidor:
+    """Valor instantâneo (profundidade da fila, segmento atual)"""
+
+    __slots__ = ('nome', 'valor')
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.valor = 0
+
+    def definir(self, valor):
+        self.valor = valor
+
+    def ler(self):
+        return self.valor
+
+
+class Latencia:
+    """Duração de uma operação (s): quantidade, última, média e máxima"""
+
+    __slots__ = ('nome', 'quantidade', 'ultima', 'total', 'maxima', '_lock')
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.quantidade = 0
+        self.ultima = 0.0
+        self.total = 0.0
+        self.maxima = 0.0
+        self._lock = threading.Lock()
+
+    def registrar(self, segundos):
+        with self._lock:
+            self.quantidade += 1
+            self.ultima = segundos
+            self.total += segundos
+            if segundos > self.maxima:
+                self.maxima = segundos
+
+    def medir(self):
+        """Context manager que registra a duração do bloco"""
+        return _Cronometro(self)
+
+    def ler(self):
+        with self._lock:
+            quantidade = self.quantidade
+            return {
+                'quantidade': quantidade,
+                'ultima': self.ultima,
+                'media': self.total / quantidade if quantidade else 0.0,
+                'maxima': self.maxima,
+            }
+
+
+class _Cronometro:
+    __slots__ = ('latencia', 'inicio')
+
+    def __init__(self, latencia):
+        self.latencia = latencia
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        self.latencia.registrar(time.perf_counter() - self.inicio)
+        return False
+
+
+class RegistroMetricas:
+    """Métricas por nome; criar é sob lock, atualizar e ler não passam por ele"""
+
+    def __init__(self):
+        self.metricas = {}
+        self.lock = threading.Lock()
+
+    def _obter(self, classe, nome):
+        metrica = self.metricas.get(nome)
+        if metrica is None:
+            with self.lock:
+                metrica = self.metricas.get(nome)
+                if metrica is None:
+                    metrica = self.metricas[nome] = classe(nome)
+        if not isinstance(metrica, classe):
+            raise TypeError(f"Métrica {nome!r} já existe como {type(metrica).__name__}")
+        return metrica
+
+    def contador(self, nome):
+        return self._obter(Contador, nome)
+
+    def medidor(self, nome):
+        return self._obter(Medidor, nome)
+
+    def latencia(self, nome):
+        return self._obter(Latencia, nome)
+
+    def ler(self, prefixo=''):
+        """Valores atuais das métricas cujo nome começa com prefixo; contadores
+        também trazem nome + '_por_s'"""
+        valores = {}
+        for nome, metrica in list(self.metricas.items()):
+            if not nome.startswith(prefixo):
+                continue
+            valores[nome] = metrica.ler()
+            if isinstance(metrica, Contador):
+                valores[f"{nome}_por_s"] = metrica.taxa()
+        return valores
+
+
+_registro = RegistroMetricas()
+
+
+def get_registro():
+    """Retorna o registro único de métricas"""
+    return _registro
+
+
+def contador(nome):
+    """Contador do registro único (criado no primeiro uso)"""
+    return _registro.contador(nome)
+
+
+def medidor(nome):
+    """Medidor do registro único (criado no primeiro uso)"""
+    return _registro.medidor(nome)
+
+
+def latencia(nome):
+    """Latência do registro único (criada no primeiro uso)"""
+    return _registro.latencia(nome)
+
+
+def ler_metricas(prefixo=''):
+    """Valores atuais das métricas do registro único (ver RegistroMetricas.ler)"""
+    return _registro.ler(prefixo)
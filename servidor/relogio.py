@@ -0,0 +1,58 @@
+"""
+Módulo do relógio único do sistema e conversões de timestamp
+
+Sensores, vídeo e áudio usam agora_ms() para que as marcas de tempo sejam
+comparáveis com resolução abaixo de um segundo. O relógio é ancorado no
+horário do sistema na importação e avança pelo relógio monotônico, então
+não volta no tempo se o horário do sistema for ajustado durante uma missão.
+"""
+
+import time
+from datetime import datetime
+
+# Formato texto das colunas DATETIME (horário local)
+FORMATO_BANCO = "%Y-%m-%d %H:%M:%S"
+
+# Formato usado nas telas
+FORMATO_EXIBICAO = "%d/%m/%Y %H:%M"
+
+# Diferença entre o horário do sistema e o relógio monotônico (ns)
+_ORIGEM_NS = time.time_ns() - time.monotonic_ns()
+
+
+def agora_ns():
+    """Nanossegundos desde a época (1970-01-01 UTC) pelo relógio único"""
+    return time.monotonic_ns() + _ORIGEM_NS
+
+
+def agora_ms():
+    """Milissegundos desde a época pelo relógio único"""
+    return agora_ns() // 1_000_000
+
+
+def para_ms(valor):
+    """Converte texto (FORMATO_BANCO, horário local), datetime ou número em ms"""
+    if valor is None:
+        return None
+    if isinstance(valor, (int, float)):
+        return int(valor)
+    if isinstance(valor, str):
+        valor = datetime.strptime(valor, FORMATO_BANCO)
+    return int(valor.timestamp() * 1000)
+
+
+def ms_para_datetime(ms):
+    """Converte ms desde a época para datetime local"""
+    return datetime.fromtimestamp(ms / 1000)
+
+
+def ms_para_texto(ms, formato=FORMATO_BANCO):
+    """Converte ms desde a época para texto no horário local"""
+    return ms_para_datetime(ms).strftime(formato)
+
+
+def formatar_ms(ms, formato=FORMATO_EXIBICAO, padrao=""):
+    """Formata ms para exibição; retorna `padrao` se ms for None"""
+    if ms is None:
+        return padrao
+    return ms_para_texto(ms, formato)
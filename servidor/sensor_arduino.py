@@ -2,196 +2,597 @@
 Módulo para leitura de dados do Arduino (temperatura e pressão)
 """
 
+import queue
 import serial
 import serial.tools.list_ports
 import threading
 import time
-from datetime import datetime
-import servidor.database as db
-
-
-class SensorArduino:
-    """Classe para gerenciar leitura de sensores do Arduino"""
-
-    # Instância única (singleton)
-    _instancia = None
-    _lock = threading.Lock()
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from servidor.alarmes import MotorAlarmes
+from servidor.analise_mergulho import AnaliseMergulho
+from servidor.buffer_leituras import BufferLeituras, agregar
+from servidor.escritor_medicoes import EscritorMedicoes
+from servidor.leitor_serial import get_leitor
+from servidor.politicas_armazenamento import PoliticaTodas
+from servidor.protocolo_serial import DecodificadorSerial
+from servidor import registro, relogio
+
+
+# Tempo máximo (s) que a leitura bloqueia esperando bytes; também é o tempo
+# para a thread perceber o pedido de parada
+TIMEOUT_LEITURA = 0.5
+
+# Intervalo mínimo (s) entre mensagens de leitura no log
+INTERVALO_LOG = 1.0
+
+# Velocidades do sketch: ASCII (padrão) e protocolo binário (PROTOCOLO_BINARIO)
+BAUDRATE_ASCII = 9600
+BAUDRATE_BINARIO = 115200
+
+# Testadas em ordem por conectar() quando a velocidade não é informada
+BAUDRATES = (BAUDRATE_ASCII, BAUDRATE_BINARIO)
+
+# Diferença máxima (ms) entre o relógio do Arduino convertido e o nosso antes
+# de reancorar (Arduino reiniciado, millis() deu a volta ou deriva acumulada)
+LIMITE_DERIVA_MS = 1000
+
+# Espera máxima (s) pela primeira leitura válida após abrir a porta (o Arduino
+# reinicia ao abrir a serial e só então começa a enviar); 0 = não esperar
+ESPERA_RESET = 5
+
+# Tentativas de conexão em segundo plano: espera inicial entre tentativas (s),
+# dobrada a cada falha até o máximo, e prazo total padrão (s, None = sem prazo)
+ESPERA_INICIAL_RECONEXAO = 0.5
+ESPERA_MAXIMA_RECONEXAO = 5.0
+PRAZO_CONEXAO = 30.0
+
+# Descrição das portas USB de Arduinos (placas originais e clones com CH340)
+DESCRICOES_ARDUINO = ('Arduino', 'CH340')
+
+# Lotes guardados por padrão na fila de cada assinante antes de descartar os mais antigos
+TAMANHO_FILA_ASSINANTE = 100
+
+log = registro.get_log('sensor', 'SENSOR')
+
+# Métricas de todos os sensores (ver servidor/registro.py)
+_leituras = registro.contador('sensor.leituras')
+_erros_decodificacao = registro.contador('sensor.erros_decodificacao')
+_medicoes_descartadas = registro.contador('sensor.medicoes_descartadas')
+_falhas_leitura = registro.contador('sensor.falhas_leitura')
+_reconexoes = registro.contador('sensor.reconexoes')
+
+# Leituras acumuladas no buffer antes de atualizar a análise do mergulho
+# (cada atualização tem custo fixo; get_analise processa o restante)
+LOTE_ANALISE = 100
+
+
+def listar_portas_disponiveis():
+    """Lista todas as portas COM disponíveis: (porta, descrição)"""
+    portas = serial.tools.list_ports.comports()
+    return [(porta.device, porta.description) for porta in portas]
+
+
+def encontrar_arduinos():
+    """Portas de todos os Arduinos conectados"""
+    return [porta for porta, descricao in listar_portas_disponiveis()
+            if any(nome in descricao for nome in DESCRICOES_ARDUINO)]
+
+
+# Conexões em segundo plano (conectar_async, reconexão e gerenciador); as
+# esperas pelo reset se sobrepõem, sem ocupar a thread da interface
+_executor_conexoes = ThreadPoolExecutor(max_workers=8, thread_name_prefix='conexao-sensor')
+
+
+def em_segundo_plano(funcao, *args, callback=None, **kwargs):
+    """
+    Executa funcao(*args, **kwargs) em uma thread de conexão e retorna o
+    Future; callback(future) é chamado nessa thread ao terminar (na interface,
+    consultar future.done() com after() em vez de mexer nos widgets no callback)
+    """
+    future = _executor_conexoes.submit(funcao, *args, **kwargs)
+    if callback is not None:
+        future.add_done_callback(callback)
+    return future
+
+
+def tentar_com_espera(tentativa, prazo=PRAZO_CONEXAO, cancelado=None,
+                      espera_inicial=ESPERA_INICIAL_RECONEXAO, espera_maxima=ESPERA_MAXIMA_RECONEXAO):
+    """
+    Repete tentativa() até ela retornar um valor verdadeiro, dobrando a espera
+    entre as tentativas (até espera_maxima). Para no prazo (s, None = sem
+    prazo) ou quando o Event `cancelado` for sinalizado. Retorna o último resultado
+    """
+    limite = None if prazo is None else time.monotonic() + prazo
+    espera = espera_inicial
+    while True:
+        resultado = tentativa()
+        if resultado:
+            return resultado
+        if limite is not None:
+            espera = min(espera, limite - time.monotonic())
+            if espera <= 0:
+                return resultado
+        if cancelado is not None:
+            if cancelado.wait(espera):
+                return resultado
+        else:
+            time.sleep(espera)
+        espera = min(espera * 2, espera_maxima)
+
+
+def porta_do_dispositivo(id_dispositivo):
+    """Porta atual do dispositivo (número de série USB ou nome da porta) ou None se não estiver conectado"""
+    for info in serial.tools.list_ports.comports():
+        if id_dispositivo in (info.serial_number, info.device):
+            return info.device
+    return None
+
+
+def identificar_dispositivo(porta):
+    """
+    Identificador estável da placa: número de série USB quando existe (não
+    muda se a porta mudar de nome), senão o nome da porta
+    """
+    for info in serial.tools.list_ports.comports():
+        if info.device == porta and info.serial_number:
+            return info.serial_number
+    return porta
+
+
+# ==================== BARRAMENTO DE EVENTOS ====================
+
+# Estado mais recente, imutável: a versão muda a cada lote publicado, então
+# quem só precisa saber se algo mudou compara um inteiro (sem lock)
+LeituraSensor = namedtuple('LeituraSensor', ['versao', 'timestamp_ms', 'temperatura', 'pressao'])
+
+SNAPSHOT_VAZIO = LeituraSensor(0, None, None, None)
+
+
+class Assinatura:
+    """Assinante do barramento: callback chamado na thread serial ou fila limitada"""
+
+    def __init__(self, barramento, callback=None, tamanho_fila=None):
+        self.barramento = barramento
+        self.callback = callback
+        self.fila = queue.Queue(maxsize=tamanho_fila) if callback is None else None
+        self.descartados = 0  # lotes perdidos com a fila cheia
+
+    def entregar(self, leituras, snapshot):
+        """Chamado pelo barramento a cada lote publicado"""
+        if self.callback is not None:
+            self.callback(leituras, snapshot)
+            return
+        # Fila cheia: o consumidor está atrasado, descartar o lote mais antigo
+        while True:
+            try:
+                self.fila.put_nowait(leituras)
+                return
+            except queue.Full:
+                try:
+                    self.fila.get_nowait()
+                    self.descartados += 1
+                except queue.Empty:
+                    pass
 
-    def __new__(cls):
-        if cls._instancia is None:
-            with cls._lock:
-                if cls._instancia is None:
-                    cls._instancia = super().__new__(cls)
-        return cls._instancia
+    def receber(self, timeout=None):
+        """Próximo lote da fila (lista de leituras) ou None no timeout"""
+        try:
+            return self.fila.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def receber_pendentes(self):
+        """Todas as leituras já na fila, sem bloquear (lista vazia se nenhuma)"""
+        leituras = []
+        while True:
+            try:
+                leituras.extend(self.fila.get_nowait())
+            except queue.Empty:
+                return leituras
+
+    def cancelar(self):
+        """Deixa de receber leituras"""
+        self.barramento.cancelar(self)
+
+
+class BarramentoSensor:
+    """
+    Publica cada lote de leituras (timestamp_ms, temperatura, pressao) para os
+    assinantes e mantém o snapshot versionado da leitura mais recente.
+    A lista de assinantes é trocada inteira ao assinar/cancelar, então a
+    publicação percorre uma tupla sem lock.
+    """
 
     def __init__(self):
-        # Evitar reinicialização
-        if hasattr(self, 'initialized'):
-            return
+        self._lock = threading.Lock()
+        self._assinaturas = ()
+        self.snapshot = SNAPSHOT_VAZIO
+
+    def assinar(self, callback=None, tamanho_fila=TAMANHO_FILA_ASSINANTE):
+        """
+        Com callback: callback(leituras, snapshot) na thread de leitura serial
+        (deve ser rápido). Sem callback: retorna uma assinatura com fila
+        limitada, consumida com receber()/receber_pendentes()
+        """
+        assinatura = Assinatura(self, callback, tamanho_fila)
+        with self._lock:
+            self._assinaturas += (assinatura,)
+        return assinatura
+
+    def cancelar(self, assinatura):
+        """Remove a assinatura (sem efeito se já removida)"""
+        with self._lock:
+            self._assinaturas = tuple(a for a in self._assinaturas if a is not assinatura)
+
+    def publicar(self, leituras):
+        """Atualiza o snapshot com a última leitura e entrega o lote aos assinantes"""
+        timestamp_ms, temperatura, pressao = leituras[-1]
+        snapshot = LeituraSensor(self.snapshot.versao + 1, timestamp_ms, temperatura, pressao)
+        self.snapshot = snapshot
+        for assinatura in self._assinaturas:
+            try:
+                assinatura.entregar(leituras, snapshot)
+            except Exception as e:
+                log.error("Falha em assinante do barramento: %s", e)
+
 
-        self.initialized = True
+class SensorArduino:
+    """
+    Um Arduino (placa de sensores) em uma porta serial. Vários podem ser usados
+    ao mesmo tempo (ver servidor/gerenciador_sensores.py); a leitura de todos
+    é feita por uma única thread (servidor/leitor_serial.py)
+    """
+
+    def __init__(self, id_dispositivo=None, escritor=None):
+        self.id_dispositivo = id_dispositivo
         self.conectado = False
         self.lendo = False
         self.porta_serial = None
-        self.thread_leitura = None
-        self.parar_flag = False
+        self.porta = None  # nome/URL da última porta conectada
+
+        # Após uma falha de leitura (Arduino desconectado), reconecta em
+        # segundo plano e volta a gravar na mesma missão
+        self.reconectar_automatico = True
+        self.reconexao = None                  # Future da reconexão em andamento
+        self.cancelar_reconexao = threading.Event()
 
         # Últimas leituras
         self.ultima_temperatura = None
         self.ultima_pressao = None
         self.ultimo_timestamp = None
+        self.ultimo_timestamp_ms = None
+
+        # Leituras recentes em memória (gráficos, tendências e alarmes sem
+        # consultar o banco); protegido por dados_lock
+        self.buffer = BufferLeituras()
+
+        # Profundidade, velocidade vertical e tempos do mergulho, atualizados
+        # a partir do buffer; protegido por dados_lock
+        self.analise = AnaliseMergulho()
+        self.leituras_analisadas = 0  # posição (buffer.total) já passada à análise
+
+        # Decodificação do fluxo serial (ASCII ou binário, detectado) e contadores
+        self.decodificador = DecodificadorSerial()
+        self.ancora_dispositivo_ms = None  # nosso relógio menos o millis() do Arduino
+        self.leituras_recebidas = 0
+        self.ultimo_log = 0.0
+        self._log = (None, log)  # (id_dispositivo, logger do dispositivo)
 
         # Dados da missão
         self.id_missao = None
 
-        # Controle de salvamento no banco (1 vez por minuto)
-        self.ultimo_salvamento = None
-        self.intervalo_salvamento = 60  # 60 segundos
+        # Gravação em lote no banco (thread separada, não bloqueia a serial);
+        # compartilhada entre os sensores do gerenciador
+        self.escritor = escritor or EscritorMedicoes()
+
+        # Quais leituras são gravadas (ver servidor/politicas_armazenamento.py)
+        self.politica = PoliticaTodas()
 
         # Lock para acesso thread-safe
         self.dados_lock = threading.Lock()
 
+        # Leituras novas para vídeo, telas e banco; a gravação no banco é o
+        # primeiro assinante
+        self.eventos = BarramentoSensor()
+        self.eventos.assinar(self._gravar_leituras)
+
+        # Alarmes avaliados a cada lote na thread de leitura; eventos gravados
+        # e entregues pela thread do motor (ver servidor/alarmes.py)
+        self.alarmes = MotorAlarmes(id_dispositivo=id_dispositivo)
+        self.eventos.assinar(self.alarmes.processar)
+
+    @property
+    def log(self):
+        """Logger do dispositivo ([SENSOR <id>] no console); o id pode ser
+        descoberto só ao conectar"""
+        id_log, logger = self._log
+        if id_log != self.id_dispositivo:
+            logger = log if self.id_dispositivo is None else log.getChild(str(self.id_dispositivo))
+            self._log = (self.id_dispositivo, logger)
+        return logger
+
     def encontrar_arduino(self):
         """Encontra automaticamente a porta do Arduino"""
-        portas = serial.tools.list_ports.comports()
-        for porta in portas:
-            if 'Arduino' in porta.description or 'CH340' in porta.description:
-                return porta.device
-        return None
+        portas = encontrar_arduinos()
+        return portas[0] if portas else None
 
     def listar_portas_disponiveis(self):
         """Lista todas as portas COM disponíveis"""
-        portas = serial.tools.list_ports.comports()
-        return [(porta.device, porta.description) for porta in portas]
-
-    def conectar(self, porta=None, baudrate=9600):
-        """Conecta ao Arduino em uma porta específica"""
+        return listar_portas_disponiveis()
+
+    def conectar(self, porta=None, baudrate=None, espera_reset=ESPERA_RESET):
+        """
+        Conecta ao Arduino em uma porta específica (detectada se None). Bloqueia
+        até a primeira leitura válida, no máximo espera_reset segundos (sem
+        leitura nesse tempo, a conexão falha); fora da thread da interface,
+        usar conectar_async. Sem baudrate, testa as velocidades de BAUDRATES
+        (cada uma com a sua espera) até uma leitura válida; sem espera_reset
+        não há como testar e vale BAUDRATE_ASCII
+        """
         if self.conectado:
-            print("[SENSOR] Já existe uma conexão ativa!")
+            self.log.warning("Já existe uma conexão ativa!")
             return False
 
         # Se não especificar porta, tentar detectar automaticamente
         if porta is None:
             porta = self.encontrar_arduino()
             if porta is None:
-                print("[SENSOR ERRO] Arduino não encontrado!")
+                self.log.error("Arduino não encontrado!")
                 return False
-            print(f"[SENSOR] Arduino encontrado em: {porta}")
+            self.log.info("Arduino encontrado em: %s", porta)
+
+        if baudrate is not None:
+            velocidades = (baudrate,)
+        else:
+            velocidades = BAUDRATES if espera_reset else (BAUDRATE_ASCII,)
 
         try:
-            self.porta_serial = serial.Serial(porta, baudrate, timeout=1)
-            time.sleep(3)  # Aguardar Arduino resetar
-            self.porta_serial.flushInput()
+            for velocidade in velocidades:
+                # serial_for_url aceita também URLs do pyserial (socket://, usado pelo simulador)
+                self.porta_serial = serial.serial_for_url(porta, velocidade, timeout=TIMEOUT_LEITURA)
+                self.porta_serial.flushInput()
+                if not espera_reset or self._aguardar_pronto(espera_reset):
+                    break
+                self.porta_serial.close()
+            else:
+                self.log.error("Nenhuma leitura válida de %s em %s s (%s baud)", porta, espera_reset,
+                               "/".join(str(velocidade) for velocidade in velocidades))
+                return False
+            self.porta = porta
             self.conectado = True
-            print(f"[SENSOR] Conectado com sucesso em {porta}")
+            if self.id_dispositivo is None:
+                self.id_dispositivo = identificar_dispositivo(porta)
+            self.log.info("Conectado com sucesso em %s (%d baud)", porta, self.porta_serial.baudrate)
             return True
         except Exception as e:
-            print(f"[SENSOR ERRO] Falha ao conectar em {porta}: {e}")
+            self.log.error("Falha ao conectar em %s: %s", porta, e)
             return False
 
+    def _aguardar_pronto(self, espera):
+        """
+        Lê a porta até decodificar a primeira leitura válida (Arduino já
+        reiniciado e enviando) ou até `espera` segundos. Os bytes lidos aqui
+        são descartados; a leitura contínua começa no que vier depois
+        """
+        decodificador = DecodificadorSerial()
+        limite = time.monotonic() + espera
+        while time.monotonic() < limite:
+            dados = self.porta_serial.read(max(self.porta_serial.in_waiting, 1))
+            if dados and decodificador.alimentar(dados):
+                return True
+        return False
+
+    def conectar_async(self, porta=None, baudrate=None, espera_reset=ESPERA_RESET,
+                       prazo=PRAZO_CONEXAO, callback=None):
+        """
+        Conecta em segundo plano, tentando de novo com espera crescente (Arduino
+        ainda não plugado, porta ocupada, reset demorado) até o prazo. Retorna
+        um Future com True/False; callback(future) é chamado ao terminar
+        """
+        def tentar():
+            return self.conectado or self.conectar(porta, baudrate, espera_reset)
+        return em_segundo_plano(tentar_com_espera, tentar, prazo, callback=callback)
+
+    @property
+    def reconectando(self):
+        """True enquanto a reconexão automática está em andamento"""
+        return self.reconexao is not None and not self.reconexao.done()
+
+    def _reconectar(self, id_missao):
+        """
+        Tentativas em segundo plano após o Arduino ser desconectado: procura a
+        placa (pelo número de série, a porta pode mudar de nome ao replugar) e
+        retoma a leitura na mesma missão. Cancelado por parar_leitura/desconectar
+        """
+        baudrate = self.porta_serial.baudrate
+
+        def tentar():
+            porta = porta_do_dispositivo(self.id_dispositivo) or self.porta
+            if self.cancelar_reconexao.is_set() or not self.conectar(porta, baudrate):
+                return False
+            if self.cancelar_reconexao.is_set():
+                self.porta_serial.close()
+                self.conectado = False
+                return False
+            _reconexoes.incrementar()
+            self.log.info("Reconectado em %s", porta)
+            return self.iniciar_leitura(id_missao, retomar=True)
+
+        self.cancelar_reconexao.clear()
+        self.reconexao = em_segundo_plano(tentar_com_espera, tentar, None, self.cancelar_reconexao)
+
+    def _parar_reconexao(self):
+        """Interrompe a reconexão automática (espera a tentativa em andamento)"""
+        if self.reconectando:
+            self.cancelar_reconexao.set()
+            try:
+                self.reconexao.result(timeout=ESPERA_RESET + 1)
+            except Exception as e:
+                self.log.error("Reconexão não terminou: %r", e)
+
     def desconectar(self):
         """Desconecta do Arduino"""
+        self._parar_reconexao()
         if self.lendo:
             self.parar_leitura()
 
         if self.porta_serial and self.porta_serial.is_open:
             self.porta_serial.close()
             self.conectado = False
-            print("[SENSOR] Desconectado")
+            self.log.info("Desconectado")
 
-    def iniciar_leitura(self, id_missao=None):
-        """Inicia leitura contínua dos sensores"""
+    def iniciar_leitura(self, id_missao=None, retomar=False):
+        """
+        Inicia leitura contínua dos sensores. retomar=True (reconexão) mantém
+        as leituras recentes, a análise do mergulho e o estado dos alarmes
+        """
         if not self.conectado:
-            print("[SENSOR ERRO] Arduino não está conectado!")
+            self.log.error("Arduino não está conectado!")
             return False
 
         if self.lendo:
-            print("[SENSOR] Já está lendo dados!")
+            self.log.warning("Já está lendo dados!")
             return False
 
         self.id_missao = id_missao
-        self.parar_flag = False
         self.lendo = True
+        self.politica.reiniciar()
+        self.decodificador.reiniciar()
+        self.ancora_dispositivo_ms = None
+        if not retomar:
+            with self.dados_lock:
+                self.buffer.limpar()
+                self.analise.reiniciar()
+                self.leituras_analisadas = 0
 
-        # Resetar contador de salvamento para nova missão
-        self.ultimo_salvamento = None
+        # Garantir que a thread de escrita no banco está rodando
+        self.escritor.iniciar()
 
-        # Iniciar thread de leitura
-        self.thread_leitura = threading.Thread(
-            target=self._ler_dados_continuamente,
-            daemon=True
-        )
-        self.thread_leitura.start()
+        self.alarmes.id_dispositivo = self.id_dispositivo
+        self.alarmes.iniciar(id_missao, reiniciar_regras=not retomar)
 
-        print("[SENSOR] Leitura de dados iniciada")
+        # A thread de leitura compartilhada entrega os bytes em _receber
+        get_leitor().adicionar(self.porta_serial, self._receber, self._falha_leitura)
+
+        self.log.info("Leitura de dados iniciada")
         return True
 
     def parar_leitura(self):
-        """Para a leitura contínua"""
+        """Para a leitura contínua (e a reconexão automática, se em andamento)"""
+        if self.reconectando:
+            self._parar_reconexao()
+            self.alarmes.parar()
         if not self.lendo:
             return
 
-        print("[SENSOR] Parando leitura...")
-        self.parar_flag = True
+        self.log.info("Parando leitura...")
         self.lendo = False
+        get_leitor().remover(self.porta_serial)
+
+        # Gravar a leitura que a política ainda segurava e as que estão na fila
+        if self.id_missao:
+            for leitura in self.politica.finalizar():
+                self.escritor.enfileirar(self.id_missao, *leitura, self.id_dispositivo)
+        self.descarregar_medicoes()
+        self.alarmes.parar()
+
+        self.log.info("Leitura parada")
+
+    def _receber(self, dados):
+        """
+        Chamado pela thread de leitura compartilhada com os bytes que chegaram
+        (uma ou várias linhas/quadros, ou parte de um)
+        """
+        decodificador = self.decodificador
+        erros = decodificador.erros
+        leituras = decodificador.alimentar(dados)
+        if decodificador.erros != erros:
+            _erros_decodificacao.incrementar(decodificador.erros - erros)
+        if leituras:
+            self._processar_leituras(leituras)
+
+    def _falha_leitura(self, erro):
+        """
+        Porta com erro (Arduino desconectado): a leitura para e, com
+        reconectar_automatico, a conexão é refeita em segundo plano
+        """
+        _falhas_leitura.incrementar()
+        self.log.error("Erro na leitura: %s", erro)
+        self.lendo = False
+        if not self.reconectar_automatico:
+            return
 
-        if self.thread_leitura and self.thread_leitura.is_alive():
-            self.thread_leitura.join(timeout=5)
-
-        print("[SENSOR] Leitura parada")
-
-    def _ler_dados_continuamente(self):
-        """Thread que lê dados continuamente do Arduino no formato CSV"""
+        # O que a política ainda segurava é gravado; a missão continua após a reconexão
+        if self.id_missao:
+            for leitura in self.politica.finalizar():
+                self.escritor.enfileirar(self.id_missao, *leitura, self.id_dispositivo)
         try:
-            while not self.parar_flag and self.porta_serial.is_open:
-                try:
-                    if self.porta_serial.in_waiting > 0:
-                        # Ler linha da serial
-                        linha = self.porta_serial.readline().decode('utf-8', errors='ignore').strip()
-
-                        if linha:
-                            # Parsear dados no formato CSV: pressao,temperatura
-                            dados = linha.split(',')
-
-                            if len(dados) >= 2:
-                                try:
-                                    pressao = float(dados[0])
-                                    temperatura = float(dados[1])
-
-                                    # Atualizar dados
-                                    with self.dados_lock:
-                                        self.ultima_temperatura = temperatura
-                                        self.ultima_pressao = pressao
-                                        self.ultimo_timestamp = datetime.now()
-
-                                    print(f"[SENSOR] Temp: {temperatura:.1f}°C | Pressão: {pressao:.2f} psi")
-
-                                    # Salvar no banco de dados se houver missão ativa
-                                    # Salva apenas de minuto em minuto
-                                    if self.id_missao:
-                                        agora = time.time()
-
-                                        # Primeira leitura ou passou 1 minuto desde último salvamento
-                                        if self.ultimo_salvamento is None or (agora - self.ultimo_salvamento) >= self.intervalo_salvamento:
-                                            try:
-                                                timestamp_str = self.ultimo_timestamp.strftime("%Y-%m-%d %H:%M:%S")
-                                                db.inserir_medicao(self.id_missao, timestamp_str, temperatura, pressao)
-                                                self.ultimo_salvamento = agora
-                                                print(f"[SENSOR BANCO] Medição salva no banco de dados")
-                                            except Exception as e:
-                                                print(f"[SENSOR ERRO] Falha ao salvar medição: {e}")
-
-                                except ValueError as e:
-                                    print(f"[SENSOR ERRO] Dados inválidos: {linha}")
-
-                except Exception as e:
-                    print(f"[SENSOR ERRO] Erro na leitura: {e}")
-                    time.sleep(1)
-
-        except Exception as e:
-            print(f"[SENSOR ERRO] Erro crítico: {e}")
-        finally:
-            self.lendo = False
+            self.porta_serial.close()
+        except Exception:
+            pass
+        self.conectado = False
+        self._reconectar(self.id_missao)
+
+    def _processar_leituras(self, leituras):
+        """
+        Marca as leituras no relógio único, atualiza a última leitura e o
+        buffer e publica o lote no barramento.
+        leituras: (pressao, temperatura, tempo_ms do Arduino ou None)
+        """
+        # Relógio único, mesmo do vídeo e áudio. No ASCII as leituras do mesmo
+        # pedaço recebem o mesmo instante; no binário cada uma usa o millis()
+        # do Arduino convertido para o nosso relógio
+        agora_ms = relogio.agora_ms()
+        tempo_ultima = leituras[-1][2]
+        if tempo_ultima is None:
+            marcadas = [(agora_ms, temperatura, pressao) for pressao, temperatura, _ in leituras]
+        else:
+            self._ancorar(tempo_ultima, agora_ms)
+            ancora = self.ancora_dispositivo_ms
+            marcadas = [(tempo_ms + ancora, temperatura, pressao)
+                        for pressao, temperatura, tempo_ms in leituras]
+
+        timestamp_ms, temperatura, pressao = marcadas[-1]
+        with self.dados_lock:
+            self.ultima_temperatura = temperatura
+            self.ultima_pressao = pressao
+            self.ultimo_timestamp_ms = timestamp_ms
+            self.ultimo_timestamp = relogio.ms_para_datetime(timestamp_ms)
+            self.leituras_recebidas += len(leituras)
+            self.buffer.adicionar_lote(marcadas)
+            if self.buffer.total - self.leituras_analisadas >= LOTE_ANALISE:
+                self._atualizar_analise()
+        _leituras.incrementar(len(leituras))
+
+        agora = time.monotonic()
+        if agora - self.ultimo_log >= INTERVALO_LOG:
+            self.ultimo_log = agora
+            self.log.info("Temp: %.1f°C | Pressão: %.2f psi", temperatura, pressao)
+
+        self.eventos.publicar(marcadas)
+
+    def _gravar_leituras(self, leituras, snapshot):
+        """Assinante do barramento: enfileira para o banco o que a política manda gravar"""
+        # Enfileirar para gravação em lote se houver missão ativa
+        if self.id_missao:
+            for leitura in leituras:
+                for gravar in self.politica.filtrar(*leitura):
+                    if not self.escritor.enfileirar(self.id_missao, *gravar, self.id_dispositivo):
+                        _medicoes_descartadas.incrementar()
+                        self.log.error("Fila do banco cheia, medição descartada")
+
+    def _ancorar(self, tempo_dispositivo_ms, agora_ms):
+        """
+        Ajusta a diferença entre o nosso relógio e o millis() do Arduino usando
+        a leitura mais recente: nunca no futuro (acompanha um relógio do Arduino
+        adiantado) e reancorada se ficar mais de LIMITE_DERIVA_MS para trás
+        (Arduino reiniciado, millis() deu a volta ou relógio atrasado)
+        """
+        ancora = agora_ms - tempo_dispositivo_ms
+        if (self.ancora_dispositivo_ms is None or ancora < self.ancora_dispositivo_ms
+                or ancora - self.ancora_dispositivo_ms > LIMITE_DERIVA_MS):
+            self.ancora_dispositivo_ms = ancora
 
     def get_ultima_leitura(self):
         """Retorna a última leitura dos sensores (thread-safe)"""
@@ -200,10 +601,86 @@ class SensorArduino:
                 'temperatura': self.ultima_temperatura,
                 'pressao': self.ultima_pressao,
                 'timestamp': self.ultimo_timestamp,
+                'timestamp_ms': self.ultimo_timestamp_ms,
                 'conectado': self.conectado,
                 'lendo': self.lendo
             }
 
+    def assinar(self, callback=None, tamanho_fila=TAMANHO_FILA_ASSINANTE):
+        """Recebe as leituras novas por callback ou fila (ver BarramentoSensor.assinar)"""
+        return self.eventos.assinar(callback, tamanho_fila)
+
+    def get_snapshot(self):
+        """Leitura mais recente com versão (LeituraSensor), sem lock"""
+        return self.eventos.snapshot
+
+    def get_janela(self, segundos=None, n=None):
+        """
+        Leituras recentes sem cópia: dos últimos `segundos` (até a leitura mais
+        nova) ou as últimas n (todas se nenhum dos dois). Retorna uma Janela
+        de views (timestamp_ms, pressao, temperatura), válida até chegarem
+        mais capacidade - len(janela) leituras
+        """
+        with self.dados_lock:
+            if segundos is not None:
+                return self.buffer.janela_tempo(segundos)
+            return self.buffer.ultimas(n)
+
+    def get_tendencia(self, segundos=10):
+        """Mínimo, máximo, média e variação por segundo das leituras dos últimos `segundos` (None sem leituras)"""
+        with self.dados_lock:
+            return agregar(self.buffer.janela_tempo(segundos))
+
+    def _atualizar_analise(self):
+        """Passa à análise as leituras do buffer que ela ainda não viu (chamar com dados_lock)"""
+        novas = self.buffer.total - self.leituras_analisadas
+        if novas:
+            janela = self.buffer.ultimas(novas)
+            self.analise.adicionar(janela.timestamp_ms, janela.pressao)
+            self.leituras_analisadas = self.buffer.total
+
+    def get_analise(self):
+        """
+        Resumo do mergulho desde o início da leitura: profundidade atual e
+        máxima, velocidade vertical, tempo de fundo etc. (ver
+        AnaliseMergulho.resultado); None sem leituras
+        """
+        with self.dados_lock:
+            self._atualizar_analise()
+            return self.analise.resultado()
+
+    def get_alarmes_ativos(self):
+        """Alarmes ativos agora: lista de (nome, severidade, mensagem)"""
+        return self.alarmes.get_ativos()
+
+    def definir_regras_alarme(self, regras):
+        """Troca as regras de alarme (objetos Regra; ver alarmes.criar_regras)"""
+        self.alarmes.definir_regras(regras)
+
+    def definir_politica(self, politica):
+        """Troca a política de armazenamento (usar com a leitura parada)"""
+        if self.lendo:
+            self.log.warning("Pare a leitura antes de trocar a política de armazenamento")
+            return False
+        self.politica = politica
+        self.log.info("Política de armazenamento: %r", politica)
+        return True
+
+    def get_metricas_leitura(self):
+        """Leituras recebidas, formato detectado e contadores do decodificador (linhas inválidas ou quadros perdidos/corrompidos)"""
+        with self.dados_lock:
+            metricas = {'leituras_recebidas': self.leituras_recebidas}
+        metricas.update(self.decodificador.get_metricas())
+        return metricas
+
+    def descarregar_medicoes(self):
+        """Bloqueia até que as medições enfileiradas estejam gravadas no banco"""
+        return self.escritor.descarregar()
+
+    def get_metricas_escrita(self):
+        """Retorna profundidade da fila e latência de gravação no banco"""
+        return self.escritor.get_metricas()
+
     def get_temperatura_formatada(self):
         """Retorna temperatura formatada para exibição"""
         with self.dados_lock:
@@ -233,7 +710,20 @@ class SensorArduino:
             return "N/A"
 
 
-# Função  para obter a instância única
+_sensor = None
+_sensor_lock = threading.Lock()
+
+
+# Função  para obter o sensor principal
 def get_sensor():
-    """Retorna a instância única do sensor Arduino"""
-    return SensorArduino()
+    """
+    Retorna o sensor principal (instância única). O gerenciador de sensores
+    usa esta mesma instância para o primeiro dispositivo que conectar, se
+    ela ainda estiver livre
+    """
+    global _sensor
+    if _sensor is None:
+        with _sensor_lock:
+            if _sensor is None:
+                _sensor = SensorArduino()
+    return _sensor
@@ -0,0 +1,374 @@
+"""
+Módulo de simulação do Arduino dos sensores (testes de carga sem hardware)
+
+Envia exatamente o que o sketch envia, uma linha "pressao,temperatura\\r\\n"
+por leitura, por uma porta que o SensorArduino abre normalmente com
+conectar(porta=simulador.porta):
+
+- 'pty': pseudo-terminal (Linux/macOS); porta = /dev/pts/N
+- 'socket': servidor TCP local; porta = socket://127.0.0.1:N (URL do
+  pyserial, funciona em qualquer sistema)
+
+As leituras vêm de um perfil de mergulho gerado (perfil_mergulho) ou de uma
+missão gravada no banco (leituras_da_missao) e são enviadas no tempo
+original, N vezes mais rápido (velocidade=N) ou sem pausa (velocidade=None).
+Ruído, linhas corrompidas e quedas de conexão (Arduino desconectado e
+reconectado) são configuráveis.
+
+Uso (a partir da raiz do projeto):
+    python -m servidor.simulador_arduino [--transporte pty] [--hz 10] [--perfil quadrado]
+    python -m servidor.simulador_arduino --missao 3 --velocidade 10
+"""
+
+import argparse
+import math
+import os
+import random
+import socket
+import threading
+import time
+
+import servidor.database as db
+
+# Pressão por metro de água salgada (psi/m) e fundo de escala do sensor (psi)
+PSI_POR_METRO = 1.45
+PRESSAO_MAXIMA = 30.0
+
+PERFIS = ('quadrado', 'ioio', 'constante')
+
+# Bytes acumulados antes de escrever na porta quando há várias linhas atrasadas
+TAMANHO_ESCRITA = 4096
+
+
+def _profundidade_relativa(perfil, fracao):
+    """Profundidade (0-1 da máxima) na fração do mergulho"""
+    if perfil == 'quadrado':
+        # Descida em 20% do tempo, fundo e subida em 20%
+        return max(0.0, min(fracao / 0.2, 1.0, (1.0 - fracao) / 0.2))
+    if perfil == 'ioio':
+        # Três subidas e descidas seguidas
+        return abs(math.sin(math.pi * 3 * fracao))
+    if perfil == 'constante':
+        return 1.0
+    raise ValueError(f"Perfil desconhecido: {perfil} (use {', '.join(PERFIS)})")
+
+
+def perfil_mergulho(duracao=60.0, hz=10, perfil='quadrado', profundidade_maxima=15.0,
+                    temperatura_superficie=25.0, temperatura_fundo=17.0):
+    """
+    Gera as leituras (tempo_s, pressao, temperatura) de um mergulho de
+    `duracao` segundos a `hz` leituras por segundo. A temperatura cai
+    linearmente com a profundidade; a pressão é limitada ao fundo de escala
+    """
+    total = max(int(duracao * hz), 1)
+    for i in range(total):
+        relativa = _profundidade_relativa(perfil, i / total)
+        pressao = min(relativa * profundidade_maxima * PSI_POR_METRO, PRESSAO_MAXIMA)
+        temperatura = temperatura_superficie - (temperatura_superficie - temperatura_fundo) * relativa
+        yield i / hz, pressao, temperatura
+
+
+def leituras_da_missao(id_missao, id_dispositivo=None):
+    """Leituras (tempo_s, pressao, temperatura) de uma missão gravada, com o tempo relativo à primeira"""
+    inicio = None
+    for lote in db.iterar_medicoes(id_missao, colunas=('timestamp_ms', 'pressao', 'temperatura'),
+                                   id_dispositivo=id_dispositivo):
+        for timestamp_ms, pressao, temperatura in lote:
+            if inicio is None:
+                inicio = timestamp_ms
+            yield (timestamp_ms - inicio) / 1000, pressao, temperatura
+
+
+def formatar_linha(pressao, temperatura):
+    """Linha como o sketch imprime: Serial.print(psi, 2), ",", Serial.println(temperatura, 1)"""
+    return b"%.2f,%.1f\r\n" % (pressao, temperatura)
+
+
+def corromper_linha(linha, aleatorio):
+    """Linha que o decodificador rejeita: byte trocado, campo faltando, separador errado ou texto"""
+    tipo = aleatorio.randrange(4)
+    if tipo == 0:
+        corrompida = bytearray(linha)
+        corrompida[aleatorio.randrange(len(linha) - 1)] = 0xFF
+        return bytes(corrompida)
+    if tipo == 1:
+        return linha[:linha.index(b',') + 1] + b"\r\n"
+    if tipo == 2:
+        return linha.replace(b',', b';')
+    return b"ERRO sensor\r\n"
+
+
+class SimuladorArduino:
+    """Thread que envia as leituras por um pty ou socket TCP, como o Arduino faria"""
+
+    def __init__(self, leituras, transporte='pty', velocidade=1.0, ruido_pressao=0.05,
+                 ruido_temperatura=0.05, taxa_corrupcao=0.0, intervalo_queda=None,
+                 duracao_queda=1.0, semente=None, baudrate=None):
+        # velocidade: 1 = tempo real, N = N vezes mais rápido, None = sem pausa
+        # intervalo_queda: segundos de envio entre quedas de conexão (None = sem quedas);
+        # as leituras do período desconectado são perdidas, como no Arduino real
+        # baudrate: velocidade do sketch (só pty); com a porta aberta em outra
+        # velocidade chegam só bytes inválidos, como em uma UART real
+        if transporte not in ('pty', 'socket'):
+            raise ValueError(f"Transporte desconhecido: {transporte} (use pty ou socket)")
+        self.leituras = leituras
+        self.transporte = transporte
+        self.velocidade = velocidade
+        self.ruido_pressao = ruido_pressao
+        self.ruido_temperatura = ruido_temperatura
+        self.taxa_corrupcao = taxa_corrupcao
+        self.intervalo_queda = intervalo_queda
+        self.duracao_queda = duracao_queda
+        self.baudrate = baudrate
+        self.aleatorio = random.Random(semente)
+
+        self.porta = None
+        self.thread = None
+        self.parar_flag = threading.Event()
+        self.terminou = threading.Event()
+        self.disponivel = threading.Event()  # porta aberta (fora das quedas), pronta para conectar
+
+        # pty: (mestre, escravo); socket: servidor e conexão com o cliente
+        self._mestre = None
+        self._escravo = None
+        self._servidor = None
+        self._conexao = None
+        self._porta_tcp = 0
+
+        # Métricas
+        self.leituras_enviadas = 0   # linhas válidas
+        self.linhas_corrompidas = 0
+        self.leituras_perdidas = 0   # geradas durante as quedas
+        self.bytes_enviados = 0
+        self.quedas = 0
+        self.instantes_queda = []    # time.perf_counter() de cada queda
+        self.atraso_maximo = 0.0     # quanto o envio ficou atrás do horário previsto (s)
+        # (leituras válidas enviadas até aqui, time.perf_counter()) a cada escrita,
+        # para medir a latência de ponta a ponta
+        self.envios = []
+
+    def abrir(self):
+        """
+        Abre a porta sem enviar nada; retorna o nome para SensorArduino.conectar.
+        Conectar antes de iniciar() garante que nenhuma leitura se perca no
+        flushInput da conexão
+        """
+        if self.porta is None:
+            self._abrir()
+        return self.porta
+
+    def iniciar(self):
+        """Inicia o envio (abrindo a porta se preciso); retorna o nome da porta"""
+        self.abrir()
+        self.thread = threading.Thread(target=self._enviar_continuamente, daemon=True)
+        self.thread.start()
+        return self.porta
+
+    def parar(self, timeout=5):
+        """Interrompe o envio e fecha a porta"""
+        self.parar_flag.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout)
+        self._fechar()
+
+    def aguardar(self, timeout=None):
+        """Bloqueia até todas as leituras serem enviadas. Retorna False no timeout"""
+        return self.terminou.wait(timeout)
+
+    def get_metricas(self):
+        """Leituras enviadas, corrompidas e perdidas, quedas e atraso máximo do envio"""
+        return {
+            'porta': self.porta,
+            'leituras_enviadas': self.leituras_enviadas,
+            'linhas_corrompidas': self.linhas_corrompidas,
+            'leituras_perdidas': self.leituras_perdidas,
+            'bytes_enviados': self.bytes_enviados,
+            'quedas': self.quedas,
+            'atraso_maximo': self.atraso_maximo,
+        }
+
+    # ==================== TRANSPORTE ====================
+
+    def _abrir(self):
+        if self.transporte == 'pty':
+            import tty  # só existe em POSIX
+            self._mestre, self._escravo = os.openpty()
+            # Sem eco nem conversão de fim de linha até a porta ser configurada
+            tty.setraw(self._escravo)
+            self.porta = os.ttyname(self._escravo)
+        else:
+            # Na reconexão, o mesmo endereço (a porta TCP é reaproveitada)
+            self._servidor = socket.create_server(('127.0.0.1', self._porta_tcp))
+            self._servidor.settimeout(0.1)
+            self._porta_tcp = self._servidor.getsockname()[1]
+            self.porta = f"socket://127.0.0.1:{self._porta_tcp}"
+        self.disponivel.set()
+
+    def _fechar(self):
+        """Fecha a conexão: o SensorArduino vê a porta com erro, como com o cabo USB removido"""
+        self.disponivel.clear()
+        # socket: o servidor também fecha, recusando conexões durante a queda
+        for conexao in (self._conexao, self._servidor):
+            if conexao is not None:
+                conexao.close()
+        self._conexao = self._servidor = None
+        for descritor in (self._mestre, self._escravo):
+            if descritor is not None:
+                os.close(descritor)
+        self._mestre = self._escravo = None
+
+    def _aguardar_cliente(self):
+        """socket: espera o SensorArduino conectar (o pty não precisa)"""
+        if self.transporte == 'pty':
+            return True
+        while not self.parar_flag.is_set():
+            try:
+                self._conexao, _ = self._servidor.accept()
+            except socket.timeout:
+                continue
+            self._conexao.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            return True
+        return False
+
+    def _velocidade_errada(self):
+        """pty: a porta foi configurada em velocidade diferente da do sketch"""
+        if self.baudrate is None or self.transporte != 'pty':
+            return False
+        import termios  # só existe em POSIX
+        velocidade = getattr(termios, f'B{self.baudrate}')
+        return termios.tcgetattr(self._escravo)[5] != velocidade
+
+    def _escrever(self, dados):
+        if self._velocidade_errada():
+            # Sem quebras de linha nem o sincronismo do protocolo binário (0xA5 0x5A)
+            dados = bytes(self.aleatorio.randrange(0x80, 0x100) for _ in dados)
+        if self.transporte == 'pty':
+            visao = memoryview(dados)
+            while visao:
+                visao = visao[os.write(self._mestre, visao):]
+        else:
+            self._conexao.sendall(dados)
+
+    # ==================== ENVIO ====================
+
+    def _linha(self, pressao, temperatura):
+        """Linha a enviar (com ruído) e se ela é válida"""
+        if self.ruido_pressao:
+            pressao = min(max(pressao + self.aleatorio.gauss(0, self.ruido_pressao), 0.0), PRESSAO_MAXIMA)
+        if self.ruido_temperatura:
+            temperatura += self.aleatorio.gauss(0, self.ruido_temperatura)
+        linha = formatar_linha(pressao, temperatura)
+        if self.taxa_corrupcao and self.aleatorio.random() < self.taxa_corrupcao:
+            return corromper_linha(linha, self.aleatorio), False
+        return linha, True
+
+    def _enviar_continuamente(self):
+        pendentes = bytearray()
+        validas_pendentes = 0
+
+        def descarregar():
+            nonlocal validas_pendentes
+            if pendentes:
+                self._escrever(pendentes)
+                self.bytes_enviados += len(pendentes)
+                self.leituras_enviadas += validas_pendentes
+                self.envios.append((self.leituras_enviadas, time.perf_counter()))
+                pendentes.clear()
+                validas_pendentes = 0
+
+        try:
+            if not self._aguardar_cliente():
+                return
+            inicio = time.monotonic()
+            proxima_queda = self.intervalo_queda
+            fim_queda = None
+
+            for tempo_s, pressao, temperatura in self.leituras:
+                if self.parar_flag.is_set():
+                    break
+                if self.velocidade:
+                    tempo_s /= self.velocidade
+                    atraso = inicio + tempo_s - time.monotonic()
+                    if atraso > 0:
+                        descarregar()
+                        if self.parar_flag.wait(atraso):
+                            break
+                    else:
+                        self.atraso_maximo = max(self.atraso_maximo, -atraso)
+                else:
+                    tempo_s = time.monotonic() - inicio
+
+                if fim_queda is not None:
+                    if tempo_s < fim_queda:
+                        self.leituras_perdidas += 1
+                        continue
+                    # Arduino de volta: nova porta (pty) ou o mesmo endereço (socket)
+                    fim_queda = None
+                    self._abrir()
+                    if not self._aguardar_cliente():
+                        break
+                elif proxima_queda is not None and tempo_s >= proxima_queda:
+                    descarregar()
+                    self._fechar()
+                    self.quedas += 1
+                    self.instantes_queda.append(time.perf_counter())
+                    fim_queda = tempo_s + self.duracao_queda
+                    proxima_queda = fim_queda + self.intervalo_queda
+                    self.leituras_perdidas += 1
+                    continue
+
+                linha, valida = self._linha(pressao, temperatura)
+                pendentes += linha
+                if valida:
+                    validas_pendentes += 1
+                else:
+                    self.linhas_corrompidas += 1
+                if len(pendentes) >= TAMANHO_ESCRITA:
+                    descarregar()
+            descarregar()
+        except OSError as e:
+            if not self.parar_flag.is_set():
+                print(f"[SIMULADOR ERRO] Falha no envio: {e}")
+        finally:
+            self.terminou.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transporte', choices=('pty', 'socket'), default='pty')
+    parser.add_argument('--perfil', choices=PERFIS, default='quadrado')
+    parser.add_argument('--hz', type=float, default=1.0, help='leituras por segundo do perfil gerado')
+    parser.add_argument('--duracao', type=float, default=600.0, help='duração do mergulho gerado (s)')
+    parser.add_argument('--profundidade', type=float, default=15.0, help='profundidade máxima (m)')
+    parser.add_argument('--missao', type=int, help='reproduz as medições gravadas desta missão')
+    parser.add_argument('--velocidade', type=float, default=1.0, help='N vezes o tempo real (0 = sem pausa)')
+    parser.add_argument('--ruido', type=float, default=0.05, help='desvio padrão do ruído (psi e °C)')
+    parser.add_argument('--corrupcao', type=float, default=0.0, help='fração de linhas corrompidas')
+    parser.add_argument('--intervalo-queda', type=float, help='segundos entre quedas de conexão')
+    parser.add_argument('--duracao-queda', type=float, default=2.0)
+    parser.add_argument('--baudrate', type=int, help='velocidade do sketch (só pty; padrão: qualquer uma)')
+    args = parser.parse_args()
+
+    if args.missao is not None:
+        leituras = leituras_da_missao(args.missao)
+        ruido = 0.0  # reproduzir as medições como foram gravadas
+    else:
+        leituras = perfil_mergulho(args.duracao, args.hz, args.perfil, args.profundidade)
+        ruido = args.ruido
+
+    simulador = SimuladorArduino(leituras, args.transporte, args.velocidade or None, ruido, ruido,
+                                 args.corrupcao, args.intervalo_queda, args.duracao_queda,
+                                 baudrate=args.baudrate)
+    porta = simulador.iniciar()
+    print(f"[SIMULADOR] Arduino simulado em {porta} (Ctrl+C para encerrar)")
+    try:
+        while not simulador.aguardar(1):
+            pass
+    except KeyboardInterrupt:
+        pass
+    simulador.parar()
+    print(f"[SIMULADOR] {simulador.get_metricas()}")
+
+
+if __name__ == "__main__":
+    main()